@@ -29,6 +29,7 @@ from app.api.llm_tools import llm_tools_bp
 from app.api.context7_tools import context7_tools_bp
 from app.api.memory_test import memory_test_bp
 from app.api.enhanced_history import enhanced_history_bp
+from app.api.uploads import uploads_bp
 from app.security.security_api import security_bp
 from app.auth.auth_routes import auth_bp
 from app.api import api_bp
@@ -111,6 +112,7 @@ def create_app():
     # Code Wave chat blueprint removed
     app.register_blueprint(context7_tools_bp, url_prefix='/api/context7-tools')
     app.register_blueprint(enhanced_history_bp)
+    app.register_blueprint(uploads_bp)
     app.register_blueprint(memory_test_bp)
     app.register_blueprint(security_bp)
     app.register_blueprint(auth_bp)
@@ -142,6 +144,14 @@ def create_app():
     from app.routes.referral_routes import referral_bp
     app.register_blueprint(referral_bp)
 
+    # Register Screenshot routes
+    from app.routes.screenshot_routes import screenshot_bp
+    app.register_blueprint(screenshot_bp)
+
+    # Serve task progress streams from the async stream server when enabled
+    from app.services.task_stream_server import start_task_stream_server
+    start_task_stream_server()
+
     # Start the Visual Browser services
     # try:
     #     print("Starting Visual Browser services...")
@@ -15,6 +15,10 @@ from .base_agent import BaseAgent
 from app.api.gemini import GeminiAPI
 from app.api.groq import GroqAPI
 from app.utils.web_browser import WebBrowser
+from app.utils.cache_service import get_cache_service, make_cache_key
+
+# Cache namespace for SuperAgent task results
+TASK_CACHE_NAMESPACE = 'super_agent_task'
 
 # Import BrowserUseWrapper if available
 try:
@@ -81,8 +85,8 @@ class SuperAgent(BaseAgent):
         self.code_snippets = []
         self.js_enabled = True  # Flag to control JavaScript rendering (for compatibility with existing code)
 
-        # Initialize cache (for compatibility with existing code)
-        self.cache = {}
+        # Initialize cache (task results live in the shared cache service)
+        self.cache = get_cache_service(self.cache_dir)
         self.cache_enabled = True
         self.cache_expiry = 3600  # Cache expiry in seconds (1 hour)
 
@@ -97,21 +101,7 @@ class SuperAgent(BaseAgent):
         Returns:
             str: A cache key
         """
-        # Create a unique key based on the URL and whether JS was used
-        key_string = f"{url}_{use_js}"
-        return hashlib.md5(key_string.encode()).hexdigest()
-
-    def _get_cache_path(self, cache_key):
-        """
-        Get the file path for a cache key.
-
-        Args:
-            cache_key (str): The cache key
-
-        Returns:
-            str: The file path
-        """
-        return os.path.join(self.cache_dir, f"{cache_key}.json")
+        return make_cache_key(TASK_CACHE_NAMESPACE, {"url": url, "use_js": use_js})
 
     def _save_to_cache(self, cache_key, data):
         """
@@ -125,20 +115,7 @@ class SuperAgent(BaseAgent):
             return
 
         try:
-            # Add timestamp for expiry checking
-            cache_data = {
-                "timestamp": datetime.datetime.now().timestamp(),
-                "data": data
-            }
-
-            # Save to memory cache
-            self.cache[cache_key] = cache_data
-
-            # Save to disk cache
-            cache_path = self._get_cache_path(cache_key)
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f)
-
+            self.cache.set(TASK_CACHE_NAMESPACE, cache_key, data, ttl=self.cache_expiry)
             print(f"Saved data to cache: {cache_key}")
         except Exception as e:
             print(f"Error saving to cache: {str(e)}")
@@ -156,44 +133,15 @@ class SuperAgent(BaseAgent):
         if not self.cache_enabled:
             return None
 
-        # Check memory cache first
-        if cache_key in self.cache:
-            cache_data = self.cache[cache_key]
-            timestamp = cache_data.get("timestamp", 0)
-            current_time = datetime.datetime.now().timestamp()
-
-            # Check if cache is expired
-            if current_time - timestamp <= self.cache_expiry:
-                print(f"Cache hit (memory): {cache_key}")
-                return cache_data.get("data")
-            else:
-                print(f"Cache expired (memory): {cache_key}")
-                return None
-
-        # Check disk cache
         try:
-            cache_path = self._get_cache_path(cache_key)
-            if os.path.exists(cache_path):
-                with open(cache_path, 'r') as f:
-                    cache_data = json.load(f)
-
-                timestamp = cache_data.get("timestamp", 0)
-                current_time = datetime.datetime.now().timestamp()
-
-                # Check if cache is expired
-                if current_time - timestamp <= self.cache_expiry:
-                    # Update memory cache
-                    self.cache[cache_key] = cache_data
-                    print(f"Cache hit (disk): {cache_key}")
-                    return cache_data.get("data")
-                else:
-                    print(f"Cache expired (disk): {cache_key}")
-                    return None
+            data = self.cache.get(TASK_CACHE_NAMESPACE, cache_key, ttl=self.cache_expiry)
         except Exception as e:
             print(f"Error reading from cache: {str(e)}")
             return None
 
-        return None
+        if data is not None:
+            print(f"Cache hit: {cache_key}")
+        return data
 
     def browse_web(self, url, use_js=None):  # use_js parameter kept for backward compatibility
         """
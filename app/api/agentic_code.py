@@ -3,7 +3,7 @@ Agentic Code API - Smart Code Assistant with Conversational AI
 Provides Augment-like capabilities for iterative code generation and modification
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, redirect
 import json
 import time
 import re
@@ -13,6 +13,7 @@ from dotenv import load_dotenv
 from app.services.file_processor import file_processor
 from app.decorators.paywall import require_credits, trial_limit, require_subscription
 from app.services.activity_logger import log_agentic_code_activity
+from app.services.task_stream_server import get_local_stream_url
 
 # Load environment variables
 load_dotenv()
@@ -1785,18 +1786,7 @@ def process_agentic_request():
         if "--- File:" in message or "--- Image:" in message:
             try:
                 # Extract the original user message (before file content)
-                parts = message.split('\n\n--- File:')
-                if len(parts) > 1:
-                    original_message = parts[0]
-                    file_content = '\n\n--- File:' + '\n\n--- File:'.join(parts[1:])
-                else:
-                    parts = message.split('\n\n--- Image:')
-                    if len(parts) > 1:
-                        original_message = parts[0]
-                        file_content = '\n\n--- Image:' + '\n\n--- Image:'.join(parts[1:])
-                    else:
-                        original_message = message
-                        file_content = ""
+                original_message, file_content = file_processor.split_file_content(message)
 
                 if file_content:
                     # Use the file processor to enhance the message
@@ -1920,11 +1910,23 @@ def execute_code():
 
 @agentic_code_bp.route('/status/<project_id>', methods=['GET'])
 def get_execution_status(project_id):
-    """Get execution status for a project"""
+    """Get execution status for a project, or stream its output as Server-Sent Events"""
     try:
         from app.services.simple_code_executor import simple_executor
 
-        result = simple_executor.get_execution_status(project_id)
+        # EventSource clients get the output as it is printed
+        if request.args.get('stream') == 'true' or 'text/event-stream' in request.headers.get('Accept', ''):
+            last_event_id = request.headers.get('Last-Event-ID')
+            # Held by the async stream server when it runs here, instead of a worker thread per client
+            stream_url = get_local_stream_url(f"/api/agentic-code/status/{project_id}", last_event_id)
+            if stream_url:
+                return redirect(stream_url, code=307)
+            events = simple_executor.iter_output_events(project_id, last_event_id)
+            return Response(events, mimetype='text/event-stream')
+
+        # Pollers pass back the previous offset to get only new output
+        since = request.args.get('since', type=int)
+        result = simple_executor.get_execution_status(project_id, since=since)
 
         return jsonify(result)
 
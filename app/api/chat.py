@@ -127,18 +127,7 @@ def do_chat(message):
         logger.info("File content detected in message, processing files...")
         try:
             # Extract the original user message (before file content)
-            parts = decoded_message.split('\n\n--- File:')
-            if len(parts) > 1:
-                original_message = parts[0]
-                file_content = '\n\n--- File:' + '\n\n--- File:'.join(parts[1:])
-            else:
-                parts = decoded_message.split('\n\n--- Image:')
-                if len(parts) > 1:
-                    original_message = parts[0]
-                    file_content = '\n\n--- Image:' + '\n\n--- Image:'.join(parts[1:])
-                else:
-                    original_message = decoded_message
-                    file_content = ""
+            original_message, file_content = file_processor.split_file_content(decoded_message)
 
             if file_content:
                 # Use the file processor to enhance the message
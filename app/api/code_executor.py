@@ -168,12 +168,15 @@ def get_execution_status(project_id):
     Args:
         project_id (str): Project ID
 
+    Query parameters:
+        since (int, optional): Output offset from the previous status, to get only new output
+
     Returns:
         JSON response with execution status
     """
     try:
         # Get the execution status
-        result = simple_executor.get_execution_status(project_id)
+        result = simple_executor.get_execution_status(project_id, since=request.args.get('since', type=int))
 
         return jsonify(result)
 
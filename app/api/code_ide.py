@@ -6,9 +6,9 @@ This module provides API endpoints for code generation and execution.
 
 import logging
 import json
-import re
 from flask import Blueprint, request, jsonify, Response, stream_with_context
 from app.api.gemini import GeminiAPI
+from app.services.code_section_index import get_section_index, update_section_index
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -31,12 +31,16 @@ class CodeSectionParser:
     """
     Intelligent code parser that identifies and extracts specific sections
     of HTML, CSS, and JavaScript code for targeted editing.
+
+    Sections come from a parsed index of the document (see
+    app.services.code_section_index), built once per version of the code.
     """
 
-    def __init__(self):
-        self.html_element_pattern = r'<(\w+)([^>]*)>(.*?)</\1>'
-        self.css_rule_pattern = r'([^{]+)\s*\{([^}]+)\}'
-        self.js_function_pattern = r'function\s+(\w+)\s*\([^)]*\)\s*\{[^}]*\}'
+    # Keywords for different types of edits
+    color_keywords = ['color', 'background', 'blue', 'red', 'green', 'yellow', 'purple', 'orange']
+    text_keywords = ['text', 'title', 'heading', 'content', 'word', 'change text']
+    layout_keywords = ['layout', 'position', 'margin', 'padding', 'width', 'height', 'size']
+    animation_keywords = ['animation', 'animate', 'transition', 'hover', 'effect']
 
     def identify_sections(self, code):
         """
@@ -48,132 +52,29 @@ class CodeSectionParser:
         Returns:
             dict: Dictionary of identified sections with metadata
         """
-        sections = {
-            'html_elements': self._extract_html_elements(code),
-            'css_rules': self._extract_css_rules(code),
-            'js_functions': self._extract_js_functions(code),
-            'inline_styles': self._extract_inline_styles(code),
-            'text_content': self._extract_text_content(code)
-        }
-
-        return sections
-
-    def _extract_html_elements(self, code):
-        """Extract HTML elements with their positions."""
-        elements = []
-        pattern = r'<(\w+)([^>]*?)>(.*?)</\1>'
-
-        for match in re.finditer(pattern, code, re.DOTALL | re.IGNORECASE):
-            tag_name = match.group(1)
-            attributes = match.group(2).strip()
-            content = match.group(3)
-            start_pos = match.start()
-            end_pos = match.end()
-
-            # Skip script and style tags for now
-            if tag_name.lower() not in ['script', 'style']:
-                elements.append({
-                    'type': 'html_element',
-                    'tag': tag_name,
-                    'attributes': attributes,
-                    'content': content,
-                    'full_match': match.group(0),
-                    'start_pos': start_pos,
-                    'end_pos': end_pos,
-                    'editable_aspects': ['content', 'attributes', 'styling']
-                })
-
-        return elements
-
-    def _extract_css_rules(self, code):
-        """Extract CSS rules from style tags and inline styles."""
-        rules = []
-
-        # Extract from <style> tags
-        style_pattern = r'<style[^>]*>(.*?)</style>'
-        for style_match in re.finditer(style_pattern, code, re.DOTALL | re.IGNORECASE):
-            css_content = style_match.group(1)
-            style_start = style_match.start()
-
-            # Extract individual CSS rules
-            rule_pattern = r'([^{]+)\s*\{([^}]+)\}'
-            for rule_match in re.finditer(rule_pattern, css_content):
-                selector = rule_match.group(1).strip()
-                properties = rule_match.group(2).strip()
-
-                rules.append({
-                    'type': 'css_rule',
-                    'selector': selector,
-                    'properties': properties,
-                    'full_match': rule_match.group(0),
-                    'start_pos': style_start + rule_match.start(),
-                    'end_pos': style_start + rule_match.end(),
-                    'editable_aspects': ['properties', 'selector']
-                })
-
-        return rules
-
-    def _extract_js_functions(self, code):
-        """Extract JavaScript functions."""
-        functions = []
-
-        # Extract from <script> tags
-        script_pattern = r'<script[^>]*>(.*?)</script>'
-        for script_match in re.finditer(script_pattern, code, re.DOTALL | re.IGNORECASE):
-            js_content = script_match.group(1)
-            script_start = script_match.start()
-
-            # Extract function declarations
-            func_pattern = r'function\s+(\w+)\s*\([^)]*\)\s*\{[^}]*\}'
-            for func_match in re.finditer(func_pattern, js_content):
-                func_name = func_match.group(1)
-
-                functions.append({
-                    'type': 'js_function',
-                    'name': func_name,
-                    'full_match': func_match.group(0),
-                    'start_pos': script_start + func_match.start(),
-                    'end_pos': script_start + func_match.end(),
-                    'editable_aspects': ['logic', 'parameters']
-                })
+        return get_section_index(code).to_dicts()
 
-        return functions
-
-    def _extract_inline_styles(self, code):
-        """Extract inline style attributes."""
-        styles = []
-        style_pattern = r'style\s*=\s*["\']([^"\']+)["\']'
-
-        for match in re.finditer(style_pattern, code, re.IGNORECASE):
-            styles.append({
-                'type': 'inline_style',
-                'properties': match.group(1),
-                'full_match': match.group(0),
-                'start_pos': match.start(),
-                'end_pos': match.end(),
-                'editable_aspects': ['properties']
-            })
+    def find_section(self, code, selector):
+        """
+        Find the section a selector, function name or piece of text refers to.
 
-        return styles
-
-    def _extract_text_content(self, code):
-        """Extract text content from HTML elements."""
-        content = []
-        # Simple pattern to find text between tags (excluding script/style)
-        text_pattern = r'>([^<]+)<'
-
-        for match in re.finditer(text_pattern, code):
-            text = match.group(1).strip()
-            if text and not text.isspace():
-                content.append({
-                    'type': 'text_content',
-                    'text': text,
-                    'start_pos': match.start(1),
-                    'end_pos': match.end(1),
-                    'editable_aspects': ['text']
-                })
+        Args:
+            code (str): The complete code
+            selector (str): A CSS selector, a JavaScript function name, or text on the page
 
-        return content
+        Returns:
+            dict: The first matching section, or None
+        """
+        index = get_section_index(code)
+        for matches in (lambda: index.css_rules_for(selector), lambda: index.select(selector),
+                        lambda: index.functions_named(selector), lambda: index.find_text(selector)):
+            try:
+                found = matches()
+            except Exception:
+                found = None
+            if found:
+                return found[0].to_dict(code)
+        return None
 
     def find_target_section(self, code, user_prompt):
         """
@@ -186,59 +87,60 @@ class CodeSectionParser:
         Returns:
             dict: Best matching section for the edit request
         """
-        sections = self.identify_sections(code)
+        index = get_section_index(code)
         prompt_lower = user_prompt.lower()
 
-        # Keywords for different types of edits
-        color_keywords = ['color', 'background', 'blue', 'red', 'green', 'yellow', 'purple', 'orange']
-        text_keywords = ['text', 'title', 'heading', 'content', 'word', 'change text']
-        layout_keywords = ['layout', 'position', 'margin', 'padding', 'width', 'height', 'size']
-        animation_keywords = ['animation', 'animate', 'transition', 'hover', 'effect']
+        wants_color = any(keyword in prompt_lower for keyword in self.color_keywords)
+        wants_text = any(keyword in prompt_lower for keyword in self.text_keywords)
+        wants_layout = any(keyword in prompt_lower for keyword in self.layout_keywords)
+        wants_animation = any(keyword in prompt_lower for keyword in self.animation_keywords)
+        wants_button = 'button' in prompt_lower
+        wants_heading = 'heading' in prompt_lower
 
-        # Score sections based on relevance to prompt
-        scored_sections = []
+        # Score sections based on relevance to prompt; the first of equal scores wins
+        best, best_score = None, 0
 
-        for section_type, section_list in sections.items():
+        for section_list in index.sections.values():
             for section in section_list:
+                if section.type == 'html_element' and section.name in ('script', 'style'):
+                    continue
                 score = 0
 
                 # Score based on keywords in prompt
-                if any(keyword in prompt_lower for keyword in color_keywords):
-                    if section['type'] in ['css_rule', 'inline_style']:
-                        score += 10
+                if wants_color and section.type in ['css_rule', 'inline_style']:
+                    score += 10
 
-                if any(keyword in prompt_lower for keyword in text_keywords):
-                    if section['type'] == 'text_content':
+                if wants_text:
+                    if section.type == 'text_content':
                         score += 10
-                    elif section['type'] == 'html_element':
+                    elif section.type == 'html_element':
                         score += 5
 
-                if any(keyword in prompt_lower for keyword in layout_keywords):
-                    if section['type'] in ['css_rule', 'inline_style']:
-                        score += 8
+                if wants_layout and section.type in ['css_rule', 'inline_style']:
+                    score += 8
 
-                if any(keyword in prompt_lower for keyword in animation_keywords):
-                    if section['type'] == 'css_rule':
-                        score += 10
+                if wants_animation and section.type == 'css_rule':
+                    score += 10
 
                 # Add context-based scoring
-                if section['type'] == 'html_element':
-                    if 'button' in prompt_lower and section['tag'].lower() == 'button':
+                if section.type == 'html_element':
+                    if wants_button and section.name == 'button':
                         score += 15
-                    elif 'heading' in prompt_lower and section['tag'].lower() in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
+                    elif wants_heading and section.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
                         score += 15
 
-                if score > 0:
-                    section['relevance_score'] = score
-                    scored_sections.append(section)
+                if score > best_score:
+                    best, best_score = section, score
 
         # Return the highest scoring section
-        if scored_sections:
-            return max(scored_sections, key=lambda x: x['relevance_score'])
+        if best is not None:
+            target = best.to_dict(code)
+            target['relevance_score'] = best_score
+            return target
 
         # Fallback: return the first CSS rule if no specific match
-        if sections['css_rules']:
-            return sections['css_rules'][0]
+        if index.sections['css_rules']:
+            return index.sections['css_rules'][0].to_dict(code)
 
         return None
 
@@ -735,7 +637,8 @@ def edit_code_section():
     {
         "prompt": "user editing request",
         "current_code": "complete current code",
-        "target_section": "optional specific section to edit"
+        "target_section": "optional specific section to edit",
+        "target_selector": "optional CSS selector, function name or text of the section to edit"
     }
     """
     try:
@@ -743,6 +646,7 @@ def edit_code_section():
         user_prompt = data.get('prompt', '').strip()
         current_code = data.get('current_code', '')
         target_section = data.get('target_section')
+        target_selector = data.get('target_selector')
 
         if not user_prompt:
             return jsonify({
@@ -765,6 +669,9 @@ def edit_code_section():
         if target_section:
             # Use provided target section
             target = target_section
+        elif target_selector:
+            # Look up the section the user pointed at
+            target = parser.find_section(current_code, target_selector)
         else:
             # Automatically detect target section
             target = parser.find_target_section(current_code, user_prompt)
@@ -980,6 +887,12 @@ def apply_section_edit(original_code, target_section, modified_section):
         original_code[end_pos:]
     )
 
+    # Index the edited version from the original's index, so the next edit does not reparse the page
+    try:
+        update_section_index(original_code, start_pos, end_pos, cleaned_modified_section)
+    except Exception as e:
+        logger.warning(f"Could not update section index: {str(e)}")
+
     logger.info(f"Modified code assembled. Length: {len(modified_code)}")
     logger.info(f"Code actually changed: {modified_code != original_code}")
 
@@ -987,7 +900,13 @@ def apply_section_edit(original_code, target_section, modified_section):
     if not is_valid_html_structure(modified_code):
         logger.warning("Generated code may have structural issues")
         # Try to fix common issues
-        modified_code = fix_html_structure(modified_code)
+        fixed_code = fix_html_structure(modified_code)
+        if fixed_code != modified_code and fixed_code.endswith(modified_code):
+            try:
+                update_section_index(modified_code, 0, 0, fixed_code[:len(fixed_code) - len(modified_code)])
+            except Exception as e:
+                logger.warning(f"Could not update section index: {str(e)}")
+        modified_code = fixed_code
         logger.info("Applied HTML structure fixes")
 
     logger.info("apply_section_edit completed successfully")
@@ -10,11 +10,12 @@ import logging
 import threading
 import os
 import random
-import tempfile
-import base64
+import functools
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
 from app.prime_agent.task_manager import task_manager
+from app.services.task_events import iter_task_events, has_final_result
+from app.services.task_stream_server import get_stream_url
 from app.utils.booking_handler import BookingHandler
 from app.visual_browser.selenium_visual_browser import SeleniumVisualBrowser
 try:
@@ -23,11 +24,14 @@ try:
 except ImportError:
     BROWSER_USE_AVAILABLE = False
 from app.visual_browser.stealth_browser import StealthBrowserSync
+from app.visual_browser.browser_pool import get_context7_browser_pool, BrowserPoolExhausted
 from app.api.gemini import GeminiAPI
 from app.services.memory_integration import memory_integration
 from app.services.file_processor import file_processor
 from app.services.activity_logger import log_context7_activity
 from app.services.credit_service import credit_service
+from app.services.screenshot_store import get_screenshot_store
+from app.utils.cache_service import get_cache_service
 
 # Create blueprint
 context7_tools_bp = Blueprint('context7_tools', __name__)
@@ -46,13 +50,90 @@ except Exception as e:
     gemini_api = None
     GEMINI_AVAILABLE = False
 
+# Tools whose results are cached by their parsed parameters; TTLs live in the cache service
+CACHED_TOOLS = ('flight_booking', 'hotel_search', 'restaurant_booking', 'price_comparison')
+
+# Seconds a request waits on an identical search already running before searching itself
+TOOL_TIMEOUT = int(os.environ.get('CONTEXT7_TOOL_TIMEOUT', 180))
+
+
+def _normalize_tool_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize parsed tool parameters so equivalent requests share a cache key."""
+    normalized = {}
+    for name, value in params.items():
+        if isinstance(value, str):
+            value = ' '.join(value.lower().split())
+            if value.isdigit():
+                value = int(value)
+        normalized[name] = value
+    return normalized
+
+
+def get_tool_cache_stats() -> Dict[str, Any]:
+    """
+    Get result cache statistics for each cached Context 7 tool.
+
+    Returns:
+        Dict[str, Any]: Per-tool hits, coalesced requests, executions and hit rates
+    """
+    namespaces = get_cache_service().get_stats()['namespaces']
+    tools = {}
+    for tool in CACHED_TOOLS:
+        stats = namespaces.get(f"context7_{tool}")
+        if stats is None:
+            continue
+        tools[tool] = {
+            'requests': stats['cache_hits'] + stats['cache_misses'],
+            'hits': stats['cache_hits'],
+            'coalesced': stats['coalesced'],
+            'executions': stats['computations'],
+            'hit_rate': stats['hit_rate'],
+            'saved_rate': stats['saved_rate'],
+            'ttl': stats['ttl']
+        }
+    return tools
+
+
 class RealWebBrowsingContext7Tools:
     """Real web browsing implementation for Context 7 tools using Selenium and LLM intelligence"""
 
     def __init__(self):
         self.booking_handler = booking_handler
         self.gemini_api = gemini_api
+        # Each task thread works on its own leased browser
+        self._local = threading.local()
+        # The pool is created and warmed on the first lease, not at import
+        self.use_browser_pool = os.environ.get('CONTEXT7_BROWSER_POOL', 'true').lower() == 'true'
+        self.result_cache = None
+        if os.environ.get('CONTEXT7_RESULT_CACHE', 'true').lower() == 'true':
+            self.result_cache = get_cache_service()
+
+    @property
+    def browser(self):
+        return getattr(self._local, 'browser', None)
+
+    @browser.setter
+    def browser(self, value):
+        self._local.browser = value
+
+    def release_browser(self):
+        """Return the current thread's browser to the pool, or stop it if it was started directly."""
+        lease = getattr(self._local, 'lease', None)
+        browser = self.browser
         self.browser = None
+        if lease is not None:
+            self._local.lease = None
+            lease.release()
+            return
+        if browser is None:
+            return
+        try:
+            if hasattr(browser, 'stop'):
+                browser.stop()
+            elif hasattr(browser, 'close'):
+                browser.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Error stopping unpooled browser: {e}")
 
     def _safe_gemini_call(self, method_name, *args, **kwargs):
         """Safely call Gemini API methods with fallback."""
@@ -67,9 +148,57 @@ class RealWebBrowsingContext7Tools:
             logger.error(f"Error calling Gemini API {method_name}: {e}")
             return None
 
+    def _run_cached_tool(self, tool: str, task_id: str, params: Dict[str, Any], search) -> Dict[str, Any]:
+        """
+        Run a tool search, reusing a recent result for the same parameters.
+
+        Identical requests running at the same time share one search. Only results
+        from a successful browser search are cached, never fallbacks or errors.
+
+        Args:
+            tool: The tool name, e.g. 'hotel_search'
+            task_id: The task to report progress on
+            params: The parsed parameters that determine the result
+            search: Runs the search and returns its result
+
+        Returns:
+            Dict[str, Any]: The tool result
+        """
+        if self.result_cache is None:
+            return search()
+
+        namespace = f"context7_{tool}"
+        ttl = os.environ.get(f"CONTEXT7_CACHE_TTL_{tool.upper()}")
+        result, source = self.result_cache.get_or_compute(
+            namespace, _normalize_tool_params(params), search,
+            ttl=int(ttl) if ttl else None,
+            cacheable=lambda r: bool(r.get('success')) and 'analysis' in r,
+            wait_timeout=TOOL_TIMEOUT
+        )
+        if source == 'hit':
+            task_manager.update_task_progress(task_id, "thinking", "⚡ Found recent results for this exact search...")
+        elif source == 'coalesced':
+            task_manager.update_task_progress(task_id, "thinking", "⚡ Joined an identical search already in progress...")
+        if source != 'miss':
+            result = dict(result, cached=True)
+        return result
+
     def initialize_browser(self):
         """Initialize advanced browser with CAPTCHA bypass capabilities"""
         if not self.browser:
+            # PRIORITY 0: Lease a pre-started browser from the warm pool
+            if self.use_browser_pool:
+                try:
+                    lease = get_context7_browser_pool().acquire()
+                    self._local.lease = lease
+                    self.browser = lease.browser
+                    logger.info(f"✅ Leased pooled browser (waited {lease.wait_time:.2f}s)")
+                    return True
+                except BrowserPoolExhausted as e:
+                    logger.warning(f"⚠️ Browser pool exhausted, starting an unpooled browser: {e}")
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to lease pooled browser, starting one directly: {e}")
+
             try:
                 # Detect Heroku environment
                 is_heroku = os.environ.get('DYNO') is not None
@@ -180,6 +309,7 @@ class RealWebBrowsingContext7Tools:
     def _take_multiple_screenshots(self, url: str, site_name: str, scroll_count: int = 5) -> List[Dict[str, str]]:
         """Take multiple screenshots with scrolling for rich visual content"""
         screenshots = []
+        seen = set()
 
         try:
             if not self.browser:
@@ -188,11 +318,15 @@ class RealWebBrowsingContext7Tools:
             # Take initial screenshot
             initial_screenshot = self.browser.take_screenshot()
             if initial_screenshot:
-                screenshot_data = self._save_screenshot_to_file(initial_screenshot, f"{site_name}_main")
-                if screenshot_data:
+                stored = self._save_screenshot_to_file(initial_screenshot, f"{site_name}_main")
+                if stored:
+                    seen.add(stored.digest)
                     screenshots.append({
                         'title': f"📸 {site_name} - Main View",
-                        'data': screenshot_data,
+                        'url': stored.url,
+                        'thumbnail_url': stored.thumbnail_url,
+                        'path': stored.path,
+                        'width': stored.width,
                         'description': f"Main page view from {site_name}"
                     })
 
@@ -207,11 +341,16 @@ class RealWebBrowsingContext7Tools:
                     # Take screenshot
                     scrolled_screenshot = self.browser.take_screenshot()
                     if scrolled_screenshot:
-                        screenshot_data = self._save_screenshot_to_file(scrolled_screenshot, f"{site_name}_scroll_{i+1}")
-                        if screenshot_data:
+                        stored = self._save_screenshot_to_file(scrolled_screenshot, f"{site_name}_scroll_{i+1}")
+                        # Skip frames identical to one already shown, e.g. once the page stops scrolling
+                        if stored and stored.digest not in seen:
+                            seen.add(stored.digest)
                             screenshots.append({
                                 'title': f"📸 {site_name} - Section {i+1}",
-                                'data': screenshot_data,
+                                'url': stored.url,
+                                'thumbnail_url': stored.thumbnail_url,
+                                'path': stored.path,
+                                'width': stored.width,
                                 'description': f"Additional content from {site_name} (scroll view {i+1})"
                             })
                 except Exception as e:
@@ -223,15 +362,13 @@ class RealWebBrowsingContext7Tools:
 
         return screenshots
 
-    def _save_screenshot_to_file(self, screenshot_data: str, filename_prefix: str) -> str:
-        """Save screenshot data to file and return base64 string"""
+    def _save_screenshot_to_file(self, screenshot_data: str, filename_prefix: str):
+        """Save screenshot data to the screenshot store and return the stored screenshot"""
         try:
-            if screenshot_data and screenshot_data.startswith('data:image/'):
-                # Extract base64 data
-                if ';base64,' in screenshot_data:
-                    screenshot_base64 = screenshot_data.split(';base64,')[1]
-                    return screenshot_base64
-            return None
+            stored = get_screenshot_store().put(screenshot_data)
+            if stored is None:
+                logger.warning(f"Could not store screenshot {filename_prefix}")
+            return stored
         except Exception as e:
             logger.error(f"Error saving screenshot: {e}")
             return None
@@ -242,14 +379,21 @@ class RealWebBrowsingContext7Tools:
             return ""
 
         html_content = "\n\n### 📸 Visual Gallery\n\n"
+        thumbnail_width = get_screenshot_store().thumbnail_width
 
         for i, screenshot in enumerate(screenshots):
+            # Thumbnails load first on narrow screens; the full image is linked
+            srcset = ""
+            if screenshot.get('width') and screenshot['thumbnail_url'] != screenshot['url']:
+                srcset = (f' srcset="{screenshot["thumbnail_url"]} {thumbnail_width}w, {screenshot["url"]} {screenshot["width"]}w"'
+                          ' sizes="(max-width: 480px) 100vw, 800px"')
+
             # Add screenshot with title and description
             html_content += f"""
 #### {screenshot['title']}
 *{screenshot['description']}*
 
-<img src="data:image/png;base64,{screenshot['data']}" style="max-width: 100%; height: auto; border-radius: 8px; margin: 15px 0; box-shadow: 0 4px 8px rgba(0,0,0,0.1);" />
+<a href="{screenshot['url']}" target="_blank"><img src="{screenshot['url']}"{srcset} loading="lazy" style="max-width: 100%; height: auto; border-radius: 8px; margin: 15px 0; box-shadow: 0 4px 8px rgba(0,0,0,0.1);" /></a>
 
 """
             # Add spacing between screenshots
@@ -308,6 +452,24 @@ class RealWebBrowsingContext7Tools:
                 f"✈️ Searching for flights from {origin} to {destination} on {departure_date}..."
             )
 
+            return self._run_cached_tool(
+                'flight_booking', task_id,
+                {'origin': origin, 'destination': destination, 'departure_date': departure_date},
+                lambda: self._search_flights(task_id, flight_details, origin, destination, departure_date, date_filter)
+            )
+
+        except Exception as e:
+            logger.error(f"Error in flight booking: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "task_summary": f"❌ Error searching for flights: {str(e)}"
+            }
+
+    def _search_flights(self, task_id: str, flight_details: Dict[str, Any], origin: str, destination: str,
+                        departure_date: str, date_filter: Dict[str, Any]) -> Dict[str, Any]:
+        """Search flights in the browser and analyse the results"""
+        try:
             # Initialize screenshots list
             all_screenshots = []
 
@@ -363,11 +525,8 @@ class RealWebBrowsingContext7Tools:
                     # Use first screenshot for LLM analysis (backward compatibility)
                     screenshot_path = None
                     if all_screenshots:
-                        # Create temporary file for LLM analysis
-                        with tempfile.NamedTemporaryFile(mode='w+b', suffix='.png', delete=False) as f:
-                            screenshot_bytes = base64.b64decode(all_screenshots[0]['data'])
-                            f.write(screenshot_bytes)
-                            screenshot_path = f.name
+                        # The stored file is analysed directly
+                        screenshot_path = all_screenshots[0]['path']
                 else:
                     screenshot_path = None
 
@@ -465,6 +624,24 @@ For actual flight booking, you'll need to:
                 f"🏨 Searching for hotels in {location} from {check_in} to {check_out}..."
             )
 
+            return self._run_cached_tool(
+                'hotel_search', task_id,
+                {'location': location, 'check_in': check_in, 'check_out': check_out, 'guests': guests},
+                lambda: self._search_hotels(task_id, hotel_details, location, check_in, check_out, guests, date_filter)
+            )
+
+        except Exception as e:
+            logger.error(f"Error in hotel search: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "task_summary": f"❌ Error searching for hotels: {str(e)}"
+            }
+
+    def _search_hotels(self, task_id: str, hotel_details: Dict[str, Any], location: str, check_in: str,
+                       check_out: str, guests: int, date_filter: Dict[str, Any]) -> Dict[str, Any]:
+        """Search hotels in the browser and analyse the results"""
+        try:
             # Initialize screenshots list
             all_screenshots = []
 
@@ -505,11 +682,8 @@ For actual flight booking, you'll need to:
                     # Use first screenshot for LLM analysis (backward compatibility)
                     screenshot_path = None
                     if all_screenshots:
-                        # Create temporary file for LLM analysis
-                        with tempfile.NamedTemporaryFile(mode='w+b', suffix='.png', delete=False) as f:
-                            screenshot_bytes = base64.b64decode(all_screenshots[0]['data'])
-                            f.write(screenshot_bytes)
-                            screenshot_path = f.name
+                        # The stored file is analysed directly
+                        screenshot_path = all_screenshots[0]['path']
                 else:
                     screenshot_path = None
 
@@ -601,6 +775,27 @@ For actual flight booking, you'll need to:
                 f"🍽️ Searching for {cuisine} restaurants in {location} for {party_size} people..."
             )
 
+            # Dates like "tonight" are relative, so the day of the search is part of the key
+            params = {'location': location, 'cuisine': cuisine, 'party_size': party_size, 'date': date,
+                      'time': time_slot, 'searched_on': date_filter['formatted_date']}
+            return self._run_cached_tool(
+                'restaurant_booking', task_id, params,
+                lambda: self._search_restaurants(task_id, restaurant_details, location, cuisine, party_size, date,
+                                                 time_slot, date_filter)
+            )
+
+        except Exception as e:
+            logger.error(f"Error in restaurant booking: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "task_summary": f"❌ Error searching for restaurants: {str(e)}"
+            }
+
+    def _search_restaurants(self, task_id: str, restaurant_details: Dict[str, Any], location: str, cuisine: str,
+                            party_size: int, date: str, time_slot: str, date_filter: Dict[str, Any]) -> Dict[str, Any]:
+        """Search restaurants in the browser and analyse the results"""
+        try:
             # Initialize screenshots list
             all_screenshots = []
 
@@ -640,11 +835,8 @@ For actual flight booking, you'll need to:
                     # Use first screenshot for LLM analysis (backward compatibility)
                     screenshot_path = None
                     if all_screenshots:
-                        # Create temporary file for LLM analysis
-                        with tempfile.NamedTemporaryFile(mode='w+b', suffix='.png', delete=False) as f:
-                            screenshot_bytes = base64.b64decode(all_screenshots[0]['data'])
-                            f.write(screenshot_bytes)
-                            screenshot_path = f.name
+                        # The stored file is analysed directly
+                        screenshot_path = all_screenshots[0]['path']
                 else:
                     logger.error(f"Navigation failed: {navigation_result.get('error', 'Unknown error')}")
                     screenshot_path = None
@@ -732,6 +924,23 @@ For actual flight booking, you'll need to:
                 f"💰 Searching for best prices on {product}..."
             )
 
+            return self._run_cached_tool(
+                'price_comparison', task_id, {'product': product, 'category': category},
+                lambda: self._compare_prices(task_id, product_details, product, category, date_filter)
+            )
+
+        except Exception as e:
+            logger.error(f"Error in price comparison: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "task_summary": f"❌ Error comparing prices: {str(e)}"
+            }
+
+    def _compare_prices(self, task_id: str, product_details: Dict[str, Any], product: str, category: str,
+                        date_filter: Dict[str, Any]) -> Dict[str, Any]:
+        """Compare prices in the browser and analyse the results"""
+        try:
             if self.initialize_browser():
                 # Build Amazon search URL
                 amazon_url = f"https://www.amazon.com/s?k={product.replace(' ', '+')}"
@@ -768,11 +977,8 @@ For actual flight booking, you'll need to:
                     # Use first screenshot for LLM analysis (backward compatibility)
                     screenshot_path = None
                     if all_screenshots:
-                        # Create temporary file for LLM analysis
-                        with tempfile.NamedTemporaryFile(mode='w+b', suffix='.png', delete=False) as f:
-                            screenshot_bytes = base64.b64decode(all_screenshots[0]['data'])
-                            f.write(screenshot_bytes)
-                            screenshot_path = f.name
+                        # The stored file is analysed directly
+                        screenshot_path = all_screenshots[0]['path']
                 else:
                     screenshot_path = None
                     all_screenshots = []
@@ -2095,11 +2301,8 @@ Multiple shopping options available. Please check the links below for current pr
                         # Use first screenshot for LLM analysis (backward compatibility)
                         screenshot_path = None
                         if all_screenshots:
-                            # Create temporary file for LLM analysis
-                            with tempfile.NamedTemporaryFile(mode='w+b', suffix='.png', delete=False) as f:
-                                screenshot_bytes = base64.b64decode(all_screenshots[0]['data'])
-                                f.write(screenshot_bytes)
-                                screenshot_path = f.name
+                            # The stored file is analysed directly
+                            screenshot_path = all_screenshots[0]['path']
                     else:
                         screenshot_path = None
                         all_screenshots = []
@@ -2827,11 +3030,8 @@ Multiple property options available. Please check the links below for current li
                     # Use first screenshot for LLM analysis (backward compatibility)
                     screenshot_path = None
                     if all_screenshots:
-                        # Create temporary file for LLM analysis
-                        with tempfile.NamedTemporaryFile(mode='w+b', suffix='.png', delete=False) as f:
-                            screenshot_bytes = base64.b64decode(all_screenshots[0]['data'])
-                            f.write(screenshot_bytes)
-                            screenshot_path = f.name
+                        # The stored file is analysed directly
+                        screenshot_path = all_screenshots[0]['path']
                 else:
                     logger.error(f"Navigation failed: {navigation_result.get('error', 'Unknown error')}")
                     all_screenshots = []
@@ -2960,11 +3160,8 @@ For the best experience:
                     # Use first screenshot for LLM analysis (backward compatibility)
                     screenshot_path = None
                     if all_screenshots:
-                        # Create temporary file for LLM analysis
-                        with tempfile.NamedTemporaryFile(mode='w+b', suffix='.png', delete=False) as f:
-                            screenshot_bytes = base64.b64decode(all_screenshots[0]['data'])
-                            f.write(screenshot_bytes)
-                            screenshot_path = f.name
+                        # The stored file is analysed directly
+                        screenshot_path = all_screenshots[0]['path']
                 else:
                     logger.error(f"Navigation failed: {navigation_result.get('error', 'Unknown error')}")
                     all_screenshots = []
@@ -7579,6 +7776,23 @@ Must-try local specialties and recommended restaurants for authentic dining expe
 - Schedule consultations with multiple attorneys
 - Understand fee structure and billing practices"""
 
+def _releases_browser(method):
+    """Release the pooled browser when the outermost tool call on this thread returns."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                self.release_browser()
+    return wrapper
+
+for _name, _method in list(vars(RealWebBrowsingContext7Tools).items()):
+    if _name.startswith('execute_') and callable(_method):
+        setattr(RealWebBrowsingContext7Tools, _name, _releases_browser(_method))
+
 # Initialize the real web browsing Context 7 tools
 real_context7_tools = RealWebBrowsingContext7Tools()
 
@@ -7608,18 +7822,7 @@ def execute_context7_task():
             logger.info("File content detected in Context 7 task, processing files...")
             try:
                 # Extract the original user message (before file content)
-                parts = task.split('\n\n--- File:')
-                if len(parts) > 1:
-                    original_task = parts[0]
-                    file_content = '\n\n--- File:' + '\n\n--- File:'.join(parts[1:])
-                else:
-                    parts = task.split('\n\n--- Image:')
-                    if len(parts) > 1:
-                        original_task = parts[0]
-                        file_content = '\n\n--- Image:' + '\n\n--- Image:'.join(parts[1:])
-                    else:
-                        original_task = task
-                        file_content = ""
+                original_task, file_content = file_processor.split_file_content(task)
 
                 if file_content:
                     # Use the file processor to enhance the task
@@ -7950,10 +8153,8 @@ Please try again or contact support if the issue persists.
                 }
                 task_manager.complete_task(task_id, error_result)
 
-        # Start task execution in background
-        thread = threading.Thread(target=execute_task)
-        thread.daemon = True
-        thread.start()
+        # Start task execution on the task worker pool
+        task_manager.submit(execute_task)
 
         # Log activity if user_id is available
         if user_id:
@@ -8012,7 +8213,8 @@ Please try again or contact support if the issue persists.
         return jsonify({
             'success': True,
             'task_id': task_id,
-            'message': 'Task execution started'
+            'message': 'Task execution started',
+            'stream_url': get_stream_url('/api/context7-tools/stream-task', task_id)
         })
 
     except Exception as e:
@@ -8059,6 +8261,23 @@ def get_context7_task_status():
             'error': str(e)
         }), 500
 
+@context7_tools_bp.route('/cache-stats', methods=['GET'])
+def get_context7_cache_stats():
+    """Get result cache hit rates per Context 7 tool"""
+    try:
+        return jsonify({
+            'success': True,
+            'enabled': real_context7_tools.result_cache is not None,
+            'tools': get_tool_cache_stats()
+        })
+
+    except Exception as e:
+        logger.error(f"Error in get_context7_cache_stats: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @context7_tools_bp.route('/stream-task', methods=['GET'])
 def stream_context7_task():
     """Stream Context 7 task progress"""
@@ -8070,37 +8289,14 @@ def stream_context7_task():
                 'error': 'task_id is required'
             }), 400
 
-        def generate():
-            last_progress_index = -1
-
-            # Send initial event
-            yield f"data: {json.dumps({'status': 'started', 'task_id': task_id})}\n\n"
-
-            # Stream progress
-            while True:
-                # Get current status
-                status = task_manager.get_task_status(task_id)
-
-                # If task is complete or failed, send final event and stop
-                if status in ['complete', 'error']:
-                    result = task_manager.get_task_result(task_id)
-                    if result:
-                        yield f"data: {json.dumps({'status': status, 'result': result})}\n\n"
-                    break
-
-                # Get new progress
-                progress = task_manager.get_task_progress(task_id)
-
-                # Send new progress
-                if len(progress) > last_progress_index + 1:
-                    for i in range(last_progress_index + 1, len(progress)):
-                        yield f"data: {json.dumps(progress[i])}\n\n"
-                    last_progress_index = len(progress) - 1
-
-                # Wait before checking again
-                time.sleep(0.5)
+        # Resumes after the last event a reconnecting client received
+        last_event_id = request.headers.get('Last-Event-ID')
+        if has_final_result(last_event_id):
+            return Response(status=204)
+        events = iter_task_events(task_manager, task_id, last_event_id,
+                                  {'status': 'started', 'task_id': task_id})
 
-        return Response(generate(), mimetype='text/event-stream')
+        return Response(events, mimetype='text/event-stream')
 
     except Exception as e:
         logger.error(f"Error in stream_context7_task: {str(e)}")
@@ -12,6 +12,7 @@ import traceback
 from flask import Blueprint, request, jsonify
 
 from app.visual_browser.live_browser import live_browser
+from app.visual_browser.screenshot_service import get_screenshot_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -438,6 +439,15 @@ def screenshot():
         # Get screenshot data
         screenshot_data = None
         screenshot_path = None
+        mimetype = 'image/png'
+
+        # Serve the screenshot service's latest encoded frame from memory
+        service = get_screenshot_service()
+        if service and not take_new:
+            frame = service.get_frame()
+            if frame:
+                screenshot_data = frame.data
+                mimetype = frame.mimetype
 
         if take_new:
             try:
@@ -498,16 +508,16 @@ def screenshot():
 
             return jsonify({
                 'success': True,
-                'screenshot': f"data:image/png;base64,{screenshot_base64}",
+                'screenshot': f"data:{mimetype};base64,{screenshot_base64}",
                 'timestamp': int(time.time())
             })
 
         # Otherwise, return the image directly
         timestamp = int(time.time())
-        filename = f"screenshot_{timestamp}.png"
+        filename = f"screenshot_{timestamp}.{mimetype.split('/')[1].replace('jpeg', 'jpg')}"
 
         # Create a response with the image data
-        response = Response(screenshot_data, mimetype='image/png')
+        response = Response(screenshot_data, mimetype=mimetype)
 
         # If download is requested, add Content-Disposition header
         if is_download:
@@ -530,6 +540,51 @@ def screenshot():
                 'error': str(e)
             })
 
+@live_browser_api.route('/frames/latest', methods=['GET'])
+@live_browser_api.route('/frames/<int:sequence>', methods=['GET'])
+@live_browser_api.route('/frames/<epoch>/<int:sequence>', methods=['GET'])
+def frame(sequence=None, epoch=None):
+    """
+    Get an encoded frame from the screenshot service's in-memory ring buffer.
+
+    Sequence numbers restart with every screenshot service, so only URLs carrying the
+    service's epoch are cacheable; the browser may cache those for as long as it likes.
+    """
+    from flask import Response
+
+    service = get_screenshot_service()
+    frame = service.get_frame(sequence, epoch=epoch) if service else None
+    if not frame:
+        return jsonify({
+            'success': False,
+            'error': 'Frame not available'
+        }), 404
+
+    response = Response(frame.data, mimetype=frame.mimetype)
+    response.headers['X-Frame-Sequence'] = str(frame.sequence)
+    if epoch is None:
+        response.headers['Cache-Control'] = 'no-cache'
+    else:
+        # Screenshots of a user's session are not for shared caches
+        response.headers['Cache-Control'] = 'private, max-age=3600, immutable'
+    return response
+
+@live_browser_api.route('/frames/stats', methods=['GET'])
+def frame_stats():
+    """
+    Get the screenshot pipeline's frame counts and latencies.
+    """
+    service = get_screenshot_service()
+    if not service:
+        return jsonify({
+            'success': False,
+            'error': 'Screenshot service not initialized'
+        })
+    return jsonify({
+        'success': True,
+        'stats': service.get_stats()
+    })
+
 @live_browser_api.route('/back', methods=['POST'])
 def go_back():
     """
@@ -54,6 +54,9 @@ def test_memory_connection():
                 'message': 'Check Qdrant Cloud credentials and cluster status'
             })
         
+        # Stored memories are written in the background; wait until searchable
+        memory_service.flush(timeout=30)
+        
         # Test retrieving memory
         memories = memory_service.retrieve_memories(
             agent_type='prime_agent',
@@ -124,8 +127,9 @@ def get_memory_stats():
             'memory_available': memory_service.is_available(),
             'collections': collections_info,
             'total_collections': len(memory_service.collections),
-            'embedding_model': 'all-MiniLM-L6-v2',
-            'vector_dimension': 384
+            'embedding_model': memory_service.pipeline.model_name,
+            'vector_dimension': 384,
+            'pipeline': memory_service.get_stats()
         })
         
     except Exception as e:
@@ -177,6 +181,7 @@ def demo_memory():
             )
             if success:
                 stored_count += 1
+        memory_service.flush(timeout=30)
         
         # Test retrieval
         travel_memories = memory_service.retrieve_memories(
@@ -13,6 +13,7 @@ from flask import Blueprint, request, jsonify, Response, stream_with_context
 
 from app.prime_agent.prime_agent import prime_agent
 from app.prime_agent.task_manager import task_manager
+from app.services.task_events import iter_task_events, has_final_result
 from app.services.file_processor import file_processor
 from app.services.activity_logger import log_prime_agent_activity
 
@@ -78,18 +79,7 @@ def execute_task():
             logger.info("File content detected in Prime Agent task, processing files...")
             try:
                 # Extract the original user task (before file content)
-                parts = task.split('\n\n--- File:')
-                if len(parts) > 1:
-                    original_task = parts[0]
-                    file_content = '\n\n--- File:' + '\n\n--- File:'.join(parts[1:])
-                else:
-                    parts = task.split('\n\n--- Image:')
-                    if len(parts) > 1:
-                        original_task = parts[0]
-                        file_content = '\n\n--- Image:' + '\n\n--- Image:'.join(parts[1:])
-                    else:
-                        original_task = task
-                        file_content = ""
+                original_task, file_content = file_processor.split_file_content(task)
 
                 if file_content:
                     # Use the file processor to enhance the task
@@ -242,45 +232,15 @@ def task_progress():
                 'error': 'Task ID is required'
             })
         
-        def generate():
-            # Send initial event
-            yield f"data: {json.dumps({'status': 'connecting', 'message': 'Connected to server'})}\n\n"
-            
-            # Get initial progress
-            progress = task_manager.get_task_progress(task_id)
-            last_progress_index = len(progress) - 1 if progress else -1
-            
-            # Send initial progress
-            if progress:
-                for i, p in enumerate(progress):
-                    yield f"data: {json.dumps(p)}\n\n"
-            
-            # Stream new progress
-            while True:
-                # Get current status
-                status = task_manager.get_task_status(task_id)
-                
-                # If task is complete or failed, send final event and stop
-                if status in ['complete', 'error']:
-                    result = task_manager.get_task_result(task_id)
-                    if result:
-                        yield f"data: {json.dumps({'status': status, 'result': result})}\n\n"
-                    break
-                
-                # Get new progress
-                progress = task_manager.get_task_progress(task_id)
-                
-                # Send new progress
-                if len(progress) > last_progress_index + 1:
-                    for i in range(last_progress_index + 1, len(progress)):
-                        yield f"data: {json.dumps(progress[i])}\n\n"
-                    last_progress_index = len(progress) - 1
-                
-                # Wait a bit before checking again
-                time.sleep(0.5)
+        # Resumes after the last event a reconnecting client received
+        last_event_id = request.headers.get('Last-Event-ID')
+        if has_final_result(last_event_id):
+            return Response(status=204)
+        events = iter_task_events(task_manager, task_id, last_event_id,
+                                  {'status': 'connecting', 'message': 'Connected to server'})
         
         return Response(
-            stream_with_context(generate()),
+            stream_with_context(events),
             mimetype='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
@@ -59,18 +59,7 @@ def do_search(query, user_id=None):
             logger.info("File content detected in research query, processing files...")
             try:
                 # Extract the original user query (before file content)
-                parts = query.split('\n\n--- File:')
-                if len(parts) > 1:
-                    original_query = parts[0]
-                    file_content = '\n\n--- File:' + '\n\n--- File:'.join(parts[1:])
-                else:
-                    parts = query.split('\n\n--- Image:')
-                    if len(parts) > 1:
-                        original_query = parts[0]
-                        file_content = '\n\n--- Image:' + '\n\n--- Image:'.join(parts[1:])
-                    else:
-                        original_query = query
-                        file_content = ""
+                original_query, file_content = file_processor.split_file_content(query)
 
                 if file_content:
                     # Use the file processor to enhance the query
@@ -0,0 +1,156 @@
+"""
+Uploads API for files attached to agent prompts.
+
+Files are streamed into the content-addressed upload store, and the client puts
+the returned reference token in its prompt instead of the file's contents. The
+analysis of a prompt's files can be streamed file by file as it completes.
+"""
+
+import logging
+from flask import Blueprint, Response, jsonify, request, send_file
+
+from app.services.upload_store import get_upload_store, UploadTooLarge
+from app.services.file_processor import file_processor
+from app.services.task_events import format_event
+
+logger = logging.getLogger(__name__)
+
+# Uploads are user content served from the app's origin; only these display inline
+INLINE_MIME_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp'}
+
+# Create blueprint
+uploads_bp = Blueprint('uploads', __name__, url_prefix='/api/uploads')
+
+
+@uploads_bp.route('', methods=['POST'])
+def upload_files():
+    """
+    Store uploaded files.
+
+    Accepts multipart form data with one or more 'file' fields, or a raw request
+    body named by the 'name' query parameter and typed by its Content-Type. The
+    raw body is streamed to disk without being held in memory.
+
+    Returns:
+        JSON response with each file's hash, token, name, mime type and size
+    """
+    store = get_upload_store()
+    try:
+        if request.files:
+            uploads = [store.store_stream(file.stream, file.filename, file.mimetype)
+                       for file in request.files.getlist('file')]
+        else:
+            name = request.args.get('name', '')
+            if not name:
+                return jsonify({'success': False, 'error': 'No file provided'}), 400
+            uploads = [store.store_stream(request.stream, name, request.mimetype)]
+    except UploadTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        logger.error(f"Error storing upload: {str(e)}")
+        return jsonify({'success': False, 'error': 'Could not store the upload'}), 500
+
+    if not uploads:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
+    return jsonify({'success': True, 'files': uploads})
+
+
+@uploads_bp.route('/analyze', methods=['POST'])
+def analyze_uploads():
+    """
+    Stream the analysis of the files attached to a prompt.
+
+    Accepts JSON with 'content', a prompt or the file sections from
+    getFileContentForAI(). Each file's result is sent as a Server-Sent Event as
+    soon as it is ready, with a summary of the files analyzed so far; the last
+    event has done set.
+
+    Returns:
+        An event stream of analysis progress
+    """
+    data = request.get_json(silent=True) or {}
+    _, file_content = file_processor.split_file_content(data.get('content', ''))
+    if not file_content:
+        return jsonify({'success': False, 'error': 'No files to analyze'}), 400
+
+    def generate():
+        update = None
+        try:
+            for update in file_processor.iter_file_analysis(file_content):
+                yield format_event({'file': update['file'], 'completed': update['done'],
+                                    'total': update['total'], 'summary': update['summary']})
+        except Exception as e:
+            logger.error(f"Error analyzing uploads: {str(e)}")
+            yield format_event({'done': True, 'success': False, 'error': 'Analysis failed'})
+            return
+        yield format_event({'done': True, 'success': True,
+                            'files_count': len(update['processed_files']) if update else 0,
+                            'summary': update['summary'] if update else file_processor._generate_files_summary([])})
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive'
+        }
+    )
+
+
+@uploads_bp.route('/<content_hash>', methods=['GET'])
+def get_upload(content_hash):
+    """
+    Return a stored upload's details.
+
+    Args:
+        content_hash: The upload's SHA-256 hex digest
+
+    Returns:
+        JSON response with the upload's name, mime type and size
+    """
+    info = get_upload_store().get_info(content_hash)
+    if info is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    return jsonify({'success': True, 'file': info})
+
+
+@uploads_bp.route('/<content_hash>/raw', methods=['GET'])
+def get_upload_content(content_hash):
+    """
+    Send a stored upload's bytes.
+
+    The MIME type comes from the uploader, so anything but a raster image is sent
+    as a download; an inline HTML or SVG upload would run script on this origin.
+
+    Args:
+        content_hash: The upload's SHA-256 hex digest
+    """
+    store = get_upload_store()
+    info = store.get_info(content_hash)
+    if info is None:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    inline = info['mime_type'] in INLINE_MIME_TYPES
+    mimetype = info['mime_type'] if inline else 'application/octet-stream'
+    response = send_file(store.blob_path(content_hash), mimetype=mimetype, as_attachment=not inline,
+                         download_name=info['name'], conditional=True)
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = 'sandbox'
+    # Content-addressed, so the bytes behind this URL never change
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
+@uploads_bp.route('/<content_hash>/thumbnail', methods=['GET'])
+def get_upload_thumbnail(content_hash):
+    """
+    Send a JPEG thumbnail of a stored image.
+
+    Args:
+        content_hash: The upload's SHA-256 hex digest
+    """
+    thumbnail = get_upload_store().get_thumbnail(content_hash)
+    if thumbnail is None:
+        return jsonify({'success': False, 'error': 'No thumbnail for this upload'}), 404
+    response = Response(thumbnail, mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
@@ -155,8 +155,8 @@ def register():
 
             # Create free subscription for new user
             try:
-                from ..services.subscription_service import SubscriptionService
-                subscription_service = SubscriptionService()
+                from ..services.subscription_service import get_subscription_service
+                subscription_service = get_subscription_service()
                 subscription_created = subscription_service.create_free_subscription(user_data['id'])
                 if subscription_created:
                     logger.info(f"Free subscription created for user: {email}")
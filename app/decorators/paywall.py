@@ -8,7 +8,7 @@ import logging
 from functools import wraps
 from flask import request, jsonify, session, redirect, url_for
 from typing import Optional, Dict, Any, Callable
-from ..services.subscription_service import SubscriptionService
+from ..services.subscription_service import get_subscription_service
 from ..services.admin_service import admin_service
 
 logger = logging.getLogger(__name__)
@@ -38,10 +38,10 @@ def require_subscription(min_plan: str = 'free'):
                     'redirect': '/auth/login'
                 }), 401
             
-            subscription_service = SubscriptionService()
-            user_subscription = subscription_service.get_user_subscription(user_id)
+            subscription_service = get_subscription_service()
+            entitlements = subscription_service.get_entitlements(user_id)
             
-            if not user_subscription:
+            if not entitlements.subscription:
                 # Create free subscription for new users
                 if min_plan == 'free':
                     subscription_service.create_free_subscription(user_id)
@@ -57,12 +57,10 @@ def require_subscription(min_plan: str = 'free'):
             plan_hierarchy = {'free': 0, 'plus': 1, 'pro': 2, 'enterprise': 3}
             
             # Get user's plan name
-            plan_response = subscription_service.supabase.table('subscription_plans').select('plan_name').eq('id', user_subscription.plan_id).single().execute()
-            
-            if not plan_response.data:
+            if not entitlements.plan:
                 return jsonify({'error': 'Invalid subscription plan'}), 500
             
-            user_plan = plan_response.data['plan_name']
+            user_plan = entitlements.plan_name
             
             if plan_hierarchy.get(user_plan, 0) < plan_hierarchy.get(min_plan, 0):
                 return jsonify({
@@ -167,7 +165,7 @@ def require_feature_access(feature_name: str, consume_usage: bool = True):
                     'redirect': '/auth/login'
                 }), 401
             
-            subscription_service = SubscriptionService()
+            subscription_service = get_subscription_service()
             access_info = subscription_service.check_feature_access(user_id, feature_name)
             
             if not access_info.get('has_access', False):
@@ -263,16 +261,13 @@ def trial_limit(feature_name: str, daily_limit: int, allow_guest: bool = False,
                     'redirect': '/auth/login'
                 }), 401
             
-            subscription_service = SubscriptionService()
+            subscription_service = get_subscription_service()
             
             # Check if user has paid plan (bypass trial limits)
-            user_subscription = subscription_service.get_user_subscription(user_id)
-            if user_subscription:
-                plan_response = subscription_service.supabase.table('subscription_plans').select('plan_name').eq('id', user_subscription.plan_id).single().execute()
-                
-                if plan_response.data and plan_response.data['plan_name'] != 'free':
-                    # Paid plan - no trial limits
-                    return f(*args, **kwargs)
+            entitlements = subscription_service.get_entitlements(user_id)
+            if entitlements.plan and entitlements.plan_name != 'free':
+                # Paid plan - no trial limits
+                return f(*args, **kwargs)
             
             # Check trial usage for free plan
             access_info = subscription_service.check_feature_access(user_id, feature_name)
@@ -310,10 +305,11 @@ def get_user_plan_info(user_id: str) -> Dict[str, Any]:
         Dict containing plan information
     """
     try:
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         
-        # Get subscription
-        subscription = subscription_service.get_user_subscription(user_id)
+        # Get subscription and plan
+        entitlements = subscription_service.get_entitlements(user_id)
+        subscription = entitlements.subscription
         if not subscription:
             return {
                 'plan_name': 'none',
@@ -321,26 +317,22 @@ def get_user_plan_info(user_id: str) -> Dict[str, Any]:
                 'has_subscription': False
             }
         
-        # Get plan details
-        plan_response = subscription_service.supabase.table('subscription_plans').select('*').eq('id', subscription.plan_id).single().execute()
-        
-        if not plan_response.data:
+        plan = entitlements.plan
+        if not plan:
             return {
                 'plan_name': 'unknown',
                 'display_name': 'Unknown Plan',
                 'has_subscription': True
             }
         
-        plan = plan_response.data
-        
         # Get credits
         credits = subscription_service.get_user_credits(user_id)
         
         return {
-            'plan_name': plan['plan_name'],
-            'display_name': plan['display_name'],
+            'plan_name': plan.plan_name,
+            'display_name': plan.display_name,
             'has_subscription': True,
-            'features': plan['features'],
+            'features': plan.features,
             'credits': {
                 'total': credits.total_credits if credits else 0,
                 'used': credits.used_credits if credits else 0,
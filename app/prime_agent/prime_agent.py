@@ -8,13 +8,13 @@ import os
 import time
 import json
 import logging
-import threading
 import traceback
 import re
 from typing import Dict, Any, List, Optional
 import requests
 
 from app.prime_agent.task_manager import task_manager
+from app.prime_agent.tool_scheduler import ToolScheduler, ToolStep, SUCCESS, TIMEOUT, SKIPPED
 from app.prime_agent.live_browser_handler import LiveBrowserHandler
 from app.utils.enhanced_mcp_client import EnhancedMCPClient
 from app.api.context7_tools import RealWebBrowsingContext7Tools
@@ -24,6 +24,27 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Context 7 tool method behind each multi-tool step
+CONTEXT7_TOOL_METHODS = {
+    "flight_booking": "execute_flight_booking",
+    "hotel_booking": "execute_hotel_search",
+    "ride_booking": "execute_ride_booking",
+    "event_tickets": "execute_event_ticket_search",
+    "job_search": "execute_job_search",
+    "real_estate": "execute_real_estate_search",
+    "medical_appointment": "execute_medical_appointment",
+    "pharmacy_search": "execute_pharmacy_search",
+    "home_services": "execute_home_services_search",
+    "government_services": "execute_government_services",
+    "moving_services": "execute_home_services_search"  # Use home services for moving
+}
+
+# Steps whose results a tool needs before it can start. Every tool reads the parsed
+# trip details (destination, dates, party size) but no tool needs another tool's
+# results, so all tools of a pattern run concurrently once parsing is done.
+# Patterns can add tool-to-tool edges with a "dependencies" entry.
+PARSE_STEP = "parse_task"
+
 class PrimeAgent:
     """
     Prime Agent for autonomous task execution.
@@ -56,13 +77,8 @@ class PrimeAgent:
             # Create a task
             task_id = task_manager.create_task(task, use_visual_browser)
 
-            # Start a thread to execute the task
-            thread = threading.Thread(
-                target=self._execute_task_thread,
-                args=(task_id, task, use_visual_browser)
-            )
-            thread.daemon = True
-            thread.start()
+            # Execute the task on the task worker pool
+            task_manager.submit(self._execute_task_thread, task_id, task, use_visual_browser)
 
             return {
                 "success": True,
@@ -216,44 +232,84 @@ class PrimeAgent:
 
     def _execute_multi_tool_sequence(self, task_id: str, task: str, pattern_info: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Execute a sequence of Context 7 tools to complete a complex task.
+        Execute the Context 7 tools of a complex task as a dependency graph.
+
+        Tools run concurrently once the steps they depend on are done, each on its own
+        leased browser, with per-tool timeouts. Progress is reported as each tool
+        finishes and the summary is assembled from whichever tools succeeded.
         """
         try:
             tools_to_use = pattern_info["tools"]
             description = pattern_info["description"]
+            dependencies = pattern_info.get("dependencies", {})
 
             task_manager.update_task_progress(
                 task_id,
                 "thinking",
                 f"🔄 Planning multi-step execution: {description}"
             )
-            time.sleep(1)
 
-            # Parse the task to extract relevant information
-            task_info = self._parse_multi_tool_task(task)
+            tool_tasks = {}
 
-            # Store results from each tool
-            tool_results = []
-            combined_summary = f"# 🎯 Multi-Tool Task Execution: {description}\n\n"
+            def parse_task(inputs):
+                # Parse the task to extract relevant information
+                return self._parse_multi_tool_task(task)
 
-            # Execute each tool in sequence
-            for i, tool_name in enumerate(tools_to_use, 1):
-                task_manager.update_task_progress(
-                    task_id,
-                    "thinking",
-                    f"🛠️ Step {i}/{len(tools_to_use)}: Executing {tool_name.replace('_', ' ').title()}..."
-                )
+            def make_tool_runner(tool_name):
+                def run_tool(inputs):
+                    # Generate specific task for this tool
+                    tool_task = self._generate_tool_specific_task(tool_name, task, inputs[PARSE_STEP])
+                    tool_tasks[tool_name] = tool_task
+                    return self._execute_context7_tool(tool_name, tool_task, task_id)
+                return run_tool
+
+            steps = [ToolStep(PARSE_STEP, parse_task)]
+            for tool_name in tools_to_use:
+                steps.append(ToolStep(
+                    tool_name,
+                    make_tool_runner(tool_name),
+                    depends_on=[PARSE_STEP] + list(dependencies.get(tool_name, []))
+                ))
+
+            step_numbers = {tool_name: i for i, tool_name in enumerate(tools_to_use, 1)}
+
+            def on_start(step):
+                if step.name in step_numbers:
+                    task_manager.update_task_progress(
+                        task_id,
+                        "thinking",
+                        f"🛠️ Step {step_numbers[step.name]}/{len(tools_to_use)}: Executing {step.name.replace('_', ' ').title()}..."
+                    )
+
+            def on_finish(outcome):
+                if outcome.name not in step_numbers:
+                    return
+                i = step_numbers[outcome.name]
+                if outcome.status == SUCCESS and outcome.result and outcome.result.get("success"):
+                    message = f"✅ Step {i} ({outcome.name.replace('_', ' ').title()}) completed in {outcome.elapsed:.1f}s"
+                elif outcome.status == TIMEOUT:
+                    message = f"⏱️ Step {i} timed out, continuing with the other steps..."
+                elif outcome.status == SKIPPED:
+                    message = f"⏭️ Step {i} skipped: {outcome.error}"
+                else:
+                    message = f"⚠️ Step {i} had issues, continuing with the other steps..."
+                task_manager.update_task_progress(task_id, "thinking", message)
 
-                # Generate specific task for this tool
-                tool_task = self._generate_tool_specific_task(tool_name, task, task_info)
+            started = time.time()
+            outcomes = ToolScheduler().run(steps, on_start=on_start, on_finish=on_finish)
 
-                # Execute the tool
-                tool_result = self._execute_context7_tool(tool_name, tool_task, task_id)
+            # Assemble the results in the pattern's order, noting tools without results
+            tool_results = []
+            combined_summary = f"# 🎯 Multi-Tool Task Execution: {description}\n\n"
+            for tool_name in tools_to_use:
+                outcome = outcomes[tool_name]
+                i = step_numbers[tool_name]
+                tool_result = outcome.result if outcome.status == SUCCESS else None
 
                 if tool_result and tool_result.get("success"):
                     tool_results.append({
                         "tool": tool_name,
-                        "task": tool_task,
+                        "task": tool_tasks.get(tool_name, ""),
                         "result": tool_result
                     })
 
@@ -261,28 +317,18 @@ class PrimeAgent:
                     combined_summary += f"## Step {i}: {tool_name.replace('_', ' ').title()}\n\n"
                     combined_summary += tool_result.get("task_summary", "Tool executed successfully") + "\n\n"
                     combined_summary += "---\n\n"
-
-                    task_manager.update_task_progress(
-                        task_id,
-                        "thinking",
-                        f"✅ Step {i} completed successfully"
-                    )
-                else:
-                    task_manager.update_task_progress(
-                        task_id,
-                        "thinking",
-                        f"⚠️ Step {i} had issues, continuing with next step..."
-                    )
-
-                time.sleep(1)
+                elif outcome.status in (TIMEOUT, SKIPPED):
+                    combined_summary += f"## Step {i}: {tool_name.replace('_', ' ').title()}\n\n"
+                    combined_summary += f"⚠️ No results: {outcome.error}\n\n---\n\n"
 
             # Generate final comprehensive summary
             combined_summary += self._generate_multi_tool_conclusion(task, tool_results, description)
 
+            elapsed = time.time() - started
             task_manager.update_task_progress(
                 task_id,
                 "thinking",
-                f"🎉 Multi-tool execution completed! Used {len(tool_results)} tools successfully."
+                f"🎉 Multi-tool execution completed in {elapsed:.1f}s! Used {len(tool_results)} tools successfully."
             )
 
             return {
@@ -291,7 +337,8 @@ class PrimeAgent:
                 "message": f"Multi-tool task completed using {len(tool_results)} tools",
                 "result": f"Successfully executed {description}",
                 "tools_used": [result["tool"] for result in tool_results],
-                "individual_results": tool_results
+                "individual_results": tool_results,
+                "tool_timings": [outcome.to_dict() for outcome in outcomes.values()]
             }
 
         except Exception as e:
@@ -426,21 +473,8 @@ class PrimeAgent:
         """
         try:
             # Map tool names to Context 7 tool methods
-            tool_methods = {
-                "flight_booking": self.context7_tools.execute_flight_search,
-                "hotel_booking": self.context7_tools.execute_hotel_search,
-                "ride_booking": self.context7_tools.execute_ride_booking,
-                "event_tickets": self.context7_tools.execute_event_tickets,
-                "job_search": self.context7_tools.execute_job_search,
-                "real_estate": self.context7_tools.execute_real_estate,
-                "medical_appointment": self.context7_tools.execute_medical_appointment,
-                "pharmacy_search": self.context7_tools.execute_pharmacy_search,
-                "home_services": self.context7_tools.execute_home_services,
-                "government_services": self.context7_tools.execute_government_services,
-                "moving_services": self.context7_tools.execute_home_services  # Use home services for moving
-            }
-
-            method = tool_methods.get(tool_name)
+            method_name = CONTEXT7_TOOL_METHODS.get(tool_name)
+            method = getattr(self.context7_tools, method_name, None) if method_name else None
             if method:
                 # Create a sub-task ID for this tool
                 sub_task_id = f"{task_id}_{tool_name}"
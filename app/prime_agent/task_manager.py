@@ -2,36 +2,389 @@
 Task Manager for Prime Agent.
 
 This module provides a task manager for Prime Agent to track and update task progress.
+Tasks are held in a bounded in-memory table with TTL and size based eviction, and can
+optionally be persisted to SQLite so they survive restarts and are visible from every
+gunicorn worker. Progress updates wake waiting SSE streams through per-task condition
+variables and the task event broker, and task bodies run on a bounded worker pool.
 """
 
 import os
 import time
 import json
 import uuid
+import sqlite3
 import logging
 import threading
 import traceback
-from typing import Dict, Any, List, Optional
+import concurrent.futures
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from app.services.task_events import task_events
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Default location of the persistent task store
+DEFAULT_TASK_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'cache', 'tasks.db')
+
+# Statuses after which a task receives no more updates
+TERMINAL_STATUSES = ('complete', 'error')
+
+
+class SQLiteTaskStore:
+    """Persists tasks and their progress in a SQLite database in WAL mode."""
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the SQLite task store.
+
+        Args:
+            db_path: Path to the database file.
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                task TEXT NOT NULL,
+                use_visual_browser INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                progress_count INTEGER NOT NULL DEFAULT 0,
+                result TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_progress (
+                task_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                message TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                PRIMARY KEY (task_id, seq)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_updated ON tasks (updated_at)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def insert_task(self, task_id: str, task: Dict[str, Any]):
+        """
+        Insert a new task.
+
+        Args:
+            task_id: The ID of the task.
+            task: The task record.
+        """
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO tasks (task_id, task, use_visual_browser, status, created_at, updated_at, "
+            "progress_count, result) VALUES (?, ?, ?, ?, ?, ?, 0, NULL)",
+            (task_id, task["task"], int(bool(task["use_visual_browser"])), task["status"],
+             task["created_at"], task["updated_at"])
+        )
+        conn.commit()
+
+    def update_task(self, task_id: str, status: str, updated_at: float, result: Optional[Dict[str, Any]],
+                    progress_count: int, new_progress: List[Dict[str, Any]] = None, first_seq: int = 0):
+        """
+        Write a task's status and result, appending any new progress items.
+
+        Args:
+            task_id: The ID of the task.
+            status: The current status.
+            updated_at: Time of the update.
+            result: The task result, if any.
+            progress_count: Total number of progress items.
+            new_progress: Progress items added by this update.
+            first_seq: Index of the first new progress item.
+        """
+        conn = self._conn()
+        result = json.dumps(result, default=str) if result is not None else None
+        conn.execute(
+            "UPDATE tasks SET status = ?, updated_at = ?, progress_count = ?, result = ? WHERE task_id = ?",
+            (status, updated_at, progress_count, result, task_id)
+        )
+        if new_progress:
+            conn.executemany(
+                "INSERT OR REPLACE INTO task_progress (task_id, seq, status, message, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(task_id, first_seq + i, item["status"], item["message"], item["timestamp"])
+                 for i, item in enumerate(new_progress)]
+            )
+        conn.commit()
+
+    def get_summary(self, task_id: str) -> Optional[Tuple[str, int]]:
+        """
+        Get a task's status and number of progress items without loading it.
+
+        Args:
+            task_id: The ID of the task.
+
+        Returns:
+            Optional[Tuple[str, int]]: (status, progress count), or None if not found.
+        """
+        return self._conn().execute(
+            "SELECT status, progress_count FROM tasks WHERE task_id = ?", (task_id,)
+        ).fetchone()
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a task with its progress.
+
+        Args:
+            task_id: The ID of the task.
+
+        Returns:
+            Optional[Dict[str, Any]]: The task, or None if not found.
+        """
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT task, use_visual_browser, status, created_at, updated_at, result FROM tasks WHERE task_id = ?",
+            (task_id,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "task": row[0],
+            "use_visual_browser": bool(row[1]),
+            "status": row[2],
+            "created_at": row[3],
+            "updated_at": row[4],
+            "progress": self.get_progress(task_id),
+            "result": json.loads(row[5]) if row[5] else None
+        }
+
+    def get_progress(self, task_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        """
+        Load a task's progress items from an index onwards.
+
+        Args:
+            task_id: The ID of the task.
+            since: Index of the first item to load.
+
+        Returns:
+            List[Dict[str, Any]]: The progress items.
+        """
+        return [
+            {"status": status, "message": message, "timestamp": timestamp}
+            for status, message, timestamp in self._conn().execute(
+                "SELECT status, message, timestamp FROM task_progress WHERE task_id = ? AND seq >= ? ORDER BY seq",
+                (task_id, since)
+            )
+        ]
+
+    def sweep(self, ttl: float, stale_ttl: Optional[float] = None) -> int:
+        """
+        Delete finished tasks not updated within the TTL.
+
+        Unfinished tasks may still be running in another worker, so they are only
+        deleted once they have gone stale_ttl without an update (their worker died).
+
+        Args:
+            ttl: Maximum age of finished tasks since the last update, in seconds.
+            stale_ttl: Maximum age of unfinished tasks, in seconds. Defaults to None (never).
+
+        Returns:
+            int: The number of tasks deleted.
+        """
+        conn = self._conn()
+        now = time.time()
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        expired = [row[0] for row in conn.execute(
+            f"SELECT task_id FROM tasks WHERE updated_at < ? AND status IN ({placeholders})",
+            (now - ttl,) + TERMINAL_STATUSES
+        )]
+        if stale_ttl is not None:
+            expired += [row[0] for row in conn.execute(
+                f"SELECT task_id FROM tasks WHERE updated_at < ? AND status NOT IN ({placeholders})",
+                (now - stale_ttl,) + TERMINAL_STATUSES
+            )]
+        if expired:
+            conn.executemany("DELETE FROM task_progress WHERE task_id = ?", [(task_id,) for task_id in expired])
+            conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in expired])
+            conn.commit()
+        return len(expired)
+
+    def count(self) -> int:
+        """
+        Get the number of stored tasks.
+
+        Returns:
+            int: The number of tasks.
+        """
+        return self._conn().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+
 class TaskManager:
     """
     A task manager for Prime Agent to track and update task progress.
     """
 
-    def __init__(self):
+    def __init__(self, ttl: int = None, max_tasks: int = None, max_workers: int = None,
+                 db_path: str = None, remote_poll_interval: float = 1.0, sweep_interval: int = 60,
+                 stale_ttl: int = None):
         """
         Initialize the Task Manager.
+
+        Finished tasks are evicted from memory by TTL and by the max_tasks limit. Tasks
+        that are still running are only evicted once they go stale_ttl without an update,
+        so the in-memory count can go over max_tasks while many tasks run at once.
+
+        Args:
+            ttl: Seconds a finished task is kept after its last update. Defaults to TASK_TTL or 6 hours.
+            max_tasks: Maximum finished tasks held in memory. Defaults to TASK_MAX_ENTRIES or 500.
+            max_workers: Size of the task worker pool. Defaults to TASK_WORKERS or 8.
+            db_path: SQLite file for persistent tasks. Defaults to cache/tasks.db when TASK_STORE=sqlite.
+            remote_poll_interval: Seconds between checks when waiting on a task owned by another worker.
+            sweep_interval: Minimum seconds between eviction sweeps.
+            stale_ttl: Seconds after which an unfinished task is treated as abandoned by a dead
+                worker, evicted from memory and deleted from the persistent store. Defaults to
+                TASK_STALE_TTL or 24 hours.
         """
-        self.tasks = {}
+        self.ttl = ttl if ttl is not None else int(os.getenv('TASK_TTL', 6 * 3600))
+        self.stale_ttl = stale_ttl if stale_ttl is not None else int(os.getenv('TASK_STALE_TTL', 24 * 3600))
+        self.max_tasks = max_tasks if max_tasks is not None else int(os.getenv('TASK_MAX_ENTRIES', 500))
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv('TASK_WORKERS', 8))
+        self.remote_poll_interval = remote_poll_interval
+        self.sweep_interval = sweep_interval
+
+        # Tasks ordered by last update, oldest first
+        self.tasks = OrderedDict()
         self.lock = threading.Lock()
+        self._conditions = {}
+        self._seen_messages = {}
+        self._waiting = 0
+        self._last_sweep = 0.0
+        self.evictions = 0
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.submitted = 0
+        self.finished = 0
+
         self.logger = logging.getLogger(__name__)
+
+        self.store = None
+        if db_path is None and os.getenv('TASK_STORE', 'memory').lower() == 'sqlite':
+            db_path = os.getenv('TASK_DB_PATH', DEFAULT_TASK_DB_PATH)
+        if db_path:
+            try:
+                self.store = SQLiteTaskStore(db_path)
+                self.logger.info(f"Task Manager persisting tasks to {db_path}")
+            except Exception as e:
+                self.logger.error(f"Error opening task store {db_path}, keeping tasks in memory: {str(e)}")
+
         self.logger.info("Task Manager initialized")
 
+    def _snapshot(self, task: Dict[str, Any], first_seq: int) -> Tuple:
+        """Capture what _persist needs from a task. Must be called with the lock held."""
+        if not self.store:
+            return None
+        return (task["status"], task["updated_at"], task["result"], len(task["progress"]),
+                task["progress"][first_seq:], first_seq)
+
+    def _persist(self, task_id: str, snapshot: Optional[Tuple]):
+        """Write a task update through to the persistent store, if one is configured."""
+        if not snapshot:
+            return
+        try:
+            self.store.update_task(task_id, *snapshot)
+        except Exception as e:
+            self.logger.error(f"Error persisting task {task_id}: {str(e)}")
+
+    def _touch(self, task_id: str, task: Dict[str, Any]):
+        """Mark a task as updated and wake its waiters. Must be called with the lock held."""
+        task["updated_at"] = time.time()
+        self.tasks.move_to_end(task_id)
+        condition = self._conditions.get(task_id)
+        if condition is not None:
+            condition.notify_all()
+        task_events.publish(task_id)
+
+    def _get_condition(self, task_id: str) -> threading.Condition:
+        """Get the condition variable for a task. Must be called with the lock held."""
+        condition = self._conditions.get(task_id)
+        if condition is None:
+            condition = self._conditions[task_id] = threading.Condition(self.lock)
+        return condition
+
+    def _evict(self, task_id: str):
+        """Drop a task from memory and wake its waiters. Must be called with the lock held."""
+        self.tasks.pop(task_id, None)
+        self._seen_messages.pop(task_id, None)
+        condition = self._conditions.pop(task_id, None)
+        if condition is not None:
+            condition.notify_all()
+        task_events.publish(task_id)
+        self.evictions += 1
+
+    def _sweep(self) -> bool:
+        """
+        Evict expired finished tasks and enforce the size limit. Must be called with the lock held.
+
+        Unfinished tasks are evicted only once stale, like the persistent store's sweep does:
+        their worker died without completing or failing them.
+
+        Returns:
+            bool: True if the persistent store is due a sweep, which the caller runs
+            with the lock released.
+        """
+        now = time.time()
+        store_due = False
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            cutoff = now - self.ttl
+            stale_cutoff = now - self.stale_ttl
+            # self.tasks is ordered by last update, so expired tasks are at the front
+            expired = []
+            stale = []
+            for task_id, task in self.tasks.items():
+                if task["updated_at"] >= max(cutoff, stale_cutoff):
+                    break
+                if task["status"] in TERMINAL_STATUSES:
+                    if task["updated_at"] < cutoff:
+                        expired.append(task_id)
+                elif task["updated_at"] < stale_cutoff:
+                    stale.append(task_id)
+            for task_id in expired + stale:
+                self._evict(task_id)
+            if stale:
+                self.logger.warning(f"Evicted {len(stale)} tasks with no update for {self.stale_ttl}s")
+            store_due = self.store is not None
+
+        if len(self.tasks) > self.max_tasks:
+            # Finished tasks remain readable from the persistent store
+            excess = len(self.tasks) - self.max_tasks
+            finished = [tid for tid, t in self.tasks.items() if t["status"] in TERMINAL_STATUSES]
+            for task_id in finished[:excess]:
+                self._evict(task_id)
+
+        return store_due
+
+    def _sweep_store(self):
+        """Delete expired tasks from the persistent store. Called without the lock held."""
+        try:
+            self.store.sweep(self.ttl, self.stale_ttl)
+        except Exception as e:
+            self.logger.error(f"Error sweeping task store: {str(e)}")
+
     def create_task(self, task: str, use_visual_browser: bool = False) -> str:
         """
         Create a new task.
@@ -45,17 +398,29 @@ class TaskManager:
         """
         try:
             task_id = str(uuid.uuid4())
+            record = {
+                "task": task,
+                "use_visual_browser": use_visual_browser,
+                "status": "pending",
+                "created_at": time.time(),
+                "updated_at": time.time(),
+                "progress": [],
+                "result": None
+            }
 
             with self.lock:
-                self.tasks[task_id] = {
-                    "task": task,
-                    "use_visual_browser": use_visual_browser,
-                    "status": "pending",
-                    "created_at": time.time(),
-                    "updated_at": time.time(),
-                    "progress": [],
-                    "result": None
-                }
+                self.tasks[task_id] = record
+                self._seen_messages[task_id] = set()
+                store_due = self._sweep()
+
+            if store_due:
+                self._sweep_store()
+
+            if self.store:
+                try:
+                    self.store.insert_task(task_id, record)
+                except Exception as e:
+                    self.logger.error(f"Error persisting task {task_id}: {str(e)}")
 
             self.logger.info(f"Created task {task_id}: {task}")
 
@@ -65,6 +430,14 @@ class TaskManager:
             self.logger.error(traceback.format_exc())
             raise
 
+    def _load_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get a task from memory, falling back to the persistent store."""
+        with self.lock:
+            task = self.tasks.get(task_id)
+        if task is None and self.store:
+            task = self.store.get_task(task_id)
+        return task
+
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a task by ID.
@@ -76,8 +449,7 @@ class TaskManager:
             Optional[Dict[str, Any]]: The task, or None if not found.
         """
         try:
-            with self.lock:
-                return self.tasks.get(task_id)
+            return self._load_task(task_id)
         except Exception as e:
             self.logger.error(f"Error getting task {task_id}: {str(e)}")
             self.logger.error(traceback.format_exc())
@@ -102,17 +474,12 @@ class TaskManager:
                     return False
 
                 task["status"] = status
-                task["updated_at"] = time.time()
-
-                # Check if this is a new message or if we already have this message
-                is_new_message = True
-                for progress_item in task["progress"]:
-                    if progress_item["message"] == message and progress_item["status"] == status:
-                        is_new_message = False
-                        break
+                first_seq = len(task["progress"])
 
-                # Only add the message if it's new
-                if is_new_message:
+                # Only add the message if we don't already have it with this status
+                seen = self._seen_messages.setdefault(task_id, set())
+                if (status, message) not in seen:
+                    seen.add((status, message))
                     task["progress"].append({
                         "status": status,
                         "message": message,
@@ -120,12 +487,38 @@ class TaskManager:
                     })
                     self.logger.info(f"Updated task {task_id} progress: {status} - {message}")
 
+                self._touch(task_id, task)
+                snapshot = self._snapshot(task, first_seq)
+
+            self._persist(task_id, snapshot)
+
             return True
         except Exception as e:
             self.logger.error(f"Error updating task {task_id} progress: {str(e)}")
             self.logger.error(traceback.format_exc())
             return False
 
+    def _finish_task(self, task_id: str, status: str, result: Dict[str, Any], message: str) -> bool:
+        """Set a task's final status and result and record the final progress item."""
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if not task:
+                return False
+
+            task["status"] = status
+            task["result"] = result
+            first_seq = len(task["progress"])
+            task["progress"].append({
+                "status": status,
+                "message": message,
+                "timestamp": time.time()
+            })
+            self._touch(task_id, task)
+            snapshot = self._snapshot(task, first_seq)
+
+        self._persist(task_id, snapshot)
+        return True
+
     def complete_task(self, task_id: str, result: Dict[str, Any]) -> bool:
         """
         Complete a task.
@@ -138,19 +531,8 @@ class TaskManager:
             bool: True if the task was completed, False otherwise.
         """
         try:
-            with self.lock:
-                task = self.tasks.get(task_id)
-                if not task:
-                    return False
-
-                task["status"] = "complete"
-                task["updated_at"] = time.time()
-                task["result"] = result
-                task["progress"].append({
-                    "status": "complete",
-                    "message": "Task completed",
-                    "timestamp": time.time()
-                })
+            if not self._finish_task(task_id, "complete", result, "Task completed"):
+                return False
 
             self.logger.info(f"Completed task {task_id}")
 
@@ -172,19 +554,8 @@ class TaskManager:
             bool: True if the task was failed, False otherwise.
         """
         try:
-            with self.lock:
-                task = self.tasks.get(task_id)
-                if not task:
-                    return False
-
-                task["status"] = "error"
-                task["updated_at"] = time.time()
-                task["result"] = {"success": False, "error": error}
-                task["progress"].append({
-                    "status": "error",
-                    "message": error,
-                    "timestamp": time.time()
-                })
+            if not self._finish_task(task_id, "error", {"success": False, "error": error}, error):
+                return False
 
             self.logger.info(f"Failed task {task_id}: {error}")
 
@@ -207,10 +578,12 @@ class TaskManager:
         try:
             with self.lock:
                 task = self.tasks.get(task_id)
-                if not task:
-                    return []
+                if task:
+                    return list(task["progress"])
 
-                return task["progress"]
+            if self.store:
+                return self.store.get_progress(task_id)
+            return []
         except Exception as e:
             self.logger.error(f"Error getting task {task_id} progress: {str(e)}")
             self.logger.error(traceback.format_exc())
@@ -229,10 +602,14 @@ class TaskManager:
         try:
             with self.lock:
                 task = self.tasks.get(task_id)
-                if not task:
-                    return None
+                if task:
+                    return task["status"]
 
-                return task["status"]
+            if self.store:
+                summary = self.store.get_summary(task_id)
+                if summary:
+                    return summary[0]
+            return None
         except Exception as e:
             self.logger.error(f"Error getting task {task_id} status: {str(e)}")
             self.logger.error(traceback.format_exc())
@@ -249,16 +626,136 @@ class TaskManager:
             Optional[Dict[str, Any]]: The result of the task, or None if not found or not complete.
         """
         try:
-            with self.lock:
-                task = self.tasks.get(task_id)
-                if not task:
-                    return None
+            task = self._load_task(task_id)
+            if not task:
+                return None
 
-                return task["result"]
+            return task["result"]
         except Exception as e:
             self.logger.error(f"Error getting task {task_id} result: {str(e)}")
             self.logger.error(traceback.format_exc())
             return None
 
+    def wait_for_progress(self, task_id: str, since: int = 0,
+                          timeout: float = 15.0) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Block until a task has progress items past an index or reaches a final status.
+
+        Tasks owned by this process wake the caller as soon as they are updated. Tasks
+        owned by another worker are read from the persistent store every
+        remote_poll_interval seconds.
+
+        Args:
+            task_id: The ID of the task to wait on.
+            since: Number of progress items the caller has already seen.
+            timeout: Maximum time to wait in seconds.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The new progress items and the current
+            status; the status is None if the task does not exist.
+        """
+        try:
+            deadline = time.monotonic() + timeout
+            with self.lock:
+                task = self.tasks.get(task_id)
+                if task is not None:
+                    condition = self._get_condition(task_id)
+                    self._waiting += 1
+                    try:
+                        condition.wait_for(
+                            lambda: (len(task["progress"]) > since or task["status"] in TERMINAL_STATUSES
+                                     or task_id not in self.tasks),
+                            timeout
+                        )
+                    finally:
+                        self._waiting -= 1
+                    if task_id in self.tasks:
+                        return list(task["progress"][since:]), task["status"]
+
+            if not self.store:
+                return [], None
+
+            while True:
+                summary = self.store.get_summary(task_id)
+                if summary is None:
+                    return [], None
+                status, count = summary
+                if count > since or status in TERMINAL_STATUSES:
+                    return self.store.get_progress(task_id, since), status
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return [], status
+                time.sleep(min(self.remote_poll_interval, remaining))
+        except Exception as e:
+            self.logger.error(f"Error waiting on task {task_id}: {str(e)}")
+            self.logger.error(traceback.format_exc())
+            return [], None
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """Get the task worker pool, creating it on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="task-worker")
+            return self._executor
+
+    def submit(self, func: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Run a task body on the bounded worker pool.
+
+        Args:
+            func: The function to run.
+            *args: Positional arguments for the function.
+            **kwargs: Keyword arguments for the function.
+
+        Returns:
+            concurrent.futures.Future: The future for the function's result.
+        """
+        def run():
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                self.logger.error(f"Unhandled error in task worker: {str(e)}")
+                self.logger.error(traceback.format_exc())
+            finally:
+                with self._executor_lock:
+                    self.finished += 1
+
+        with self._executor_lock:
+            self.submitted += 1
+        return self._get_executor().submit(run)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get task manager statistics.
+
+        Returns:
+            Dict[str, Any]: Task counts, eviction count and worker pool usage.
+        """
+        with self.lock:
+            in_memory = len(self.tasks)
+            running = sum(1 for task in self.tasks.values() if task["status"] not in TERMINAL_STATUSES)
+            waiters = self._waiting
+        with self._executor_lock:
+            outstanding = self.submitted - self.finished
+        stats = {
+            "tasks_in_memory": in_memory,
+            "tasks_running": running,
+            "max_tasks": self.max_tasks,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+            "streams_waiting": waiters,
+            "workers": self.max_workers,
+            "jobs_active": min(outstanding, self.max_workers),
+            "jobs_queued": max(0, outstanding - self.max_workers),
+            "persistent": self.store is not None
+        }
+        if self.store:
+            try:
+                stats["tasks_persisted"] = self.store.count()
+            except Exception as e:
+                self.logger.error(f"Error counting persisted tasks: {str(e)}")
+        return stats
+
 # Create a singleton instance
 task_manager = TaskManager()
@@ -0,0 +1,399 @@
+"""
+Tool Scheduler for Prime Agent.
+
+This module runs a set of tool steps as a dependency graph. A step starts as soon
+as every step it depends on has succeeded, independent steps run concurrently on a
+bounded worker pool, and each step has its own timeout, counted from the moment
+the step starts running rather than from when it was queued. When a step fails or
+times out, the steps depending on it are skipped and the rest still complete, so
+callers can assemble partial results. Wall-clock time follows the critical path
+instead of the sum of all steps.
+
+Python threads cannot be interrupted, so a step that times out keeps its thread
+(and anything it holds, such as a leased browser) until its callable returns; its
+result is then discarded. The shared pool hands the abandoned thread's place to a
+new thread, so hung tools do not starve later requests, up to a cap on abandoned
+threads. Past the cap the pool shrinks, and once no thread is left steps fail at
+once instead of queueing behind hung ones.
+"""
+
+import os
+import time
+import itertools
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Tools running at once across all schedules in this process
+DEFAULT_MAX_WORKERS = int(os.getenv('TOOL_SCHEDULER_WORKERS', 4))
+# Seconds a single tool may run before its result is abandoned
+DEFAULT_TOOL_TIMEOUT = float(os.getenv('TOOL_TIMEOUT', 180))
+# Threads stuck in timed-out tools that the shared pool replaces
+DEFAULT_MAX_ABANDONED = int(os.getenv('TOOL_SCHEDULER_MAX_ABANDONED', 2 * DEFAULT_MAX_WORKERS))
+
+# Outcome statuses
+SUCCESS = 'success'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+SKIPPED = 'skipped'
+
+
+class ToolStep:
+    """One node of the graph: a callable and the steps whose results it needs."""
+
+    def __init__(self, name: str, run: Callable[[Dict[str, Any]], Any], depends_on: List[str] = None,
+                 timeout: float = None):
+        """
+        Args:
+            name: Unique step name
+            run: Called with a dict of dependency name to result; returns the step result
+            depends_on: Names of steps that must succeed first
+            timeout: Seconds before the step is abandoned. Defaults to TOOL_TIMEOUT or 180.
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = list(depends_on or [])
+        self.timeout = timeout
+
+
+class ToolOutcome:
+    """The result of one step."""
+
+    def __init__(self, name: str, status: str, result: Any = None, error: str = None, elapsed: float = 0.0):
+        self.name = name
+        self.status = status
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == SUCCESS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'status': self.status,
+            'error': self.error,
+            'elapsed': round(self.elapsed, 3)
+        }
+
+
+class ToolPoolExhausted(Exception):
+    """Raised when every thread of a tool pool is stuck in a timed-out tool."""
+
+
+class _Worker:
+    """One pool thread; abandoned once the step it runs times out."""
+
+    def __init__(self):
+        self.abandoned = False
+
+
+class ToolWorkerPool(concurrent.futures.Executor):
+    """
+    A thread pool that replaces threads abandoned in timed-out steps.
+
+    Call abandon() with a step's future when it times out: another thread takes
+    its place while at most max_abandoned threads are abandoned. An abandoned
+    thread whose step finally returns rejoins the pool if the pool is short of
+    threads, and exits otherwise.
+    """
+
+    def __init__(self, max_workers: int = None, max_abandoned: int = None, thread_name_prefix: str = 'tool-worker'):
+        """
+        Args:
+            max_workers: Threads serving steps. Defaults to TOOL_SCHEDULER_WORKERS or 4.
+            max_abandoned: Abandoned threads that are replaced. Defaults to TOOL_SCHEDULER_MAX_ABANDONED
+                or twice max_workers.
+            thread_name_prefix: Prefix of thread names.
+        """
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.max_abandoned = max_abandoned if max_abandoned is not None else DEFAULT_MAX_ABANDONED
+        self.thread_name_prefix = thread_name_prefix
+        self._cond = threading.Condition()
+        self._work = deque()
+        self._current = {}  # future -> _Worker running it
+        self._ids = itertools.count(1)
+        self._started = False
+        # Threads serving the queue, not counting abandoned ones
+        self._live = 0
+        self._abandoned = 0
+        self._shutdown = False
+        self.replaced = 0
+
+    def _start_thread(self):
+        # Caller holds self._cond. Daemon threads, so a hung tool cannot block interpreter exit
+        self._live += 1
+        threading.Thread(target=self._serve, name=f"{self.thread_name_prefix}_{next(self._ids)}",
+                         daemon=True).start()
+
+    def submit(self, fn, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Queue a call.
+
+        Raises:
+            ToolPoolExhausted: If every thread is stuck in a timed-out step
+            RuntimeError: If the pool has been shut down
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to a tool pool after shutdown")
+            if self._started and not self._live:
+                raise ToolPoolExhausted(f"All tool workers are stuck in timed-out tools "
+                                        f"({self._abandoned} abandoned)")
+            if not self._started:
+                self._started = True
+                for _ in range(self.max_workers):
+                    self._start_thread()
+            future = concurrent.futures.Future()
+            self._work.append((future, fn, args, kwargs))
+            self._cond.notify()
+            return future
+
+    def abandon(self, future: concurrent.futures.Future):
+        """
+        Give up on a running call, replacing its thread if under the abandoned cap.
+
+        Args:
+            future: The future of the timed-out call
+        """
+        with self._cond:
+            worker = self._current.get(future)
+            if worker is None or worker.abandoned:
+                return
+            worker.abandoned = True
+            self._live -= 1
+            self._abandoned += 1
+            if self._abandoned <= self.max_abandoned and not self._shutdown:
+                self._start_thread()
+                self.replaced += 1
+            elif not self._live:
+                logger.error(f"Every tool worker is stuck in a timed-out tool; failing {len(self._work)} queued steps")
+                while self._work:
+                    queued = self._work.popleft()[0]
+                    if queued.set_running_or_notify_cancel():
+                        queued.set_exception(ToolPoolExhausted("All tool workers are stuck in timed-out tools"))
+
+    def _serve(self):
+        worker = _Worker()
+        while True:
+            with self._cond:
+                while not self._work and not self._shutdown:
+                    self._cond.wait()
+                if not self._work:
+                    self._live -= 1
+                    return
+                future, fn, args, kwargs = self._work.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._current[future] = worker
+
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+            with self._cond:
+                self._current.pop(future, None)
+                if worker.abandoned:
+                    self._abandoned -= 1
+                    worker.abandoned = False
+                    if self._live >= self.max_workers or self._shutdown:
+                        # Its place was taken by a replacement
+                        return
+                    self._live += 1
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """Stop the threads once the queue is empty; abandoned threads are not waited for."""
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                while self._work:
+                    self._work.popleft()[0].cancel()
+            self._cond.notify_all()
+            if wait:
+                while self._live:
+                    self._cond.wait(0.1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool metrics.
+
+        Returns:
+            Dict[str, Any]: Live and abandoned threads, queued calls and replacements
+        """
+        with self._cond:
+            return {
+                'max_workers': self.max_workers,
+                'live': self._live,
+                'abandoned': self._abandoned,
+                'queued': len(self._work),
+                'replaced': self.replaced
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ToolWorkerPool:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ToolWorkerPool()
+        return _executor
+
+
+class _RunningStep:
+    """Bookkeeping for a submitted step; started is set by the worker when the step begins."""
+
+    def __init__(self, step: ToolStep, timeout: float):
+        self.step = step
+        self.timeout = timeout
+        self.started = None
+
+    def run(self, inputs: Dict[str, Any]) -> Any:
+        self.started = time.monotonic()
+        return self.step.run(inputs)
+
+    def deadline(self, now: float) -> float:
+        """When the step times out; a step still queued cannot time out before now + timeout."""
+        return (self.started if self.started is not None else now) + self.timeout
+
+    def elapsed(self, now: float) -> float:
+        return now - self.started if self.started is not None else 0.0
+
+
+class ToolScheduler:
+    """Runs tool steps in dependency order with bounded concurrency and per-step timeouts."""
+
+    def __init__(self, default_timeout: float = None, executor: concurrent.futures.Executor = None):
+        """
+        Args:
+            default_timeout: Timeout for steps that do not set one. Defaults to TOOL_TIMEOUT or 180.
+            executor: Pool to run steps on. Defaults to the shared ToolWorkerPool of TOOL_SCHEDULER_WORKERS threads.
+        """
+        self.default_timeout = default_timeout if default_timeout is not None else DEFAULT_TOOL_TIMEOUT
+        self.executor = executor
+
+    @staticmethod
+    def _validate(steps: List[ToolStep]):
+        names = {step.name for step in steps}
+        if len(names) != len(steps):
+            raise ValueError("Tool step names must be unique")
+        for step in steps:
+            missing = [dep for dep in step.depends_on if dep not in names]
+            if missing:
+                raise ValueError(f"Step {step.name} depends on unknown steps: {missing}")
+
+        # Kahn's algorithm: every step must become ready eventually
+        remaining = {step.name: set(step.depends_on) for step in steps}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Tool steps contain a dependency cycle: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def run(self, steps: List[ToolStep],
+            on_start: Optional[Callable[[ToolStep], None]] = None,
+            on_finish: Optional[Callable[[ToolOutcome], None]] = None) -> Dict[str, ToolOutcome]:
+        """
+        Run every step, starting each as soon as its dependencies have succeeded.
+
+        Args:
+            steps: The graph's steps
+            on_start: Called with each step as it is submitted to the worker pool
+            on_finish: Called with each outcome as soon as it is known, including skips
+
+        Returns:
+            Dict[str, ToolOutcome]: Outcome of every step, in the order the steps were given
+        """
+        self._validate(steps)
+        executor = self.executor or _get_executor()
+        outcomes: Dict[str, ToolOutcome] = {}
+        running = {}  # future -> _RunningStep
+
+        def finish(outcome: ToolOutcome):
+            outcomes[outcome.name] = outcome
+            if on_finish:
+                try:
+                    on_finish(outcome)
+                except Exception as e:
+                    logger.error(f"Error in tool progress callback: {e}")
+
+        def submit_ready():
+            submitted = {entry.step.name for entry in running.values()}
+            for step in steps:
+                if step.name in outcomes or step.name in submitted:
+                    continue
+                deps = [outcomes.get(dep) for dep in step.depends_on]
+                if any(dep is not None and not dep.succeeded for dep in deps):
+                    failed = [dep.name for dep in deps if dep is not None and not dep.succeeded]
+                    finish(ToolOutcome(step.name, SKIPPED, error=f"Dependency did not succeed: {', '.join(failed)}"))
+                    continue
+                if all(dep is not None for dep in deps):
+                    inputs = {dep.name: dep.result for dep in deps}
+                    if on_start:
+                        try:
+                            on_start(step)
+                        except Exception as e:
+                            logger.error(f"Error in tool progress callback: {e}")
+                    timeout = step.timeout if step.timeout is not None else self.default_timeout
+                    entry = _RunningStep(step, timeout)
+                    try:
+                        running[executor.submit(entry.run, inputs)] = entry
+                    except ToolPoolExhausted as e:
+                        logger.error(f"Tool step {step.name} not started: {e}")
+                        finish(ToolOutcome(step.name, FAILED, error=str(e)))
+
+        # Skips can unblock nothing but may cascade, so repeat until the graph settles
+        while len(outcomes) < len(steps):
+            before = len(outcomes)
+            submit_ready()
+            if not running:
+                if len(outcomes) == before:
+                    break
+                continue
+
+            # Steps still waiting for a worker are not on the clock yet; waking early
+            # for them is harmless since deadlines are recomputed after every wait
+            now = time.monotonic()
+            nearest = min(entry.deadline(now) for entry in running.values())
+            done, _ = concurrent.futures.wait(
+                list(running), timeout=max(0, nearest - now),
+                return_when=concurrent.futures.FIRST_COMPLETED)
+
+            now = time.monotonic()
+            for future in done:
+                entry = running.pop(future)
+                name, elapsed = entry.step.name, entry.elapsed(now)
+                try:
+                    finish(ToolOutcome(name, SUCCESS, result=future.result(), elapsed=elapsed))
+                except Exception as e:
+                    logger.error(f"Tool step {name} failed: {e}")
+                    finish(ToolOutcome(name, FAILED, error=str(e), elapsed=elapsed))
+
+            for future, entry in list(running.items()):
+                if entry.started is not None and now >= entry.deadline(now):
+                    # The worker cannot be interrupted; its result is discarded when it returns
+                    running.pop(future)
+                    abandon = getattr(executor, 'abandon', None)
+                    if abandon is not None:
+                        abandon(future)
+                    elapsed = entry.elapsed(now)
+                    logger.warning(f"Tool step {entry.step.name} timed out after {elapsed:.1f}s")
+                    finish(ToolOutcome(entry.step.name, TIMEOUT, error=f"Timed out after {elapsed:.1f}s",
+                                       elapsed=elapsed))
+
+        return {step.name: outcomes[step.name] for step in steps if step.name in outcomes}
@@ -6,7 +6,7 @@ Special routes for admin testing and management
 import logging
 from flask import Blueprint, request, jsonify, session, render_template
 from ..services.admin_service import admin_service
-from ..services.subscription_service import SubscriptionService
+from ..services.subscription_service import get_subscription_service
 from ..decorators.paywall import get_user_plan_info
 from ..security.auth_manager import require_auth
 
@@ -73,7 +73,7 @@ def grant_admin_access():
             return jsonify({'error': 'User not authenticated'}), 401
         
         # Get user email from session or database
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         user_response = subscription_service.supabase.table('user_profiles').select('email').eq('id', user_id).single().execute()
         
         if not user_response.data:
@@ -114,7 +114,7 @@ def test_paywall():
         admin_status = admin_service.check_user_admin_status(user_id)
         
         # Get subscription plans
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         plans = subscription_service.get_subscription_plans()
         
         plans_data = []
@@ -172,6 +172,34 @@ def admin_dashboard():
         logger.error(f"Error loading admin dashboard: {str(e)}")
         return render_template('error.html', error='Failed to load admin dashboard')
 
+@admin_bp.route('/visual-browser/sessions', methods=['GET'])
+@require_auth()
+def visual_browser_sessions():
+    """Live visual browser sessions, browser memory and eviction history"""
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'User not authenticated'}), 401
+        
+        # Check if user is admin
+        admin_status = admin_service.check_user_admin_status(user_id)
+        
+        if not admin_status.get('is_admin', False):
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        from ..visual_browser.browser_workers import get_browser_backend
+        return jsonify({
+            'success': True,
+            'sessions': get_browser_backend().get_session_stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting visual browser sessions: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get visual browser sessions'
+        }), 500
+
 @admin_bp.route('/simulate-usage', methods=['POST'])
 @require_auth()
 def simulate_usage():
@@ -193,7 +221,7 @@ def simulate_usage():
             return jsonify({'error': 'Admin access required'}), 403
         
         # Simulate credit consumption
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         
         if admin_status.get('has_unlimited_credits', False):
             # For admins with unlimited credits, just log the usage
@@ -257,7 +285,7 @@ def reset_credits():
         new_credits = data.get('credits', 100)
         
         # Reset credits
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         
         from datetime import datetime, timedelta
         now = datetime.utcnow()
@@ -77,3 +77,58 @@ def system_status():
         'uptime': time.time(),
         'timestamp': datetime.now().isoformat()
     })
+
+@health_bp.route('/health/cache', methods=['GET'])
+def cache_stats():
+    """Shared cache statistics for this worker."""
+    try:
+        from app.utils.cache_service import get_cache_service
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'pid': os.getpid(),
+            'cache': get_cache_service().get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'unhealthy',
+            'timestamp': datetime.now().isoformat(),
+            'error': str(e)
+        }), 500
+
+
+@health_bp.route('/health/browsers', methods=['GET'])
+def browser_pool_stats():
+    """Warm browser pool metrics for this worker."""
+    try:
+        from app.visual_browser.browser_pool import get_browser_pool_stats
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'pid': os.getpid(),
+            'pools': get_browser_pool_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'unhealthy',
+            'timestamp': datetime.now().isoformat(),
+            'error': str(e)
+        }), 500
+
+@health_bp.route('/health/tasks', methods=['GET'])
+def task_stats():
+    """Task manager and worker pool statistics for this worker."""
+    try:
+        from app.prime_agent.task_manager import task_manager
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'pid': os.getpid(),
+            'tasks': task_manager.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 'unhealthy',
+            'timestamp': datetime.now().isoformat(),
+            'error': str(e)
+        }), 500
@@ -7,7 +7,7 @@ import logging
 import os
 from datetime import datetime
 from flask import Blueprint, request, jsonify, session
-from ..services.subscription_service import SubscriptionService
+from ..services.subscription_service import get_subscription_service
 from ..services.payment_gateway import PaymentGatewayFactory
 from ..services.currency_service import currency_service
 from ..services.invoice_email_service import invoice_email_service
@@ -21,11 +21,29 @@ logger = logging.getLogger(__name__)
 
 payment_bp = Blueprint('payment', __name__, url_prefix='/payment')
 
+def _invalidate_entitlements(user_id=None):
+    """Drop cached paywall entitlements for a user, or for everyone when the user is unknown"""
+    subscription_service = get_subscription_service()
+    if user_id:
+        subscription_service.invalidate_user(user_id)
+    else:
+        subscription_service.invalidate_all()
+
+def _webhook_user_id(data):
+    """The user ID carried in a webhook payload's metadata, if any"""
+    metadata = data.get('metadata') if isinstance(data, dict) else None
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            metadata = None
+    return metadata.get('user_id') if isinstance(metadata, dict) else None
+
 @payment_bp.route('/plans', methods=['GET'])
 def get_subscription_plans():
     """Get all available subscription plans with currency conversion"""
     try:
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         plans = subscription_service.get_subscription_plans()
 
         # Get user location for payment provider detection
@@ -132,7 +150,7 @@ def get_user_payment_info():
         credit_info = credit_service.get_user_credits(user_id)
 
         # Get subscription info
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         user_subscription = subscription_service.get_user_subscription(user_id)
 
         # If no subscription found, create free subscription
@@ -266,7 +284,7 @@ def create_subscription():
             return jsonify({'error': 'Plan ID is required'}), 400
         
         # Get user email for customer creation
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
 
         # Get user info from session or Supabase
         user_email = session.get('user_email')
@@ -441,6 +459,7 @@ def create_subscription():
         # Store subscription based on available storage
         if subscription_service.use_supabase:
             result = subscription_service.supabase.table('user_subscriptions').insert(subscription_data).execute()
+            _invalidate_entitlements(user_id)
             subscription_id = result.data[0]['id'] if result.data else subscription_result['subscription_id']
         else:
             # In fallback mode, just log the subscription creation
@@ -500,7 +519,7 @@ def cancel_subscription():
         if not user_id:
             return jsonify({'error': 'User not authenticated'}), 401
         
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         user_subscription = subscription_service.get_user_subscription(user_id)
         
         if not user_subscription:
@@ -523,6 +542,7 @@ def cancel_subscription():
             'cancel_at_period_end': True,
             'updated_at': datetime.utcnow().isoformat()
         }).eq('id', user_subscription.id).execute()
+        _invalidate_entitlements(user_id)
         
         return jsonify({
             'success': True,
@@ -574,7 +594,8 @@ def _process_webhook_event(webhook_result, provider):
         action = webhook_result.get('action')
         data = webhook_result.get('data', {})
 
-        subscription_service = SubscriptionService()
+        if action in ('subscription_created', 'subscription_cancelled', 'payment_failed', 'payment_succeeded'):
+            _invalidate_entitlements(_webhook_user_id(data))
 
         if action == 'subscription_created':
             # Handle subscription activation
@@ -607,7 +628,7 @@ def upgrade_plan():
         if not new_plan_id:
             return jsonify({'error': 'New plan ID is required'}), 400
         
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
         current_subscription = subscription_service.get_user_subscription(user_id)
         
         if not current_subscription:
@@ -618,6 +639,7 @@ def upgrade_plan():
             'plan_id': new_plan_id,
             'updated_at': datetime.utcnow().isoformat()
         }).eq('id', current_subscription.id).execute()
+        _invalidate_entitlements(user_id)
         
         return jsonify({
             'success': True,
@@ -750,7 +772,7 @@ def get_billing_history():
         if not user_id:
             return jsonify({'error': 'User not authenticated'}), 401
 
-        subscription_service = SubscriptionService()
+        subscription_service = get_subscription_service()
 
         # Get payment transactions
         transactions_response = subscription_service.supabase.table('payment_transactions').select('*').eq('user_id', user_id).order('created_at', desc=True).execute()
@@ -894,6 +916,7 @@ def paystack_webhook():
             # 1. Find the user by email
             # 2. Activate their subscription
             # 3. Update database records
+            _invalidate_entitlements(_webhook_user_id(data))
 
             return jsonify({'status': 'success'}), 200
 
@@ -904,6 +927,7 @@ def paystack_webhook():
             customer_email = data.get('customer', {}).get('email')
 
             logger.info(f"Subscription created: {subscription_code}, Email: {customer_email}")
+            _invalidate_entitlements(_webhook_user_id(data))
 
             return jsonify({'status': 'success'}), 200
 
@@ -11,6 +11,7 @@ from flask import Blueprint, request, jsonify, send_file, Response
 
 from app.visual_browser.live_browser import live_browser
 from app.visual_browser.screen_recorder import get_screen_recorder
+from app.visual_browser.recording_store import CONTAINER_FILE, INDEX_FILE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -41,7 +42,8 @@ def get_status():
             'success': True,
             'is_running': screen_recorder.is_running,
             'is_recording': screen_recorder.is_recording,
-            'current_recording': screen_recorder.current_recording['id'] if screen_recorder.is_recording else None
+            'current_recording': screen_recorder.current_recording['id'] if screen_recorder.is_recording else None,
+            'stream': screen_recorder.streamer.get_stats()
         })
     except Exception as e:
         logger.error(f"Error getting screen recorder status: {str(e)}")
@@ -277,6 +279,46 @@ def get_recording_frames(recording_id):
             'error': str(e)
         })
 
+@screen_recorder_bp.route('/api/screen-recorder/recordings/<int:recording_id>/frame', methods=['GET'])
+def get_recording_frame(recording_id):
+    """
+    Get the frame shown at a time in a recording.
+    
+    Args:
+        recording_id: The ID of the recording.
+        
+    Returns:
+        Response: The frame image (JPEG unless 'format' is png or webp) for the 't' query parameter in seconds.
+    """
+    try:
+        screen_recorder = get_screen_recorder()
+        
+        if not screen_recorder:
+            return jsonify({
+                'success': False,
+                'error': 'Screen recorder not initialized'
+            })
+        
+        timestamp = request.args.get('t', 0.0, type=float)
+        image_format = request.args.get('format', 'jpeg').lower()
+        if image_format not in ('png', 'jpeg', 'webp'):
+            image_format = 'jpeg'
+        
+        result = screen_recorder.get_frame_at(recording_id, timestamp, image_format)
+        if not result['success']:
+            return jsonify(result), 404
+        
+        response = Response(result['image'], mimetype=f'image/{image_format}')
+        response.headers['X-Frame-Index'] = str(result['index'])
+        response.headers['X-Frame-Timestamp'] = f"{result['timestamp']:.3f}"
+        return response
+    except Exception as e:
+        logger.error(f"Error getting recording frame: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @screen_recorder_bp.route('/api/screen-recorder/recordings/<int:recording_id>', methods=['DELETE'])
 def delete_recording(recording_id):
     """
@@ -354,9 +396,9 @@ def download_recording(recording_id):
             if os.path.exists(metadata_path):
                 zipf.write(metadata_path, 'metadata.json')
             
-            # Add frame files
+            # Add the frame container and its index, or the frame files of older recordings
             for filename in os.listdir(recording['path']):
-                if filename.startswith('frame_') and filename.endswith('.png'):
+                if filename in (CONTAINER_FILE, INDEX_FILE) or (filename.startswith('frame_') and filename.endswith('.png')):
                     file_path = os.path.join(recording['path'], filename)
                     zipf.write(file_path, filename)
         
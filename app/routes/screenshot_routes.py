@@ -0,0 +1,35 @@
+"""
+Screenshot routes for AutoWave platform.
+Serves files from the content-addressed screenshot store.
+"""
+
+import logging
+from flask import Blueprint, jsonify, send_file
+
+from app.services.screenshot_store import get_screenshot_store, MIMETYPES, SCREENSHOT_URL_PREFIX
+
+logger = logging.getLogger(__name__)
+
+screenshot_bp = Blueprint('screenshots', __name__)
+
+# File names are content hashes, so a URL always refers to the same bytes
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+
+@screenshot_bp.route(f'{SCREENSHOT_URL_PREFIX}/<filename>', methods=['GET'])
+def get_screenshot(filename):
+    """Serve a stored screenshot or thumbnail with long-lived caching headers."""
+    path = get_screenshot_store().get_path(filename)
+    if not path:
+        return jsonify({'success': False, 'error': 'Screenshot not found'}), 404
+
+    response = send_file(path, mimetype=MIMETYPES[filename.rsplit('.', 1)[1]],
+                         etag=filename.split('.', 1)[0], conditional=True, max_age=CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}, immutable'
+    return response
+
+
+@screenshot_bp.route('/api/screenshots/stats', methods=['GET'])
+def screenshot_stats():
+    """Get screenshot store statistics."""
+    return jsonify({'success': True, 'stats': get_screenshot_store().get_stats()})
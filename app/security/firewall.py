@@ -6,12 +6,15 @@ Advanced threat protection, IP filtering, and request monitoring.
 import re
 import time
 import ipaddress
-from collections import defaultdict, deque
+from collections import defaultdict
 from flask import request, jsonify, abort
 from functools import wraps
 import logging
 import os
 
+from .rate_limit_engine import get_rate_limit_engine
+from .threat_scanner import get_firewall_scanner, report_scan_metrics, FIREWALL_RULES
+
 logger = logging.getLogger(__name__)
 
 class SecurityFirewall:
@@ -21,7 +24,9 @@ class SecurityFirewall:
         self.blocked_ips = set()
         self.allowed_ips = self._load_allowed_ips()
         self.suspicious_patterns = self._load_threat_patterns()
-        self.request_history = defaultdict(lambda: deque(maxlen=100))
+        self.threat_scanner = get_firewall_scanner()
+        # Per-IP GCRA buckets, shared with the API rate limiter
+        self.rate_engine = get_rate_limit_engine()
         self.threat_scores = defaultdict(int)
         
         # Configuration
@@ -58,29 +63,7 @@ class SecurityFirewall:
     
     def _load_threat_patterns(self):
         """Load patterns that indicate potential threats."""
-        return [
-            # SQL Injection patterns
-            re.compile(r'(\bunion\b|\bselect\b|\binsert\b|\bdelete\b|\bdrop\b|\bupdate\b)', re.IGNORECASE),
-            re.compile(r'(\bor\b|\band\b)\s+\d+\s*=\s*\d+', re.IGNORECASE),
-            re.compile(r'[\'";]\s*(\bor\b|\band\b)', re.IGNORECASE),
-            
-            # XSS patterns
-            re.compile(r'<script[^>]*>.*?</script>', re.IGNORECASE | re.DOTALL),
-            re.compile(r'javascript:', re.IGNORECASE),
-            re.compile(r'on\w+\s*=', re.IGNORECASE),
-            
-            # Path traversal
-            re.compile(r'\.\.[\\/]'),
-            re.compile(r'[\\/]etc[\\/]passwd'),
-            re.compile(r'[\\/]proc[\\/]'),
-            
-            # Command injection
-            re.compile(r'[;&|`$]'),
-            re.compile(r'\b(cat|ls|pwd|whoami|id|uname)\b'),
-            
-            # Common attack tools
-            re.compile(r'(sqlmap|nmap|nikto|dirb|gobuster)', re.IGNORECASE),
-        ]
+        return [re.compile(pattern, flags) for _, pattern, flags, _ in FIREWALL_RULES]
     
     def is_ip_allowed(self, ip_address):
         """Check if IP address is in allowed list."""
@@ -115,47 +98,20 @@ class SecurityFirewall:
         if not content:
             return threat_score, detected_threats
         
-        content_str = str(content).lower()
-        
-        for i, pattern in enumerate(self.suspicious_patterns):
-            if pattern.search(content_str):
-                threat_score += 10
-                threat_types = [
-                    'SQL Injection', 'SQL Injection', 'SQL Injection',
-                    'XSS Attack', 'XSS Attack', 'XSS Attack',
-                    'Path Traversal', 'Path Traversal', 'Path Traversal',
-                    'Command Injection', 'Command Injection',
-                    'Attack Tool'
-                ]
-                detected_threats.append(threat_types[min(i, len(threat_types) - 1)])
+        verdict = self.threat_scanner.scan(content)
+        for rule_id in verdict.rule_ids:
+            threat_score += 10
+            detected_threats.append(FIREWALL_RULES[rule_id][0])
         
         return threat_score, detected_threats
     
     def check_rate_limits(self, ip_address):
         """Check if IP address exceeds rate limits."""
-        current_time = time.time()
-        
-        # Clean old requests
-        self.request_history[ip_address] = deque(
-            [req_time for req_time in self.request_history[ip_address] 
-             if current_time - req_time < 3600],  # Keep last hour
-            maxlen=100
-        )
-        
-        # Add current request
-        self.request_history[ip_address].append(current_time)
-        
-        # Check limits
-        recent_requests = [req_time for req_time in self.request_history[ip_address] 
-                          if current_time - req_time < 60]  # Last minute
-        
-        if len(recent_requests) > self.max_requests_per_minute:
-            return False, f"Rate limit exceeded: {len(recent_requests)} requests per minute"
-        
-        if len(self.request_history[ip_address]) > self.max_requests_per_hour:
-            return False, f"Rate limit exceeded: {len(self.request_history[ip_address])} requests per hour"
-        
-        return True, None
+        decision = self.rate_engine.check(f"ip:{ip_address}", 'firewall', {
+            'per_minute': self.max_requests_per_minute,
+            'per_hour': self.max_requests_per_hour
+        })
+        return decision.allowed, decision.reason
     
     def process_request(self, request_obj):
         """Process incoming request through firewall."""
@@ -206,11 +162,16 @@ class SecurityFirewall:
         # Analyze all content
         total_threat_score = 0
         all_threats = []
+        scan_start = time.perf_counter()
+        scanned = 0
         
         for content in content_to_analyze:
-            score, threats = self.analyze_request_content(content)
-            total_threat_score += score
-            all_threats.extend(threats)
+            verdict = self.threat_scanner.scan(content)
+            scanned += verdict.bytes_scanned
+            total_threat_score += 10 * len(verdict.rule_ids)
+            all_threats.extend(FIREWALL_RULES[rule_id][0] for rule_id in verdict.rule_ids)
+        
+        report_scan_metrics('firewall', time.perf_counter() - scan_start, scanned, all_threats)
         
         # Update threat score for IP
         self.threat_scores[client_ip] += total_threat_score
@@ -230,10 +191,8 @@ def firewall_protection():
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            firewall = SecurityFirewall()
-            
-            # Process request through firewall
-            allowed, reason = firewall.process_request(request)
+            # Process request through the shared firewall so rate limits and blocks persist
+            allowed, reason = security_firewall.process_request(request)
             
             if not allowed:
                 logger.warning(f"Firewall blocked request from {request.remote_addr}: {reason}")
@@ -8,38 +8,25 @@ import html
 import urllib.parse
 from typing import Any, Dict, List, Optional
 
+from .threat_scanner import get_validator_scanner, report_scan_metrics, VALIDATOR_RULES
+
 class InputValidator:
     """Advanced input validation and sanitization."""
     
     def __init__(self):
-        # Common attack patterns
-        self.sql_patterns = [
-            re.compile(r'(\bunion\b|\bselect\b|\binsert\b|\bdelete\b|\bdrop\b|\bupdate\b)', re.IGNORECASE),
-            re.compile(r'(\bor\b|\band\b)\s+\d+\s*=\s*\d+', re.IGNORECASE),
-            re.compile(r'[\'";]\s*(\bor\b|\band\b)', re.IGNORECASE),
-        ]
-        
-        self.xss_patterns = [
-            re.compile(r'<script[^>]*>.*?</script>', re.IGNORECASE | re.DOTALL),
-            re.compile(r'javascript:', re.IGNORECASE),
-            re.compile(r'on\w+\s*=', re.IGNORECASE),
-            re.compile(r'<iframe[^>]*>', re.IGNORECASE),
-            re.compile(r'<object[^>]*>', re.IGNORECASE),
-            re.compile(r'<embed[^>]*>', re.IGNORECASE),
-        ]
-        
-        self.path_traversal_patterns = [
-            re.compile(r'\.\.[\\/]'),
-            re.compile(r'[\\/]etc[\\/]passwd'),
-            re.compile(r'[\\/]proc[\\/]'),
-            re.compile(r'[\\/]windows[\\/]system32'),
-        ]
-        
-        self.command_injection_patterns = [
-            re.compile(r'[;&|`$]'),
-            re.compile(r'\b(cat|ls|pwd|whoami|id|uname|rm|del|format)\b'),
-            re.compile(r'(\|\||&&)'),
-        ]
+        # Common attack patterns, grouped by category for the detect_* helpers
+        self.sql_patterns = self._compile_category('SQL Injection')
+        self.xss_patterns = self._compile_category('XSS Attack')
+        self.path_traversal_patterns = self._compile_category('Path Traversal')
+        self.command_injection_patterns = self._compile_category('Command Injection')
+        
+        # All categories are classified in one scan per string
+        self.threat_scanner = get_validator_scanner()
+    
+    def _compile_category(self, category: str) -> List[re.Pattern]:
+        """Compile the validator rules of one threat category."""
+        return [re.compile(pattern, flags) for rule_category, pattern, flags, _ in VALIDATOR_RULES
+                if rule_category == category]
     
     def validate_email(self, email: str) -> bool:
         """Validate email format."""
@@ -133,46 +120,28 @@ class InputValidator:
         if not text:
             return False
         
-        text_lower = text.lower()
-        
-        for pattern in self.sql_patterns:
-            if pattern.search(text_lower):
-                return True
-        
-        return False
+        return 'SQL Injection' in self.threat_scanner.scan(text).categories
     
     def detect_xss(self, text: str) -> bool:
         """Detect XSS attempts."""
         if not text:
             return False
         
-        for pattern in self.xss_patterns:
-            if pattern.search(text):
-                return True
-        
-        return False
+        return 'XSS Attack' in self.threat_scanner.scan(text).categories
     
     def detect_path_traversal(self, text: str) -> bool:
         """Detect path traversal attempts."""
         if not text:
             return False
         
-        for pattern in self.path_traversal_patterns:
-            if pattern.search(text):
-                return True
-        
-        return False
+        return 'Path Traversal' in self.threat_scanner.scan(text).categories
     
     def detect_command_injection(self, text: str) -> bool:
         """Detect command injection attempts."""
         if not text:
             return False
         
-        for pattern in self.command_injection_patterns:
-            if pattern.search(text):
-                return True
-        
-        return False
+        return 'Command Injection' in self.threat_scanner.scan(text).categories
     
     def validate_input(self, input_data: Any, input_type: str = 'general') -> Dict[str, Any]:
         """Comprehensive input validation."""
@@ -185,19 +154,10 @@ class InputValidator:
     
     def _validate_string_input(self, text: str, input_type: str) -> Dict[str, Any]:
         """Validate string input."""
-        threats = []
-        
-        if self.detect_sql_injection(text):
-            threats.append('SQL Injection')
-        
-        if self.detect_xss(text):
-            threats.append('XSS Attack')
-        
-        if self.detect_path_traversal(text):
-            threats.append('Path Traversal')
-        
-        if self.detect_command_injection(text):
-            threats.append('Command Injection')
+        # One scan classifies SQL injection, XSS, path traversal and command injection
+        verdict = self.threat_scanner.scan(text)
+        threats = list(verdict.categories)
+        report_scan_metrics('input_validator', verdict.elapsed, verdict.bytes_scanned, threats)
         
         # Type-specific validation
         if input_type == 'email':
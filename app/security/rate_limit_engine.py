@@ -0,0 +1,378 @@
+"""
+GCRA Rate Limit Engine
+Generic cell rate algorithm (a token bucket stored as one timestamp) shared by the
+rate limiter and the security firewall. Every (client, endpoint, tier) bucket is a
+single float: its theoretical arrival time (TAT). All tiers of a request are checked
+and updated together, in one atomic Lua script when Redis is enabled, otherwise under
+a lock with a time wheel expiring idle buckets in O(1).
+"""
+
+import math
+import os
+import time
+import threading
+import logging
+
+# Optional Redis import
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Length of each rate limit tier in seconds
+PERIODS = {
+    'per_second': 1,
+    'per_minute': 60,
+    'per_hour': 3600,
+    'per_day': 86400
+}
+
+# Checks every tier of a request and updates them only if all allow it.
+# KEYS: one bucket key per tier. ARGV: now, then (emission interval, period) per tier.
+# Returns {1, tat_1, ..., tat_n} when allowed or {0, denied tier index, retry after in ms}.
+GCRA_LUA = """
+local now = tonumber(ARGV[1])
+local tats = {}
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[i * 2])
+    local period = tonumber(ARGV[i * 2 + 1])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then
+        tat = now
+    end
+    local new_tat = tat + interval
+    local allow_at = new_tat - period
+    if allow_at > now then
+        return {0, i, math.ceil((allow_at - now) * 1000)}
+    end
+    tats[i] = new_tat
+end
+local result = {1}
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], tostring(tats[i]), 'PX', math.ceil((tats[i] - now) * 1000))
+    result[i + 1] = tostring(tats[i])
+end
+return result
+"""
+
+
+def _get_tiers(limits):
+    """(period, limit, period length) for every enabled tier in a limits dict."""
+    return [(period, limit, PERIODS[period]) for period, limit in limits.items()
+            if period in PERIODS and limit and limit > 0]
+
+
+def _remaining(tiers, tats, now):
+    """Remaining requests per tier given each tier's TAT."""
+    remaining = {}
+    for (period, limit, length), tat in zip(tiers, tats):
+        interval = length / limit
+        remaining[period] = max(0, int((length - (max(tat, now) - now)) / interval + 1e-9))
+    return remaining
+
+
+class RateLimitDecision:
+    """The outcome of checking one request against its rate limit tiers."""
+
+    def __init__(self, allowed, tiers, tats, now, reason=None, retry_after=0):
+        self.allowed = allowed
+        self.reason = reason
+        self.retry_after = retry_after
+        self._tiers = tiers
+        self._tats = tats
+        self._now = now
+
+    @property
+    def limits(self):
+        """Allowed requests per tier."""
+        return {period: limit for period, limit, _ in self._tiers}
+
+    @property
+    def remaining(self):
+        """Remaining requests per tier, computed on demand from the bucket TATs."""
+        return _remaining(self._tiers, self._tats, self._now)
+
+    def headers(self):
+        """
+        Get X-RateLimit-* headers describing this decision.
+
+        Returns:
+            dict: Header names and values
+        """
+        headers = {}
+        remaining = self.remaining
+        for period, limit, _ in self._tiers:
+            name = period.replace('per_', '').title()
+            headers[f'X-RateLimit-{name}'] = str(limit)
+            headers[f'X-RateLimit-{name}-Remaining'] = str(remaining.get(period, limit))
+        if not self.allowed:
+            headers['Retry-After'] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class TimeWheel:
+    """Expires buckets in O(1) per tick by hashing deadlines into a ring of slots."""
+
+    def __init__(self, slots=4096, resolution=1.0):
+        """
+        Initialize the time wheel.
+
+        Args:
+            slots (int, optional): Number of slots in the ring. Defaults to 4096.
+            resolution (float, optional): Seconds per slot. Defaults to 1.0.
+        """
+        self.resolution = resolution
+        self.slots = [[] for _ in range(slots)]
+        self.current_tick = int(time.time() / resolution)
+
+    def schedule(self, key, deadline):
+        """
+        Schedule a key to be checked at a deadline.
+
+        Deadlines further away than one turn of the wheel are checked early and
+        rescheduled by the expiry callback.
+
+        Args:
+            key: The bucket key
+            deadline (float): Time at which the key may expire
+        """
+        tick = max(int(deadline / self.resolution), self.current_tick + 1)
+        self.slots[tick % len(self.slots)].append(key)
+
+    def advance(self, now, expire):
+        """
+        Process every slot up to now.
+
+        Args:
+            now (float): The current time
+            expire (callable): Called with each due key; responsible for deleting or rescheduling it
+        """
+        target = int(now / self.resolution)
+        # After a long idle gap, one full turn visits every slot
+        start = max(self.current_tick + 1, target - len(self.slots) + 1)
+        for tick in range(start, target + 1):
+            slot = self.slots[tick % len(self.slots)]
+            if slot:
+                self.slots[tick % len(self.slots)] = []
+                for key in slot:
+                    expire(key, now)
+        self.current_tick = max(self.current_tick, target)
+
+
+class GCRARateLimiter:
+    """Multi-tier GCRA rate limiter with in-memory and Redis backends."""
+
+    def __init__(self, redis_client=None, key_prefix='gcra:'):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            redis_client (optional): Redis client for limits shared across workers. Defaults to None.
+            key_prefix (str, optional): Prefix of Redis bucket keys. Defaults to 'gcra:'.
+        """
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self._script = redis_client.register_script(GCRA_LUA) if redis_client is not None else None
+
+        self._tats = {}
+        self._lock = threading.Lock()
+        self._wheel = TimeWheel()
+        self.allowed_count = 0
+        self.denied_count = 0
+
+    def _expire(self, key, now):
+        """Time wheel callback: drop a bucket once it has fully refilled."""
+        tat = self._tats.get(key)
+        if tat is None:
+            return
+        if tat <= now:
+            del self._tats[key]
+        else:
+            self._wheel.schedule(key, tat)
+
+    def check(self, client_id, endpoint, limits, cost=1):
+        """
+        Check a request against every tier and consume from all of them if allowed.
+
+        Args:
+            client_id (str): The client identifier
+            endpoint (str): The endpoint or limiter scope
+            limits (dict): Map of tier ('per_second', 'per_minute', ...) to allowed requests
+            cost (int, optional): Number of requests this call counts as. Defaults to 1.
+
+        Returns:
+            RateLimitDecision: Whether the request is allowed, remaining quota and retry delay
+        """
+        tiers = _get_tiers(limits)
+        if not tiers:
+            return RateLimitDecision(True, tiers, [], time.time())
+
+        if self.redis_client is not None:
+            try:
+                decision = self._check_redis(client_id, endpoint, tiers, cost)
+            except Exception as e:
+                logger.error(f"Redis rate limit check failed, using in-memory limits: {e}")
+                decision = self._check_memory(client_id, endpoint, tiers, cost)
+        else:
+            decision = self._check_memory(client_id, endpoint, tiers, cost)
+
+        if decision.allowed:
+            self.allowed_count += 1
+        else:
+            self.denied_count += 1
+        return decision
+
+    def _check_memory(self, client_id, endpoint, tiers, cost):
+        now = time.time()
+        tats = self._tats
+        keys = [(client_id, endpoint, period) for period, _, _ in tiers]
+        with self._lock:
+            if int(now / self._wheel.resolution) != self._wheel.current_tick:
+                self._wheel.advance(now, self._expire)
+
+            new_tats = []
+            for key, (period, limit, length) in zip(keys, tiers):
+                tat = tats.get(key, now)
+                if tat < now:
+                    tat = now
+                new_tat = tat + cost * length / limit
+                allow_at = new_tat - length
+                if allow_at > now:
+                    return RateLimitDecision(
+                        False, tiers, [tats.get(k, now) for k in keys], now,
+                        reason=f"Rate limit exceeded: {limit} requests {period}",
+                        retry_after=allow_at - now
+                    )
+                new_tats.append(new_tat)
+
+            for key, new_tat in zip(keys, new_tats):
+                if key not in tats:
+                    self._wheel.schedule(key, new_tat)
+                tats[key] = new_tat
+
+        return RateLimitDecision(True, tiers, new_tats, now)
+
+    def _redis_key(self, client_id, endpoint, period):
+        return f"{self.key_prefix}{client_id}:{endpoint}:{period}"
+
+    def _check_redis(self, client_id, endpoint, tiers, cost):
+        now = time.time()
+        keys = [self._redis_key(client_id, endpoint, period) for period, _, _ in tiers]
+        args = [now]
+        for _, limit, length in tiers:
+            args.extend([cost * length / limit, length])
+
+        result = self._script(keys=keys, args=args)
+        if int(result[0]) == 1:
+            return RateLimitDecision(True, tiers, [float(tat) for tat in result[1:]], now)
+
+        period, limit, _ = tiers[int(result[1]) - 1]
+        values = self.redis_client.mget(keys)
+        return RateLimitDecision(
+            False, tiers, [float(value) if value is not None else now for value in values], now,
+            reason=f"Rate limit exceeded: {limit} requests {period}",
+            retry_after=int(result[2]) / 1000.0
+        )
+
+    def peek(self, client_id, endpoint, limits):
+        """
+        Get the remaining quota per tier without consuming any.
+
+        Args:
+            client_id (str): The client identifier
+            endpoint (str): The endpoint or limiter scope
+            limits (dict): Map of tier to allowed requests
+
+        Returns:
+            dict: Remaining requests per tier
+        """
+        tiers = _get_tiers(limits)
+        now = time.time()
+        if self.redis_client is not None:
+            try:
+                values = self.redis_client.mget([self._redis_key(client_id, endpoint, p) for p, _, _ in tiers])
+                tats = [float(value) if value is not None else now for value in values]
+                return _remaining(tiers, tats, now)
+            except Exception as e:
+                logger.error(f"Redis rate limit lookup failed: {e}")
+        with self._lock:
+            tats = [self._tats.get((client_id, endpoint, p), now) for p, _, _ in tiers]
+        return _remaining(tiers, tats, now)
+
+    def reset(self, client_id, endpoint=None):
+        """
+        Clear a client's buckets.
+
+        Args:
+            client_id (str): The client identifier
+            endpoint (str, optional): Only clear this endpoint. Defaults to all endpoints.
+        """
+        with self._lock:
+            for key in [k for k in self._tats if k[0] == client_id and (endpoint is None or k[1] == endpoint)]:
+                del self._tats[key]
+        if self.redis_client is not None:
+            try:
+                pattern = self._redis_key(client_id, endpoint if endpoint is not None else '*', '*')
+                keys = list(self.redis_client.scan_iter(match=pattern))
+                if keys:
+                    self.redis_client.delete(*keys)
+            except Exception as e:
+                logger.error(f"Redis rate limit reset failed: {e}")
+
+    def get_stats(self):
+        """
+        Get limiter statistics.
+
+        Returns:
+            dict: Backend, live in-memory buckets and decision counts
+        """
+        with self._lock:
+            self._wheel.advance(time.time(), self._expire)
+            buckets = len(self._tats)
+        return {
+            'backend': 'redis' if self.redis_client is not None else 'memory',
+            'buckets': buckets,
+            'allowed': self.allowed_count,
+            'denied': self.denied_count
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_rate_limit_engine():
+    """
+    Get the process-wide rate limit engine shared by the rate limiter and the firewall.
+
+    Uses Redis when USE_REDIS_RATE_LIMIT is true and a server is reachable.
+
+    Returns:
+        GCRARateLimiter: The shared engine
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            redis_client = None
+            if os.getenv('USE_REDIS_RATE_LIMIT', 'false').lower() == 'true':
+                if REDIS_AVAILABLE:
+                    try:
+                        redis_client = redis.Redis(
+                            host=os.getenv('REDIS_HOST', 'localhost'),
+                            port=int(os.getenv('REDIS_PORT', 6379)),
+                            db=int(os.getenv('REDIS_DB', 0)),
+                            decode_responses=True
+                        )
+                        redis_client.ping()
+                        logger.info("Connected to Redis for rate limiting")
+                    except Exception:
+                        logger.warning("Redis not available, using in-memory rate limiting")
+                        redis_client = None
+                else:
+                    logger.info("Redis module not installed, using in-memory rate limiting")
+            _engine = GCRARateLimiter(redis_client)
+        return _engine
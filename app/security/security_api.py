@@ -277,6 +277,8 @@ def get_security_stats():
             'api_keys_count': len(auth_manager.api_keys),
             'high_threat_ips': len([ip for ip, score in security_firewall.threat_scores.items() if score > 50]),
             'locked_ips': len([ip for ip in auth_manager.failed_attempts.keys() if auth_manager.is_ip_locked(ip)]),
+            'rate_limiter': rate_limiter.engine.get_stats(),
+            'threat_scanner': security_firewall.threat_scanner.get_stats(),
             'system_status': 'secure',
             'last_updated': datetime.now().isoformat()
         }
@@ -0,0 +1,295 @@
+"""
+Threat Scanner
+Classification of request content against the firewall and input validator
+threat patterns in one scan per payload. A lowercased copy of each chunk is
+checked for the literals every rule needs, and only rules whose literals are
+present run their regex, so clean text never reaches most patterns. Bodies are
+scanned whole up to a byte budget, so a match of any length is found wherever it
+sits, verdicts are cached per payload, and scan times are reported to registered
+metrics hooks.
+"""
+
+import os
+import re
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Rules as (category, pattern, flags, literals). A rule can only match text that contains one
+# of its literals (compared lowercased), so the literals prefilter which regexes run.
+# Order matters: the firewall scores each matched rule.
+SQL_KEYWORDS = ('union', 'select', 'insert', 'delete', 'drop', 'update')
+QUOTES = ("'", '"', ';')
+SHELL_CHARS = (';', '&', '|', '`', '$')
+
+FIREWALL_RULES = [
+    # SQL Injection patterns
+    ('SQL Injection', r'(\bunion\b|\bselect\b|\binsert\b|\bdelete\b|\bdrop\b|\bupdate\b)', re.IGNORECASE, SQL_KEYWORDS),
+    ('SQL Injection', r'(\bor\b|\band\b)\s+\d+\s*=\s*\d+', re.IGNORECASE, ('=',)),
+    ('SQL Injection', r'[\'";]\s*(\bor\b|\band\b)', re.IGNORECASE, QUOTES),
+
+    # XSS patterns
+    ('XSS Attack', r'<script[^>]*>.*?</script>', re.IGNORECASE | re.DOTALL, ('<script',)),
+    ('XSS Attack', r'javascript:', re.IGNORECASE, ('javascript:',)),
+    ('XSS Attack', r'on\w+\s*=', re.IGNORECASE, ('=',)),
+
+    # Path traversal
+    ('Path Traversal', r'\.\.[\\/]', 0, ('..',)),
+    ('Path Traversal', r'[\\/]etc[\\/]passwd', re.IGNORECASE, ('passwd',)),
+    ('Path Traversal', r'[\\/]proc[\\/]', re.IGNORECASE, ('proc',)),
+
+    # Command injection
+    ('Command Injection', r'[;&|`$]', 0, SHELL_CHARS),
+    ('Command Injection', r'\b(cat|ls|pwd|whoami|id|uname)\b', re.IGNORECASE,
+     ('cat', 'ls', 'pwd', 'whoami', 'id', 'uname')),
+
+    # Common attack tools
+    ('Attack Tool', r'(sqlmap|nmap|nikto|dirb|gobuster)', re.IGNORECASE,
+     ('sqlmap', 'nmap', 'nikto', 'dirb', 'gobuster')),
+]
+
+VALIDATOR_RULES = [
+    ('SQL Injection', r'(\bunion\b|\bselect\b|\binsert\b|\bdelete\b|\bdrop\b|\bupdate\b)', re.IGNORECASE, SQL_KEYWORDS),
+    ('SQL Injection', r'(\bor\b|\band\b)\s+\d+\s*=\s*\d+', re.IGNORECASE, ('=',)),
+    ('SQL Injection', r'[\'";]\s*(\bor\b|\band\b)', re.IGNORECASE, QUOTES),
+
+    ('XSS Attack', r'<script[^>]*>.*?</script>', re.IGNORECASE | re.DOTALL, ('<script',)),
+    ('XSS Attack', r'javascript:', re.IGNORECASE, ('javascript:',)),
+    ('XSS Attack', r'on\w+\s*=', re.IGNORECASE, ('=',)),
+    ('XSS Attack', r'<iframe[^>]*>', re.IGNORECASE, ('<iframe',)),
+    ('XSS Attack', r'<object[^>]*>', re.IGNORECASE, ('<object',)),
+    ('XSS Attack', r'<embed[^>]*>', re.IGNORECASE, ('<embed',)),
+
+    ('Path Traversal', r'\.\.[\\/]', 0, ('..',)),
+    ('Path Traversal', r'[\\/]etc[\\/]passwd', 0, ('passwd',)),
+    ('Path Traversal', r'[\\/]proc[\\/]', 0, ('proc',)),
+    ('Path Traversal', r'[\\/]windows[\\/]system32', 0, ('system32',)),
+
+    ('Command Injection', r'[;&|`$]', 0, SHELL_CHARS),
+    ('Command Injection', r'\b(cat|ls|pwd|whoami|id|uname|rm|del|format)\b', 0,
+     ('cat', 'ls', 'pwd', 'whoami', 'id', 'uname', 'rm', 'del', 'format')),
+    ('Command Injection', r'(\|\||&&)', 0, ('||', '&&')),
+]
+
+# Scanning budget for large bodies
+DEFAULT_MAX_SCAN_BYTES = int(os.getenv('THREAT_SCAN_MAX_BYTES', 1024 * 1024))
+
+# Payloads shorter than this are cached by value instead of by digest
+INLINE_KEY_LENGTH = 256
+
+
+class ScanVerdict:
+    """The rules and categories matched in one piece of content."""
+
+    def __init__(self, rule_ids, categories, bytes_scanned, truncated, elapsed, cached=False):
+        self.rule_ids = rule_ids
+        self.categories = categories
+        self.bytes_scanned = bytes_scanned
+        self.truncated = truncated
+        self.elapsed = elapsed
+        self.cached = cached
+
+    def to_dict(self):
+        """
+        Get the verdict as a plain dictionary.
+
+        Returns:
+            dict: Matched rules and categories with scan statistics
+        """
+        return {
+            'rule_ids': list(self.rule_ids),
+            'categories': list(self.categories),
+            'bytes_scanned': self.bytes_scanned,
+            'truncated': self.truncated,
+            'elapsed': self.elapsed,
+            'cached': self.cached
+        }
+
+
+class ThreatScanner:
+    """Scans text against one compiled rule set."""
+
+    def __init__(self, rules, name='scanner', max_scan_bytes=None, cache_size=4096):
+        """
+        Initialize the scanner.
+
+        Args:
+            rules (list): (category, pattern, flags, literals) tuples
+            name (str, optional): Name reported to metrics hooks. Defaults to 'scanner'.
+            max_scan_bytes (int, optional): Characters scanned per payload. Defaults to THREAT_SCAN_MAX_BYTES or 1 MB.
+            cache_size (int, optional): Number of cached verdicts. Defaults to 4096.
+        """
+        self.name = name
+        self.rules = rules
+        self.max_scan_bytes = max_scan_bytes if max_scan_bytes is not None else DEFAULT_MAX_SCAN_BYTES
+        self.cache_size = cache_size
+
+        self.patterns = [re.compile(pattern, flags) for _, pattern, flags, _ in rules]
+
+        # Each distinct literal is searched once per payload, then mapped back to its rules
+        self.literal_rules = {}
+        for i, (_, _, _, literals) in enumerate(rules):
+            for literal in literals:
+                self.literal_rules.setdefault(literal, []).append(i)
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.scans = 0
+        self.cache_hits = 0
+        self.bytes_scanned = 0
+        self.scan_time = 0.0
+
+    def _scan_text(self, text):
+        """Get the indexes of every rule matching text."""
+        lowered = text.lower()
+        candidates = set()
+        for literal, rule_ids in self.literal_rules.items():
+            if literal in lowered:
+                candidates.update(rule_ids)
+        return {i for i in candidates if self.patterns[i].search(text)}
+
+    def _cache_key(self, text):
+        if len(text) <= INLINE_KEY_LENGTH:
+            return text
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def scan(self, content):
+        """
+        Scan content against every rule.
+
+        Args:
+            content: The content to scan; non-strings are converted with str()
+
+        Returns:
+            ScanVerdict: The matched rules and categories
+        """
+        if not content:
+            return ScanVerdict((), (), 0, False, 0.0)
+
+        start = time.perf_counter()
+        text = content if isinstance(content, str) else str(content)
+        truncated = len(text) > self.max_scan_bytes
+        if truncated:
+            text = text[:self.max_scan_bytes]
+
+        key = self._cache_key(text)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                self.scans += 1
+                rule_ids, categories = cached
+                return ScanVerdict(rule_ids, categories, 0, truncated, time.perf_counter() - start, cached=True)
+
+        # One pass over the whole text: a DOTALL rule's match can be arbitrarily long
+        rule_ids = tuple(sorted(self._scan_text(text)))
+        categories = tuple(dict.fromkeys(self.rules[i][0] for i in rule_ids))
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._cache[key] = (rule_ids, categories)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self.scans += 1
+            self.bytes_scanned += len(text)
+            self.scan_time += elapsed
+
+        return ScanVerdict(rule_ids, categories, len(text), truncated, elapsed)
+
+    def get_stats(self):
+        """
+        Get scanner statistics.
+
+        Returns:
+            dict: Scan count, cache hits, bytes scanned and total scan time
+        """
+        with self._lock:
+            return {
+                'name': self.name,
+                'rules': len(self.patterns),
+                'scans': self.scans,
+                'cache_hits': self.cache_hits,
+                'cached_verdicts': len(self._cache),
+                'bytes_scanned': self.bytes_scanned,
+                'scan_time': round(self.scan_time, 6),
+                'max_scan_bytes': self.max_scan_bytes
+            }
+
+
+_metrics_hooks = []
+
+
+def add_metrics_hook(hook):
+    """
+    Register a callable receiving per-request scan metrics.
+
+    The hook is called with (source, elapsed, bytes_scanned, categories).
+
+    Args:
+        hook (callable): The metrics callback
+    """
+    _metrics_hooks.append(hook)
+
+
+def remove_metrics_hook(hook):
+    """
+    Unregister a metrics callback.
+
+    Args:
+        hook (callable): The metrics callback
+    """
+    if hook in _metrics_hooks:
+        _metrics_hooks.remove(hook)
+
+
+def report_scan_metrics(source, elapsed, bytes_scanned, categories):
+    """
+    Send one request's scan metrics to every registered hook.
+
+    Args:
+        source (str): What was scanned (e.g. 'firewall')
+        elapsed (float): Total scan time in seconds
+        bytes_scanned (int): Characters scanned
+        categories (list): Threat categories found
+    """
+    for hook in list(_metrics_hooks):
+        try:
+            hook(source, elapsed, bytes_scanned, categories)
+        except Exception as e:
+            logger.error(f"Error in threat scan metrics hook: {e}")
+
+
+_scanners = {}
+_scanners_lock = threading.Lock()
+
+
+def _get_scanner(name, rules):
+    with _scanners_lock:
+        if name not in _scanners:
+            _scanners[name] = ThreatScanner(rules, name=name)
+        return _scanners[name]
+
+
+def get_firewall_scanner():
+    """
+    Get the process-wide scanner for the firewall rule set.
+
+    Returns:
+        ThreatScanner: The firewall scanner
+    """
+    return _get_scanner('firewall', FIREWALL_RULES)
+
+
+def get_validator_scanner():
+    """
+    Get the process-wide scanner for the input validator rule set.
+
+    Returns:
+        ThreatScanner: The input validator scanner
+    """
+    return _get_scanner('input_validator', VALIDATOR_RULES)
@@ -126,6 +126,9 @@ class AdminService:
                 'updated_at': now.isoformat()
             }).eq('id', user_id).execute()
             
+            from .subscription_service import get_subscription_service
+            get_subscription_service().invalidate_user(user_id)
+
             logger.info(f"Granted admin access to user {user_id} ({email})")
             return True
             
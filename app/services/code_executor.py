@@ -1,12 +1,13 @@
 """
 Code Execution Service - Executes generated code and provides visualization
+Runs go through the shared sandbox runner, which forks them from a pre-imported zygote.
 """
 
 import os
-import sys
 import tempfile
 import subprocess
 import threading
+import functools
 import time
 import json
 import base64
@@ -16,6 +17,8 @@ import uuid
 import logging
 import traceback
 
+from app.services.sandbox_runner import get_sandbox_runner
+
 logger = logging.getLogger(__name__)
 
 class CodeExecutor:
@@ -123,29 +126,17 @@ class CodeExecutor:
             'last_update': time.time()
         }
 
-        # Create a virtual display for GUI applications
-        env = os.environ.copy()
-
         # Start the process
         try:
-            # For Pygame applications, we need to capture the display
-            process = subprocess.Popen(
-                [sys.executable, main_file],
-                cwd=project_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=env,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
+            # Run in a sandbox forked from the pre-imported zygote; output arrives line by line
+            process = get_sandbox_runner().start(
+                main_file,
+                project_dir,
+                on_output=functools.partial(self._append_output, project_id)
             )
 
             self.running_processes[project_id] = process
 
-            # Start threads to read stdout and stderr
-            threading.Thread(target=self._read_output, args=(process.stdout, project_id, 'stdout')).start()
-            threading.Thread(target=self._read_output, args=(process.stderr, project_id, 'stderr')).start()
-
             # Start a thread to capture screenshots for GUI applications
             threading.Thread(target=self._capture_screenshots, args=(project_dir, project_id)).start()
 
@@ -161,22 +152,21 @@ class CodeExecutor:
                 'output': f"Error executing code: {str(e)}"
             }
 
-    def _read_output(self, pipe, project_id, stream_type):
+    def _append_output(self, project_id, stream_type, line):
         """
-        Read output from a pipe and update the output cache
+        Append a line of process output to the output cache
 
         Args:
-            pipe: Pipe to read from
             project_id (str): Project ID
             stream_type (str): Type of stream (stdout or stderr)
+            line (str): The output line
         """
-        for line in pipe:
-            if project_id in self.output_cache:
-                if stream_type == 'stderr':
-                    line = f"ERROR: {line}"
+        if project_id in self.output_cache:
+            if stream_type == 'stderr':
+                line = f"ERROR: {line}"
 
-                self.output_cache[project_id]['output'] += line
-                self.output_cache[project_id]['last_update'] = time.time()
+            self.output_cache[project_id]['output'] += line
+            self.output_cache[project_id]['last_update'] = time.time()
 
     def _capture_screenshots(self, project_dir, project_id):
         """
@@ -213,21 +203,13 @@ class CodeExecutor:
 
                 # Execute the modified file in a separate process
                 try:
-                    process = subprocess.Popen(
-                        [sys.executable, modified_file],
-                        cwd=project_dir,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        bufsize=1,
-                        universal_newlines=True
+                    process = get_sandbox_runner().start(
+                        modified_file,
+                        project_dir,
+                        on_output=functools.partial(self._append_output, project_id)
                     )
 
-                    # Read output from the process
-                    threading.Thread(target=self._read_output, args=(process.stdout, project_id, 'stdout')).start()
-                    threading.Thread(target=self._read_output, args=(process.stderr, project_id, 'stderr')).start()
-
-                    # Wait for the process to complete
+                    # Wait for the process to complete and its output to be read
                     process.wait()
                 except Exception as e:
                     logger.error(f"Error executing modified Pygame code: {str(e)}")
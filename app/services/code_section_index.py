@@ -0,0 +1,899 @@
+"""
+Code Section Index
+
+Parses a generated HTML page once into an index of its editable sections: the
+element tree, the CSS rules in its <style> blocks, the JavaScript functions in
+its <script> blocks, inline style attributes and text nodes, each with its
+start and end offset in the document. The Code Wave targeted editor looks
+sections up here instead of re-running regexes over the whole page.
+
+HTML is read with the standard library's HTMLParser, so nested and implicitly
+closed elements are found. CSS and JavaScript are scanned with small tokenizers
+that skip comments and strings and match braces, so rules inside @media blocks
+and functions containing nested blocks get their full spans.
+
+Indexes are cached per document version. After an edit, apply_edit reparses
+only the smallest enclosing element and shifts the offsets of everything
+after it, rather than rebuilding the index.
+"""
+
+import os
+import re
+import bisect
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Dict, List, Any, Optional, Tuple, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Document versions whose indexes are kept
+INDEX_CACHE_SIZE = int(os.getenv('SECTION_INDEX_CACHE_SIZE', 32))
+
+VOID_ELEMENTS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                           'param', 'source', 'track', 'wbr'])
+RAW_TEXT_ELEMENTS = ('script', 'style')
+
+# Open elements a start tag implicitly closes, as browsers do: <li> ends the previous <li>, <div> ends a <p>
+_BLOCK_TAGS = ('address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset', 'figcaption',
+               'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'main', 'menu',
+               'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul')
+IMPLICIT_CLOSE = dict({tag: ('p',) for tag in _BLOCK_TAGS}, **{
+    'li': ('li', 'p'), 'dt': ('dt', 'dd', 'p'), 'dd': ('dt', 'dd', 'p'), 'option': ('option',),
+    'tr': ('tr', 'td', 'th'), 'td': ('td', 'th'), 'th': ('td', 'th'), 'tbody': ('thead', 'tbody', 'tr', 'td', 'th'),
+    'thead': ('tbody', 'tr', 'td', 'th'), 'tfoot': ('thead', 'tbody', 'tr', 'td', 'th')
+})
+
+# At-rules whose block holds further rules rather than declarations
+CSS_GROUP_RULES = ('@media', '@supports', '@document', '@layer', '@container', '@scope')
+
+EDITABLE_ASPECTS = {
+    'html_element': ['content', 'attributes', 'styling'],
+    'css_rule': ['properties', 'selector'],
+    'js_function': ['logic', 'parameters'],
+    'inline_style': ['properties'],
+    'text_content': ['text']
+}
+
+_CSS_SPECIAL = re.compile(r'[{};"\'/]')
+_JS_SPECIAL = re.compile(r'[{}()\[\]"\'`/]')
+_JS_FUNCTION = re.compile(
+    r'\bfunction\b\s*\*?\s*([A-Za-z_$][\w$]*)\s*\('
+    r'|\b(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?'
+    r'(?:function\b\s*\*?\s*[\w$]*\s*\(|\([^()]*\)\s*=>\s*\{|[A-Za-z_$][\w$]*\s*=>\s*\{)'
+)
+_INLINE_STYLE = re.compile(r'\sstyle\s*=\s*(["\'])(.*?)\1', re.IGNORECASE | re.DOTALL)
+_SELECTOR_TOKEN = re.compile(r'([#.]?)([\w-]+|\*)|\[([\w-]+)(?:([~|^$*]?=)["\']?([^\]"\']*)["\']?)?\]')
+
+# The characters after which a '/' in JavaScript starts a regex literal rather than a division
+_JS_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^') | {''}
+
+
+class Section(NamedTuple):
+    """
+    One indexed section. Offsets are string indices into the document.
+
+    content_start and content_end span an element's content, a CSS rule's
+    declarations, a function's body braces, a style attribute's value, or the
+    whole gap between tags a text node was stripped from.
+    """
+    type: str
+    start_pos: int
+    end_pos: int
+    name: str
+    content_start: int
+    content_end: int
+    attrs: Tuple[Tuple[str, str], ...] = ()
+
+    def shifted(self, delta: int) -> 'Section':
+        return Section(self.type, self.start_pos + delta, self.end_pos + delta, self.name,
+                       self.content_start + delta, self.content_end + delta, self.attrs)
+
+    def attr(self, name: str) -> Optional[str]:
+        for key, value in self.attrs:
+            if key == name:
+                return value
+        return None
+
+    def to_dict(self, code: str) -> Dict[str, Any]:
+        """
+        Return the section in the format the targeted editor works with.
+
+        Args:
+            code: The document the section's offsets refer to.
+
+        Returns:
+            Dict[str, Any]: The section's type, text, offsets and editable aspects.
+        """
+        section = {
+            'type': self.type,
+            'full_match': code[self.start_pos:self.end_pos],
+            'start_pos': self.start_pos,
+            'end_pos': self.end_pos,
+            'editable_aspects': EDITABLE_ASPECTS[self.type]
+        }
+        if self.type == 'html_element':
+            tag_end = self.content_start - 1
+            section['tag'] = self.name
+            section['attributes'] = code[self.start_pos + 1 + len(self.name):tag_end].rstrip('/').strip()
+            section['content'] = code[self.content_start:self.content_end]
+        elif self.type == 'css_rule':
+            section['selector'] = self.name
+            section['properties'] = code[self.content_start:self.content_end].strip()
+        elif self.type == 'js_function':
+            section['name'] = self.name
+        elif self.type == 'inline_style':
+            section['properties'] = code[self.content_start:self.content_end]
+        elif self.type == 'text_content':
+            section['text'] = section.pop('full_match')
+        return section
+
+
+class _HTMLIndexer(HTMLParser):
+    """Collects sections from one HTMLParser pass over a document or fragment."""
+
+    def __init__(self, code: str, base: int = 0):
+        super().__init__(convert_charrefs=True)
+        self.code = code
+        self.base = base
+        self.line_starts = [0] + [m.end() for m in re.finditer('\n', code)]
+        self.elements: List[Section] = []
+        self.css_rules: List[Section] = []
+        self.js_functions: List[Section] = []
+        self.inline_styles: List[Section] = []
+        self.text_content: List[Section] = []
+        # Open elements as (tag, start, content_start, attrs)
+        self.stack: List[tuple] = []
+        self.stray_end_tags = 0
+        self._text_start = None
+
+    def _offset(self) -> int:
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def _flush_text(self, end: int):
+        start = self._text_start
+        self._text_start = None
+        if start is None or (self.stack and self.stack[-1][0] in RAW_TEXT_ELEMENTS):
+            return
+        gap = self.code[start:end]
+        stripped = gap.strip()
+        if stripped:
+            lead = len(gap) - len(gap.lstrip())
+            b = self.base
+            self.text_content.append(Section('text_content', b + start + lead, b + start + lead + len(stripped),
+                                             '', b + start, b + end))
+
+    def handle_data(self, data):
+        if self._text_start is None:
+            self._text_start = self._offset()
+
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        self._flush_text(start)
+        content_start = start + len(self.get_starttag_text())
+        attrs = tuple((k, v or '') for k, v in attrs)
+        self._inline_style(start, content_start)
+        closes = IMPLICIT_CLOSE.get(tag)
+        while closes and self.stack and self.stack[-1][0] in closes:
+            open_tag, open_start, open_content_start, open_attrs = self.stack.pop()
+            self._add_element(open_tag, open_start, start, open_content_start, start, open_attrs)
+        if tag in VOID_ELEMENTS:
+            self._add_element(tag, start, content_start, content_start, content_start, attrs)
+        else:
+            self.stack.append((tag, start, content_start, attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        start = self._offset()
+        self._flush_text(start)
+        end = start + len(self.get_starttag_text())
+        self._inline_style(start, end)
+        self._add_element(tag, start, end, end, end, tuple((k, v or '') for k, v in attrs))
+
+    def handle_endtag(self, tag):
+        start = self._offset()
+        self._flush_text(start)
+        end = self.code.find('>', start) + 1 or len(self.code)
+        if not any(open_tag[0] == tag for open_tag in self.stack):
+            self.stray_end_tags += 1
+            return
+        # Elements left open inside this one (<p>, <li>, ...) end where it ends
+        while self.stack:
+            open_tag, open_start, content_start, attrs = self.stack.pop()
+            if open_tag == tag:
+                self._add_element(tag, open_start, end, content_start, start, attrs)
+                break
+            self._add_element(open_tag, open_start, start, content_start, start, attrs)
+
+    def handle_comment(self, data):
+        self._flush_text(self._offset())
+
+    def handle_decl(self, decl):
+        self._flush_text(self._offset())
+
+    def handle_pi(self, data):
+        self._flush_text(self._offset())
+
+    def unknown_decl(self, data):
+        self._flush_text(self._offset())
+
+    def _add_element(self, tag, start, end, content_start, content_end, attrs):
+        b = self.base
+        self.elements.append(Section('html_element', b + start, b + end, tag, b + content_start,
+                                     b + content_end, attrs))
+        if tag == 'style':
+            self.css_rules.extend(scan_css(self.code, content_start, content_end, b))
+        elif tag == 'script':
+            self.js_functions.extend(scan_js(self.code, content_start, content_end, b))
+
+    def _inline_style(self, start, end):
+        match = _INLINE_STYLE.search(self.code, start, end)
+        if match:
+            b = self.base
+            self.inline_styles.append(Section('inline_style', b + match.start() + 1, b + match.end(), 'style',
+                                              b + match.start(2), b + match.end(2)))
+
+    def finish(self) -> bool:
+        """Flush the parser; returns True if every element opened in the input was closed in it."""
+        self.close()
+        self._flush_text(len(self.code))
+        balanced = not self.stack and not self.stray_end_tags
+        end = len(self.code)
+        while self.stack:
+            open_tag, open_start, content_start, attrs = self.stack.pop()
+            self._add_element(open_tag, open_start, end, content_start, end, attrs)
+        for sections in (self.elements, self.css_rules, self.js_functions, self.inline_styles,
+                         self.text_content):
+            sections.sort(key=_order)
+        return balanced
+
+
+def _order(section: Section):
+    # Parents before their children
+    return section.start_pos, -section.end_pos
+
+
+def _start(section: Section) -> int:
+    return section.start_pos
+
+
+def _skip_string(code: str, i: int, end: int) -> int:
+    quote = code[i]
+    i += 1
+    while i < end:
+        c = code[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == quote or (c == '\n' and quote != '`'):
+            return i + 1
+        i += 1
+    return end
+
+
+def _skip_comment(code: str, i: int, end: int) -> int:
+    if code.startswith('/*', i):
+        close = code.find('*/', i + 2, end)
+        return end if close == -1 else close + 2
+    close = code.find('\n', i, end)
+    return end if close == -1 else close + 1
+
+
+def scan_css(code: str, start: int, end: int, base: int = 0) -> List[Section]:
+    """
+    Find the rules in a block of CSS.
+
+    Args:
+        code: The document.
+        start: Offset where the CSS starts.
+        end: Offset where the CSS ends.
+        base: Added to every offset, when code is a fragment of a larger document.
+
+    Returns:
+        List[Section]: One css_rule per rule, including those nested in group rules.
+    """
+    rules = []
+    selector_start = None
+    i = start
+    while i < end:
+        match = _CSS_SPECIAL.search(code, i, end)
+        if not match:
+            break
+        j = match.start()
+        c = code[j]
+        if selector_start is None:
+            stripped = code[i:j].lstrip()
+            if stripped:
+                selector_start = j - len(stripped)
+        if c == '/':
+            if code.startswith('/*', j):
+                i = _skip_comment(code, j, end)
+            else:
+                if selector_start is None:
+                    selector_start = j
+                i = j + 1
+            continue
+        if c in '"\'':
+            if selector_start is None:
+                selector_start = j
+            i = _skip_string(code, j, end)
+            continue
+        if c == ';' or c == '}':
+            # Statement at-rules (@import ...;) and the end of a group rule
+            selector_start = None
+            i = j + 1
+            continue
+
+        # An opening brace
+        selector = ' '.join(code[selector_start if selector_start is not None else j:j].split())
+        if selector.lower().startswith(CSS_GROUP_RULES):
+            selector_start = None
+            i = j + 1
+            continue
+        close = _match_brace(code, j, end)
+        if selector:
+            rules.append(Section('css_rule', base + selector_start, base + close, selector,
+                                 base + j + 1, base + close - 1))
+        selector_start = None
+        i = close
+    return rules
+
+
+def _match_brace(code: str, open_pos: int, end: int) -> int:
+    """Return the offset just past the brace closing the one at open_pos, skipping comments and strings."""
+    depth = 0
+    i = open_pos
+    while i < end:
+        match = _CSS_SPECIAL.search(code, i, end)
+        if not match:
+            return end
+        j = match.start()
+        c = code[j]
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return j + 1
+        elif c in '"\'':
+            i = _skip_string(code, j, end)
+            continue
+        elif c == '/' and code.startswith('/*', j):
+            i = _skip_comment(code, j, end)
+            continue
+        i = j + 1
+    return end
+
+
+def _js_brace_pairs(code: str, start: int, end: int) -> Dict[int, int]:
+    """Map each '{' and '(' in a script to the offset just past its partner, skipping strings, comments and regexes."""
+    pairs = {}
+    stack = []
+    previous = ''
+    i = start
+    while i < end:
+        match = _JS_SPECIAL.search(code, i, end)
+        if not match:
+            break
+        j = match.start()
+        between = code[i:j].rstrip()
+        if between:
+            previous = between[-1]
+        c = code[j]
+        if c in '{([':
+            stack.append(j)
+            i = j + 1
+        elif c in '})]':
+            if stack:
+                pairs[stack.pop()] = j + 1
+            i = j + 1
+        elif c in '"\'`':
+            i = _skip_string(code, j, end)
+        elif code.startswith('//', j) or code.startswith('/*', j):
+            i = _skip_comment(code, j, end)
+            continue
+        elif previous in _JS_REGEX_PRECEDERS or between.endswith(('return', 'typeof', 'case')):
+            # A regex literal: skip to its closing slash, outside any character class
+            k = j + 1
+            in_class = False
+            while k < end and code[k] != '\n':
+                if code[k] == '\\':
+                    k += 2
+                    continue
+                if code[k] == '[':
+                    in_class = True
+                elif code[k] == ']':
+                    in_class = False
+                elif code[k] == '/' and not in_class:
+                    break
+                k += 1
+            i = k + 1
+        else:
+            i = j + 1
+        previous = c
+    return pairs
+
+
+def scan_js(code: str, start: int, end: int, base: int = 0) -> List[Section]:
+    """
+    Find the named functions in a block of JavaScript.
+
+    Covers function declarations and functions or arrow functions with a block
+    body assigned with const, let or var, including nested ones.
+
+    Args:
+        code: The document.
+        start: Offset where the script starts.
+        end: Offset where the script ends.
+        base: Added to every offset, when code is a fragment of a larger document.
+
+    Returns:
+        List[Section]: One js_function per function, spanning its whole body.
+    """
+    functions = []
+    pairs = None
+    for match in _JS_FUNCTION.finditer(code, start, end):
+        if pairs is None:
+            pairs = _js_brace_pairs(code, start, end)
+        name = match.group(1) or match.group(2)
+        # The body is the first brace after the parameter list
+        i = match.end() - 1
+        if code[i] == '(':
+            if i not in pairs:
+                continue
+            i = pairs[i]
+        body = code.find('{', i, end)
+        if body == -1 or body not in pairs:
+            # Inside a string or comment, or unbalanced
+            continue
+        functions.append(Section('js_function', base + match.start(), base + pairs[body], name,
+                                 base + body, base + pairs[body]))
+    return functions
+
+
+def _parse(code: str, base: int = 0) -> Tuple[Dict[str, List[Section]], bool]:
+    indexer = _HTMLIndexer(code, base)
+    indexer.feed(code)
+    balanced = indexer.finish()
+    return {
+        'html_elements': indexer.elements,
+        'css_rules': indexer.css_rules,
+        'js_functions': indexer.js_functions,
+        'inline_styles': indexer.inline_styles,
+        'text_content': indexer.text_content
+    }, balanced
+
+
+class SectionIndex:
+    """
+    The editable sections of one version of a document, with lookups.
+    """
+
+    KINDS = ('html_elements', 'css_rules', 'js_functions', 'inline_styles', 'text_content')
+
+    def __init__(self, code: str, sections: Optional[Dict[str, List[Section]]] = None):
+        """
+        Index a document.
+
+        Args:
+            code: The complete HTML/CSS/JS document.
+            sections: Sections already found for this exact code, to skip parsing.
+        """
+        self.code = code
+        self.sections = sections if sections is not None else _parse(code)[0]
+        self.reparsed_chars = len(code) if sections is None else 0
+        self._lookups = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(sections) for sections in self.sections.values())
+
+    def to_dicts(self, include_raw_text: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Return every section as a dictionary, grouped the way identify_sections reports them.
+
+        Args:
+            include_raw_text: Also list <script> and <style> elements.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Sections by kind.
+        """
+        result = {}
+        for kind, sections in self.sections.items():
+            if kind == 'html_elements' and not include_raw_text:
+                sections = [s for s in sections if s.name not in RAW_TEXT_ELEMENTS]
+            result[kind] = [s.to_dict(self.code) for s in sections]
+        return result
+
+    # Lookups
+
+    def _build_lookups(self):
+        with self._lock:
+            if self._lookups is not None:
+                return self._lookups
+            elements = self.sections['html_elements']
+            parents = [-1] * len(elements)
+            classes = [frozenset((element.attr('class') or '').split()) for element in elements]
+            by_tag, by_id, by_class = {}, {}, {}
+            stack = []
+            for i, element in enumerate(elements):
+                while stack and elements[stack[-1]].end_pos <= element.start_pos:
+                    stack.pop()
+                parents[i] = stack[-1] if stack else -1
+                stack.append(i)
+                by_tag.setdefault(element.name, []).append(i)
+                element_id = element.attr('id')
+                if element_id:
+                    by_id.setdefault(element_id, []).append(i)
+                for name in classes[i]:
+                    by_class.setdefault(name, []).append(i)
+
+            css_by_selector = {}
+            for rule in self.sections['css_rules']:
+                for selector in rule.name.split(','):
+                    css_by_selector.setdefault(' '.join(selector.split()), []).append(rule)
+
+            functions = {}
+            for function in self.sections['js_functions']:
+                functions.setdefault(function.name, []).append(function)
+
+            self._lookups = {
+                'starts': [element.start_pos for element in elements],
+                'parents': parents,
+                'classes': classes,
+                'by_tag': by_tag,
+                'by_id': by_id,
+                'by_class': by_class,
+                'css_by_selector': css_by_selector,
+                'functions': functions,
+                'texts': [(s.to_dict(self.code)['text'].lower(), s) for s in self.sections['text_content']]
+            }
+            return self._lookups
+
+    def select(self, selector: str) -> List[Section]:
+        """
+        Find elements matching a CSS selector.
+
+        Supports type, #id, .class, * and [attribute] / [attribute=value] selectors,
+        compounds of them, descendant and child combinators, and comma-separated lists.
+
+        Args:
+            selector: The selector.
+
+        Returns:
+            List[Section]: Matching html_element sections in document order.
+        """
+        lookups = self._build_lookups()
+        elements = self.sections['html_elements']
+        matched = set()
+        for complex_selector in selector.split(','):
+            steps = _parse_selector(complex_selector)
+            if not steps:
+                continue
+            # Narrow the candidates with the rightmost compound's id, class or tag, or to the
+            # descendants of the elements the leftmost compound names, whichever is fewer
+            candidates = _indexed(lookups, steps[-1][0])
+            if candidates is None:
+                candidates = range(len(elements))
+            anchors = _indexed(lookups, steps[0][0]) if len(steps) > 1 else None
+            if anchors is not None and len(anchors) < len(candidates):
+                starts = lookups['starts']
+                within = set()
+                for anchor in anchors:
+                    element = elements[anchor]
+                    within.update(range(anchor + 1, bisect.bisect_left(starts, element.end_pos, anchor + 1)))
+                if len(within) < len(candidates):
+                    candidates = sorted(within)
+            for i in candidates:
+                if _matches(elements, lookups, i, steps, len(steps) - 1):
+                    matched.add(i)
+        return [elements[i] for i in sorted(matched)]
+
+    def css_rules_for(self, selector: str) -> List[Section]:
+        """
+        Find the CSS rules written for a selector.
+
+        Args:
+            selector: The selector, e.g. ".hero h1". Rules listing it among others match too.
+
+        Returns:
+            List[Section]: Matching css_rule sections in document order.
+        """
+        return list(self._build_lookups()['css_by_selector'].get(' '.join(selector.split()), []))
+
+    def functions_named(self, name: str) -> List[Section]:
+        """
+        Find JavaScript functions by name.
+
+        Args:
+            name: The function name.
+
+        Returns:
+            List[Section]: Matching js_function sections in document order.
+        """
+        return list(self._build_lookups()['functions'].get(name, []))
+
+    def find_text(self, text: str) -> List[Section]:
+        """
+        Find text nodes containing some text, ignoring case.
+
+        Args:
+            text: The text to look for.
+
+        Returns:
+            List[Section]: Matching text_content sections in document order.
+        """
+        needle = text.lower()
+        return [section for lowered, section in self._build_lookups()['texts'] if needle in lowered]
+
+    def element_at(self, pos: int) -> Optional[Section]:
+        """
+        Find the innermost element containing an offset.
+
+        Args:
+            pos: Offset into the document.
+
+        Returns:
+            Optional[Section]: The element, or None outside every element.
+        """
+        elements = self.sections['html_elements']
+        parents = self._build_lookups()['parents']
+        i = bisect.bisect_right(self._build_lookups()['starts'], pos) - 1
+        while i >= 0:
+            if elements[i].start_pos <= pos < elements[i].end_pos:
+                return elements[i]
+            i = parents[i]
+        return None
+
+    # Incremental updates
+
+    def apply_edit(self, start: int, end: int, new_text: str) -> 'SectionIndex':
+        """
+        Index the document that results from replacing code[start:end] with new_text.
+
+        Only the smallest region enclosing the edit that the parser can reparse on
+        its own (an element, a <style> or <script> block, or a run of text) is
+        reparsed; sections before it are reused, sections after it are shifted and
+        its ancestors are stretched. If the edit changes the document's structure
+        beyond that region, the new document is indexed from scratch.
+
+        Args:
+            start: Offset where the replaced text starts.
+            end: Offset where the replaced text ends.
+            new_text: The replacement text.
+
+        Returns:
+            SectionIndex: The index of the edited document.
+        """
+        code = self.code
+        new_code = code[:start] + new_text + code[end:]
+        delta = len(new_text) - (end - start)
+        region_start, region_end = self._reparse_region(start, end)
+
+        fragment, balanced = _parse(new_code[region_start:region_end + delta], region_start)
+        if not balanced or self._closes_parent(fragment['html_elements'], region_start, region_end):
+            logger.debug("Edit changed the document structure; reindexing from scratch")
+            return SectionIndex(new_code)
+
+        sections = {}
+        for kind in self.KINDS:
+            old = self.sections[kind]
+            # Sorted by start: before the region, inside it (replaced by the fragment's), after it
+            inside = bisect.bisect_left(old, region_start, key=_start)
+            after = bisect.bisect_left(old, region_end, lo=inside, key=_start)
+            before = old[:inside]
+            for i, section in enumerate(before):
+                if section.end_pos > region_start:
+                    # An ancestor of the region
+                    before[i] = section._replace(end_pos=section.end_pos + delta,
+                                                 content_end=section.content_end + delta)
+            sections[kind] = before + fragment[kind] + [section.shifted(delta) for section in old[after:]]
+
+        index = SectionIndex(new_code, sections)
+        index.reparsed_chars = region_end + delta - region_start
+        return index
+
+    def _closes_parent(self, elements: List[Section], region_start: int, region_end: int) -> bool:
+        """Whether a new top-level element would implicitly close the element enclosing the region."""
+        parent = None
+        for element in self.sections['html_elements']:
+            if element.start_pos >= region_start:
+                break
+            if element.content_start <= region_start and region_end <= element.content_end:
+                parent = element
+        if parent is None:
+            return False
+        covered = -1
+        for element in elements:
+            if element.start_pos >= covered:
+                if parent.name in IMPLICIT_CLOSE.get(element.name, ()):
+                    return True
+                covered = element.end_pos
+        return False
+
+    def _reparse_region(self, start: int, end: int) -> Tuple[int, int]:
+        """Widen an edit to a span whose new text the parser can index in isolation."""
+        elements = self.sections['html_elements']
+        texts = self.sections['text_content']
+        code = self.code
+        region_start, region_end = start, end
+        changed = True
+        while changed:
+            changed = False
+            # Whitespace around the region belongs to whatever text the edit leaves there
+            while region_start > 0 and code[region_start - 1].isspace():
+                region_start -= 1
+            while region_end < len(code) and code[region_end].isspace():
+                region_end += 1
+            for element in elements:
+                if element.end_pos == region_start and element.content_end == element.end_pos:
+                    # Implicitly closed (<p>, <li>): it would take in text the edit puts after it
+                    if element.start_pos < region_start:
+                        region_start = element.start_pos
+                        changed = True
+                    continue
+                if element.end_pos <= region_start or element.start_pos >= region_end:
+                    continue
+                if region_start <= element.start_pos and element.end_pos <= region_end:
+                    continue
+                inside_content = element.content_start <= region_start and region_end <= element.content_end
+                if inside_content and element.name not in RAW_TEXT_ELEMENTS:
+                    continue
+                region_start = min(region_start, element.start_pos)
+                region_end = max(region_end, element.end_pos)
+                changed = True
+            for text in texts:
+                # Text touching the region could merge with text the edit inserts
+                if text.content_end < region_start or text.content_start > region_end:
+                    continue
+                if text.content_start < region_start or text.content_end > region_end:
+                    region_start = min(region_start, text.content_start)
+                    region_end = max(region_end, text.content_end)
+                    changed = True
+        return region_start, region_end
+
+
+def _parse_selector(selector: str) -> List[Tuple[Dict[str, Any], str]]:
+    """Split a complex selector into (compound, combinator to the previous compound) steps."""
+    steps = []
+    combinator = ' '
+    for part in selector.replace('>', ' > ').split():
+        if part == '>':
+            combinator = '>'
+            continue
+        compound = {'tag': None, 'id': None, 'classes': [], 'attrs': []}
+        for match in _SELECTOR_TOKEN.finditer(part):
+            prefix, name, attr, operator, value = match.groups()
+            if attr:
+                compound['attrs'].append((attr.lower(), operator, value))
+            elif prefix == '#':
+                compound['id'] = name
+            elif prefix == '.':
+                compound['classes'].append(name)
+            else:
+                compound['tag'] = name.lower()
+        steps.append((compound, combinator))
+        combinator = ' '
+    return steps
+
+
+def _indexed(lookups: Dict[str, Any], compound: Dict[str, Any]) -> Optional[List[int]]:
+    """The elements an id, class or tag lookup gives for a compound, or None if it names none."""
+    if compound['id']:
+        return lookups['by_id'].get(compound['id'], [])
+    if compound['classes']:
+        return lookups['by_class'].get(compound['classes'][0], [])
+    if compound['tag'] and compound['tag'] != '*':
+        return lookups['by_tag'].get(compound['tag'], [])
+    return None
+
+
+def _compound_matches(element: Section, classes: frozenset, compound: Dict[str, Any]) -> bool:
+    if compound['tag'] and compound['tag'] != '*' and element.name != compound['tag']:
+        return False
+    if compound['classes'] and not classes.issuperset(compound['classes']):
+        return False
+    if compound['id'] and element.attr('id') != compound['id']:
+        return False
+    for attr, operator, value in compound['attrs']:
+        actual = element.attr(attr)
+        if actual is None:
+            return False
+        if operator == '=' and actual != value:
+            return False
+        if operator == '~=' and value not in actual.split():
+            return False
+        if operator == '^=' and not actual.startswith(value):
+            return False
+        if operator == '$=' and not actual.endswith(value):
+            return False
+        if operator == '*=' and value not in actual:
+            return False
+    return True
+
+
+def _matches(elements: List[Section], lookups: Dict[str, Any], i: int, steps, step: int) -> bool:
+    compound, combinator = steps[step]
+    if not _compound_matches(elements[i], lookups['classes'][i], compound):
+        return False
+    if step == 0:
+        return True
+    parents = lookups['parents']
+    parent = parents[i]
+    if combinator == '>':
+        return parent >= 0 and _matches(elements, lookups, parent, steps, step - 1)
+    while parent >= 0:
+        if _matches(elements, lookups, parent, steps, step - 1):
+            return True
+        parent = parents[parent]
+    return False
+
+
+# Indexes of recent document versions, keyed by a hash of the document
+_index_cache: "OrderedDict[str, SectionIndex]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+_index_stats = {'hits': 0, 'builds': 0, 'incremental_updates': 0}
+
+
+def _document_key(code: str) -> str:
+    return hashlib.sha1(code.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def _store_index(key: str, index: SectionIndex):
+    with _index_cache_lock:
+        _index_cache[key] = index
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+
+def get_section_index(code: str) -> SectionIndex:
+    """
+    Return the index of a document, building it on the first request for this version.
+
+    Args:
+        code: The complete document.
+
+    Returns:
+        SectionIndex: The document's index.
+    """
+    key = _document_key(code)
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            _index_stats['hits'] += 1
+            return index
+    index = SectionIndex(code)
+    _index_stats['builds'] += 1
+    _store_index(key, index)
+    return index
+
+
+def update_section_index(code: str, start: int, end: int, new_text: str) -> SectionIndex:
+    """
+    Index the edited version of a document from the index of the original.
+
+    The new index is cached, so the next request for the edited document reuses it.
+
+    Args:
+        code: The document before the edit.
+        start: Offset where the replaced text starts.
+        end: Offset where the replaced text ends.
+        new_text: The replacement text.
+
+    Returns:
+        SectionIndex: The edited document's index.
+    """
+    index = get_section_index(code).apply_edit(start, end, new_text)
+    _index_stats['incremental_updates'] += 1
+    _store_index(_document_key(index.code), index)
+    return index
+
+
+def get_index_stats() -> Dict[str, int]:
+    """Return how often indexes were reused, built from scratch and updated after edits."""
+    with _index_cache_lock:
+        return dict(_index_stats, cached_versions=len(_index_cache))
@@ -0,0 +1,512 @@
+"""
+Credit Ledger for AutoWave
+Write-behind journal of credit consumption. Every consumption is appended to a
+local SQLite journal (WAL mode) inside a transaction that also checks the user's
+remaining allowance, so concurrent gunicorn workers cannot overspend. A background
+flusher batches journal entries into the Supabase credit_usage table, and daily
+usage is served from a short-lived in-process cache so the paywall check does not
+make a network round trip.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default location of the journal, next to the other local caches
+DEFAULT_LEDGER_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'cache', 'credit_ledger.db')
+
+# Legacy file-based usage store, imported into the journal once
+FALLBACK_USAGE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'fallback_storage', 'credit_usage.json')
+
+UUID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+# Journal rows claimed by a flusher that has not finished within this many seconds are retried
+CLAIM_TIMEOUT = 120
+
+
+def is_remote_user(user_id: str) -> bool:
+    """Whether a user's usage is mirrored to Supabase (real users have UUID ids)."""
+    return bool(user_id) and bool(UUID_PATTERN.match(user_id))
+
+
+class CreditLedger:
+    """Journal of credit consumption with a balance cache and a batched Supabase flusher."""
+
+    def __init__(self, db_path: str = DEFAULT_LEDGER_PATH, supabase=None,
+                 balance_ttl: float = None, baseline_ttl: float = None,
+                 flush_interval: float = None, batch_size: int = None):
+        """
+        Initialize the ledger.
+
+        Args:
+            db_path: Path to the SQLite journal.
+            supabase: Supabase client to flush to and read remote usage from, if any.
+            balance_ttl: Seconds a cached daily usage is served from memory. Defaults to CREDIT_BALANCE_TTL or 5.
+            baseline_ttl: Seconds between re-reads of a user's usage from Supabase. Defaults to CREDIT_BASELINE_TTL or 300.
+            flush_interval: Seconds between flushes. Defaults to CREDIT_FLUSH_INTERVAL or 2.
+            batch_size: Maximum rows per Supabase insert. Defaults to CREDIT_FLUSH_BATCH or 200.
+        """
+        self.db_path = db_path
+        self.supabase = supabase
+        self.balance_ttl = balance_ttl if balance_ttl is not None else float(os.getenv('CREDIT_BALANCE_TTL', 5))
+        self.baseline_ttl = baseline_ttl if baseline_ttl is not None else float(os.getenv('CREDIT_BASELINE_TTL', 300))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv('CREDIT_FLUSH_INTERVAL', 2))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv('CREDIT_FLUSH_BATCH', 200))
+
+        self._local = threading.local()
+        self._usage_cache = {}
+        self._cache_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._flusher = None
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.flushed_rows = 0
+        self.flush_failures = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ledger_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                credits REAL NOT NULL,
+                date TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                remote INTEGER NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL,
+                flushed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_ledger_user_date ON ledger_entries (user_id, date);
+            CREATE INDEX IF NOT EXISTS idx_ledger_pending ON ledger_entries (remote, flushed_at);
+            CREATE TABLE IF NOT EXISTS remote_usage (
+                user_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                credits REAL NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (user_id, date)
+            );
+            CREATE TABLE IF NOT EXISTS ledger_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Usage
+
+    def _fetch_remote_usage(self, user_id: str, date: str) -> Optional[float]:
+        """Sum a user's Supabase credit_usage rows for a date."""
+        if not self.supabase or not is_remote_user(user_id):
+            return None
+        try:
+            result = self.supabase.table('credit_usage').select('credits_consumed').eq('user_id', user_id).eq('date', date).execute()
+            return sum(record['credits_consumed'] for record in result.data) if result.data else 0
+        except Exception as e:
+            logger.error(f"💳 Error reading credit usage from Supabase: {str(e)}")
+            return None
+
+    def _get_baseline(self, conn: sqlite3.Connection, user_id: str, date: str) -> Tuple[float, float]:
+        """
+        Get the Supabase usage baseline for a user and date, refreshing it when stale.
+
+        Returns:
+            Tuple[float, float]: (credits already in Supabase, time they were read)
+        """
+        row = conn.execute("SELECT credits, fetched_at FROM remote_usage WHERE user_id = ? AND date = ?",
+                           (user_id, date)).fetchone()
+        if row and time.time() - row[1] < self.baseline_ttl:
+            return row[0], row[1]
+
+        fetched_at = time.time()
+        remote = self._fetch_remote_usage(user_id, date)
+        if remote is None:
+            # Keep the last known baseline when Supabase is unavailable
+            return (row[0], row[1]) if row else (0.0, 0.0)
+
+        conn.execute("INSERT OR REPLACE INTO remote_usage (user_id, date, credits, fetched_at) VALUES (?, ?, ?, ?)",
+                     (user_id, date, remote, fetched_at))
+        return remote, fetched_at
+
+    def _compute_usage(self, conn: sqlite3.Connection, user_id: str, date: str) -> float:
+        """
+        Usage from the Supabase baseline plus journal entries not yet reflected in it.
+
+        A flushed row is in the baseline if its insert was claimed before the baseline was
+        read. One whose insert committed only after the read is covered by _mark_flushed,
+        which drops such baselines so they are read again.
+        """
+        baseline, fetched_at = self._get_baseline(conn, user_id, date)
+        local = conn.execute(
+            "SELECT COALESCE(SUM(credits), 0) FROM ledger_entries WHERE user_id = ? AND date = ? "
+            "AND (remote = 0 OR flushed_at IS NULL OR claimed_at >= ?)",
+            (user_id, date, fetched_at)
+        ).fetchone()[0]
+        return baseline + local
+
+    def get_daily_usage(self, user_id: str, date: str = None) -> float:
+        """
+        Get a user's credit usage for a day, from memory when fresh.
+
+        Args:
+            user_id: User identifier.
+            date: ISO date. Defaults to today.
+
+        Returns:
+            float: Credits consumed.
+        """
+        date = date or datetime.now().date().isoformat()
+        key = (user_id, date)
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._usage_cache.get(key)
+            if cached and cached[1] > now:
+                self.cache_hits += 1
+                return cached[0]
+            self.cache_misses += 1
+
+        usage = self._compute_usage(self._conn(), user_id, date)
+        self._cache_usage(key, usage)
+        return usage
+
+    def _cache_usage(self, key: Tuple[str, str], usage: float):
+        with self._cache_lock:
+            self._usage_cache[key] = (usage, time.monotonic() + self.balance_ttl)
+            if len(self._usage_cache) > 10000:
+                now = time.monotonic()
+                for stale in [k for k, (_, expires) in self._usage_cache.items() if expires <= now]:
+                    del self._usage_cache[stale]
+
+    def invalidate(self, user_id: str, refetch: bool = False):
+        """
+        Drop a user's cached usage.
+
+        Args:
+            user_id: User identifier.
+            refetch: Also re-read the Supabase baseline on next use (after out-of-band writes).
+        """
+        with self._cache_lock:
+            for key in [k for k in self._usage_cache if k[0] == user_id]:
+                del self._usage_cache[key]
+        if refetch:
+            try:
+                self._conn().execute("DELETE FROM remote_usage WHERE user_id = ?", (user_id,))
+            except Exception as e:
+                logger.error(f"💳 Error invalidating credit baseline: {str(e)}")
+
+    # Consumption
+
+    def consume(self, user_id: str, task_type: str, credits: float, limit: float = None) -> Dict[str, Any]:
+        """
+        Atomically check the allowance and record a consumption.
+
+        The check and the journal append share one IMMEDIATE transaction, which SQLite
+        serializes across processes, so two workers cannot both spend the last credits.
+
+        Args:
+            user_id: User identifier.
+            task_type: Type of task being charged.
+            credits: Credits to consume.
+            limit: Daily allowance; None records the consumption without a check.
+
+        Returns:
+            Dict[str, Any]: success, usage after the consumption and, on refusal, usage before it.
+        """
+        now = datetime.now()
+        date = now.date().isoformat()
+        conn = self._conn()
+
+        # Refresh the Supabase baseline outside the write lock so the transaction stays short
+        self._get_baseline(conn, user_id, date)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            usage = self._compute_usage(conn, user_id, date)
+            if limit is not None and usage + credits > limit:
+                conn.execute("COMMIT")
+                self._cache_usage((user_id, date), usage)
+                return {'success': False, 'usage': usage}
+
+            conn.execute(
+                "INSERT INTO ledger_entries (user_id, task_type, credits, date, timestamp, remote) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, task_type, credits, date, now.isoformat(), int(bool(self.supabase) and is_remote_user(user_id)))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        usage += credits
+        self._cache_usage((user_id, date), usage)
+        self._flush_event.set()
+        return {'success': True, 'usage': usage}
+
+    # Flushing
+
+    def _claim_batch(self) -> List[Tuple]:
+        """Claim up to batch_size unflushed remote rows for this process."""
+        conn = self._conn()
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, user_id, task_type, credits, date, timestamp FROM ledger_entries "
+                "WHERE remote = 1 AND flushed_at IS NULL AND (claimed_by IS NULL OR claimed_at < ?) "
+                "ORDER BY id LIMIT ?",
+                (now - CLAIM_TIMEOUT, self.batch_size)
+            ).fetchall()
+            if rows:
+                conn.executemany("UPDATE ledger_entries SET claimed_by = ?, claimed_at = ? WHERE id = ?",
+                                 [(owner, now, row[0]) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def flush(self) -> int:
+        """
+        Insert pending journal rows into Supabase in batches.
+
+        Returns:
+            int: Number of rows flushed.
+        """
+        if not self.supabase:
+            return 0
+
+        flushed = 0
+        while True:
+            rows = self._claim_batch()
+            if not rows:
+                return flushed
+
+            payload = [{
+                'user_id': user_id,
+                'task_type': task_type,
+                'credits_consumed': credits,
+                'date': date,
+                'timestamp': timestamp
+            } for _, user_id, task_type, credits, date, timestamp in rows]
+
+            try:
+                result = self.supabase.table('credit_usage').insert(payload).execute()
+                if not result.data:
+                    raise RuntimeError("Supabase returned no rows")
+            except Exception as e:
+                self.flush_failures += 1
+                logger.error(f"💳 Error flushing {len(rows)} credit usage rows to Supabase: {str(e)}")
+                # Release the claim so the rows are retried on the next flush
+                self._conn().executemany("UPDATE ledger_entries SET claimed_by = NULL WHERE id = ?",
+                                         [(row[0],) for row in rows])
+                return flushed
+
+            self._mark_flushed([row[0] for row in rows])
+            flushed += len(rows)
+            self.flushed_rows += len(rows)
+            logger.info(f"💳 Flushed {len(rows)} credit usage rows to Supabase")
+
+    def _mark_flushed(self, row_ids: List[int]):
+        """
+        Mark journal rows as inserted into Supabase.
+
+        A baseline read after a row was claimed may have been read before its insert
+        committed, so it is dropped in the same transaction and read again on next use.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("UPDATE ledger_entries SET flushed_at = ? WHERE id = ?",
+                             [(now, row_id) for row_id in row_ids])
+            claims = conn.execute(
+                f"SELECT user_id, date, MIN(claimed_at) FROM ledger_entries "
+                f"WHERE id IN ({','.join('?' * len(row_ids))}) GROUP BY user_id, date",
+                row_ids
+            ).fetchall()
+            conn.executemany("DELETE FROM remote_usage WHERE user_id = ? AND date = ? AND fetched_at >= ?",
+                             [(user_id, date, claimed_at or 0) for user_id, date, claimed_at in claims])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._cache_lock:
+            for user_id, date, _ in claims:
+                self._usage_cache.pop((user_id, date), None)
+
+    def prune(self, keep_days: int = 7) -> int:
+        """
+        Delete settled journal rows older than keep_days.
+
+        Args:
+            keep_days: Days of history to keep.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        cutoff = (datetime.now() - timedelta(days=keep_days)).date().isoformat()
+        conn = self._conn()
+        deleted = conn.execute(
+            "DELETE FROM ledger_entries WHERE date < ? AND (remote = 0 OR flushed_at IS NOT NULL)", (cutoff,)
+        ).rowcount
+        conn.execute("DELETE FROM remote_usage WHERE date < ?", (cutoff,))
+        return deleted
+
+    def _flush_loop(self):
+        last_prune = 0
+        while True:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+                if time.time() - last_prune > 3600:
+                    last_prune = time.time()
+                    self.prune()
+            except Exception as e:
+                logger.error(f"💳 Credit ledger flush failed: {str(e)}")
+
+    def start_flusher(self):
+        """Start the background flusher thread if it is not already running."""
+        if self.supabase and (self._flusher is None or not self._flusher.is_alive()):
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="credit-ledger-flusher")
+            self._flusher.start()
+
+    # Startup
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        Reconcile the journal with Supabase after a restart.
+
+        Rows that were inserted into Supabase but not marked flushed before the process
+        stopped are matched by user and timestamp and marked flushed instead of being
+        inserted twice. The legacy fallback_storage/credit_usage.json totals are imported
+        into the journal once.
+
+        Returns:
+            Dict[str, int]: Counts of rows matched and imported.
+        """
+        conn = self._conn()
+        matched = 0
+        if self.supabase:
+            pending = conn.execute(
+                "SELECT id, user_id, date, timestamp FROM ledger_entries "
+                "WHERE remote = 1 AND flushed_at IS NULL AND claimed_by IS NOT NULL"
+            ).fetchall()
+            by_user_date = {}
+            for row_id, user_id, date, timestamp in pending:
+                by_user_date.setdefault((user_id, date), []).append((row_id, timestamp))
+            for (user_id, date), entries in by_user_date.items():
+                try:
+                    result = self.supabase.table('credit_usage').select('timestamp').eq('user_id', user_id).eq('date', date).execute()
+                    remote_timestamps = {record.get('timestamp') for record in (result.data or [])}
+                except Exception as e:
+                    logger.error(f"💳 Error reconciling credit usage for {user_id}: {str(e)}")
+                    continue
+                done = [row_id for row_id, timestamp in entries if timestamp in remote_timestamps]
+                if done:
+                    self._mark_flushed(done)
+                    matched += len(done)
+            conn.execute("UPDATE ledger_entries SET claimed_by = NULL WHERE flushed_at IS NULL")
+
+        imported = self._import_fallback_file(conn)
+        if matched or imported:
+            logger.info(f"💳 Credit ledger reconciled: {matched} rows already in Supabase, {imported} legacy totals imported")
+        return {'matched': matched, 'imported': imported}
+
+    def _import_fallback_file(self, conn: sqlite3.Connection) -> int:
+        """Import the legacy per-user daily totals file into the journal once."""
+        if not os.path.exists(FALLBACK_USAGE_FILE):
+            return 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM ledger_meta WHERE key = 'fallback_imported'").fetchone():
+                conn.execute("COMMIT")
+                return 0
+            try:
+                with open(FALLBACK_USAGE_FILE, 'r') as f:
+                    usage_data = json.load(f)
+            except Exception:
+                usage_data = {}
+            rows = []
+            for key, credits in usage_data.items():
+                user_id, _, date = key.rpartition('_')
+                if user_id and date:
+                    rows.append((user_id, 'fallback_import', credits, date, f"{date}T00:00:00", 0))
+            conn.executemany(
+                "INSERT INTO ledger_entries (user_id, task_type, credits, date, timestamp, remote) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("INSERT INTO ledger_meta (key, value) VALUES ('fallback_imported', ?)", (datetime.now().isoformat(),))
+            conn.execute("COMMIT")
+            return len(rows)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get ledger statistics.
+
+        Returns:
+            Dict[str, Any]: Pending rows, flush counts and cache hit rates.
+        """
+        pending = self._conn().execute(
+            "SELECT COUNT(*) FROM ledger_entries WHERE remote = 1 AND flushed_at IS NULL").fetchone()[0]
+        return {
+            'pending_rows': pending,
+            'flushed_rows': self.flushed_rows,
+            'flush_failures': self.flush_failures,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'supabase': self.supabase is not None
+        }
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_credit_ledger(supabase=None) -> CreditLedger:
+    """
+    Get the process-wide credit ledger, reconciling and starting its flusher on first use.
+
+    Args:
+        supabase: Supabase client to attach if the ledger does not have one yet.
+
+    Returns:
+        CreditLedger: The shared ledger.
+    """
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = CreditLedger(os.getenv('CREDIT_LEDGER_PATH', DEFAULT_LEDGER_PATH), supabase=supabase)
+            try:
+                _ledger.reconcile()
+            except Exception as e:
+                logger.error(f"💳 Credit ledger reconciliation failed: {str(e)}")
+        elif supabase is not None and _ledger.supabase is None:
+            _ledger.supabase = supabase
+        _ledger.start_flusher()
+        return _ledger
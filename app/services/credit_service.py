@@ -9,6 +9,8 @@ import json
 import re
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
+
+from .credit_ledger import get_credit_ledger
 # from .database_service import DatabaseService  # Not available, using fallback mode
 
 # Try to import tiktoken for token counting, fallback to simple estimation
@@ -146,6 +148,9 @@ class CreditService:
         except Exception as e:
             logger.warning(f"❌ Failed to initialize Supabase for credits: {e}, using fallback mode")
 
+        # Usage is journaled locally and flushed to Supabase in batches
+        self.ledger = get_credit_ledger(self.supabase)
+
     def count_tokens(self, text: str, model: str = "gpt-3.5-turbo") -> int:
         """Count tokens in text using tiktoken or fallback estimation"""
         if not text:
@@ -231,24 +236,9 @@ class CreditService:
     def get_user_credits(self, user_id: str) -> Dict[str, Any]:
         """Get user's current credit status"""
         try:
-            # If Supabase available, get real credit data
-            if self.supabase:
-                return self._get_credits_from_supabase(user_id)
-
-            # If no database service available, return free plan defaults with dynamic tracking
-            if not self.db:
-                # Get usage from fallback storage
-                today_usage = self.get_daily_usage_fallback(user_id)
-                remaining = max(0, 50 - today_usage)
-
-                return {
-                    'plan': 'free',
-                    'type': 'daily',
-                    'remaining': remaining,
-                    'total': 50,
-                    'reset_date': None,
-                    'percentage': (remaining / 50) * 100
-                }
+            # Daily free plan credits, with usage read from the credit ledger
+            if self.supabase or not self.db:
+                return self._get_daily_credits(user_id)
 
             # Get user's current plan
             user_plan = self.db.get_user_subscription(user_id)
@@ -264,7 +254,7 @@ class CreditService:
                 if self.db:
                     usage = self.db.get_daily_credit_usage(user_id, today)
                 else:
-                    usage = self.get_daily_usage_fallback(user_id)
+                    usage = self.ledger.get_daily_usage(user_id)
                 remaining = max(0, plan_config['amount'] - usage)
                 reset_date = datetime.combine(today + timedelta(days=1), datetime.min.time())
             else:
@@ -374,7 +364,7 @@ class CreditService:
                     'plan': credit_status['plan']
                 }
             
-            # Check if user has enough credits
+            # Check if user has enough credits (from the cached balance)
             if credit_status['remaining'] < credit_cost:
                 return {
                     'success': False,
@@ -384,36 +374,31 @@ class CreditService:
                     'plan': credit_status['plan']
                 }
             
-            # Consume credits
-            if self.supabase:
-                success = self._consume_credits_supabase(user_id, task_type, credit_cost)
-                if not success:
-                    # Fallback to in-memory tracking if Supabase fails (e.g., RLS policy issues)
-                    logger.warning(f"💳 Supabase failed, using fallback tracking for user {user_id}")
-                    success = self._consume_credits_fallback(user_id, credit_cost, task_type)
-            else:
-                # Fallback mode - use in-memory storage
-                success = self._consume_credits_fallback(user_id, credit_cost, task_type)
-
-            if success:
-                new_remaining = credit_status['remaining'] - credit_cost
-                result = {
-                    'success': True,
-                    'credits_consumed': credit_cost,
-                    'remaining_credits': new_remaining,
-                    'plan': credit_status['plan'],
-                    'percentage': (new_remaining / credit_status['total']) * 100 if credit_status['total'] > 0 else 0
-                }
-                # Add credit breakdown if available
-                if 'credit_breakdown' in locals():
-                    result['credit_breakdown'] = credit_breakdown
-                return result
-            else:
+            # Consume credits: the ledger re-checks the allowance and journals the usage atomically,
+            # then flushes it to Supabase in the background
+            consumption = self.ledger.consume(user_id, task_type, credit_cost, limit=credit_status['total'])
+            if not consumption['success']:
                 return {
                     'success': False,
-                    'error': 'Failed to consume credits',
+                    'error': 'Insufficient credits',
+                    'credits_needed': credit_cost,
+                    'credits_available': max(0, credit_status['total'] - consumption['usage']),
                     'plan': credit_status['plan']
                 }
+
+            logger.info(f"💳 Credit consumption journaled: {credit_cost} credits for {task_type} (Total today: {consumption['usage']})")
+            new_remaining = max(0, credit_status['total'] - consumption['usage'])
+            result = {
+                'success': True,
+                'credits_consumed': credit_cost,
+                'remaining_credits': new_remaining,
+                'plan': credit_status['plan'],
+                'percentage': (new_remaining / credit_status['total']) * 100 if credit_status['total'] > 0 else 0
+            }
+            # Add credit breakdown if available
+            if 'credit_breakdown' in locals():
+                result['credit_breakdown'] = credit_breakdown
+            return result
                 
         except Exception as e:
             logger.error(f"Error consuming credits: {str(e)}")
@@ -423,159 +408,23 @@ class CreditService:
                 'plan': 'unknown'
             }
 
-    def _get_credits_from_supabase(self, user_id: str) -> Dict[str, Any]:
-        """Get user credits from Supabase"""
-        try:
-            from datetime import datetime, timedelta
-
-            # Check if user_id is a valid UUID format (for real users)
-            import re
-            uuid_pattern = r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
-            if not re.match(uuid_pattern, user_id, re.IGNORECASE):
-                # Not a valid UUID, use fallback system
-                logger.info(f"💳 User ID {user_id} is not a valid UUID, using fallback system")
-                fallback_usage = self._get_fallback_usage(user_id)
-                total_credits = 50
-                remaining = max(0, total_credits - fallback_usage)
+    def _get_daily_credits(self, user_id: str) -> Dict[str, Any]:
+        """Get a free plan user's daily credit status from the ledger"""
+        # Usage is served from the ledger's in-process cache; Supabase is only re-read
+        # periodically for users with UUID ids
+        # TODO: Get actual plan from user subscription
+        total_credits = 50
+        usage = self.ledger.get_daily_usage(user_id)
+        remaining = max(0, total_credits - usage)
 
-                return {
-                    'plan': 'free',
-                    'type': 'daily',
-                    'remaining': remaining,
-                    'total': total_credits,
-                    'reset_date': (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0),
-                    'percentage': (remaining / total_credits) * 100 if total_credits > 0 else 0
-                }
-
-            # Get today's usage
-            today = datetime.now().date().isoformat()
-
-            # Query today's credit usage
-            usage_result = self.supabase.table('credit_usage').select('credits_consumed').eq('user_id', user_id).eq('date', today).execute()
-
-            total_used_today = sum(record['credits_consumed'] for record in usage_result.data) if usage_result.data else 0
-
-            # For now, assume free plan (50 daily credits)
-            # TODO: Get actual plan from user subscription
-            total_credits = 50
-            remaining = max(0, total_credits - total_used_today)
-
-            return {
-                'plan': 'free',
-                'type': 'daily',
-                'remaining': remaining,
-                'total': total_credits,
-                'reset_date': (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0),
-                'percentage': (remaining / total_credits) * 100 if total_credits > 0 else 0
-            }
-
-        except Exception as e:
-            logger.error(f"❌ Error getting credits from Supabase: {str(e)}")
-            # Return fallback with actual usage tracking
-            from datetime import datetime, timedelta
-            fallback_usage = self._get_fallback_usage(user_id)
-            total_credits = 50
-            remaining = max(0, total_credits - fallback_usage)
-
-            return {
-                'plan': 'free',
-                'type': 'daily',
-                'remaining': remaining,
-                'total': total_credits,
-                'reset_date': (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0),
-                'percentage': (remaining / total_credits) * 100 if total_credits > 0 else 0
-            }
-
-    def _consume_credits_supabase(self, user_id: str, task_type: str, credit_cost: int) -> bool:
-        """Consume credits using Supabase"""
-        try:
-            from datetime import datetime
-
-            # Log the credit usage
-            usage_data = {
-                'user_id': user_id,
-                'task_type': task_type,
-                'credits_consumed': credit_cost,
-                'date': datetime.now().date().isoformat(),
-                'timestamp': datetime.now().isoformat()
-            }
-
-            result = self.supabase.table('credit_usage').insert(usage_data).execute()
-
-            if result.data:
-                logger.info(f"💳 Supabase credit consumption logged: {credit_cost} credits for {task_type}")
-                return True
-            else:
-                logger.error(f"💳 Failed to log credit consumption in Supabase")
-                return False
-
-        except Exception as e:
-            logger.error(f"💳 Error consuming credits in Supabase: {str(e)}")
-            return False
-
-    def _consume_credits_fallback(self, user_id: str, credit_cost: int, task_type: str) -> bool:
-        """Fallback credit consumption using file-based storage"""
-        try:
-            import os
-            import json
-            from datetime import datetime
-
-            # Create fallback storage directory
-            fallback_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'fallback_storage')
-            os.makedirs(fallback_dir, exist_ok=True)
-
-            fallback_file = os.path.join(fallback_dir, 'credit_usage.json')
-
-            # Load existing usage data
-            usage_data = {}
-            if os.path.exists(fallback_file):
-                try:
-                    with open(fallback_file, 'r') as f:
-                        usage_data = json.load(f)
-                except:
-                    usage_data = {}
-
-            today = datetime.now().date().isoformat()
-            key = f"{user_id}_{today}"
-
-            current_usage = usage_data.get(key, 0)
-            usage_data[key] = current_usage + credit_cost
-
-            # Save updated usage data
-            with open(fallback_file, 'w') as f:
-                json.dump(usage_data, f)
-
-            logger.info(f"💳 Fallback credit consumption: {credit_cost} credits for {task_type} (Total: {usage_data[key]})")
-            return True
-
-        except Exception as e:
-            logger.error(f"💳 Error in fallback credit consumption: {str(e)}")
-            return False
-
-    def _get_fallback_usage(self, user_id: str) -> int:
-        """Get current fallback usage for a user"""
-        try:
-            import os
-            import json
-            from datetime import datetime
-
-            fallback_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'fallback_storage')
-            fallback_file = os.path.join(fallback_dir, 'credit_usage.json')
-
-            if not os.path.exists(fallback_file):
-                return 0
-
-            with open(fallback_file, 'r') as f:
-                usage_data = json.load(f)
-
-            today = datetime.now().date().isoformat()
-            key = f"{user_id}_{today}"
-
-            return usage_data.get(key, 0)
-
-        except Exception as e:
-            logger.error(f"💳 Error getting fallback usage: {str(e)}")
-            return 0
+        return {
+            'plan': 'free',
+            'type': 'daily',
+            'remaining': remaining,
+            'total': total_credits,
+            'reset_date': (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0),
+            'percentage': (remaining / total_credits) * 100 if total_credits > 0 else 0
+        }
 
     def get_task_credit_cost(self, task_type: str) -> int:
         """Get credit cost for a specific task type"""
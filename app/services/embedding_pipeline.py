@@ -0,0 +1,367 @@
+"""
+Embedding Pipeline
+Sentence embeddings for the memory service. The transformer is loaded on first
+use instead of at import, embeddings are cached by content hash, and concurrent
+encode requests are coalesced by a worker thread into one batched forward pass.
+MemoryWriter batches memory upserts behind the request so storing a memory only
+enqueues it.
+"""
+
+import os
+import time
+import queue
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', 10000))
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))
+# How long the worker waits for more requests to join a batch
+EMBEDDING_BATCH_WAIT = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', 5)) / 1000
+
+MEMORY_UPSERT_BATCH = int(os.getenv('MEMORY_UPSERT_BATCH', 64))
+MEMORY_FLUSH_INTERVAL = float(os.getenv('MEMORY_FLUSH_INTERVAL', 1.0))
+
+
+class EmbeddingPipeline:
+    """Lazily loaded, cached and micro-batched sentence encoder."""
+
+    def __init__(self, model_name=None, encoder=None, cache_size=None, max_batch=None, max_wait=None):
+        """
+        Initialize the pipeline without loading the model.
+
+        Args:
+            model_name (str, optional): SentenceTransformer model. Defaults to EMBEDDING_MODEL or all-MiniLM-L6-v2.
+            encoder (optional): Object with encode(list_of_texts) to use instead of loading a model. Defaults to None.
+            cache_size (int, optional): Cached embeddings. Defaults to EMBEDDING_CACHE_SIZE or 10000.
+            max_batch (int, optional): Texts per forward pass. Defaults to EMBEDDING_BATCH_SIZE or 32.
+            max_wait (float, optional): Seconds to wait for a batch to fill. Defaults to EMBEDDING_BATCH_WAIT_MS or 5 ms.
+        """
+        self.model_name = model_name or DEFAULT_MODEL
+        self.cache_size = cache_size if cache_size is not None else EMBEDDING_CACHE_SIZE
+        self.max_batch = max_batch if max_batch is not None else EMBEDDING_BATCH_SIZE
+        self.max_wait = max_wait if max_wait is not None else EMBEDDING_BATCH_WAIT
+
+        self._encoder = encoder
+        self._load_lock = threading.Lock()
+        self._load_error = None
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self.encode_time = 0.0
+
+    def can_encode(self):
+        """
+        Whether an encoder is set or can be loaded.
+
+        Returns:
+            bool: True if embeddings can be produced
+        """
+        return self._encoder is not None or (SENTENCE_TRANSFORMERS_AVAILABLE and self._load_error is None)
+
+    @property
+    def encoder(self):
+        """The loaded encoder, or None if it has not been loaded yet."""
+        return self._encoder
+
+    def _get_encoder(self):
+        if self._encoder is None:
+            with self._load_lock:
+                if self._encoder is None:
+                    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+                        raise RuntimeError("sentence-transformers is not installed")
+                    if self._load_error is not None:
+                        raise RuntimeError(f"Embedding model failed to load: {self._load_error}")
+                    start = time.time()
+                    try:
+                        self._encoder = SentenceTransformer(self.model_name)
+                    except Exception as e:
+                        self._load_error = e
+                        raise
+                    logger.info(f"Loaded embedding model {self.model_name} in {time.time() - start:.1f}s")
+        return self._encoder
+
+    def warm_up(self):
+        """Load the model in a background thread so the first request does not wait for it."""
+        def load():
+            try:
+                self._get_encoder()
+            except Exception as e:
+                logger.error(f"Failed to load embedding model: {e}")
+        threading.Thread(target=load, name="embedding-warmup", daemon=True).start()
+
+    def _cache_key(self, text):
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+            return vector
+
+    def _cache_put(self, key, vector):
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _submit(self, key, text):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((key, text, future))
+        return future
+
+    def encode(self, text, timeout=None):
+        """
+        Get the embedding of one text.
+
+        Args:
+            text (str): The text to embed
+            timeout (float, optional): Seconds to wait for the batch. Defaults to no limit.
+
+        Returns:
+            list: The embedding vector
+        """
+        key = self._cache_key(text)
+        vector = self._cache_get(key)
+        if vector is not None:
+            return vector
+        return self._submit(key, text).result(timeout)
+
+    def encode_many(self, texts, timeout=None):
+        """
+        Get the embeddings of several texts, encoding cache misses in shared batches.
+
+        Args:
+            texts (list): Texts to embed
+            timeout (float, optional): Seconds to wait for the batches. Defaults to no limit.
+
+        Returns:
+            list: One embedding vector per text
+        """
+        results = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            key = self._cache_key(text)
+            vector = self._cache_get(key)
+            if vector is not None:
+                results[i] = vector
+            else:
+                pending.append((i, self._submit(key, text)))
+        for i, future in pending:
+            results[i] = future.result(timeout)
+        return results
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch):
+        # Identical texts in one batch are encoded once
+        texts = OrderedDict()
+        for key, text, future in batch:
+            texts.setdefault(key, (text, []))[1].append(future)
+
+        try:
+            start = time.perf_counter()
+            vectors = self._get_encoder().encode([text for text, _ in texts.values()], batch_size=self.max_batch)
+            self.encode_time += time.perf_counter() - start
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} failed: {e}")
+            for _, futures in texts.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batched_texts += len(texts)
+        for (key, (_, futures)), vector in zip(texts.items(), vectors):
+            vector = vector.tolist() if hasattr(vector, 'tolist') else list(vector)
+            self._cache_put(key, vector)
+            for future in futures:
+                future.set_result(vector)
+
+    def get_stats(self):
+        """
+        Get pipeline statistics.
+
+        Returns:
+            dict: Model state, cache hits and batching counts
+        """
+        with self._cache_lock:
+            cached = len(self._cache)
+        return {
+            'model': self.model_name,
+            'model_loaded': self._encoder is not None,
+            'cached_embeddings': cached,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'batches': self.batches,
+            'average_batch_size': round(self.batched_texts / self.batches, 2) if self.batches else 0,
+            'encode_time': round(self.encode_time, 4),
+            'queued': self._queue.qsize()
+        }
+
+
+class MemoryWriter:
+    """Write-behind queue that embeds and upserts memories in batches on a background thread."""
+
+    def __init__(self, pipeline, store, batch_size=None, flush_interval=None):
+        """
+        Initialize the writer.
+
+        Args:
+            pipeline (EmbeddingPipeline): Encoder for memory contents
+            store: Vector store receiving the points
+            batch_size (int, optional): Memories per write. Defaults to MEMORY_UPSERT_BATCH or 64.
+            flush_interval (float, optional): Longest a memory waits before being written. Defaults to MEMORY_FLUSH_INTERVAL or 1s.
+        """
+        self.pipeline = pipeline
+        self.store = store
+        self.batch_size = batch_size if batch_size is not None else MEMORY_UPSERT_BATCH
+        self.flush_interval = flush_interval if flush_interval is not None else MEMORY_FLUSH_INTERVAL
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.upserts = 0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+                    self._thread.start()
+
+    def enqueue(self, collection, point_id, content, payload):
+        """
+        Queue a memory to be embedded and stored.
+
+        Args:
+            collection (str): Target collection
+            point_id (str): Point ID
+            content (str): Text to embed
+            payload (dict): Point payload
+        """
+        self._ensure_thread()
+        self._queue.put((collection, point_id, content, payload))
+
+    def flush(self, timeout=None):
+        """
+        Write every queued memory before returning.
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to no limit.
+
+        Returns:
+            bool: True if the queue was drained within the timeout
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                batch, deadline = [], None
+                item.set()
+                continue
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch, deadline = [], None
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            vectors = self.pipeline.encode_many([content for _, _, content, _ in batch])
+        except Exception as e:
+            logger.error(f"Failed to embed {len(batch)} memories: {e}")
+            self.failed += len(batch)
+            return
+
+        points = OrderedDict()
+        for (collection, point_id, content, payload), vector in zip(batch, vectors):
+            points.setdefault(collection, []).append((point_id, vector, {'content': content, **payload}))
+
+        for collection, collection_points in points.items():
+            try:
+                self.store.upsert(collection, collection_points)
+                self.upserts += 1
+                self.written += len(collection_points)
+            except Exception as e:
+                logger.error(f"Failed to store {len(collection_points)} memories in {collection}: {e}")
+                self.failed += len(collection_points)
+
+    def get_stats(self):
+        """
+        Get writer statistics.
+
+        Returns:
+            dict: Queued, written and failed memories and upsert requests
+        """
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'failed': self.failed,
+            'upserts': self.upserts
+        }
@@ -0,0 +1,295 @@
+"""
+File Analysis Pipeline for uploaded files.
+
+FileProcessor hands the files attached to a prompt to this pipeline. Each
+file's analysis is cached in the shared cache by content hash, so a file
+attached again to a later message is not analyzed again, in this process or
+any other worker.
+
+Files that cost real CPU time (uploads loaded from the upload store, which
+includes PDF and Word text extraction and image thumbnails, and large inline
+files) are analyzed in a process pool, fanned out across cores. Each gets a
+time budget; a file over budget is given a basic analysis so the prompt is
+not held up, and its full analysis is cached when the worker finishes. Small
+inline files are analyzed in-process, where the pool's round trip would cost
+more than the analysis.
+
+Results are yielded as each file completes, so callers can stream partial
+summaries.
+
+Workers are spawned, and a spawned worker imports whatever module the function
+it runs lives in. Anything under app/ would import the app package and, through
+app/__init__, every blueprint and service, so the analyzers live in
+file_analyzers, which imports nothing from the app. It is loaded as a top-level
+module from this directory, here and in workers, which import the upload store
+the same way.
+"""
+
+import os
+import sys
+import math
+import site
+import time
+import hashlib
+import logging
+import threading
+import importlib.util
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.utils.cache_service import get_cache_service
+from app.services.upload_store import UploadStore, get_upload_store
+
+logger = logging.getLogger(__name__)
+
+# Bump when an analyzer's output changes, so cached analyses are not reused
+ANALYSIS_VERSION = 1
+
+CACHE_NAMESPACE = 'file_analysis'
+
+# Worker processes; 0 analyzes every file in-process
+WORKER_COUNT = int(os.getenv('FILE_ANALYSIS_WORKERS', min(4, os.cpu_count() or 1)))
+# Seconds each file's analysis may take before a basic analysis stands in
+FILE_TIMEOUT = float(os.getenv('FILE_ANALYSIS_TIMEOUT', 10))
+START_METHOD = os.getenv('FILE_ANALYSIS_START_METHOD', 'spawn')
+
+# Inline files shorter than this are analyzed in-process
+POOL_MIN_CHARS = 16 * 1024
+
+# Directory holding the modules workers load without the app
+LEAF_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load_leaf_module(name: str):
+    """Import a module from LEAF_MODULE_DIR under its top-level name, as workers do."""
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(LEAF_MODULE_DIR, f"{name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+file_analyzers = _load_leaf_module('file_analyzers')
+
+
+class FileAnalysisPipeline:
+    """
+    Analyzes the files of one prompt concurrently, with caching and time budgets.
+    """
+
+    def __init__(self, workers: int = WORKER_COUNT, file_timeout: float = FILE_TIMEOUT,
+                 start_method: Optional[str] = None, cache=None, store: Optional[UploadStore] = None):
+        """
+        Configure the pipeline. The worker pool starts on first use.
+
+        Args:
+            workers: Worker processes. 0 analyzes every file in-process.
+            file_timeout: Seconds each file's analysis may take.
+            start_method: multiprocessing start method. Defaults to FILE_ANALYSIS_START_METHOD or spawn.
+            cache: The cache service. Defaults to the shared cache service.
+            store: The upload store. Defaults to the process-wide upload store.
+        """
+        self.workers = max(0, workers)
+        self.file_timeout = file_timeout
+        self.start_method = start_method or START_METHOD
+        self.cache = cache or get_cache_service()
+        self.store = store or get_upload_store()
+
+        self._pool = None
+        # Reentrant: _submit starts the pool while holding it
+        self._lock = threading.RLock()
+        # Analyses running in the pool, by cache key
+        self._pending: Dict[str, Future] = {}
+        self._stats = {'cache_hits': 0, 'analyzed_in_process': 0, 'analyzed_in_pool': 0,
+                       'coalesced': 0, 'over_budget': 0, 'failed': 0}
+
+    def cache_key(self, file_info: Dict[str, Any]) -> str:
+        """
+        Return the key a file's analysis is cached under.
+
+        Inline text is hashed the way the upload store hashes its bytes, so a file
+        sent inline and the same file referenced from the store share one entry.
+        """
+        digest = file_info.get('upload_hash')
+        if not digest:
+            digest = hashlib.sha256((file_info.get('content') or '').encode('utf-8', 'replace')).hexdigest()
+        return f"{ANALYSIS_VERSION}:{file_info['type']}:{file_info['extension']}:{digest}"
+
+    @staticmethod
+    def _cacheable(file_info: Dict[str, Any]) -> bool:
+        # Image results carry their preview; the upload store already caches it by hash
+        return file_info['type'] == 'text'
+
+    def _use_pool(self, file_info: Dict[str, Any]) -> bool:
+        if not self.workers:
+            return False
+        return bool(file_info.get('upload_hash')) or len(file_info.get('content') or '') >= POOL_MIN_CHARS
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Workers import file_analyzers and upload_store from this directory, not through app
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(self.start_method),
+                                                 initializer=site.addsitedir, initargs=(LEAF_MODULE_DIR,))
+                logger.info(f"Started file analysis pool with {self.workers} workers")
+            return self._pool
+
+    def _submit(self, key: str, file_info: Dict[str, Any]) -> Future:
+        """Start a file's analysis in the pool, or join the one already running."""
+        # One lock hold, so concurrent requests for the same file submit it once
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                self._stats['coalesced'] += 1
+                return future
+
+            try:
+                future = self._get_pool().submit(file_analyzers.analyze_in_worker, file_info, self.store.root)
+            except BrokenProcessPool:
+                logger.warning("File analysis pool broke; starting a new one")
+                self._pool = None
+                future = self._get_pool().submit(file_analyzers.analyze_in_worker, file_info, self.store.root)
+            self._pending[key] = future
+            self._stats['analyzed_in_pool'] += 1
+        cacheable = self._cacheable(file_info)
+
+        def finished(done: Future):
+            # Results that arrive after the file's budget still serve the next request
+            if cacheable and not done.cancelled() and done.exception() is None and done.result():
+                self.cache.set(CACHE_NAMESPACE, key, _unnamed(done.result()))
+            with self._lock:
+                self._pending.pop(key, None)
+
+        future.add_done_callback(finished)
+        return future
+
+    def iter_results(self, processor, files_info: List[Dict[str, Any]]) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+        """
+        Analyze files, yielding each result as soon as it is ready.
+
+        Args:
+            processor: The FileProcessor whose analyzers run in-process.
+            files_info: Files as parsed from the prompt.
+
+        Yields:
+            Tuple[int, Optional[Dict[str, Any]]]: The file's index in files_info and
+            its processed result, or None if it could not be processed.
+        """
+        # Files with the same content share one analysis
+        waiting: Dict[Future, List[Tuple[int, Dict[str, Any]]]] = {}
+
+        for index, file_info in enumerate(files_info):
+            key = self.cache_key(file_info)
+            if self._cacheable(file_info):
+                cached = self.cache.get(CACHE_NAMESPACE, key)
+                if cached is not None:
+                    self._stats['cache_hits'] += 1
+                    yield index, _named(cached, file_info)
+                    continue
+
+            if self._use_pool(file_info):
+                waiting.setdefault(self._submit(key, file_info), []).append((index, file_info))
+                continue
+
+            result = processor._process_single_file(file_info, self.store)
+            self._stats['analyzed_in_process'] += 1
+            if result and self._cacheable(file_info):
+                self.cache.set(CACHE_NAMESPACE, key, _unnamed(result))
+            yield index, result
+
+        if not waiting:
+            return
+
+        # Files queue behind one another once there are more than workers
+        rounds = math.ceil(len(waiting) / self.workers)
+        deadline = time.monotonic() + self.file_timeout * rounds
+        while waiting:
+            done, _ = wait(list(waiting), timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                for files in waiting.values():
+                    for index, file_info in files:
+                        self._stats['over_budget'] += 1
+                        logger.warning(f"Analysis of {file_info['name']} exceeded {self.file_timeout}s; "
+                                       f"using a basic analysis")
+                        yield index, self._over_budget(file_info)
+                return
+
+            for future in done:
+                files = waiting.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self._stats['failed'] += 1
+                    logger.error(f"Error analyzing {files[0][1]['name']}: {str(e)}")
+                    result = None
+                for index, file_info in files:
+                    yield index, _named(result, file_info) if result else None
+
+    def _over_budget(self, file_info: Dict[str, Any]) -> Dict[str, Any]:
+        """A basic result for a file whose analysis ran past its budget."""
+        content = file_info.get('content') or ''
+        analysis = {'timed_out': True}
+        if content:
+            analysis.update({
+                'line_count': content.count('\n') + 1,
+                'character_count': len(content),
+                'word_count': len(content.split())
+            })
+        else:
+            info = self.store.get_info(file_info['upload_hash']) if file_info.get('upload_hash') else None
+            analysis['size'] = info['size'] if info else 0
+
+        result = {
+            'filename': file_info['name'],
+            'type': file_info['type'],
+            'extension': file_info['extension'],
+            'analysis': analysis,
+            'ai_instructions': [
+                f"This {file_info['type']} file was too large to analyze in time; only basic details are available."
+            ]
+        }
+        if content:
+            result['content_preview'] = content[:500] + "..." if len(content) > 500 else content
+        if file_info.get('upload_hash'):
+            result['upload_hash'] = file_info['upload_hash']
+        return result
+
+    def close(self):
+        """Stop the worker pool."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the pipeline's counters."""
+        with self._lock:
+            return dict(self._stats, workers=self.workers, running=len(self._pending))
+
+
+def _unnamed(result: Dict[str, Any]) -> Dict[str, Any]:
+    # Cached analyses are shared by every name the same content is uploaded under
+    return {key: value for key, value in result.items() if key != 'filename'}
+
+
+def _named(result: Dict[str, Any], file_info: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(result, filename=file_info['name'])
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_file_analysis_pipeline() -> FileAnalysisPipeline:
+    """Return the process-wide file analysis pipeline."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = FileAnalysisPipeline()
+    return _pipeline
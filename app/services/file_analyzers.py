@@ -0,0 +1,392 @@
+"""
+File Analyzers for uploaded files.
+
+The per-type analyses FileProcessor gives each file attached to a prompt. Like
+the sandbox zygote, this module imports nothing from the app: the file analysis
+pipeline's spawned workers load it, and the upload store, as top-level modules,
+so a worker does not import the app package and, through app/__init__, every
+blueprint and service. Keep it that way: import only the standard library here,
+and upload_store inside the worker.
+"""
+
+import io
+import re
+import ast
+import csv
+import json
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TEXT_EXTENSIONS = {
+    '.txt', '.py', '.js', '.html', '.css', '.json', '.md', '.xml', '.csv',
+    '.yaml', '.yml', '.sql', '.sh', '.bat', '.log', '.ini', '.cfg', '.conf'
+}
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg'}
+
+DOCUMENT_EXTENSIONS = {'.pdf', '.doc', '.docx'}
+
+# Characters of a CSV file sampled to detect its dialect
+CSV_SAMPLE_CHARS = 32 * 1024
+
+# Upload stores opened inside a worker, by root
+_worker_stores = {}
+
+
+def analyze_in_worker(file_info: Dict[str, Any], store_root: str) -> Optional[Dict[str, Any]]:
+    """Analyze one file inside a pool worker, where this directory is on sys.path."""
+    from upload_store import UploadStore
+
+    store = _worker_stores.get(store_root)
+    if store is None:
+        store = _worker_stores[store_root] = UploadStore(root=store_root)
+    return process_single_file(file_info, store)
+
+
+def load_upload(file_info: Dict[str, Any], store) -> Dict[str, Any]:
+    """Load the content of a file section that references the upload store."""
+    upload_hash = file_info['upload_hash']
+    info = store.get_info(upload_hash)
+    if info is None:
+        logger.warning(f"Upload {upload_hash[:12]} for {file_info['name']} is not in the store")
+        return dict(file_info, content='', missing=True)
+
+    loaded = dict(file_info, size=info['size'])
+    if file_info['type'] == 'image':
+        loaded['content'] = store.get_thumbnail_data_url(upload_hash) or ''
+        loaded['image_info'] = store.get_image_info(upload_hash)
+    else:
+        text = store.get_text(upload_hash)
+        loaded['content'] = (text or '').strip()
+        loaded['binary'] = text is None
+    return loaded
+
+
+def process_single_file(file_info: Dict[str, Any], store) -> Optional[Dict[str, Any]]:
+    """
+    Process a single file and extract meaningful information.
+
+    Args:
+        file_info: The file as parsed from the prompt.
+        store: The UploadStore holding files sent by reference.
+
+    Returns:
+        Optional[Dict[str, Any]]: The processed file, or None if it could not be processed.
+    """
+    try:
+        if file_info.get('upload_hash'):
+            file_info = load_upload(file_info, store)
+
+        filename = file_info['name']
+        file_type = file_info['type']
+        extension = file_info['extension']
+
+        processed = {
+            'filename': filename,
+            'type': file_type,
+            'extension': extension,
+            'analysis': {},
+            'ai_instructions': []
+        }
+        if file_info.get('upload_hash'):
+            processed['upload_hash'] = file_info['upload_hash']
+
+        if file_info.get('missing'):
+            processed['ai_instructions'].append(
+                f"The file {filename} was uploaded but is no longer available; ask the user to attach it again.")
+        elif file_info.get('binary'):
+            processed['analysis'] = {'size': file_info.get('size', 0)}
+            processed['ai_instructions'].append(
+                f"This is a binary file ({file_info.get('size', 0)} bytes) whose content cannot be shown as text.")
+        elif file_type == 'text':
+            processed.update(process_text_file(file_info))
+        elif file_type == 'image':
+            processed.update(process_image_file(file_info))
+
+        return processed
+
+    except Exception as e:
+        logger.error(f"Error processing file {file_info.get('name', 'unknown')}: {str(e)}")
+        return None
+
+
+def process_text_file(file_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Process text-based files and extract meaningful information."""
+    content = file_info['content']
+    extension = file_info['extension']
+
+    analysis = {
+        'line_count': len(content.split('\n')),
+        'character_count': len(content),
+        'word_count': len(content.split())
+    }
+
+    ai_instructions = []
+
+    # Language-specific processing
+    if extension in ['.py']:
+        analysis.update(analyze_python_code(content))
+        ai_instructions.append("This is Python code. You can analyze its functionality, suggest improvements, debug issues, or explain how it works.")
+
+    elif extension in ['.js']:
+        analysis.update(analyze_javascript_code(content))
+        ai_instructions.append("This is JavaScript code. You can analyze its functionality, suggest improvements, debug issues, or explain how it works.")
+
+    elif extension in ['.html']:
+        analysis.update(analyze_html_content(content))
+        ai_instructions.append("This is HTML content. You can analyze the structure, suggest improvements, or help with web development tasks.")
+
+    elif extension in ['.css']:
+        analysis.update(analyze_css_content(content))
+        ai_instructions.append("This is CSS styling code. You can analyze the styles, suggest improvements, or help with design tasks.")
+
+    elif extension in ['.json']:
+        analysis.update(analyze_json_content(content))
+        ai_instructions.append("This is JSON data. You can analyze the structure, validate the format, or help with data processing tasks.")
+
+    elif extension in ['.md']:
+        analysis.update(analyze_markdown_content(content))
+        ai_instructions.append("This is Markdown content. You can analyze the structure, suggest improvements, or help with documentation tasks.")
+
+    elif extension in ['.csv']:
+        analysis.update(analyze_csv_content(content))
+        ai_instructions.append("This is CSV data. You can analyze the data structure, perform data analysis, or help with data processing tasks.")
+
+    elif extension in DOCUMENT_EXTENSIONS:
+        ai_instructions.append("This is the text extracted from a document. You can summarize it, answer questions about it, or help with any text-related tasks.")
+
+    else:
+        ai_instructions.append("This is a text file. You can analyze its content, summarize it, or help with any text-related tasks.")
+
+    return {
+        'analysis': analysis,
+        'ai_instructions': ai_instructions,
+        'content_preview': content[:500] + "..." if len(content) > 500 else content
+    }
+
+
+def process_image_file(file_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Process image files."""
+    filename = file_info['name']
+    mime_type = file_info.get('mime_type', 'image/unknown')
+    image_data = file_info.get('content', '')
+
+    analysis = {
+        'mime_type': mime_type,
+        'format': mime_type.split('/')[-1] if '/' in mime_type else 'unknown',
+        'has_data': bool(image_data and image_data.startswith('data:'))
+    }
+    image_info = file_info.get('image_info')
+    if image_info:
+        analysis['width'] = image_info['width']
+        analysis['height'] = image_info['height']
+
+    ai_instructions = []
+
+    if image_data and image_data.startswith('data:'):
+        # We have actual image data
+        ai_instructions = [
+            "This is an image file with actual image data provided.",
+            "You can analyze the image content, describe what you see, extract text if it contains any, or help with image-related tasks.",
+            "The image data is provided as a base64-encoded data URL that you can process.",
+            f"Image format: {analysis['format']}",
+            f"Filename: {filename}"
+        ]
+        if image_info:
+            ai_instructions[2] = (f"The image is provided as a base64-encoded JPEG preview of the "
+                                  f"{image_info['width']}x{image_info['height']} original.")
+    else:
+        # Fallback for when image data is not available
+        ai_instructions = [
+            "This is an image file. You can provide guidance based on the filename and type.",
+            f"Image format: {analysis['format']}",
+            f"Filename: {filename}",
+            "Note: The actual image data is not available in this context."
+        ]
+
+    return {
+        'analysis': analysis,
+        'ai_instructions': ai_instructions,
+        'content': image_data if image_data else f"Image file: {filename}"
+    }
+
+
+def analyze_python_code(content: str) -> Dict[str, Any]:
+    """Analyze Python code content."""
+    analysis = {}
+
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError) as e:
+        tree = None
+        analysis['syntax_error'] = f"line {getattr(e, 'lineno', '?')}: {getattr(e, 'msg', str(e))}"
+
+    if tree is not None:
+        import_nodes = []
+        function_count = class_count = 0
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                import_nodes.append(node)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                function_count += 1
+            elif isinstance(node, ast.ClassDef):
+                class_count += 1
+
+        lines = content.split('\n')
+        import_nodes.sort(key=lambda node: node.lineno)
+        analysis['import_count'] = len(import_nodes)
+        analysis['imports'] = [lines[node.lineno - 1].strip() for node in import_nodes[:10]]  # First 10 imports
+
+        # Functions include methods
+        analysis['function_count'] = function_count
+        analysis['class_count'] = class_count
+    else:
+        # Code that does not parse still gets counted line by line
+        import_lines = [line for line in content.split('\n') if line.strip().startswith(('import ', 'from '))]
+        analysis['import_count'] = len(import_lines)
+        analysis['imports'] = import_lines[:10]
+        analysis['function_count'] = len(re.findall(r'^\s*(?:async\s+)?def\s+\w+', content, re.MULTILINE))
+        analysis['class_count'] = len(re.findall(r'^\s*class\s+\w+', content, re.MULTILINE))
+
+    # Detect common patterns
+    lowered = content.lower()
+    if 'flask' in lowered:
+        analysis['framework'] = 'Flask'
+    elif 'django' in lowered:
+        analysis['framework'] = 'Django'
+    elif 'fastapi' in lowered:
+        analysis['framework'] = 'FastAPI'
+
+    return analysis
+
+
+def analyze_javascript_code(content: str) -> Dict[str, Any]:
+    """Analyze JavaScript code content."""
+    analysis = {}
+
+    # Count functions
+    function_count = len(re.findall(r'function\s+\w+|=>\s*{|\w+\s*:\s*function', content))
+    analysis['function_count'] = function_count
+
+    # Detect frameworks/libraries
+    if 'react' in content.lower():
+        analysis['framework'] = 'React'
+    elif 'vue' in content.lower():
+        analysis['framework'] = 'Vue'
+    elif 'angular' in content.lower():
+        analysis['framework'] = 'Angular'
+    elif 'jquery' in content.lower():
+        analysis['library'] = 'jQuery'
+
+    return analysis
+
+
+def analyze_html_content(content: str) -> Dict[str, Any]:
+    """Analyze HTML content."""
+    analysis = {}
+
+    # Count elements
+    tag_count = len(re.findall(r'<[^/][^>]*>', content))
+    analysis['tag_count'] = tag_count
+
+    # Detect common elements
+    if '<form' in content:
+        analysis['has_forms'] = True
+    if '<table' in content:
+        analysis['has_tables'] = True
+    if '<script' in content:
+        analysis['has_scripts'] = True
+
+    return analysis
+
+
+def analyze_css_content(content: str) -> Dict[str, Any]:
+    """Analyze CSS content."""
+    analysis = {}
+
+    # Count selectors and rules
+    selector_count = len(re.findall(r'[^{}]+\s*{', content))
+    analysis['selector_count'] = selector_count
+
+    return analysis
+
+
+def analyze_json_content(content: str) -> Dict[str, Any]:
+    """Analyze JSON content."""
+    analysis = {}
+
+    try:
+        data = json.loads(content)
+        analysis['valid_json'] = True
+        analysis['structure'] = type(data).__name__
+
+        if isinstance(data, dict):
+            analysis['key_count'] = len(data.keys())
+            analysis['top_level_keys'] = list(data.keys())[:10]
+        elif isinstance(data, list):
+            analysis['item_count'] = len(data)
+
+    except json.JSONDecodeError:
+        analysis['valid_json'] = False
+        analysis['error'] = 'Invalid JSON format'
+
+    return analysis
+
+
+def analyze_markdown_content(content: str) -> Dict[str, Any]:
+    """Analyze Markdown content."""
+    analysis = {}
+
+    # Count headers
+    headers = re.findall(r'^#+\s+(.+)$', content, re.MULTILINE)
+    analysis['header_count'] = len(headers)
+    analysis['headers'] = headers[:5]  # First 5 headers
+
+    # Count links and images
+    links = re.findall(r'\[([^\]]+)\]\([^)]+\)', content)
+    images = re.findall(r'!\[([^\]]*)\]\([^)]+\)', content)
+
+    analysis['link_count'] = len(links)
+    analysis['image_count'] = len(images)
+
+    return analysis
+
+
+def analyze_csv_content(content: str) -> Dict[str, Any]:
+    """Analyze CSV content."""
+    analysis = {}
+
+    # Sniff the dialect from a sample rather than the whole file
+    sample = content[:CSV_SAMPLE_CHARS]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+    try:
+        analysis['has_header'] = csv.Sniffer().has_header(sample)
+    except csv.Error:
+        pass
+    analysis['delimiter'] = dialect.delimiter
+
+    # Quoted fields may hold delimiters and newlines, so rows are read, not split
+    headers = None
+    row_count = 0
+    try:
+        for row in csv.reader(io.StringIO(content), dialect):
+            if not any(field.strip() for field in row):
+                continue
+            if headers is None:
+                headers = row
+            row_count += 1
+    except csv.Error as e:
+        analysis['error'] = str(e)
+
+    analysis['row_count'] = row_count
+    if headers:
+        # Analyze first row as headers
+        analysis['column_count'] = len(headers)
+        analysis['headers'] = [col.strip() for col in headers]
+
+    return analysis
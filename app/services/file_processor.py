@@ -3,36 +3,29 @@ Enhanced File Processing Service
 Processes uploaded files for all agents to understand and use in their tasks.
 """
 
-import base64
-import json
 import re
 import logging
-from typing import Dict, List, Any, Optional
-from PIL import Image
-import io
-import PyPDF2
-import docx
-import csv
-import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+from app.services.upload_store import UploadStore, get_upload_store, parse_token
+from app.services.file_analysis import get_file_analysis_pipeline, file_analyzers
 
 logger = logging.getLogger(__name__)
 
+# Header line of each file section the universal file upload appends to a prompt
+FILE_HEADER_PATTERN = re.compile(r'^--- (File|Image): (.+?) ---[ \t]*$', re.MULTILINE)
+
+# Where the first file section starts
+FILE_SECTION_START = re.compile(r'\n\n--- (?:File|Image): ')
+
 class FileProcessor:
     """Enhanced file processor that can handle various file types and extract meaningful content."""
     
     def __init__(self):
-        self.supported_text_extensions = {
-            '.txt', '.py', '.js', '.html', '.css', '.json', '.md', '.xml', '.csv',
-            '.yaml', '.yml', '.sql', '.sh', '.bat', '.log', '.ini', '.cfg', '.conf'
-        }
-        
-        self.supported_image_extensions = {
-            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg'
-        }
-        
-        self.supported_document_extensions = {
-            '.pdf', '.doc', '.docx'
-        }
+        # The analyzers themselves live in file_analyzers, which pool workers load without the app
+        self.supported_text_extensions = file_analyzers.TEXT_EXTENSIONS
+        self.supported_image_extensions = file_analyzers.IMAGE_EXTENSIONS
+        self.supported_document_extensions = file_analyzers.DOCUMENT_EXTENSIONS
     
     def process_file_content(self, file_content: str) -> Dict[str, Any]:
         """
@@ -46,14 +39,8 @@ class FileProcessor:
         """
         try:
             processed_files = []
-            
-            # Parse the file content string
-            files_info = self._parse_file_content_string(file_content)
-            
-            for file_info in files_info:
-                processed_file = self._process_single_file(file_info)
-                if processed_file:
-                    processed_files.append(processed_file)
+            for update in self.iter_file_analysis(file_content):
+                processed_files = update['processed_files']
             
             return {
                 'success': True,
@@ -71,284 +58,99 @@ class FileProcessor:
                 'processed_files': []
             }
     
+    def iter_file_analysis(self, file_content: str) -> Iterator[Dict[str, Any]]:
+        """
+        Process file content, yielding progress as each file's analysis completes.
+
+        Files are analyzed by the file analysis pipeline: cached analyses are
+        reused and CPU-heavy files are analyzed concurrently in worker processes.
+
+        Args:
+            file_content (str): The file content string from getFileContentForAI()
+
+        Yields:
+            Dict containing the file just processed, how many files are done out of
+            the total, the processed files so far in upload order, and a summary
+            of them
+        """
+        files_info = self._parse_file_content_string(file_content)
+        results: Dict[int, Dict[str, Any]] = {}
+        done = 0
+
+        for index, processed_file in get_file_analysis_pipeline().iter_results(self, files_info):
+            done += 1
+            if processed_file:
+                results[index] = processed_file
+            processed_files = [results[i] for i in sorted(results)]
+            yield {
+                'file': processed_file,
+                'done': done,
+                'total': len(files_info),
+                'processed_files': processed_files,
+                'summary': self._generate_files_summary(processed_files)
+            }
+
+    def split_file_content(self, text: str) -> Tuple[str, str]:
+        """
+        Split a prompt from the file sections the universal file upload appended to it.
+
+        Args:
+            text (str): The prompt as the client sent it
+
+        Returns:
+            Tuple[str, str]: The user's own text and the file sections, which are
+            empty if no files were attached
+        """
+        match = FILE_SECTION_START.search(text)
+        if not match:
+            return text, ""
+        return text[:match.start()], text[match.start():]
+
     def _parse_file_content_string(self, content: str) -> List[Dict[str, Any]]:
-        """Parse the file content string to extract individual files."""
+        """
+        Parse the file content string to extract individual files.
+
+        Sections whose body is an upload token reference a file in the upload
+        store and are loaded when processed. Inline image data is moved into the
+        store so only its token travels further.
+        """
         files = []
-        
-        # Pattern to match file sections
-        file_pattern = r'--- File: ([^-]+) ---\n(.*?)(?=\n--- |$)'
-        image_pattern = r'--- Image: ([^(]+) \(([^)]+)\) ---\n(.*?)(?=\n--- |$)'
-        
-        # Find text files
-        for match in re.finditer(file_pattern, content, re.DOTALL):
-            filename = match.group(1).strip()
-            file_content = match.group(2).strip()
-            
-            files.append({
-                'name': filename,
-                'type': 'text',
-                'content': file_content,
-                'extension': self._get_file_extension(filename)
-            })
-        
-        # Find images
-        for match in re.finditer(image_pattern, content, re.DOTALL):
-            filename = match.group(1).strip()
-            mime_type = match.group(2).strip()
-            image_data = match.group(3).strip()
+        headers = list(FILE_HEADER_PATTERN.finditer(content))
 
-            files.append({
-                'name': filename,
-                'type': 'image',
-                'mime_type': mime_type,
-                'content': image_data,
-                'extension': self._get_file_extension(filename)
-            })
-        
-        return files
-    
-    def _process_single_file(self, file_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Process a single file and extract meaningful information."""
-        try:
-            filename = file_info['name']
-            file_type = file_info['type']
-            extension = file_info['extension']
-            
-            processed = {
-                'filename': filename,
-                'type': file_type,
-                'extension': extension,
-                'analysis': {},
-                'ai_instructions': []
-            }
-            
-            if file_type == 'text':
-                processed.update(self._process_text_file(file_info))
-            elif file_type == 'image':
-                processed.update(self._process_image_file(file_info))
-            
-            return processed
-            
-        except Exception as e:
-            logger.error(f"Error processing file {file_info.get('name', 'unknown')}: {str(e)}")
-            return None
-    
-    def _process_text_file(self, file_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Process text-based files and extract meaningful information."""
-        content = file_info['content']
-        extension = file_info['extension']
-        
-        analysis = {
-            'line_count': len(content.split('\n')),
-            'character_count': len(content),
-            'word_count': len(content.split())
-        }
-        
-        ai_instructions = []
-        
-        # Language-specific processing
-        if extension in ['.py']:
-            analysis.update(self._analyze_python_code(content))
-            ai_instructions.append("This is Python code. You can analyze its functionality, suggest improvements, debug issues, or explain how it works.")
-            
-        elif extension in ['.js']:
-            analysis.update(self._analyze_javascript_code(content))
-            ai_instructions.append("This is JavaScript code. You can analyze its functionality, suggest improvements, debug issues, or explain how it works.")
-            
-        elif extension in ['.html']:
-            analysis.update(self._analyze_html_content(content))
-            ai_instructions.append("This is HTML content. You can analyze the structure, suggest improvements, or help with web development tasks.")
-            
-        elif extension in ['.css']:
-            analysis.update(self._analyze_css_content(content))
-            ai_instructions.append("This is CSS styling code. You can analyze the styles, suggest improvements, or help with design tasks.")
-            
-        elif extension in ['.json']:
-            analysis.update(self._analyze_json_content(content))
-            ai_instructions.append("This is JSON data. You can analyze the structure, validate the format, or help with data processing tasks.")
-            
-        elif extension in ['.md']:
-            analysis.update(self._analyze_markdown_content(content))
-            ai_instructions.append("This is Markdown content. You can analyze the structure, suggest improvements, or help with documentation tasks.")
-            
-        elif extension in ['.csv']:
-            analysis.update(self._analyze_csv_content(content))
-            ai_instructions.append("This is CSV data. You can analyze the data structure, perform data analysis, or help with data processing tasks.")
-            
-        else:
-            ai_instructions.append("This is a text file. You can analyze its content, summarize it, or help with any text-related tasks.")
-        
-        return {
-            'analysis': analysis,
-            'ai_instructions': ai_instructions,
-            'content_preview': content[:500] + "..." if len(content) > 500 else content
-        }
-    
-    def _process_image_file(self, file_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Process image files."""
-        filename = file_info['name']
-        mime_type = file_info.get('mime_type', 'image/unknown')
-        image_data = file_info.get('content', '')
+        for i, header in enumerate(headers):
+            body_end = headers[i + 1].start() if i + 1 < len(headers) else len(content)
+            body = content[header.end():body_end].strip()
+            kind, title = header.group(1), header.group(2).strip()
 
-        analysis = {
-            'mime_type': mime_type,
-            'format': mime_type.split('/')[-1] if '/' in mime_type else 'unknown',
-            'has_data': bool(image_data and image_data.startswith('data:'))
-        }
+            if kind == 'File':
+                file_info = {'name': title, 'type': 'text', 'content': body}
+            else:
+                filename, mime_type = title, 'image/unknown'
+                if title.endswith(')') and ' (' in title:
+                    filename, mime_type = title[:-1].rsplit(' (', 1)
+                file_info = {'name': filename.strip(), 'type': 'image', 'mime_type': mime_type.strip(),
+                             'content': body}
+            file_info['extension'] = self._get_file_extension(file_info['name'])
 
-        ai_instructions = []
+            upload_hash = parse_token(body)
+            if upload_hash is None and kind == 'Image' and body.startswith('data:'):
+                try:
+                    stored = get_upload_store().store_data_url(body, file_info['name'])
+                    upload_hash = stored['hash'] if stored else None
+                except Exception as e:
+                    logger.warning(f"Could not store inline image {file_info['name']}: {str(e)}")
+            if upload_hash:
+                file_info['upload_hash'] = upload_hash
+                file_info['content'] = None
 
-        if image_data and image_data.startswith('data:'):
-            # We have actual image data
-            ai_instructions = [
-                "This is an image file with actual image data provided.",
-                "You can analyze the image content, describe what you see, extract text if it contains any, or help with image-related tasks.",
-                "The image data is provided as a base64-encoded data URL that you can process.",
-                f"Image format: {analysis['format']}",
-                f"Filename: {filename}"
-            ]
-        else:
-            # Fallback for when image data is not available
-            ai_instructions = [
-                "This is an image file. You can provide guidance based on the filename and type.",
-                f"Image format: {analysis['format']}",
-                f"Filename: {filename}",
-                "Note: The actual image data is not available in this context."
-            ]
+            files.append(file_info)
 
-        return {
-            'analysis': analysis,
-            'ai_instructions': ai_instructions,
-            'content': image_data if image_data else f"Image file: {filename}"
-        }
-    
-    def _analyze_python_code(self, content: str) -> Dict[str, Any]:
-        """Analyze Python code content."""
-        analysis = {}
-        
-        # Count imports
-        import_lines = [line for line in content.split('\n') if line.strip().startswith(('import ', 'from '))]
-        analysis['import_count'] = len(import_lines)
-        analysis['imports'] = import_lines[:10]  # First 10 imports
-        
-        # Count functions and classes
-        function_count = len(re.findall(r'^\s*def\s+\w+', content, re.MULTILINE))
-        class_count = len(re.findall(r'^\s*class\s+\w+', content, re.MULTILINE))
-        
-        analysis['function_count'] = function_count
-        analysis['class_count'] = class_count
-        
-        # Detect common patterns
-        if 'flask' in content.lower():
-            analysis['framework'] = 'Flask'
-        elif 'django' in content.lower():
-            analysis['framework'] = 'Django'
-        elif 'fastapi' in content.lower():
-            analysis['framework'] = 'FastAPI'
-        
-        return analysis
-    
-    def _analyze_javascript_code(self, content: str) -> Dict[str, Any]:
-        """Analyze JavaScript code content."""
-        analysis = {}
-        
-        # Count functions
-        function_count = len(re.findall(r'function\s+\w+|=>\s*{|\w+\s*:\s*function', content))
-        analysis['function_count'] = function_count
-        
-        # Detect frameworks/libraries
-        if 'react' in content.lower():
-            analysis['framework'] = 'React'
-        elif 'vue' in content.lower():
-            analysis['framework'] = 'Vue'
-        elif 'angular' in content.lower():
-            analysis['framework'] = 'Angular'
-        elif 'jquery' in content.lower():
-            analysis['library'] = 'jQuery'
-        
-        return analysis
-    
-    def _analyze_html_content(self, content: str) -> Dict[str, Any]:
-        """Analyze HTML content."""
-        analysis = {}
-        
-        # Count elements
-        tag_count = len(re.findall(r'<[^/][^>]*>', content))
-        analysis['tag_count'] = tag_count
-        
-        # Detect common elements
-        if '<form' in content:
-            analysis['has_forms'] = True
-        if '<table' in content:
-            analysis['has_tables'] = True
-        if '<script' in content:
-            analysis['has_scripts'] = True
-        
-        return analysis
-    
-    def _analyze_css_content(self, content: str) -> Dict[str, Any]:
-        """Analyze CSS content."""
-        analysis = {}
-        
-        # Count selectors and rules
-        selector_count = len(re.findall(r'[^{}]+\s*{', content))
-        analysis['selector_count'] = selector_count
-        
-        return analysis
-    
-    def _analyze_json_content(self, content: str) -> Dict[str, Any]:
-        """Analyze JSON content."""
-        analysis = {}
-        
-        try:
-            data = json.loads(content)
-            analysis['valid_json'] = True
-            analysis['structure'] = type(data).__name__
-            
-            if isinstance(data, dict):
-                analysis['key_count'] = len(data.keys())
-                analysis['top_level_keys'] = list(data.keys())[:10]
-            elif isinstance(data, list):
-                analysis['item_count'] = len(data)
-                
-        except json.JSONDecodeError:
-            analysis['valid_json'] = False
-            analysis['error'] = 'Invalid JSON format'
-        
-        return analysis
-    
-    def _analyze_markdown_content(self, content: str) -> Dict[str, Any]:
-        """Analyze Markdown content."""
-        analysis = {}
-        
-        # Count headers
-        headers = re.findall(r'^#+\s+(.+)$', content, re.MULTILINE)
-        analysis['header_count'] = len(headers)
-        analysis['headers'] = headers[:5]  # First 5 headers
-        
-        # Count links and images
-        links = re.findall(r'\[([^\]]+)\]\([^)]+\)', content)
-        images = re.findall(r'!\[([^\]]*)\]\([^)]+\)', content)
-        
-        analysis['link_count'] = len(links)
-        analysis['image_count'] = len(images)
-        
-        return analysis
-    
-    def _analyze_csv_content(self, content: str) -> Dict[str, Any]:
-        """Analyze CSV content."""
-        analysis = {}
-        
-        lines = content.split('\n')
-        analysis['row_count'] = len([line for line in lines if line.strip()])
-        
-        if lines:
-            # Analyze first row as headers
-            first_row = lines[0].split(',')
-            analysis['column_count'] = len(first_row)
-            analysis['headers'] = [col.strip().strip('"') for col in first_row]
-        
-        return analysis
+        return files
+
+    def _process_single_file(self, file_info: Dict[str, Any],
+                             store: Optional[UploadStore] = None) -> Optional[Dict[str, Any]]:
+        """Process a single file and extract meaningful information."""
+        return file_analyzers.process_single_file(file_info, store or get_upload_store())
     
     def _generate_files_summary(self, processed_files: List[Dict[str, Any]]) -> str:
         """Generate a summary of all processed files for AI context."""
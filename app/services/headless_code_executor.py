@@ -6,13 +6,13 @@ capturing output and screenshots for GUI applications.
 """
 
 import os
-import sys
 import uuid
 import time
 import base64
 import io
 import json
 import logging
+import functools
 import threading
 import subprocess
 import tempfile
@@ -20,6 +20,7 @@ import shutil
 from PIL import Image
 
 from app.services.virtual_display import VirtualDisplayManager
+from app.services.sandbox_runner import get_sandbox_runner
 
 logger = logging.getLogger(__name__)
 
@@ -205,8 +206,10 @@ class HeadlessCodeExecutor:
             # Update status
             self.output_cache[project_id]['status'] = 'running'
 
-            # Prepare environment variables
-            env = os.environ.copy()
+            # Environment for the run on top of the sandbox's minimal one
+            env = {}
+            if has_gui and self.display_manager.is_display_running() and os.environ.get('DISPLAY'):
+                env['DISPLAY'] = os.environ['DISPLAY']
 
             # If this is a GUI application but we couldn't start a virtual display,
             # add a note about it to the output
@@ -220,34 +223,17 @@ class HeadlessCodeExecutor:
                     self.output_cache[project_id]['output'] += "Detected Pygame application. Setting SDL_VIDEODRIVER to 'dummy' for headless operation.\n"
                     env['SDL_VIDEODRIVER'] = 'dummy'
 
-            # Start the process
-            process = subprocess.Popen(
-                [sys.executable, main_file],
-                cwd=project_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                env=env  # Use the modified environment
+            # Start the process in a sandbox forked from the pre-imported zygote
+            process = get_sandbox_runner().start(
+                main_file,
+                project_dir,
+                env=env,
+                on_output=functools.partial(self._append_output, project_id)
             )
 
             # Store the process
             self.running_processes[project_id] = process
 
-            # Start threads to read output
-            stdout_thread = threading.Thread(
-                target=self._read_output,
-                args=(process.stdout, project_id, 'stdout')
-            )
-            stderr_thread = threading.Thread(
-                target=self._read_output,
-                args=(process.stderr, project_id, 'stderr')
-            )
-
-            stdout_thread.start()
-            stderr_thread.start()
-
             # Start screenshot thread if GUI and any display is running
             if has_gui and self.display_manager.is_display_running():
                 # If using fallback display, add a note
@@ -267,13 +253,9 @@ class HeadlessCodeExecutor:
                 self.output_cache[project_id]['output'] += "\nCannot capture screenshots without a virtual display.\n"
                 self.output_cache[project_id]['output'] += "Install Xvfb to enable screenshot capture.\n"
 
-            # Wait for the process to complete
+            # Wait for the process to complete and its output to be read
             process.wait()
 
-            # Wait for output threads to complete
-            stdout_thread.join()
-            stderr_thread.join()
-
             # Update status
             if process.returncode == 0:
                 self.output_cache[project_id]['status'] = 'completed'
@@ -294,21 +276,20 @@ class HeadlessCodeExecutor:
             if has_gui:
                 self.display_manager.stop_display()
 
-    def _read_output(self, pipe, project_id, stream_type):
+    def _append_output(self, project_id, stream_type, line):
         """
-        Read output from a process pipe
+        Append a line of process output to the output cache
 
         Args:
-            pipe: Process pipe to read from
             project_id (str): Project ID
             stream_type (str): Type of stream ('stdout' or 'stderr')
+            line (str): The output line
         """
         prefix = "ERROR: " if stream_type == 'stderr' else ""
 
-        for line in pipe:
-            if project_id in self.output_cache:
-                self.output_cache[project_id]['output'] += f"{prefix}{line}"
-                self.output_cache[project_id]['last_update'] = time.time()
+        if project_id in self.output_cache:
+            self.output_cache[project_id]['output'] += f"{prefix}{line}"
+            self.output_cache[project_id]['last_update'] = time.time()
 
     def _capture_screenshots_thread(self, project_id):
         """
@@ -1,6 +1,11 @@
 """
 AutoWave Memory Service using Qdrant Cloud
 Provides persistent memory capabilities for all agents in the platform.
+
+Embeddings come from a shared pipeline that loads the model on first use, caches
+vectors by content hash and batches concurrent requests. Stored memories are
+written behind the request in batched upserts. Set MEMORY_BACKEND=local to use
+an in-process vector store instead of Qdrant Cloud.
 """
 
 import os
@@ -10,24 +15,39 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 import logging
 
+from .embedding_pipeline import EmbeddingPipeline, MemoryWriter, SENTENCE_TRANSFORMERS_AVAILABLE
+from .vector_store import QdrantVectorStore, InMemoryVectorStore
+
 try:
     from qdrant_client import QdrantClient
-    from qdrant_client.http import models
-    from sentence_transformers import SentenceTransformer
-    MEMORY_AVAILABLE = True
+    QDRANT_AVAILABLE = True
 except ImportError:
-    MEMORY_AVAILABLE = False
+    QDRANT_AVAILABLE = False
+
+MEMORY_AVAILABLE = SENTENCE_TRANSFORMERS_AVAILABLE
+if not MEMORY_AVAILABLE:
     logging.warning("Memory dependencies not installed. Memory features will be disabled.")
 
+# all-MiniLM-L6-v2 embedding size
+EMBEDDING_SIZE = 384
+
 class MemoryService:
     """
     Centralized memory service for all AutoWave agents.
     Uses Qdrant Cloud for vector storage and retrieval.
     """
     
-    def __init__(self):
+    def __init__(self, backend: str = None, encoder=None):
+        """
+        Args:
+            backend: 'qdrant' or 'local'. Defaults to MEMORY_BACKEND or 'qdrant'.
+            encoder: Object with encode(list_of_texts) used instead of loading the model
+        """
         self.client = None
-        self.encoder = None
+        self.store = None
+        self.backend = (backend or os.getenv('MEMORY_BACKEND', 'qdrant')).lower()
+        self.pipeline = EmbeddingPipeline(encoder=encoder)
+        self.writer = None
         self.collections = {
             'prime_agent_memory': 'Prime Agent task execution and user preferences',
             'agentic_code_memory': 'Code generation patterns and user coding style',
@@ -36,11 +56,29 @@ class MemoryService:
             'global_user_memory': 'Cross-agent user profile and preferences'
         }
         
-        if MEMORY_AVAILABLE:
-            self._initialize_client()
+        if MEMORY_AVAILABLE or encoder is not None:
+            if self.backend == 'local':
+                self.store = InMemoryVectorStore()
+                self.store.ensure_collections(list(self.collections), EMBEDDING_SIZE)
+                logging.info("Memory service using local in-memory vector store")
+            elif QDRANT_AVAILABLE:
+                self._initialize_client()
+            else:
+                logging.warning("qdrant-client not installed. Memory features disabled.")
+        
+        if self.store is not None:
+            self.writer = MemoryWriter(self.pipeline, self.store)
+            # Opt-in: load the model in the background instead of on first request
+            if os.getenv('MEMORY_WARMUP', 'false').lower() == 'true':
+                self.pipeline.warm_up()
+    
+    @property
+    def encoder(self):
+        """The loaded embedding model, or None until first use."""
+        return self.pipeline.encoder
     
     def _initialize_client(self):
-        """Initialize Qdrant client and embedding model."""
+        """Initialize the Qdrant client. The embedding model is loaded on first use."""
         try:
             # Get Qdrant Cloud credentials from environment
             qdrant_url = os.getenv('QDRANT_URL')
@@ -56,8 +94,7 @@ class MemoryService:
                 api_key=qdrant_api_key,
             )
             
-            # Initialize sentence transformer for embeddings
-            self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
+            self.store = QdrantVectorStore(self.client)
             
             # Create collections if they don't exist
             self._create_collections()
@@ -67,33 +104,44 @@ class MemoryService:
         except Exception as e:
             logging.error(f"Failed to initialize memory service: {e}")
             self.client = None
-            self.encoder = None
+            self.store = None
     
     def _create_collections(self):
         """Create memory collections for each agent."""
-        if not self.client:
+        if not self.store:
             return
         
         try:
-            existing_collections = [col.name for col in self.client.get_collections().collections]
-            
-            for collection_name, description in self.collections.items():
-                if collection_name not in existing_collections:
-                    self.client.create_collection(
-                        collection_name=collection_name,
-                        vectors_config=models.VectorParams(
-                            size=384,  # all-MiniLM-L6-v2 embedding size
-                            distance=models.Distance.COSINE
-                        )
-                    )
-                    logging.info(f"Created collection: {collection_name}")
-        
+            self.store.ensure_collections(list(self.collections), EMBEDDING_SIZE)
         except Exception as e:
             logging.error(f"Failed to create collections: {e}")
     
     def is_available(self) -> bool:
         """Check if memory service is available."""
-        return MEMORY_AVAILABLE and self.client is not None and self.encoder is not None
+        return self.store is not None and self.pipeline.can_encode()
+    
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until every stored memory has been written to the vector store.
+        
+        Args:
+            timeout: Seconds to wait, or None to wait until done
+        
+        Returns:
+            bool: True if all pending writes completed
+        """
+        if not self.writer:
+            return True
+        return self.writer.flush(timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get embedding pipeline and write-behind statistics."""
+        return {
+            'backend': self.store.name if self.store else None,
+            'available': self.is_available(),
+            'embeddings': self.pipeline.get_stats(),
+            'writes': self.writer.get_stats() if self.writer else {}
+        }
     
     def store_memory(self, 
                     agent_type: str, 
@@ -103,6 +151,9 @@ class MemoryService:
         """
         Store a memory entry for an agent.
         
+        The memory is queued and embedded and upserted in a batch on a background
+        thread; call flush() to wait for it to be searchable.
+        
         Args:
             agent_type: Type of agent (prime_agent, agentic_code, agent_wave, context7)
             user_id: User identifier
@@ -110,7 +161,7 @@ class MemoryService:
             metadata: Additional metadata
         
         Returns:
-            bool: Success status
+            bool: True if the memory was queued
         """
         if not self.is_available():
             return False
@@ -121,9 +172,6 @@ class MemoryService:
                 logging.error(f"Unknown agent type: {agent_type}")
                 return False
             
-            # Generate embedding
-            embedding = self.encoder.encode(content).tolist()
-            
             # Prepare metadata
             if metadata is None:
                 metadata = {}
@@ -135,23 +183,11 @@ class MemoryService:
                 'content_preview': content[:100] + '...' if len(content) > 100 else content
             })
             
-            # Store in Qdrant
+            # Embedded and stored in the next write-behind batch
             point_id = str(uuid.uuid4())
-            self.client.upsert(
-                collection_name=collection_name,
-                points=[
-                    models.PointStruct(
-                        id=point_id,
-                        vector=embedding,
-                        payload={
-                            'content': content,
-                            **metadata
-                        }
-                    )
-                ]
-            )
+            self.writer.enqueue(collection_name, point_id, content, metadata)
             
-            logging.info(f"Stored memory for {agent_type} user {user_id}")
+            logging.info(f"Queued memory for {agent_type} user {user_id}")
             return True
             
         except Exception as e:
@@ -184,22 +220,10 @@ class MemoryService:
                 return []
             
             # Generate query embedding
-            query_embedding = self.encoder.encode(query).tolist()
+            query_embedding = self.pipeline.encode(query)
             
-            # Search in Qdrant
-            search_results = self.client.search(
-                collection_name=collection_name,
-                query_vector=query_embedding,
-                query_filter=models.Filter(
-                    must=[
-                        models.FieldCondition(
-                            key="user_id",
-                            match=models.MatchValue(value=user_id)
-                        )
-                    ]
-                ),
-                limit=limit
-            )
+            # Search the vector store
+            search_results = self.store.search(collection_name, query_embedding, {'user_id': user_id}, limit)
             
             # Format results
             memories = []
@@ -234,27 +258,12 @@ class MemoryService:
             collection_name = f"{agent_type}_memory" if agent_type else "global_user_memory"
             
             # Search for preference entries
-            search_results = self.client.scroll(
-                collection_name=collection_name,
-                scroll_filter=models.Filter(
-                    must=[
-                        models.FieldCondition(
-                            key="user_id",
-                            match=models.MatchValue(value=user_id)
-                        ),
-                        models.FieldCondition(
-                            key="type",
-                            match=models.MatchValue(value="preference")
-                        )
-                    ]
-                ),
-                limit=100
-            )
+            payloads = self.store.scroll(collection_name, {'user_id': user_id, 'type': 'preference'}, 100)
             
             preferences = {}
-            for point in search_results[0]:
-                if 'preference_key' in point.payload and 'preference_value' in point.payload:
-                    preferences[point.payload['preference_key']] = point.payload['preference_value']
+            for payload in payloads:
+                if 'preference_key' in payload and 'preference_value' in payload:
+                    preferences[payload['preference_key']] = payload['preference_value']
             
             return preferences
             
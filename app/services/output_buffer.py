@@ -0,0 +1,193 @@
+"""
+Output Buffer for code execution.
+
+Holds a run's console output as a bounded ring of text chunks instead of one
+ever-growing string. Output past the byte cap drops the oldest chunks, and a
+reader asking for dropped output gets a truncation marker in its place.
+
+Every character written has an absolute offset, so pollers and streams read
+incrementally with read(since=offset) and only receive output they have not
+seen, however long the run's total output grows.
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+# Most output bytes kept per run
+MAX_OUTPUT_BYTES = int(os.getenv('EXECUTION_OUTPUT_MAX_BYTES', 1024 * 1024))
+
+# Lines are gathered into chunks of up to this size before joining the ring
+CHUNK_BYTES = 16 * 1024
+
+
+def truncation_marker(dropped: int) -> str:
+    """
+    Text standing in for output that was dropped from the buffer.
+
+    Args:
+        dropped: Characters of output dropped.
+
+    Returns:
+        str: The marker line.
+    """
+    return f"[... {dropped} characters of earlier output truncated ...]\n"
+
+
+class OutputBuffer:
+    """
+    A thread-safe, size-capped buffer of one run's output with offset-based reads.
+    """
+
+    def __init__(self, max_bytes: int = MAX_OUTPUT_BYTES):
+        """
+        Initialize the buffer.
+
+        Args:
+            max_bytes: Most UTF-8 bytes of output to keep.
+        """
+        self.max_bytes = max(1, max_bytes)
+        # Small chunks for small caps, so dropping one never empties the buffer
+        self._chunk_bytes = max(1, min(CHUNK_BYTES, self.max_bytes // 4))
+        self.closed = False
+
+        # Sealed chunks as (offset, text, size in bytes), oldest first
+        self._chunks = deque()
+        # Lines not yet joined into a chunk
+        self._tail = []
+        self._tail_offset = 0
+        self._tail_bytes = 0
+
+        self._start = 0
+        self._end = 0
+        self._bytes = 0
+        self._total_bytes = 0
+        self._condition = threading.Condition()
+
+    @property
+    def end(self) -> int:
+        """Offset just past the last character written."""
+        return self._end
+
+    @property
+    def dropped(self) -> int:
+        """Characters dropped from the front of the buffer."""
+        return self._start
+
+    def write(self, text: str):
+        """
+        Append output, dropping the oldest output past the byte cap.
+
+        Args:
+            text: The text to append.
+        """
+        if not text:
+            return
+        size = len(text.encode('utf-8', 'replace'))
+        length = len(text)
+
+        with self._condition:
+            self._total_bytes += size
+            if size > self.max_bytes:
+                # A single write bigger than the whole buffer keeps only its end
+                self._seal()
+                self._chunks.clear()
+                self._bytes = 0
+                text = text[-self.max_bytes:]
+                size = len(text.encode('utf-8', 'replace'))
+                self._start = self._end + length - len(text)
+            elif self._tail_bytes + size > self._chunk_bytes:
+                self._seal()
+
+            if not self._tail:
+                self._tail_offset = self._end + length - len(text)
+            self._end += length
+            self._tail.append(text)
+            self._tail_bytes += size
+            self._bytes += size
+            self._trim()
+            self._condition.notify_all()
+
+    def _seal(self):
+        if self._tail:
+            self._chunks.append((self._tail_offset, ''.join(self._tail), self._tail_bytes))
+            self._tail = []
+            self._tail_bytes = 0
+
+    def _trim(self):
+        while self._bytes > self.max_bytes and self._chunks:
+            offset, text, size = self._chunks.popleft()
+            self._bytes -= size
+            self._start = offset + len(text)
+
+    def read(self, since: int = 0) -> Tuple[str, int, int]:
+        """
+        Read output written at or after an offset.
+
+        Args:
+            since: Offset returned by the previous read, or 0 for everything kept.
+
+        Returns:
+            Tuple[str, int, int]: The text, the offset to pass to the next read, and
+            how many characters between since and the text were dropped. Dropped
+            output is replaced by a truncation marker at the start of the text.
+        """
+        with self._condition:
+            if since < 0 or since > self._end:
+                since = 0
+            dropped = max(0, self._start - since)
+            since = max(since, self._start)
+
+            parts = []
+            if self._tail and since < self._end:
+                tail = ''.join(self._tail)
+                if len(self._tail) > 1:
+                    self._tail = [tail]
+                parts.append(tail[max(0, since - self._tail_offset):])
+            if since < self._tail_offset or not self._tail:
+                # Walk back from the newest chunk; incremental reads stop after one or two
+                for offset, text, _ in reversed(self._chunks):
+                    if offset + len(text) <= since:
+                        break
+                    parts.append(text[max(0, since - offset):])
+
+            text = ''.join(reversed(parts))
+            if dropped:
+                text = truncation_marker(dropped) + text
+            return text, self._end, dropped
+
+    def getvalue(self) -> str:
+        """Return all output kept, with a truncation marker if any was dropped."""
+        return self.read(0)[0]
+
+    def wait(self, since: int, timeout: Optional[float] = None) -> bool:
+        """
+        Block until output past an offset is written or the buffer is closed.
+
+        Args:
+            since: Offset the caller has read up to.
+            timeout: Most seconds to wait.
+
+        Returns:
+            bool: True if there is new output or the buffer is closed.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._end > since or self.closed, timeout)
+
+    def close(self):
+        """Mark the output as complete and wake any waiting readers."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def get_stats(self) -> dict:
+        """Return the buffer's sizes."""
+        with self._condition:
+            return {
+                'characters': self._end,
+                'bytes_written': self._total_bytes,
+                'bytes_kept': self._bytes,
+                'characters_dropped': self._start,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,550 @@
+"""
+Sandbox Runner Service
+
+This module runs user projects for the code executors. Instead of starting a
+fresh interpreter per run, it keeps a zygote interpreter (sandbox_zygote.py)
+that has already imported the heavy libraries projects use (numpy, flask,
+pygame, ...) and forks it for each run, so a run pays a fork instead of
+interpreter startup and module imports. If the zygote is unavailable the run is
+spawned as a fresh interpreter with the same sandboxing.
+
+Every run gets its own session, working directory, a minimal environment
+without the app's secrets, CPU/memory/file size limits and a network policy
+(no network by default). The network policy is enforced by an audit hook in the
+run's interpreter, which also refuses starting programs and ctypes; it is not a
+security boundary, so isolate the host's network for untrusted code. Output from all runs is read by one selector-driven
+multiplexer thread instead of two reader threads per process, and delivered
+line by line to a callback.
+
+Configuration:
+    SANDBOX_ZYGOTE: Fork runs from a pre-imported zygote, started on the first run (default true)
+    SANDBOX_PREIMPORT: Modules the zygote imports up front
+    SANDBOX_CPU_SECONDS, SANDBOX_MEMORY_MB, SANDBOX_FILE_SIZE_MB: Per-run limits
+    SANDBOX_NETWORK: 'none' (default), 'loopback' or 'full'
+    SANDBOX_MAX_SECONDS: Wall time after which a run is killed (default 300)
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import codecs
+import signal
+import socket
+import logging
+import selectors
+import threading
+import subprocess
+from collections import deque
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+ZYGOTE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_zygote.py')
+
+USE_ZYGOTE = os.getenv('SANDBOX_ZYGOTE', 'true').lower() == 'true' and hasattr(os, 'fork') and hasattr(socket, 'send_fds')
+PREIMPORT = os.getenv('SANDBOX_PREIMPORT', 'numpy,flask,pygame,PIL.Image,requests')
+CPU_SECONDS = int(os.getenv('SANDBOX_CPU_SECONDS', 60))
+MEMORY_MB = int(os.getenv('SANDBOX_MEMORY_MB', 1024))
+FILE_SIZE_MB = int(os.getenv('SANDBOX_FILE_SIZE_MB', 64))
+OPEN_FILES = 256
+NETWORK_POLICY = os.getenv('SANDBOX_NETWORK', 'none')
+MAX_SECONDS = float(os.getenv('SANDBOX_MAX_SECONDS', 300))
+
+ZYGOTE_READY_TIMEOUT = 60
+START_TIMEOUT = 10
+# Seconds to let processes the run left behind release its pipes before the group is killed
+EXIT_GRACE = 1.0
+
+# Environment variables passed through to runs; everything else, including API keys, is dropped
+ENV_WHITELIST = ('PATH', 'LANG', 'LC_ALL', 'LC_CTYPE', 'TZ', 'TERM', 'DISPLAY', 'PYTHONPATH', 'VIRTUAL_ENV')
+
+LATENCY_SAMPLES = 1024
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[int(round((pct / 100.0) * (len(sorted_values) - 1)))]
+
+
+class SandboxProcess:
+    """A running sandboxed project, with the parts of the Popen interface the executors use."""
+
+    def __init__(self, run_id: str, main_file: str, on_output: Callable[[str, str], None],
+                 on_exit: Optional[Callable[['SandboxProcess'], None]], deadline: float):
+        self.run_id = run_id
+        self.args = [sys.executable, main_file]
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.mode = None
+        self.timed_out = False
+        self.started_at = time.monotonic()
+        self.first_output_at: Optional[float] = None
+        self.on_output = on_output
+        self.on_exit = on_exit
+        self.deadline = deadline
+        self._open_streams = 2
+        self._popen: Optional[subprocess.Popen] = None
+        self._exit_at: Optional[float] = None
+        self._started = threading.Event()
+        self._done = threading.Event()
+        self._error: Optional[str] = None
+
+    def poll(self) -> Optional[int]:
+        """Return the exit code once the process has exited, otherwise None."""
+        return self.returncode
+
+    def wait(self, timeout: float = None) -> int:
+        """
+        Wait for the process to exit and its output to be delivered.
+
+        Raises:
+            subprocess.TimeoutExpired: If it is still running after timeout seconds
+        """
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def send_signal(self, sig: int):
+        """Signal the run and every process it started."""
+        if self.pid is None or self._done.is_set():
+            return
+        try:
+            os.killpg(self.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class SandboxRunner:
+    """Runs projects in sandboxed processes forked from a pre-imported zygote."""
+
+    def __init__(self, use_zygote: bool = None, preimport: str = None, cpu_seconds: int = None,
+                 memory_mb: int = None, file_size_mb: int = None, network: str = None, max_seconds: float = None):
+        """
+        Initialize the runner and start its output multiplexer. Call start_zygote() to warm the zygote.
+
+        Args:
+            use_zygote (bool, optional): Fork runs from a zygote. Defaults to SANDBOX_ZYGOTE.
+            preimport (str, optional): Comma-separated modules the zygote imports. Defaults to SANDBOX_PREIMPORT.
+            cpu_seconds (int, optional): CPU time limit per run. Defaults to SANDBOX_CPU_SECONDS or 60.
+            memory_mb (int, optional): Address space limit per run. Defaults to SANDBOX_MEMORY_MB or 1024.
+            file_size_mb (int, optional): Largest file a run may write. Defaults to SANDBOX_FILE_SIZE_MB or 64.
+            network (str, optional): 'none', 'loopback' or 'full'. Defaults to SANDBOX_NETWORK or 'none'.
+            max_seconds (float, optional): Wall time before a run is killed. Defaults to SANDBOX_MAX_SECONDS or 300.
+        """
+        self.use_zygote = USE_ZYGOTE if use_zygote is None else use_zygote
+        self.preimport = PREIMPORT if preimport is None else preimport
+        self.limits = {
+            'cpu_seconds': cpu_seconds or CPU_SECONDS,
+            'memory_bytes': (memory_mb or MEMORY_MB) * 1024 * 1024,
+            'file_size_bytes': (file_size_mb or FILE_SIZE_MB) * 1024 * 1024,
+            'open_files': OPEN_FILES
+        }
+        self.network = network or NETWORK_POLICY
+        self.max_seconds = max_seconds or MAX_SECONDS
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._zygote_lock = threading.Lock()
+        self._zygote: Optional[subprocess.Popen] = None
+        self._control: Optional[socket.socket] = None
+        self._closed = False
+        self.preloaded = []
+
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, ('wakeup', None))
+        # Work for the multiplexer thread, which owns the selector
+        self._pending = deque()
+        self._processes: Dict[str, SandboxProcess] = {}
+        self._by_pid: Dict[int, SandboxProcess] = {}
+
+        self.runs = 0
+        self.zygote_runs = 0
+        self.spawned_runs = 0
+        self.timeouts = 0
+        self._first_output = deque(maxlen=LATENCY_SAMPLES)
+
+        self._thread = threading.Thread(target=self._multiplex, name='sandbox-output', daemon=True)
+        self._thread.start()
+
+    def start_zygote(self) -> bool:
+        """
+        Start the zygote if it is not running.
+
+        Returns:
+            bool: True if runs can be forked from the zygote
+        """
+        if not self.use_zygote:
+            return False
+        with self._zygote_lock:
+            if self._zygote is not None and self._zygote.poll() is None:
+                return True
+            parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            env = self._base_env()
+            env.update({
+                'SANDBOX_PREIMPORT': self.preimport,
+                'PYGAME_HIDE_SUPPORT_PROMPT': '1',
+                # Native thread pools do not survive a fork
+                'OPENBLAS_NUM_THREADS': '1',
+                'OMP_NUM_THREADS': '1',
+                'MKL_NUM_THREADS': '1'
+            })
+            try:
+                zygote = subprocess.Popen(
+                    [sys.executable, ZYGOTE_SCRIPT, '--zygote', str(child.fileno())],
+                    pass_fds=[child.fileno()], env=env, cwd='/', stdin=subprocess.DEVNULL,
+                    start_new_session=True
+                )
+                child.close()
+                parent.settimeout(ZYGOTE_READY_TIMEOUT)
+                ready = json.loads(parent.recv(65536) or b'{}')
+                if ready.get('op') != 'ready':
+                    raise RuntimeError('zygote exited during startup')
+            except Exception as e:
+                logger.error(f"Error starting sandbox zygote, spawning runs instead: {str(e)}")
+                child.close()
+                parent.close()
+                return False
+
+            parent.setblocking(False)
+            self._zygote = zygote
+            self._control = parent
+            self.preloaded = ready.get('preloaded', [])
+            self._call_soon(lambda: self._selector.register(parent, selectors.EVENT_READ, ('control', parent)))
+            logger.info(f"Sandbox zygote {zygote.pid} ready with {', '.join(self.preloaded) or 'no modules'} preloaded")
+            return True
+
+    def _zygote_ready(self) -> bool:
+        return self._control is not None and self._zygote is not None and self._zygote.poll() is None
+
+    def _base_env(self) -> Dict[str, str]:
+        env = {name: os.environ[name] for name in ENV_WHITELIST if name in os.environ}
+        env.setdefault('PATH', os.defpath)
+        env['PYTHONUNBUFFERED'] = '1'
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+        return env
+
+    def start(self, main_file: str, cwd: str, env: Dict[str, str] = None,
+              on_output: Callable[[str, str], None] = None,
+              on_exit: Callable[[SandboxProcess], None] = None, timeout: float = None) -> SandboxProcess:
+        """
+        Run a project's main file in a sandbox.
+
+        Args:
+            main_file (str): The script to run
+            cwd (str): The run's working directory; also its HOME and TMPDIR
+            env (dict, optional): Environment variables on top of the minimal sandbox environment
+            on_output (callable, optional): Called with ('stdout' or 'stderr', line) from the multiplexer thread
+            on_exit (callable, optional): Called with the process once it has exited and its output is delivered
+            timeout (float, optional): Wall time before the run is killed. Defaults to max_seconds.
+
+        Returns:
+            SandboxProcess: The running process
+        """
+        run_env = self._base_env()
+        run_env.update({'HOME': cwd, 'TMPDIR': cwd})
+        run_env.update(env or {})
+        request = {
+            'id': uuid.uuid4().hex,
+            'main_file': os.path.abspath(main_file),
+            'cwd': cwd,
+            'env': run_env,
+            'limits': self.limits,
+            'network': self.network
+        }
+        process = SandboxProcess(request['id'], request['main_file'], on_output or (lambda *_: None), on_exit,
+                                 time.monotonic() + (timeout or self.max_seconds))
+
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        for fd in (out_r, err_r):
+            os.set_blocking(fd, False)
+        with self._lock:
+            self._processes[process.run_id] = process
+            self.runs += 1
+
+        def register():
+            for fd, stream in ((out_r, 'stdout'), (err_r, 'stderr')):
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                self._selector.register(fd, selectors.EVENT_READ, ('output', (process, stream, decoder, [''])))
+        self._call_soon(register)
+
+        if self.use_zygote and not self._zygote_ready() and not self._zygote_lock.locked():
+            # Runs are spawned until the zygote is back
+            threading.Thread(target=self.start_zygote, name='sandbox-zygote-start', daemon=True).start()
+        try:
+            if self._zygote_ready() and self._fork(process, request, out_w, err_w):
+                process.mode = 'zygote'
+                self.zygote_runs += 1
+            else:
+                self._spawn(process, request, out_w, err_w)
+                process.mode = 'spawn'
+                self.spawned_runs += 1
+        except Exception:
+            with self._lock:
+                self._processes.pop(process.run_id, None)
+            for fd in (out_r, err_r):
+                self._call_soon(lambda fd=fd: self._close_stream(fd))
+            raise
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+        return process
+
+    def _fork(self, process: SandboxProcess, request: Dict[str, Any], out_w: int, err_w: int) -> bool:
+        try:
+            with self._send_lock:
+                socket.send_fds(self._control, [json.dumps(request).encode()], [out_w, err_w])
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Sandbox zygote unreachable, spawning run instead: {str(e)}")
+            return False
+        if not process._started.wait(START_TIMEOUT) or process._error:
+            logger.warning(f"Sandbox zygote did not start run {process.run_id}: {process._error or 'timeout'}")
+            process._started.clear()
+            return False
+        return True
+
+    def _spawn(self, process: SandboxProcess, request: Dict[str, Any], out_w: int, err_w: int):
+        popen = subprocess.Popen(
+            [sys.executable, ZYGOTE_SCRIPT, '--run', json.dumps(request)],
+            cwd=request['cwd'], env=request['env'], stdin=subprocess.DEVNULL, stdout=out_w, stderr=err_w,
+            start_new_session=True
+        )
+        process.pid = popen.pid
+        process._popen = popen
+        process._started.set()
+
+    def _call_soon(self, func: Callable[[], None]):
+        self._pending.append(func)
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except BlockingIOError:
+            pass
+
+    def _multiplex(self):
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                processes = list(self._processes.values())
+            wake_times = []
+            for process in processes:
+                if process._popen is not None and process.returncode is None:
+                    # Spawned runs are not reaped by the zygote, so poll them
+                    if process._popen.poll() is not None:
+                        self._exited(process, process._popen.returncode)
+                    else:
+                        wake_times.append(now + 0.1)
+                if process.returncode is None:
+                    if now >= process.deadline:
+                        process.timed_out = True
+                        self.timeouts += 1
+                        process.kill()
+                        process.deadline = float('inf')
+                    elif process.deadline != float('inf'):
+                        wake_times.append(process.deadline)
+                elif process._exit_at is not None:
+                    if now - process._exit_at >= EXIT_GRACE:
+                        # Something the run started still holds its pipes
+                        process.kill()
+                        self._finish(process)
+                    else:
+                        wake_times.append(process._exit_at + EXIT_GRACE)
+            timeout = max(0.0, min(wake_times) - now) if wake_times else None
+
+            try:
+                events = self._selector.select(timeout)
+            except Exception as e:
+                logger.error(f"Error in sandbox output multiplexer: {str(e)}")
+                time.sleep(0.1)
+                continue
+            for key, _ in events:
+                kind, data = key.data
+                try:
+                    if kind == 'wakeup':
+                        try:
+                            os.read(self._wakeup_r, 4096)
+                        except BlockingIOError:
+                            pass
+                        while self._pending:
+                            self._pending.popleft()()
+                    elif kind == 'control':
+                        self._read_control(data)
+                    else:
+                        self._read_output(key.fd, *data)
+                except Exception as e:
+                    logger.error(f"Error in sandbox output multiplexer: {str(e)}")
+
+    def _read_control(self, control: socket.socket):
+        while True:
+            try:
+                data = control.recv(65536)
+            except BlockingIOError:
+                return
+            if not data:
+                # The zygote died; runs it forked are orphaned and finish when their pipes close
+                if not self._closed:
+                    logger.warning("Sandbox zygote exited")
+                self._selector.unregister(control)
+                control.close()
+                if self._control is control:
+                    self._control = None
+                with self._lock:
+                    orphans = [p for p in self._processes.values() if p.mode == 'zygote' and p.returncode is None]
+                for process in orphans:
+                    process.kill()
+                    self._exited(process, -signal.SIGKILL)
+                return
+            message = json.loads(data)
+            op = message.get('op')
+            if op in ('started', 'failed'):
+                with self._lock:
+                    process = self._processes.get(message['id'])
+                if process is None:
+                    continue
+                if op == 'started':
+                    process.pid = message['pid']
+                    self._by_pid[process.pid] = process
+                else:
+                    process._error = message.get('error')
+                process._started.set()
+            elif op == 'exit':
+                process = self._by_pid.pop(message['pid'], None)
+                if process is not None:
+                    self._exited(process, message['returncode'])
+
+    def _read_output(self, fd: int, process: SandboxProcess, stream: str, decoder, partial):
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if data:
+            if process.first_output_at is None:
+                process.first_output_at = time.monotonic()
+                self._first_output.append(process.first_output_at - process.started_at)
+            text = partial[0] + decoder.decode(data)
+            lines = text.splitlines(keepends=True)
+            partial[0] = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+            for line in lines:
+                self._deliver(process, stream, line)
+            return
+
+        rest = partial[0] + decoder.decode(b'', final=True)
+        if rest:
+            self._deliver(process, stream, rest)
+        self._close_stream(fd)
+        process._open_streams -= 1
+        if process._open_streams == 0 and process.returncode is not None:
+            self._finish(process)
+
+    def _deliver(self, process: SandboxProcess, stream: str, line: str):
+        try:
+            process.on_output(stream, line)
+        except Exception as e:
+            logger.error(f"Error delivering sandbox output: {str(e)}")
+
+    def _close_stream(self, fd: int):
+        try:
+            self._selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+        os.close(fd)
+
+    def _exited(self, process: SandboxProcess, returncode: int):
+        if process.returncode is not None:
+            return
+        process.returncode = returncode
+        if process._open_streams == 0:
+            self._finish(process)
+        else:
+            process._exit_at = time.monotonic()
+
+    def _finish(self, process: SandboxProcess):
+        if process._done.is_set():
+            return
+        process._exit_at = None
+        # Drop streams still held open by leftover processes
+        for key in list(self._selector.get_map().values()):
+            if key.data[0] == 'output' and key.data[1][0] is process:
+                self._close_stream(key.fd)
+        process._open_streams = 0
+        with self._lock:
+            self._processes.pop(process.run_id, None)
+        if process.pid is not None:
+            self._by_pid.pop(process.pid, None)
+        process._done.set()
+        if process.on_exit is not None:
+            try:
+                process.on_exit(process)
+            except Exception as e:
+                logger.error(f"Error in sandbox exit callback: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get runner statistics.
+
+        Returns:
+            Dict[str, Any]: Run counts by mode, active runs, zygote state and time to first output
+        """
+        samples = sorted(self._first_output)
+        with self._lock:
+            active = len(self._processes)
+        return {
+            'runs': self.runs,
+            'zygote_runs': self.zygote_runs,
+            'spawned_runs': self.spawned_runs,
+            'timeouts': self.timeouts,
+            'active': active,
+            'zygote_pid': self._zygote.pid if self._zygote_ready() else None,
+            'preloaded': self.preloaded,
+            'limits': self.limits,
+            'network': self.network,
+            'first_output_ms': {
+                'p50': round(_percentile(samples, 50) * 1000, 1),
+                'p95': round(_percentile(samples, 95) * 1000, 1),
+                'samples': len(samples)
+            }
+        }
+
+    def close(self):
+        """Stop every run and the zygote."""
+        self._closed = True
+        with self._lock:
+            processes = list(self._processes.values())
+        for process in processes:
+            process.kill()
+        if self._zygote is not None and self._zygote.poll() is None:
+            self._zygote.terminate()
+
+
+_runner: Optional[SandboxRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_sandbox_runner() -> SandboxRunner:
+    """
+    Get the process-wide sandbox runner.
+
+    The zygote is started in the background by the first run, not here, so
+    importing an executor does not fork one in every process.
+
+    Returns:
+        SandboxRunner: The runner
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = SandboxRunner()
+        return _runner
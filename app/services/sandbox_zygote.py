@@ -0,0 +1,231 @@
+"""
+Sandbox Zygote
+
+Runs as its own interpreter, outside the Flask app, and imports nothing from it.
+In zygote mode it pre-imports the heavy libraries user projects use, then forks
+one child per run on request from the sandbox runner, so a run starts with
+those modules already loaded instead of paying interpreter startup and imports
+from cold. Each child gets its own session, working directory, environment,
+resource limits and network policy before running the project's main file.
+
+Usage:
+    python sandbox_zygote.py --zygote <control socket fd>
+    python sandbox_zygote.py --run '<request json>'
+
+The control socket is a SOCK_SEQPACKET pair. Requests are JSON messages carrying
+the run's stdout and stderr pipes as SCM_RIGHTS file descriptors; the zygote
+answers with the child's pid and reports its exit status when it is reaped.
+"""
+
+import io
+import os
+import sys
+import json
+import signal
+import socket
+import runpy
+import selectors
+import traceback
+import importlib
+
+MAX_MESSAGE = 256 * 1024
+LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '::1', '0.0.0.0', '', None)
+
+
+def _is_loopback(host):
+    return host in LOOPBACK_HOSTS or (isinstance(host, str) and host.startswith('127.'))
+
+
+# Audit events that run native code or another program, which the audit hook cannot follow
+ESCAPE_EVENTS = ('subprocess.Popen', 'os.system', 'os.exec', 'os.posix_spawn', 'os.spawn', 'ctypes.dlopen')
+
+
+def _install_network_guard(policy):
+    """
+    Refuse sockets to anything but loopback ('loopback') or at all ('none').
+
+    Under either policy the run may also not start programs or load native
+    libraries through ctypes, since those would run without this hook. The hook
+    only sees what the interpreter audits, so it is a guard against accidents
+    and casual misuse, not a security boundary; isolate the host's network (a
+    network namespace or container) when running untrusted code.
+    """
+    if policy == 'full':
+        return
+
+    def guard(event, args):
+        if event in ESCAPE_EVENTS:
+            raise PermissionError(f"{event} is disabled in the sandbox")
+        if event in ('socket.connect', 'socket.bind', 'socket.sendto', 'socket.sendmsg'):
+            address = args[-1]
+            if not isinstance(address, tuple):
+                # Unix domain sockets stay local
+                return
+            if policy == 'none' or not _is_loopback(address[0]):
+                raise PermissionError(f"Network access to {address[0]} is disabled in the sandbox")
+        elif event == 'socket.getaddrinfo':
+            if policy == 'none' or not _is_loopback(args[0]):
+                raise PermissionError(f"Network access to {args[0]} is disabled in the sandbox")
+
+    sys.addaudithook(guard)
+
+
+def _apply_limits(limits):
+    try:
+        import resource
+    except ImportError:
+        return
+    for name, value in (('RLIMIT_CPU', limits.get('cpu_seconds')),
+                        ('RLIMIT_AS', limits.get('memory_bytes')),
+                        ('RLIMIT_FSIZE', limits.get('file_size_bytes')),
+                        ('RLIMIT_NOFILE', limits.get('open_files')),
+                        ('RLIMIT_CORE', 0)):
+        if value is None or not hasattr(resource, name):
+            continue
+        limit = getattr(resource, name)
+        try:
+            _, hard = resource.getrlimit(limit)
+            # Past the CPU soft limit the run gets SIGXCPU, and SIGKILL a few seconds later
+            new_hard = value + 5 if name == 'RLIMIT_CPU' else value
+            if hard != resource.RLIM_INFINITY:
+                value, new_hard = min(value, hard), min(new_hard, hard)
+            resource.setrlimit(limit, (value, new_hard))
+        except (ValueError, OSError):
+            pass
+
+
+def run_child(request):
+    """Turn the current process into a sandboxed run of the request's main file; never returns."""
+    code = 1
+    try:
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        _apply_limits(request.get('limits', {}))
+        _install_network_guard(request.get('network', 'none'))
+
+        # Line-buffered, write-through streams so output reaches the runner as it is printed
+        sys.stdout = io.TextIOWrapper(io.FileIO(1, 'w', closefd=False), line_buffering=True, write_through=True)
+        sys.stderr = io.TextIOWrapper(io.FileIO(2, 'w', closefd=False), line_buffering=True, write_through=True)
+        sys.stdin = open(os.devnull)
+        sys.argv = [request['main_file']]
+        sys.path.insert(0, os.path.dirname(request['main_file']))
+
+        runpy.run_path(request['main_file'], run_name='__main__')
+        code = 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+    os._exit(code & 0xff)
+
+
+def _preimport(names):
+    loaded, failed = [], []
+    for name in names:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            failed.append(name)
+    return loaded, failed
+
+
+def zygote(control_fd):
+    control = socket.socket(fileno=control_fd)
+    names = [n.strip() for n in os.environ.get('SANDBOX_PREIMPORT', '').split(',') if n.strip()]
+    loaded, failed = _preimport(names)
+
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    selector = selectors.DefaultSelector()
+    selector.register(control, selectors.EVENT_READ)
+    selector.register(wakeup_r, selectors.EVENT_READ)
+    control.send(json.dumps({'op': 'ready', 'pid': os.getpid(), 'preloaded': loaded, 'failed': failed}).encode())
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj == wakeup_r:
+                try:
+                    os.read(wakeup_r, 4096)
+                except BlockingIOError:
+                    pass
+                _reap(control)
+                continue
+
+            data, fds, _, _ = socket.recv_fds(control, MAX_MESSAGE, 2)
+            if not data:
+                # The runner went away
+                return
+            request = json.loads(data)
+            try:
+                pid = os.fork()
+            except OSError as e:
+                for fd in fds:
+                    os.close(fd)
+                control.send(json.dumps({'op': 'failed', 'id': request['id'], 'error': str(e)}).encode())
+                continue
+
+            if pid == 0:
+                # Child: drop the zygote's machinery and become the run
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                selector.close()
+                control.close()
+                os.close(wakeup_r)
+                os.close(wakeup_w)
+                os.setsid()
+                os.dup2(fds[0], 1)
+                os.dup2(fds[1], 2)
+                for fd in fds:
+                    os.close(fd)
+                null = os.open(os.devnull, os.O_RDONLY)
+                os.dup2(null, 0)
+                os.close(null)
+                run_child(request)
+
+            for fd in fds:
+                os.close(fd)
+            control.send(json.dumps({'op': 'started', 'id': request['id'], 'pid': pid}).encode())
+
+
+def _reap(control):
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        control.send(json.dumps({'op': 'exit', 'pid': pid,
+                                 'returncode': os.waitstatus_to_exitcode(status)}).encode())
+
+
+if __name__ == '__main__':
+    # Keep this directory's modules from shadowing the project's
+    sys.path.pop(0)
+    if len(sys.argv) == 3 and sys.argv[1] == '--zygote':
+        zygote(int(sys.argv[2]))
+    elif len(sys.argv) == 3 and sys.argv[1] == '--run':
+        run_child(json.loads(sys.argv[2]))
+    else:
+        print(__doc__, file=sys.stderr)
+        sys.exit(2)
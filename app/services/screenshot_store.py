@@ -0,0 +1,330 @@
+"""
+Screenshot Store for AutoWave
+Content-addressed storage for browser screenshots. Each screenshot is written once
+to disk under the hash of its pixels, re-encoded as WebP (or JPEG) with a small
+thumbnail next to it, and referenced by URL. Task summaries, SSE progress events
+and history entries carry those URLs instead of base64 PNGs, identical frames are
+stored once, and files that have not been requested for SCREENSHOT_TTL are removed.
+"""
+
+import io
+import os
+import re
+import time
+import base64
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, Union
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Default location of the store, next to the other local caches
+DEFAULT_STORE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'cache', 'screenshots')
+
+# URL the screenshot routes are mounted on
+SCREENSHOT_URL_PREFIX = '/screenshots'
+
+# Stored files are named <digest>.<ext> and <digest>_thumb.<ext>
+FILENAME_PATTERN = re.compile(r'^[0-9a-f]{32}(_thumb)?\.(webp|jpg|png)$')
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+MIMETYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg', 'png': 'image/png'}
+
+
+class StoredScreenshot:
+    """A screenshot in the store and the URLs it is served from."""
+
+    def __init__(self, digest: str, filename: str, thumbnail: str, path: str,
+                 size: int, original_size: int, width: int = None, deduplicated: bool = False):
+        self.digest = digest
+        self.filename = filename
+        self.thumbnail = thumbnail
+        self.path = path
+        self.size = size
+        self.original_size = original_size
+        self.width = width
+        self.deduplicated = deduplicated
+
+    @property
+    def url(self) -> str:
+        return f"{SCREENSHOT_URL_PREFIX}/{self.filename}"
+
+    @property
+    def thumbnail_url(self) -> str:
+        return f"{SCREENSHOT_URL_PREFIX}/{self.thumbnail}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'digest': self.digest,
+            'url': self.url,
+            'thumbnail_url': self.thumbnail_url,
+            'size': self.size,
+            'width': self.width
+        }
+
+
+def decode_screenshot(image: Union[bytes, str]) -> Optional[bytes]:
+    """
+    Get the image bytes of a screenshot.
+
+    Args:
+        image: Raw bytes, a data:image/...;base64 URL or a bare base64 string
+
+    Returns:
+        Optional[bytes]: The decoded bytes, or None if the input is empty or invalid
+    """
+    if not image:
+        return None
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    if image.startswith('data:image/'):
+        if ';base64,' not in image:
+            return None
+        image = image.split(';base64,', 1)[1]
+    try:
+        return base64.b64decode(image)
+    except (ValueError, TypeError):
+        return None
+
+
+class ScreenshotStore:
+    """Content-addressed screenshot files with thumbnails, deduplication and TTL cleanup."""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, ttl: float = None, image_format: str = None,
+                 quality: int = None, thumbnail_width: int = None, cleanup_interval: float = None):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding the files.
+            ttl: Seconds a screenshot is kept after it was last stored or served. Defaults to SCREENSHOT_TTL or 7 days.
+            image_format: 'webp' or 'jpeg'. Defaults to SCREENSHOT_FORMAT or webp.
+            quality: Encoder quality from 1 to 100. Defaults to SCREENSHOT_QUALITY or 80.
+            thumbnail_width: Thumbnail width in pixels. Defaults to SCREENSHOT_THUMB_WIDTH or 320.
+            cleanup_interval: Seconds between expiry sweeps. Defaults to SCREENSHOT_CLEANUP_INTERVAL or 600.
+        """
+        self.root = root
+        self.ttl = ttl if ttl is not None else float(os.getenv('SCREENSHOT_TTL', 7 * 24 * 3600))
+        self.image_format = (image_format or os.getenv('SCREENSHOT_FORMAT', 'webp')).lower()
+        if self.image_format not in ('webp', 'jpeg'):
+            logger.warning(f"Unsupported screenshot format {self.image_format}, using webp")
+            self.image_format = 'webp'
+        self.quality = quality if quality is not None else int(os.getenv('SCREENSHOT_QUALITY', 80))
+        self.thumbnail_width = thumbnail_width if thumbnail_width is not None else int(
+            os.getenv('SCREENSHOT_THUMB_WIDTH', 320))
+        self.cleanup_interval = cleanup_interval if cleanup_interval is not None else float(
+            os.getenv('SCREENSHOT_CLEANUP_INTERVAL', 600))
+
+        os.makedirs(self.root, exist_ok=True)
+        # digest -> StoredScreenshot for screenshots written by this process
+        self._index: Dict[str, StoredScreenshot] = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self._cleanup_running = False
+
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.removed = 0
+
+    def _encode(self, data: bytes):
+        """Re-encode a screenshot, returning (extension, image, thumbnail, width)."""
+        if not PIL_AVAILABLE:
+            # Without Pillow the original PNG is kept and doubles as its thumbnail
+            return 'png', data, None, None
+
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert('RGB')
+            width = img.width
+            fmt = self.image_format.upper()
+            ext = EXTENSIONS[self.image_format]
+
+            output = io.BytesIO()
+            try:
+                if fmt == 'WEBP':
+                    img.save(output, fmt, quality=self.quality, method=4)
+                else:
+                    img.save(output, fmt, quality=self.quality, optimize=True)
+            except (OSError, KeyError):
+                # Pillow built without WebP support
+                fmt, ext = 'JPEG', 'jpg'
+                output = io.BytesIO()
+                img.save(output, fmt, quality=self.quality, optimize=True)
+
+            thumb = img.copy()
+            thumb.thumbnail((self.thumbnail_width, self.thumbnail_width * 20))
+            thumb_output = io.BytesIO()
+            thumb.save(thumb_output, fmt, quality=self.quality)
+            return ext, output.getvalue(), thumb_output.getvalue(), width
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _touch(self, stored: StoredScreenshot) -> bool:
+        """Refresh the expiry of a stored screenshot, returning False if its files are gone."""
+        try:
+            os.utime(stored.path)
+            if stored.thumbnail != stored.filename:
+                os.utime(os.path.join(self.root, stored.thumbnail))
+            return True
+        except OSError:
+            return False
+
+    def put(self, image: Union[bytes, str]) -> Optional[StoredScreenshot]:
+        """
+        Store a screenshot, reusing the existing files if identical pixels were stored before.
+
+        Args:
+            image: Raw PNG bytes, a data:image/...;base64 URL or a bare base64 string
+
+        Returns:
+            Optional[StoredScreenshot]: The stored screenshot, or None if the image could not be decoded
+        """
+        data = decode_screenshot(image)
+        if not data:
+            return None
+
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            stored = self._index.get(digest)
+        if stored is not None and self._touch(stored):
+            with self._lock:
+                self.deduplicated += 1
+            self._maybe_cleanup()
+            return StoredScreenshot(stored.digest, stored.filename, stored.thumbnail, stored.path,
+                                    stored.size, len(data), stored.width, deduplicated=True)
+
+        try:
+            ext, encoded, thumb, width = self._encode(data)
+        except Exception as e:
+            logger.error(f"Error encoding screenshot: {e}")
+            return None
+
+        filename = f"{digest}.{ext}"
+        thumbnail = f"{digest}_thumb.{ext}" if thumb is not None else filename
+        path = os.path.join(self.root, filename)
+        try:
+            self._write(path, encoded)
+            if thumb is not None:
+                self._write(os.path.join(self.root, thumbnail), thumb)
+        except OSError as e:
+            logger.error(f"Error writing screenshot {filename}: {e}")
+            return None
+
+        stored = StoredScreenshot(digest, filename, thumbnail, path, len(encoded), len(data), width)
+        with self._lock:
+            self._index[digest] = stored
+            self.stored += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(encoded)
+        self._maybe_cleanup()
+        return stored
+
+    def get_path(self, filename: str) -> Optional[str]:
+        """
+        Resolve a stored file name to its path, refreshing its expiry.
+
+        Args:
+            filename: A name produced by the store, e.g. '<digest>.webp'
+
+        Returns:
+            Optional[str]: The path, or None if the name is invalid or the file does not exist
+        """
+        if not FILENAME_PATTERN.match(filename or ''):
+            return None
+        path = os.path.join(self.root, filename)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def _maybe_cleanup(self):
+        with self._lock:
+            if self._cleanup_running or time.time() - self._last_cleanup < self.cleanup_interval:
+                return
+            self._cleanup_running = True
+            self._last_cleanup = time.time()
+        threading.Thread(target=self.cleanup, name="screenshot-cleanup", daemon=True).start()
+
+    def cleanup(self) -> int:
+        """
+        Remove screenshots that have not been stored or served within the TTL.
+
+        Returns:
+            int: Number of files removed
+        """
+        cutoff = time.time() - self.ttl
+        removed = 0
+        try:
+            for entry in os.scandir(self.root):
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    continue
+        except OSError as e:
+            logger.error(f"Error cleaning up screenshots: {e}")
+        finally:
+            with self._lock:
+                self._index = {digest: stored for digest, stored in self._index.items()
+                               if os.path.exists(stored.path)}
+                self.removed += removed
+                self._cleanup_running = False
+        if removed:
+            logger.info(f"Removed {removed} expired screenshot files")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get store statistics.
+
+        Returns:
+            Dict[str, Any]: Stored and deduplicated screenshots and the bytes saved by re-encoding
+        """
+        with self._lock:
+            return {
+                'root': self.root,
+                'format': self.image_format if PIL_AVAILABLE else 'png',
+                'indexed': len(self._index),
+                'stored': self.stored,
+                'deduplicated': self.deduplicated,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'removed': self.removed
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_screenshot_store() -> ScreenshotStore:
+    """
+    Get the process-wide screenshot store.
+
+    The directory is chosen by the SCREENSHOT_STORE_DIR environment variable and
+    defaults to cache/screenshots.
+
+    Returns:
+        ScreenshotStore: The shared store
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScreenshotStore(os.getenv('SCREENSHOT_STORE_DIR', DEFAULT_STORE_DIR))
+        return _store
@@ -2,22 +2,36 @@
 Simple Code Executor Service
 
 This module provides a simplified service for executing code in a sandboxed environment.
-It focuses on reliability rather than advanced features.
+It focuses on reliability rather than advanced features. Runs go through the shared
+sandbox runner, which forks them from a pre-imported zygote interpreter.
 """
 
 import os
-import sys
 import uuid
 import time
 import logging
+import functools
 import threading
 import subprocess
 import tempfile
 import shutil
 # Removed unused imports: base64, io, PIL.Image
 
+from app.services.sandbox_runner import get_sandbox_runner
+from app.services.output_buffer import OutputBuffer
+from app.services.task_events import task_events, execution_channel, format_event, RETRY_MS
+
 logger = logging.getLogger(__name__)
 
+# Seconds a finished run's output stays available to status requests
+OUTPUT_TTL = int(os.getenv('EXECUTION_OUTPUT_TTL', 600))
+
+# Seconds between sweeps for expired runs
+EVICTION_INTERVAL = 30
+
+# Seconds an output stream waits for more lines before sending an event
+STREAM_BATCH_SECONDS = 0.1
+
 class SimpleCodeExecutor:
     """
     A simplified code executor that focuses on reliability
@@ -30,6 +44,7 @@ class SimpleCodeExecutor:
         self.running_processes = {}
         self.output_cache = {}
         self.project_dirs = {}
+        self._last_eviction = time.time()
 
     def execute_project(self, files):
         """
@@ -41,6 +56,7 @@ class SimpleCodeExecutor:
         Returns:
             dict: Execution result with project_id and success status
         """
+        self._evict_finished()
         try:
             # Create a unique project ID
             project_id = str(uuid.uuid4())
@@ -61,17 +77,18 @@ class SimpleCodeExecutor:
 
             # Initialize output cache
             self.output_cache[project_id] = {
-                'output': '',
+                'output': OutputBuffer(),
                 'images': [],
                 'status': 'initializing',
-                'last_update': time.time()
+                'last_update': time.time(),
+                'finished_at': None
             }
 
             # Find the main file to execute
             main_file = self._find_main_file(project_dir)
             if not main_file:
-                self.output_cache[project_id]['output'] += "ERROR: Could not find a main file to execute.\n"
-                self.output_cache[project_id]['status'] = 'error'
+                self._write(project_id, "ERROR: Could not find a main file to execute.\n")
+                self._finish(project_id, 'error')
                 return {'success': False, 'project_id': project_id, 'error': 'No main file found'}
 
             # Start execution in a separate thread
@@ -146,138 +163,129 @@ class SimpleCodeExecutor:
         try:
             # Update status
             self.output_cache[project_id]['status'] = 'running'
-            self.output_cache[project_id]['output'] += f"Executing {os.path.basename(main_file)}...\n"
-
-            # Prepare environment variables
-            env = os.environ.copy()
+            self._write(project_id, f"Executing {os.path.basename(main_file)}...\n")
 
-            # Fix Flask environment variables
-            env['FLASK_DEBUG'] = 'True'
-            # Remove deprecated FLASK_ENV to prevent warnings
-            if 'FLASK_ENV' in env:
-                del env['FLASK_ENV']
-            # Set Python to not buffer output for better real-time feedback
-            env['PYTHONUNBUFFERED'] = '1'
+            # Environment for the run on top of the sandbox's minimal one
+            env = {'FLASK_DEBUG': 'True'}
 
             # For Pygame applications, set SDL_VIDEODRIVER to 'dummy'
             if self._is_pygame_project(project_dir):
-                self.output_cache[project_id]['output'] += "Detected Pygame application. Setting SDL_VIDEODRIVER to 'dummy' for headless operation.\n"
+                self._write(project_id, "Detected Pygame application. Setting SDL_VIDEODRIVER to 'dummy' for headless operation.\n")
                 env['SDL_VIDEODRIVER'] = 'dummy'
 
             # For Flask applications, modify the code to use a different port
             if self._is_flask_project(project_dir):
-                self.output_cache[project_id]['output'] += "Detected Flask application. Modifying to use port 5002 to avoid conflicts.\n"
+                self._write(project_id, "Detected Flask application. Modifying to use port 5002 to avoid conflicts.\n")
                 self._modify_flask_port(main_file)
 
             # Check if we're in a cloud environment
             is_cloud_env = os.environ.get('VERCEL') or os.environ.get('NETLIFY')
 
-            # In cloud environments, use a more restricted execution approach
+            timeout = 30  # 30 seconds timeout
             if is_cloud_env:
-                self.output_cache[project_id]['output'] += "Running in cloud environment with restricted execution.\n"
-
+                self._write(project_id, "Running in cloud environment with restricted execution.\n")
                 # Use a shorter timeout for cloud environments
-                timeout = 15  # 15 seconds timeout for cloud environments
-
-                try:
-                    # Use check_output instead of Popen for simpler process management
-                    result = subprocess.check_output(
-                        [sys.executable, main_file],
-                        cwd=project_dir,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        timeout=timeout,
-                        env=env
-                    )
-                    self.output_cache[project_id]['output'] += result
-                    self.output_cache[project_id]['status'] = 'completed'
-                    return
-                except subprocess.TimeoutExpired as e:
-                    self.output_cache[project_id]['output'] += f"\nExecution timed out after {timeout} seconds.\n"
-                    self.output_cache[project_id]['status'] = 'error'
-                    return
-                except subprocess.CalledProcessError as e:
-                    self.output_cache[project_id]['output'] += f"\nExecution failed with exit code {e.returncode}.\n"
-                    self.output_cache[project_id]['output'] += e.output
-                    self.output_cache[project_id]['status'] = 'error'
-                    return
-
-            # For non-cloud environments, use the standard approach with Popen
-            process = subprocess.Popen(
-                [sys.executable, main_file],
-                cwd=project_dir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                env=env
+                timeout = 15
+
+            # Run in a sandbox forked from the pre-imported zygote; output arrives line by line
+            process = get_sandbox_runner().start(
+                main_file,
+                project_dir,
+                env=env,
+                on_output=functools.partial(self._append_output, project_id)
             )
 
             # Store the process
             self.running_processes[project_id] = process
 
-            # Start threads to read output
-            stdout_thread = threading.Thread(
-                target=self._read_output,
-                args=(process.stdout, project_id, 'stdout')
-            )
-            stderr_thread = threading.Thread(
-                target=self._read_output,
-                args=(process.stderr, project_id, 'stderr')
-            )
-
-            stdout_thread.start()
-            stderr_thread.start()
-
             # Wait for the process to complete (with a timeout)
             try:
-                process.wait(timeout=30)  # 30 seconds timeout
+                process.wait(timeout=timeout)
             except subprocess.TimeoutExpired:
-                self.output_cache[project_id]['output'] += "\nExecution timed out after 30 seconds.\n"
+                self._write(project_id, f"\nExecution timed out after {timeout} seconds.\n")
                 process.terminate()
                 try:
                     process.wait(timeout=5)
-                except:
+                except subprocess.TimeoutExpired:
                     process.kill()
+                    process.wait(timeout=5)
 
-            # Wait for output threads to complete
-            stdout_thread.join()
-            stderr_thread.join()
-
-            # Update status
-            if process.returncode == 0:
-                self.output_cache[project_id]['status'] = 'completed'
-                self.output_cache[project_id]['output'] += "\nExecution completed successfully.\n"
+            # Update status, unless the user already stopped the run
+            if self.output_cache[project_id]['status'] == 'stopped':
+                pass
+            elif process.returncode == 0:
+                self._write(project_id, "\nExecution completed successfully.\n")
+                self._finish(project_id, 'completed')
             else:
-                self.output_cache[project_id]['status'] = 'error'
-                self.output_cache[project_id]['output'] += f"\nExecution failed with exit code {process.returncode}.\n"
+                self._write(project_id, f"\nExecution failed with exit code {process.returncode}.\n")
+                self._finish(project_id, 'error')
 
         except Exception as e:
             logger.error(f"Error executing project: {str(e)}")
-            self.output_cache[project_id]['output'] += f"ERROR: {str(e)}\n"
-            self.output_cache[project_id]['status'] = 'error'
+            self._write(project_id, f"ERROR: {str(e)}\n")
+            self._finish(project_id, 'error')
 
         finally:
             # Clean up
             if project_id in self.running_processes:
                 del self.running_processes[project_id]
 
-    def _read_output(self, pipe, project_id, stream_type):
+    def _write(self, project_id, text):
+        """
+        Append text to a project's output buffer
+
+        Args:
+            project_id (str): Project ID
+            text (str): The text to append
+        """
+        entry = self.output_cache.get(project_id)
+        if entry:
+            entry['output'].write(text)
+            entry['last_update'] = time.time()
+            task_events.publish(execution_channel(project_id))
+
+    def _finish(self, project_id, status):
         """
-        Read output from a process pipe
+        Record a project's final status and close its output
+
+        Args:
+            project_id (str): Project ID
+            status (str): 'completed', 'error' or 'stopped'
+        """
+        entry = self.output_cache.get(project_id)
+        if entry:
+            entry['status'] = status
+            entry['finished_at'] = time.time()
+            entry['output'].close()
+            task_events.publish(execution_channel(project_id))
+
+    def _append_output(self, project_id, stream_type, line):
+        """
+        Append a line of process output to the output cache
 
         Args:
-            pipe: Process pipe to read from
             project_id (str): Project ID
             stream_type (str): Type of stream ('stdout' or 'stderr')
+            line (str): The output line
         """
         prefix = "ERROR: " if stream_type == 'stderr' else ""
+        self._write(project_id, f"{prefix}{line}")
 
-        for line in pipe:
-            if project_id in self.output_cache:
-                self.output_cache[project_id]['output'] += f"{prefix}{line}"
-                self.output_cache[project_id]['last_update'] = time.time()
+    def _evict_finished(self):
+        """
+        Drop the output and project directories of runs finished more than OUTPUT_TTL ago
+        """
+        now = time.time()
+        if now - self._last_eviction < EVICTION_INTERVAL:
+            return
+        self._last_eviction = now
+
+        for project_id, entry in list(self.output_cache.items()):
+            if entry['finished_at'] and now - entry['finished_at'] > OUTPUT_TTL:
+                self.output_cache.pop(project_id, None)
+                project_dir = self.project_dirs.pop(project_id, None)
+                if project_dir:
+                    shutil.rmtree(project_dir, ignore_errors=True)
 
     def _is_pygame_project(self, project_dir):
         """
@@ -384,24 +392,80 @@ class SimpleCodeExecutor:
         except Exception as e:
             logger.error(f"Error modifying Flask port: {str(e)}")
 
-    def get_execution_status(self, project_id):
+    def get_execution_status(self, project_id, since=None):
         """
         Get the current execution status of a project
 
         Args:
             project_id (str): Project ID
+            since (int, optional): Output offset from the previous status; only output
+                written after it is returned. Omit for all the output kept.
 
         Returns:
-            dict: Execution status
+            dict: Execution status; status['offset'] is the offset to poll with next
         """
-        if project_id in self.output_cache:
+        self._evict_finished()
+        entry = self.output_cache.get(project_id)
+        if entry:
+            output, offset, truncated = entry['output'].read(since or 0)
             return {
                 'success': True,
-                'status': self.output_cache[project_id]
+                'status': {
+                    'output': output,
+                    'offset': offset,
+                    'truncated': truncated,
+                    'images': entry['images'],
+                    'status': entry['status'],
+                    'last_update': entry['last_update']
+                }
             }
 
         return {'success': False, 'error': 'Project not found'}
 
+    def iter_output_events(self, project_id, last_event_id=None, timeout=15):
+        """
+        Stream a project's output as Server-Sent Events, blocking the calling thread
+
+        Event IDs are output offsets, so a reconnecting client resumes where it left off.
+        Used when the async task stream server is not running in this process; it
+        serves the same events without a thread per client.
+
+        Args:
+            project_id (str): Project ID
+            last_event_id (str, optional): The client's Last-Event-ID header, if reconnecting
+            timeout (float): Seconds between keep-alive comments on an idle stream
+
+        Yields:
+            str: Event text
+        """
+        try:
+            offset = max(0, int(last_event_id)) if last_event_id else 0
+        except ValueError:
+            offset = 0
+        yield f"retry: {RETRY_MS}\n\n"
+
+        while True:
+            entry = self.output_cache.get(project_id)
+            if not entry:
+                yield format_event({'status': 'error', 'error': 'Project not found'})
+                break
+
+            buffer = entry['output']
+            closed = buffer.closed
+            output, offset, truncated = buffer.read(offset)
+            if output:
+                yield format_event({'output': output, 'truncated': truncated, 'status': entry['status']}, offset)
+
+            if closed:
+                yield format_event({'status': entry['status'], 'done': True}, offset)
+                break
+
+            # Wait for output, then briefly let a chatty program's lines gather into one event
+            if buffer.wait(offset, timeout):
+                time.sleep(STREAM_BATCH_SECONDS)
+            elif not buffer.closed:
+                yield ": keep-alive\n\n"
+
     def stop_execution(self, project_id):
         """
         Stop the execution of a project
@@ -414,6 +478,10 @@ class SimpleCodeExecutor:
         """
         if project_id in self.running_processes:
             try:
+                # Mark the run stopped first so its thread does not report the kill as a failure
+                if project_id in self.output_cache:
+                    self.output_cache[project_id]['status'] = 'stopped'
+
                 # Terminate the process
                 self.running_processes[project_id].terminate()
 
@@ -425,12 +493,11 @@ class SimpleCodeExecutor:
                     self.running_processes[project_id].kill()
 
                 # Update status
-                if project_id in self.output_cache:
-                    self.output_cache[project_id]['status'] = 'stopped'
-                    self.output_cache[project_id]['output'] += "\nExecution stopped by user.\n"
+                self._write(project_id, "\nExecution stopped by user.\n")
+                self._finish(project_id, 'stopped')
 
                 # Clean up
-                del self.running_processes[project_id]
+                self.running_processes.pop(project_id, None)
 
                 return {'success': True}
             except Exception as e:
@@ -4,8 +4,11 @@ Handles subscription lifecycle, credit management, and feature access control
 """
 
 import os
+import time
 import logging
 import sqlite3
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
@@ -20,6 +23,13 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Seconds a user's resolved subscription and plan stay cached
+ENTITLEMENT_TTL = float(os.getenv('SUBSCRIPTION_CACHE_TTL', 60))
+ENTITLEMENT_CACHE_SIZE = int(os.getenv('SUBSCRIPTION_CACHE_SIZE', 10000))
+
+# Active subscription with its plan embedded, resolved by PostgREST in one request
+SUBSCRIPTION_WITH_PLAN = '*, subscription_plans(*)'
+
 @dataclass
 class SubscriptionPlan:
     """Subscription plan data structure"""
@@ -56,6 +66,62 @@ class UserCredits:
     billing_period_end: datetime
     rollover_credits: int
 
+@dataclass
+class PlanEntitlements:
+    """A user's active subscription and plan, as cached for paywall checks"""
+    user_id: str
+    subscription: Optional[UserSubscription]
+    plan: Optional[SubscriptionPlan]
+    fetched_at: float
+
+    @property
+    def plan_name(self) -> Optional[str]:
+        return self.plan.plan_name if self.plan else None
+
+    @property
+    def features(self) -> Dict[str, Any]:
+        return self.plan.features if self.plan and self.plan.features else {}
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _parse_subscription(data: Dict[str, Any]) -> UserSubscription:
+    return UserSubscription(
+        id=data['id'],
+        user_id=data['user_id'],
+        plan_id=data['plan_id'],
+        status=data['status'],
+        payment_gateway=data['payment_gateway'],
+        gateway_subscription_id=data.get('gateway_subscription_id'),
+        current_period_start=_parse_datetime(data['current_period_start']),
+        current_period_end=_parse_datetime(data['current_period_end']),
+        cancel_at_period_end=data['cancel_at_period_end']
+    )
+
+def _parse_plan(data: Dict[str, Any]) -> SubscriptionPlan:
+    return SubscriptionPlan(
+        id=data['id'],
+        plan_name=data['plan_name'],
+        display_name=data['display_name'],
+        monthly_price_usd=float(data['monthly_price_usd']),
+        annual_price_usd=float(data['annual_price_usd']),
+        monthly_credits=data['monthly_credits'],
+        features=data['features'],
+        is_active=data['is_active']
+    )
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _get_supabase_client(url: str, key: str):
+    """Get the process-wide Supabase client for a URL and key, reusing its HTTP connections"""
+    with _clients_lock:
+        client = _clients.get((url, key))
+        if client is None:
+            client = create_client(url, key)
+            _clients[(url, key)] = client
+        return client
+
 class SubscriptionService:
     """Manages user subscriptions, credits, and feature access"""
 
@@ -82,7 +148,7 @@ class SubscriptionService:
                 not supabase_key.startswith('your_')):
                 try:
                     logger.info("Attempting to create Supabase client...")
-                    self.supabase = create_client(supabase_url, supabase_key)
+                    self.supabase = _get_supabase_client(supabase_url, supabase_key)
                     self.use_supabase = True
                     logger.info("✅ Using Supabase for subscription management")
                 except Exception as e:
@@ -102,7 +168,88 @@ class SubscriptionService:
         if not self.use_supabase:
             self.sqlite_db_path = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'subscriptions.db')
             logger.info("Using SQLite for subscription management (fallback mode)")
-        
+
+        self.entitlement_ttl = ENTITLEMENT_TTL
+        self._entitlements = OrderedDict()
+        self._entitlements_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def get_entitlements(self, user_id: str, refresh: bool = False) -> PlanEntitlements:
+        """
+        Get a user's active subscription and plan, cached for SUBSCRIPTION_CACHE_TTL seconds.
+
+        Subscription and plan are fetched together in one query. Users without a
+        subscription are cached too, so repeated checks for them stay off the network.
+
+        Args:
+            user_id: User ID
+            refresh: Bypass the cache and fetch again
+
+        Returns:
+            PlanEntitlements with subscription and plan set to None when not found
+        """
+        now = time.monotonic()
+        if not refresh:
+            with self._entitlements_lock:
+                cached = self._entitlements.get(user_id)
+                if cached is not None and now - cached.fetched_at < self.entitlement_ttl:
+                    self._entitlements.move_to_end(user_id)
+                    self.cache_hits += 1
+                    return cached
+
+        try:
+            entitlements = self._fetch_entitlements(user_id, now)
+        except Exception as e:
+            logger.error(f"Error fetching subscription entitlements: {str(e)}")
+            return PlanEntitlements(user_id, None, None, now)
+
+        with self._entitlements_lock:
+            self.cache_misses += 1
+            self._entitlements[user_id] = entitlements
+            self._entitlements.move_to_end(user_id)
+            while len(self._entitlements) > ENTITLEMENT_CACHE_SIZE:
+                self._entitlements.popitem(last=False)
+        return entitlements
+
+    def _fetch_entitlements(self, user_id: str, now: float) -> PlanEntitlements:
+        if not self.use_supabase:
+            return PlanEntitlements(user_id, None, None, now)
+
+        response = self.supabase.table('user_subscriptions').select(SUBSCRIPTION_WITH_PLAN).eq('user_id', user_id).eq('status', 'active').limit(1).execute()
+        if not response.data:
+            return PlanEntitlements(user_id, None, None, now)
+
+        data = response.data[0]
+        plan_data = data.get('subscription_plans')
+        plan = _parse_plan(plan_data) if plan_data else None
+        return PlanEntitlements(user_id, _parse_subscription(data), plan, now)
+
+    def invalidate_user(self, user_id: str):
+        """
+        Drop a user's cached entitlements after their subscription changes.
+
+        Args:
+            user_id: User ID
+        """
+        with self._entitlements_lock:
+            self._entitlements.pop(user_id, None)
+
+    def invalidate_all(self):
+        """Drop every cached entitlement, e.g. after a plan definition changes"""
+        with self._entitlements_lock:
+            self._entitlements.clear()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get entitlement cache statistics"""
+        with self._entitlements_lock:
+            return {
+                'entries': len(self._entitlements),
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'ttl': self.entitlement_ttl
+            }
+
     def get_subscription_plans(self) -> List[SubscriptionPlan]:
         """Get all active subscription plans"""
         try:
@@ -131,20 +278,7 @@ class SubscriptionService:
                         'is_active': bool(row[7])
                     })
 
-            plans = []
-            for plan_data in plan_data_list:
-                plans.append(SubscriptionPlan(
-                    id=plan_data['id'],
-                    plan_name=plan_data['plan_name'],
-                    display_name=plan_data['display_name'],
-                    monthly_price_usd=float(plan_data['monthly_price_usd']),
-                    annual_price_usd=float(plan_data['annual_price_usd']),
-                    monthly_credits=plan_data['monthly_credits'],
-                    features=plan_data['features'],
-                    is_active=plan_data['is_active']
-                ))
-
-            return plans
+            return [_parse_plan(plan_data) for plan_data in plan_data_list]
 
         except Exception as e:
             logger.error(f"Error fetching subscription plans: {str(e)}")
@@ -152,28 +286,7 @@ class SubscriptionService:
     
     def get_user_subscription(self, user_id: str) -> Optional[UserSubscription]:
         """Get user's current subscription"""
-        try:
-            response = self.supabase.table('user_subscriptions').select('*').eq('user_id', user_id).eq('status', 'active').single().execute()
-            
-            if response.data:
-                data = response.data
-                return UserSubscription(
-                    id=data['id'],
-                    user_id=data['user_id'],
-                    plan_id=data['plan_id'],
-                    status=data['status'],
-                    payment_gateway=data['payment_gateway'],
-                    gateway_subscription_id=data.get('gateway_subscription_id'),
-                    current_period_start=datetime.fromisoformat(data['current_period_start'].replace('Z', '+00:00')),
-                    current_period_end=datetime.fromisoformat(data['current_period_end'].replace('Z', '+00:00')),
-                    cancel_at_period_end=data['cancel_at_period_end']
-                )
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error fetching user subscription: {str(e)}")
-            return None
+        return self.get_entitlements(user_id).subscription
     
     def get_user_credits(self, user_id: str) -> Optional[UserCredits]:
         """Get user's current credit balance"""
@@ -238,6 +351,7 @@ class SubscriptionService:
             }
             
             self.supabase.table('user_credits').insert(credits_data).execute()
+            self.invalidate_user(user_id)
             
             logger.info(f"Created free subscription for user {user_id}")
             return True
@@ -289,17 +403,14 @@ class SubscriptionService:
         """Check if user has access to a feature and usage limits"""
         try:
             # Get user subscription and plan
-            subscription = self.get_user_subscription(user_id)
-            if not subscription:
+            entitlements = self.get_entitlements(user_id)
+            if not entitlements.subscription:
                 return {'has_access': False, 'reason': 'No active subscription'}
             
-            # Get plan features
-            plan_response = self.supabase.table('subscription_plans').select('features').eq('id', subscription.plan_id).single().execute()
-            
-            if not plan_response.data:
+            if not entitlements.plan:
                 return {'has_access': False, 'reason': 'Plan not found'}
             
-            features = plan_response.data['features']
+            features = entitlements.features
             
             # Check if feature is included in plan
             if feature_name not in features:
@@ -366,3 +477,20 @@ class SubscriptionService:
         except Exception as e:
             logger.error(f"Error recording feature usage: {str(e)}")
             return False
+
+
+_subscription_service = None
+_subscription_service_lock = threading.Lock()
+
+def get_subscription_service() -> SubscriptionService:
+    """
+    Get the process-wide subscription service shared by the paywall and payment routes.
+
+    Returns:
+        SubscriptionService: The shared service
+    """
+    global _subscription_service
+    with _subscription_service_lock:
+        if _subscription_service is None:
+            _subscription_service = SubscriptionService()
+        return _subscription_service
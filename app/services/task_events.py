@@ -0,0 +1,189 @@
+"""
+Task Events for AutoWave.
+
+This module is the in-process pub/sub between the task manager and the streams
+watching its tasks. The task manager publishes a task ID whenever the task
+changes, and the code executor publishes execution_channel(project_id) whenever
+a run prints or finishes; subscribers register a callback that only has to wake
+their stream, which then reads the new progress or output itself. It also holds the Server-Sent Events
+framing shared by the Flask progress endpoints and the async streaming server.
+
+Event IDs are the number of progress items a client has received, so a client
+reconnecting with Last-Event-ID resumes right after the last item it saw. The
+final result event carries the ID RESULT_EVENT_ID.
+"""
+
+import json
+import logging
+import threading
+from typing import Callable, Dict, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+RESULT_EVENT_ID = 'result'
+
+# Milliseconds a browser waits before reconnecting a dropped stream
+RETRY_MS = 3000
+
+
+def execution_channel(project_id: str) -> str:
+    """The broker key a code execution's output changes are published under."""
+    return f"execution:{project_id}"
+
+
+def format_event(data: Dict[str, Any], event_id: Any = None) -> str:
+    """
+    Frame a JSON payload as a Server-Sent Event.
+
+    Args:
+        data: The event payload.
+        event_id: The event ID, if the event can be resumed after.
+
+    Returns:
+        str: The event text.
+    """
+    if event_id is None:
+        return f"data: {json.dumps(data)}\n\n"
+    return f"id: {event_id}\ndata: {json.dumps(data)}\n\n"
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """
+    Read a Last-Event-ID header.
+
+    Args:
+        value: The header value.
+
+    Returns:
+        Optional[int]: Progress items the client has seen, -1 if it saw the final
+        result, or None for a fresh connection.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value == RESULT_EVENT_ID:
+        return -1
+    try:
+        return max(0, int(value))
+    except ValueError:
+        return None
+
+
+def has_final_result(last_event_id: Optional[str]) -> bool:
+    """
+    Check whether a reconnecting client already received a task's final result.
+
+    Args:
+        last_event_id: The client's Last-Event-ID header.
+
+    Returns:
+        bool: True if the stream should be answered with 204 so EventSource stops reconnecting.
+    """
+    return parse_last_event_id(last_event_id) == -1
+
+
+def iter_task_events(task_manager, task_id: str, last_event_id: Optional[str], initial: Dict[str, Any],
+                     timeout: float = 15):
+    """
+    Stream a task's progress as Server-Sent Events, blocking the calling thread.
+
+    Used by the WSGI progress endpoints; the async streaming server does the same
+    without a thread per client. A client that already received the final result
+    gets no events; check has_final_result() first to answer it with 204 instead.
+
+    Args:
+        task_manager: The task manager holding the task.
+        task_id: The task to stream.
+        last_event_id: The client's Last-Event-ID header, if reconnecting.
+        initial: Event sent first on a fresh connection.
+        timeout: Seconds between keep-alive comments on an idle stream.
+
+    Yields:
+        str: Event text.
+    """
+    seen = parse_last_event_id(last_event_id)
+    if seen == -1:
+        # The client already has the final result
+        return
+    yield f"retry: {RETRY_MS}\n\n"
+    if seen is None:
+        seen = 0
+        yield format_event(initial)
+
+    while True:
+        progress, status = task_manager.wait_for_progress(task_id, since=seen, timeout=timeout)
+
+        if status is None:
+            yield format_event({'status': 'error', 'error': 'Task not found'})
+            break
+
+        # Send new progress
+        for item in progress:
+            seen += 1
+            yield format_event(item, seen)
+
+        # If task is complete or failed, send final event and stop
+        if status in ('complete', 'error'):
+            result = task_manager.get_task_result(task_id)
+            if result:
+                yield format_event({'status': status, 'result': result}, RESULT_EVENT_ID)
+            break
+
+        # Keep idle connections alive and notice disconnected clients
+        if not progress:
+            yield ": keep-alive\n\n"
+
+
+class TaskEventBroker:
+    """Wakes subscribers when a task changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Callable[[], None]]] = {}
+        self.published = 0
+
+    def subscribe(self, task_id: str, callback: Callable[[], None]):
+        """
+        Call a function whenever a task changes.
+
+        The callback runs on the publishing thread with the task manager's lock held,
+        so it must only signal, e.g. loop.call_soon_threadsafe(event.set).
+
+        Args:
+            task_id: The task to watch.
+            callback: Called with no arguments.
+        """
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(callback)
+
+    def unsubscribe(self, task_id: str, callback: Callable[[], None]):
+        """Stop calling a subscribed function."""
+        with self._lock:
+            callbacks = self._subscribers.get(task_id)
+            if callbacks is not None:
+                callbacks.discard(callback)
+                if not callbacks:
+                    del self._subscribers[task_id]
+
+    def publish(self, task_id: str):
+        """Wake every subscriber of a task."""
+        with self._lock:
+            callbacks = list(self._subscribers.get(task_id, ()))
+            self.published += 1
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error notifying task {task_id} subscriber: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'tasks_watched': len(self._subscribers),
+                'subscribers': sum(len(callbacks) for callbacks in self._subscribers.values()),
+                'published': self.published
+            }
+
+
+# Process-wide broker the task manager publishes to
+task_events = TaskEventBroker()
@@ -0,0 +1,464 @@
+"""
+Task Stream Server for AutoWave.
+
+This module serves task progress and code execution output streams from an
+asyncio event loop instead of a WSGI worker per client, so one process can hold
+thousands of idle streams. It answers the same paths as the Flask endpoints:
+
+    GET /api/context7-tools/stream-task?task_id=...
+    GET /api/prime-agent/task-progress?task_id=...
+    GET /api/agentic-code/status/<project_id>
+    GET /health
+
+Each stream subscribes to the task event broker and only wakes when its task or
+execution changes, sends a heartbeat comment on idle connections, and honours
+Last-Event-ID (or a last_event_id query parameter) so a reconnecting client
+resumes after the last event it received. Task manager calls take its lock and
+may read SQLite, so they run in the loop's default executor, never on the loop.
+Code executions live in the process that started them, so the Flask status
+endpoint only redirects execution streams here when this process runs the
+server (see get_local_stream_url).
+
+The server runs on its own port and thread, like the screen recorder's websocket
+server. Enable it with SSE_SERVER=true; SSE_PUBLIC_URL is the base URL clients
+reach it at, which the Flask endpoints hand out as stream_url.
+
+Only one process can bind SSE_PORT. Under gunicorn with several workers the
+first worker serves every stream and the others log that the port is taken, so
+tasks created by those other workers are only visible with TASK_STORE=sqlite,
+where they are polled from the shared task store. With the default in-memory
+store, run a single worker or leave SSE_SERVER off.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qs, quote
+from typing import Dict, Any, Optional
+
+from app.services.task_events import (
+    task_events, execution_channel, format_event, parse_last_event_id, RESULT_EVENT_ID, RETRY_MS
+)
+
+logger = logging.getLogger(__name__)
+
+SSE_ENABLED = os.getenv('SSE_SERVER', 'false').lower() == 'true'
+SSE_HOST = os.getenv('SSE_HOST', '0.0.0.0')
+SSE_PORT = int(os.getenv('SSE_PORT', 5027))
+SSE_PUBLIC_URL = os.getenv('SSE_PUBLIC_URL', '').rstrip('/')
+HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT', 15))
+MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', 10000))
+ALLOW_ORIGIN = os.getenv('SSE_ALLOW_ORIGIN', '*')
+
+# Largest request head accepted
+MAX_REQUEST_BYTES = 8192
+REQUEST_TIMEOUT = 10
+
+# Path to the event sent first on a fresh connection, as the Flask endpoints do
+STREAM_ROUTES = {
+    '/api/context7-tools/stream-task': lambda task_id: {'status': 'started', 'task_id': task_id},
+    '/api/prime-agent/task-progress': lambda task_id: {'status': 'connecting', 'message': 'Connected to server'},
+}
+
+# Code execution output streams, /api/agentic-code/status/<project_id>
+EXECUTION_ROUTE = '/api/agentic-code/status/'
+
+TERMINAL_STATUSES = ('complete', 'error')
+
+# Seconds an execution stream waits for more lines before sending an event, as the Flask stream does
+EXECUTION_BATCH_SECONDS = 0.1
+
+
+def get_stream_url(path: str, task_id: str) -> str:
+    """
+    Get the URL a client should stream a task from.
+
+    Args:
+        path: The stream path, e.g. /api/context7-tools/stream-task.
+        task_id: The task to stream.
+
+    Returns:
+        str: The streaming server's URL when it is enabled, otherwise the Flask endpoint's path.
+    """
+    base = SSE_PUBLIC_URL if SSE_ENABLED and SSE_PUBLIC_URL else ''
+    return f"{base}{path}?task_id={quote(task_id)}"
+
+
+def get_local_stream_url(path: str, last_event_id: Optional[str] = None) -> Optional[str]:
+    """
+    Get the streaming server's URL for a stream only this process can serve.
+
+    Args:
+        path: The stream path, e.g. /api/agentic-code/status/<project_id>.
+        last_event_id: The client's Last-Event-ID, carried over as a query parameter.
+
+    Returns:
+        Optional[str]: The URL if this process runs the server and SSE_PUBLIC_URL is set, otherwise None.
+    """
+    if task_stream_server is None or not SSE_PUBLIC_URL:
+        return None
+    url = f"{SSE_PUBLIC_URL}{path}"
+    if last_event_id:
+        url += f"?last_event_id={quote(last_event_id)}"
+    return url
+
+
+class TaskStreamServer:
+    """Serves task progress as Server-Sent Events from one event loop."""
+
+    def __init__(self, task_manager=None, broker=None, host: str = None, port: int = None,
+                 heartbeat: float = None, max_streams: int = None, executor=None):
+        """
+        Initialize the server. Call serve() on an event loop, or start_thread().
+
+        Args:
+            task_manager: The task manager to stream from. Defaults to Prime Agent's.
+            broker: The task event broker. Defaults to the process-wide broker.
+            host (str, optional): Interface to bind. Defaults to SSE_HOST or 0.0.0.0.
+            port (int, optional): Port to bind, 0 for any. Defaults to SSE_PORT or 5027.
+            heartbeat (float, optional): Seconds between heartbeats on idle streams. Defaults to SSE_HEARTBEAT or 15.
+            max_streams (int, optional): Most open streams before new ones get 503. Defaults to SSE_MAX_STREAMS or 10000.
+            executor: The code executor whose output to stream. Defaults to the simple executor.
+        """
+        if task_manager is None:
+            from app.prime_agent.task_manager import task_manager
+        if executor is None:
+            from app.services.simple_code_executor import simple_executor as executor
+        self.task_manager = task_manager
+        self.executor = executor
+        self.broker = broker or task_events
+        self.host = host or SSE_HOST
+        self.port = SSE_PORT if port is None else port
+        self.heartbeat = heartbeat or HEARTBEAT_INTERVAL
+        self.max_streams = max_streams or MAX_STREAMS
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server = None
+        self.ready = threading.Event()
+        self.error: Optional[BaseException] = None
+
+        self.active = 0
+        self.peak = 0
+        self.served = 0
+        self.resumed = 0
+        self.rejected = 0
+        self.events_sent = 0
+        self.heartbeats_sent = 0
+
+    async def serve(self):
+        """Accept connections until cancelled."""
+        self.loop = asyncio.get_running_loop()
+        _raise_file_limit()
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Task stream server listening on {self.host}:{self.port}")
+        self.ready.set()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def start_thread(self) -> threading.Thread:
+        """
+        Run the server on its own event loop in a daemon thread.
+
+        Raises:
+            RuntimeError: If the server could not bind its port, e.g. another worker holds it.
+        """
+        def run():
+            try:
+                asyncio.run(self.serve())
+            except BaseException as e:
+                self.error = e
+                self.ready.set()
+
+        thread = threading.Thread(target=run, name='task-stream-server', daemon=True)
+        thread.start()
+        self.ready.wait(5)
+        if self.error is not None or self.server is None:
+            raise RuntimeError(f"Could not listen on {self.host}:{self.port}: {self.error or 'timed out'}")
+        return thread
+
+    def _read_task(self, task_id: str, seen: int):
+        """Read a task's new progress, status, result and whether this worker owns it. Runs off the loop."""
+        progress, status = self.task_manager.wait_for_progress(task_id, since=seen, timeout=0)
+        result = self.task_manager.get_task_result(task_id) if status in TERMINAL_STATUSES else None
+        return progress, status, result, task_id in self.task_manager.tasks
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+        if len(head) > MAX_REQUEST_BYTES:
+            raise ValueError('request too large')
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        return method, target, headers
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: str, body: Dict[str, Any]):
+        data = json.dumps(body).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+            f"Access-Control-Allow-Origin: {ALLOW_ORIGIN}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                method, target, headers = await self._read_request(reader)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                return
+
+            url = urlsplit(target)
+            query = parse_qs(url.query)
+            if url.path == '/health':
+                await self._respond(writer, '200 OK', self.get_stats())
+                return
+            initial = STREAM_ROUTES.get(url.path)
+            project_id = url.path[len(EXECUTION_ROUTE):] if url.path.startswith(EXECUTION_ROUTE) else None
+            if method != 'GET' or (initial is None and not project_id):
+                await self._respond(writer, '404 Not Found', {'success': False, 'error': 'Not found'})
+                return
+            task_id = (query.get('task_id') or [None])[0]
+            if initial is not None and not task_id:
+                await self._respond(writer, '400 Bad Request', {'success': False, 'error': 'task_id is required'})
+                return
+            if self.active >= self.max_streams:
+                self.rejected += 1
+                await self._respond(writer, '503 Service Unavailable', {'success': False, 'error': 'Too many streams'})
+                return
+
+            last_event_id = headers.get('last-event-id') or (query.get('last_event_id') or [None])[0]
+            if project_id:
+                await self._stream_execution(reader, writer, project_id, last_event_id)
+            else:
+                await self._stream(reader, writer, task_id, parse_last_event_id(last_event_id), initial(task_id))
+        except (ConnectionError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"Error in task stream: {str(e)}")
+        finally:
+            writer.close()
+
+    def _open_stream(self, writer: asyncio.StreamWriter):
+        writer.write(
+            "HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            f"Access-Control-Allow-Origin: {ALLOW_ORIGIN}\r\nX-Accel-Buffering: no\r\nConnection: keep-alive\r\n\r\n"
+            f"retry: {RETRY_MS}\n\n".encode('utf-8'))
+
+    async def _wait_for_change(self, writer: asyncio.StreamWriter, changed: asyncio.Event, heartbeat_at: float,
+                               poll: Optional[float] = None) -> float:
+        """
+        Wait until a stream's source changes, sending heartbeats while it is idle.
+
+        Args:
+            writer: The client connection.
+            changed: Set when the source changes or the client hangs up.
+            heartbeat_at: When the next heartbeat is due.
+            poll: Return after this many seconds even without a change, for sources that do not publish.
+
+        Returns:
+            float: When the next heartbeat is due.
+        """
+        while not changed.is_set():
+            timeout = max(0.0, heartbeat_at - time.monotonic())
+            if poll is not None:
+                timeout = min(timeout, poll)
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            if time.monotonic() >= heartbeat_at and not changed.is_set():
+                writer.write(b": heartbeat\n\n")
+                await writer.drain()
+                self.heartbeats_sent += 1
+                heartbeat_at = time.monotonic() + self.heartbeat
+            if poll is not None:
+                break
+        return heartbeat_at
+
+    async def _stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, task_id: str,
+                      seen: Optional[int], initial: Dict[str, Any]):
+        if seen == -1:
+            # The client already has the final result; 204 tells EventSource not to reconnect
+            writer.write(b"HTTP/1.1 204 No Content\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            return
+
+        self._open_stream(writer)
+        if seen is None:
+            seen = 0
+            writer.write(format_event(initial).encode('utf-8'))
+        else:
+            self.resumed += 1
+
+        changed = asyncio.Event()
+        loop = self.loop
+
+        def wake():
+            loop.call_soon_threadsafe(changed.set)
+
+        # Clients send nothing after the request, so a read only returns when they hang up
+        hangup = asyncio.ensure_future(reader.read(1))
+        hangup.add_done_callback(lambda _: changed.set())
+        self.broker.subscribe(task_id, wake)
+        self.active += 1
+        self.served += 1
+        self.peak = max(self.peak, self.active)
+        heartbeat_at = time.monotonic() + self.heartbeat
+        try:
+            while not hangup.done():
+                changed.clear()
+                # The task manager's lock and store reads must not block the loop
+                progress, status, result, local = await loop.run_in_executor(None, self._read_task, task_id, seen)
+
+                if status is None:
+                    writer.write(format_event({'status': 'error', 'error': 'Task not found'}).encode('utf-8'))
+                    await writer.drain()
+                    return
+
+                for item in progress:
+                    seen += 1
+                    writer.write(format_event(item, seen).encode('utf-8'))
+                if progress:
+                    self.events_sent += len(progress)
+                    heartbeat_at = time.monotonic() + self.heartbeat
+
+                if status in TERMINAL_STATUSES:
+                    if result:
+                        writer.write(format_event({'status': status, 'result': result}, RESULT_EVENT_ID).encode('utf-8'))
+                        self.events_sent += 1
+                    await writer.drain()
+                    return
+                await writer.drain()
+
+                # Local tasks publish their changes; tasks owned by another worker are polled
+                poll = None if local else self.task_manager.remote_poll_interval
+                heartbeat_at = await self._wait_for_change(writer, changed, heartbeat_at, poll)
+        finally:
+            hangup.cancel()
+            self.active -= 1
+            self.broker.unsubscribe(task_id, wake)
+
+    async def _stream_execution(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, project_id: str,
+                                last_event_id: Optional[str]):
+        # Event IDs are output offsets, as in SimpleCodeExecutor.iter_output_events
+        try:
+            offset = max(0, int(last_event_id)) if last_event_id else 0
+        except ValueError:
+            offset = 0
+        if offset:
+            self.resumed += 1
+        self._open_stream(writer)
+
+        changed = asyncio.Event()
+        loop = self.loop
+
+        def wake():
+            # A chatty run publishes every line; one pending wake-up is enough
+            if not changed.is_set():
+                loop.call_soon_threadsafe(changed.set)
+
+        channel = execution_channel(project_id)
+        hangup = asyncio.ensure_future(reader.read(1))
+        hangup.add_done_callback(lambda _: changed.set())
+        self.broker.subscribe(channel, wake)
+        self.active += 1
+        self.served += 1
+        self.peak = max(self.peak, self.active)
+        heartbeat_at = time.monotonic() + self.heartbeat
+        try:
+            while not hangup.done():
+                changed.clear()
+                entry = self.executor.output_cache.get(project_id)
+                if not entry:
+                    writer.write(format_event({'status': 'error', 'error': 'Project not found'}).encode('utf-8'))
+                    await writer.drain()
+                    return
+
+                buffer = entry['output']
+                closed = buffer.closed
+                # Catching up can join up to the whole buffer, so read off the loop
+                output, offset, truncated = await loop.run_in_executor(None, buffer.read, offset)
+                if output:
+                    writer.write(format_event({'output': output, 'truncated': truncated, 'status': entry['status']},
+                                              offset).encode('utf-8'))
+                    self.events_sent += 1
+                    heartbeat_at = time.monotonic() + self.heartbeat
+
+                if closed:
+                    writer.write(format_event({'status': entry['status'], 'done': True}, offset).encode('utf-8'))
+                    self.events_sent += 1
+                    await writer.drain()
+                    return
+                await writer.drain()
+
+                heartbeat_at = await self._wait_for_change(writer, changed, heartbeat_at)
+                if changed.is_set() and not hangup.done():
+                    # Let a chatty program's lines gather into one event
+                    await asyncio.sleep(EXECUTION_BATCH_SECONDS)
+        finally:
+            hangup.cancel()
+            self.active -= 1
+            self.broker.unsubscribe(channel, wake)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get stream statistics.
+
+        Returns:
+            Dict[str, Any]: Open, peak and total streams, resumes, rejections and events sent.
+        """
+        return {
+            'active_streams': self.active,
+            'peak_streams': self.peak,
+            'streams_served': self.served,
+            'resumed': self.resumed,
+            'rejected': self.rejected,
+            'events_sent': self.events_sent,
+            'heartbeats_sent': self.heartbeats_sent,
+            'max_streams': self.max_streams,
+            'broker': self.broker.get_stats()
+        }
+
+
+def _raise_file_limit():
+    """Raise the open file limit to its hard maximum; every stream holds a socket."""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+task_stream_server: Optional[TaskStreamServer] = None
+
+
+def start_task_stream_server() -> Optional[TaskStreamServer]:
+    """
+    Start the task stream server thread if SSE_SERVER is enabled.
+
+    Returns:
+        Optional[TaskStreamServer]: The running server, or None if disabled.
+    """
+    global task_stream_server
+    if not SSE_ENABLED:
+        return None
+    if task_stream_server is None:
+        try:
+            server = TaskStreamServer()
+            if server.task_manager.store is None:
+                logger.warning("Task stream server is using the in-memory task store; streams only see "
+                               "this process's tasks. Set TASK_STORE=sqlite when running several workers.")
+            server.start_thread()
+            task_stream_server = server
+        except Exception as e:
+            # Expected in every gunicorn worker but the one that bound SSE_PORT first
+            logger.error(f"Error starting task stream server: {str(e)}")
+            task_stream_server = None
+    return task_stream_server
@@ -0,0 +1,554 @@
+"""
+Upload Store for files attached to agent prompts.
+
+Uploaded files are streamed to a content-addressed blob store on disk, keyed by
+the SHA-256 of their bytes, so identical uploads are stored once. Prompts carry
+a short reference token in place of the file's contents:
+
+    --- Image: photo.png (image/png) ---
+    [upload:<sha256>]
+
+and processors load the blob only when they need it. Artifacts derived from a
+blob (extracted text, thumbnails) are cached next to it under the same hash.
+Reading a blob or one of its artifacts keeps it alive; a background sweeper
+prunes blobs unused for UPLOAD_TTL and temporary files of interrupted uploads.
+"""
+
+import io
+import os
+import re
+import json
+import time
+import base64
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Any, BinaryIO, Dict, Optional
+
+# Optional imports for derived artifacts
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    Image = None
+
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+    PyPDF2 = None
+
+try:
+    import docx
+    DOCX_AVAILABLE = True
+except ImportError:
+    DOCX_AVAILABLE = False
+    docx = None
+
+logger = logging.getLogger(__name__)
+
+# Under the cache service's DEFAULT_CACHE_DIR, which is not imported: file analysis
+# workers load this module without the app package
+UPLOAD_DIR = os.getenv('UPLOAD_STORE_DIR', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'cache', 'uploads'))
+
+# Largest upload accepted, in bytes
+MAX_UPLOAD_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+
+# Blobs not read for this many seconds are removed by prune()
+UPLOAD_TTL = int(os.getenv('UPLOAD_TTL', 7 * 86400))
+
+# Seconds between background prunes
+UPLOAD_SWEEP_INTERVAL = int(os.getenv('UPLOAD_SWEEP_INTERVAL', 3600))
+
+# Temporary files older than this belong to interrupted uploads
+TMP_TTL = 3600
+
+# Longest side of generated thumbnails, in pixels
+THUMBNAIL_SIZE = 512
+
+# Most characters of extracted text kept per file
+MAX_TEXT_CHARS = 2 * 1024 * 1024
+
+CHUNK_BYTES = 64 * 1024
+
+HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+TOKEN_PATTERN = re.compile(r'\[upload:([0-9a-f]{64})\]')
+
+TEXT_MIME_TYPES = {'application/json', 'application/xml', 'application/javascript', 'application/x-yaml',
+                   'application/x-sh', 'application/sql'}
+
+
+def make_token(content_hash: str) -> str:
+    """
+    Build the reference token that stands in for an upload in a prompt.
+
+    Args:
+        content_hash: The upload's SHA-256 hex digest.
+
+    Returns:
+        str: The token.
+    """
+    return f"[upload:{content_hash}]"
+
+
+def parse_token(text: str) -> Optional[str]:
+    """
+    Return the hash referenced by text that is just an upload token.
+
+    Args:
+        text: A file section's body.
+
+    Returns:
+        Optional[str]: The SHA-256 hex digest, or None if text is not a token.
+    """
+    match = TOKEN_PATTERN.fullmatch(text.strip())
+    return match.group(1) if match else None
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload is larger than MAX_UPLOAD_BYTES."""
+
+
+class UploadStore:
+    """
+    A content-addressed store of uploaded files and their derived artifacts.
+    """
+
+    def __init__(self, root: str = UPLOAD_DIR, max_bytes: int = MAX_UPLOAD_BYTES, ttl: int = UPLOAD_TTL,
+                 sweep_interval: int = UPLOAD_SWEEP_INTERVAL):
+        """
+        Initialize the store. Call start_sweeper() to prune it in the background.
+
+        Args:
+            root: Directory holding the blobs.
+            max_bytes: Largest upload accepted.
+            ttl: Seconds an unread blob is kept.
+            sweep_interval: Seconds between background prunes.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+        self._stop_event = threading.Event()
+        self._tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        # Serializes building the same derived artifact twice
+        self._derive_locks = {}
+        self._locks_lock = threading.Lock()
+        self._stats = {'stored': 0, 'deduplicated': 0, 'bytes_stored': 0,
+                       'derived_built': 0, 'derived_hits': 0}
+
+    def _blob_path(self, content_hash: str, suffix: str = '') -> str:
+        return os.path.join(self.root, content_hash[:2], content_hash + suffix)
+
+    def store_stream(self, stream: BinaryIO, filename: str, mime_type: str = '') -> Dict[str, Any]:
+        """
+        Stream an upload to disk, hashing it as it is written.
+
+        Args:
+            stream: A binary file-like object with the upload's bytes.
+            filename: The name the user gave the file.
+            mime_type: The upload's content type.
+
+        Returns:
+            Dict[str, Any]: The upload's hash, token, name, mime type, size and
+            whether an identical upload was already stored.
+
+        Raises:
+            UploadTooLarge: If the upload is larger than the store's limit.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f"Upload is larger than {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            content_hash = digest.hexdigest()
+            path = self._blob_path(content_hash)
+            deduplicated = os.path.exists(path)
+            if deduplicated:
+                os.unlink(tmp_path)
+                os.utime(path)
+                self._stats['deduplicated'] += 1
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                self._stats['stored'] += 1
+                self._stats['bytes_stored'] += size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        info = {
+            'hash': content_hash,
+            'token': make_token(content_hash),
+            'name': os.path.basename(filename or '') or 'upload',
+            'mime_type': mime_type or 'application/octet-stream',
+            'size': size,
+            'deduplicated': deduplicated
+        }
+        # The first name an upload was stored under is kept for references without one
+        meta_path = self._blob_path(content_hash, '.json')
+        if not os.path.exists(meta_path):
+            self._write_atomic(meta_path, json.dumps({key: info[key] for key in ('name', 'mime_type', 'size')}).encode())
+        logger.info(f"Stored upload {info['name']} ({size} bytes) as {content_hash[:12]}"
+                    f"{' (duplicate)' if deduplicated else ''}")
+        return info
+
+    def store_bytes(self, data: bytes, filename: str, mime_type: str = '') -> Dict[str, Any]:
+        """
+        Store an upload already held in memory.
+
+        Args:
+            data: The upload's bytes.
+            filename: The name the user gave the file.
+            mime_type: The upload's content type.
+
+        Returns:
+            Dict[str, Any]: As returned by store_stream.
+        """
+        return self.store_stream(io.BytesIO(data), filename, mime_type)
+
+    def store_data_url(self, data_url: str, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Store an upload sent inline as a base64 data URL.
+
+        Args:
+            data_url: A data URL such as the browser's FileReader produces.
+            filename: The name the user gave the file.
+
+        Returns:
+            Optional[Dict[str, Any]]: As returned by store_stream, or None if the
+            text is not a base64 data URL.
+        """
+        match = re.match(r'data:([^;,]*)(?:;[^;,]*)*;base64,', data_url)
+        if not match:
+            return None
+        try:
+            data = base64.b64decode(data_url[match.end():], validate=False)
+        except (ValueError, TypeError):
+            return None
+        return self.store_bytes(data, filename, match.group(1))
+
+    def exists(self, content_hash: str) -> bool:
+        """Whether a blob with this hash is stored."""
+        # Only well-formed hashes ever reach the filesystem
+        return bool(HASH_PATTERN.fullmatch(content_hash or '')) and os.path.exists(self._blob_path(content_hash))
+
+    def get_info(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Return what is known about a stored upload without reading it.
+
+        Args:
+            content_hash: The upload's SHA-256 hex digest.
+
+        Returns:
+            Optional[Dict[str, Any]]: The hash, token, name, mime type and size,
+            or None if no such upload is stored.
+        """
+        if not self.exists(content_hash):
+            return None
+        info = {'hash': content_hash, 'token': make_token(content_hash), 'name': 'upload',
+                'mime_type': 'application/octet-stream', 'size': os.path.getsize(self._blob_path(content_hash))}
+        try:
+            with open(self._blob_path(content_hash, '.json')) as f:
+                info.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return info
+
+    def open_blob(self, content_hash: str) -> BinaryIO:
+        """
+        Open a stored upload for reading.
+
+        Args:
+            content_hash: The upload's SHA-256 hex digest.
+
+        Returns:
+            BinaryIO: The open blob.
+
+        Raises:
+            FileNotFoundError: If no such upload is stored.
+        """
+        if not self.exists(content_hash):
+            raise FileNotFoundError(f"No upload {content_hash}")
+        path = self._blob_path(content_hash)
+        # Reads keep a blob alive past the TTL
+        os.utime(path)
+        return open(path, 'rb')
+
+    def read_bytes(self, content_hash: str) -> bytes:
+        """Return a stored upload's bytes."""
+        with self.open_blob(content_hash) as f:
+            return f.read()
+
+    def blob_path(self, content_hash: str) -> str:
+        """
+        Return the path of a stored upload, for sending it as a file.
+
+        Raises:
+            FileNotFoundError: If no such upload is stored.
+        """
+        self.open_blob(content_hash).close()
+        return self._blob_path(content_hash)
+
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _derived(self, content_hash: str, suffix: str, build) -> Optional[bytes]:
+        """Return a derived artifact, building and caching it on first use."""
+        path = self._blob_path(content_hash, suffix)
+        try:
+            with open(path, 'rb') as f:
+                self._stats['derived_hits'] += 1
+                data = f.read()
+            # Using an artifact keeps its blob alive past the TTL, like reading the blob
+            self._touch(content_hash)
+            return data
+        except FileNotFoundError:
+            pass
+
+        with self._locks_lock:
+            lock = self._derive_locks.setdefault(path, threading.Lock())
+        with lock:
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return f.read()
+            data = build()
+            if data is not None:
+                self._write_atomic(path, data)
+                self._stats['derived_built'] += 1
+        with self._locks_lock:
+            self._derive_locks.pop(path, None)
+        return data
+
+    def _touch(self, content_hash: str):
+        try:
+            os.utime(self._blob_path(content_hash))
+        except OSError:
+            pass
+
+    def get_text(self, content_hash: str) -> Optional[str]:
+        """
+        Return the text of a stored upload, extracting it once per hash.
+
+        Text files are decoded, and the text of PDF and Word documents is
+        extracted when PyPDF2 and python-docx are installed.
+
+        Args:
+            content_hash: The upload's SHA-256 hex digest.
+
+        Returns:
+            Optional[str]: The text, or None if the upload has none to extract.
+        """
+        info = self.get_info(content_hash)
+        if not info:
+            return None
+
+        def build():
+            text = self._extract_text(content_hash, info)
+            return None if text is None else text[:MAX_TEXT_CHARS].encode('utf-8')
+
+        data = self._derived(content_hash, '.txt', build)
+        return None if data is None else data.decode('utf-8')
+
+    def _extract_text(self, content_hash: str, info: Dict[str, Any]) -> Optional[str]:
+        mime_type = info['mime_type']
+        extension = os.path.splitext(info['name'])[1].lower()
+
+        if extension == '.pdf' or mime_type == 'application/pdf':
+            if not PYPDF2_AVAILABLE:
+                return None
+            with self.open_blob(content_hash) as f:
+                reader = PyPDF2.PdfReader(f)
+                return '\n\n'.join(page.extract_text() or '' for page in reader.pages)
+
+        if extension == '.docx' or 'wordprocessingml' in mime_type:
+            if not DOCX_AVAILABLE:
+                return None
+            with self.open_blob(content_hash) as f:
+                document = docx.Document(f)
+                return '\n'.join(paragraph.text for paragraph in document.paragraphs)
+
+        if mime_type.startswith('image/') and extension != '.svg':
+            return None
+
+        data = self.read_bytes(content_hash)
+        if not (mime_type.startswith('text/') or mime_type in TEXT_MIME_TYPES) and b'\0' in data[:8192]:
+            return None
+        return data.decode('utf-8', 'replace')
+
+    def get_thumbnail(self, content_hash: str) -> Optional[bytes]:
+        """
+        Return a JPEG thumbnail of a stored image, rendering it once per hash.
+
+        Args:
+            content_hash: The upload's SHA-256 hex digest.
+
+        Returns:
+            Optional[bytes]: The thumbnail, or None if the upload is not an image
+            Pillow can read.
+        """
+        if not PIL_AVAILABLE or not self.exists(content_hash):
+            return None
+
+        def build():
+            try:
+                with self.open_blob(content_hash) as f:
+                    image = Image.open(f)
+                    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+                    if image.mode not in ('RGB', 'L'):
+                        image = image.convert('RGB')
+                    output = io.BytesIO()
+                    image.save(output, 'JPEG', quality=85)
+                    return output.getvalue()
+            except Exception as e:
+                logger.warning(f"Could not render a thumbnail of upload {content_hash[:12]}: {e}")
+                return None
+
+        return self._derived(content_hash, '.thumb.jpg', build)
+
+    def get_image_info(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a stored image's dimensions and format, reading them once per hash.
+
+        Args:
+            content_hash: The upload's SHA-256 hex digest.
+
+        Returns:
+            Optional[Dict[str, Any]]: width, height, format and mode, or None if
+            the upload is not an image Pillow can read.
+        """
+        if not PIL_AVAILABLE or not self.exists(content_hash):
+            return None
+
+        def build():
+            try:
+                with self.open_blob(content_hash) as f:
+                    image = Image.open(f)
+                    return json.dumps({'width': image.width, 'height': image.height,
+                                       'format': image.format, 'mode': image.mode}).encode()
+            except Exception:
+                return None
+
+        data = self._derived(content_hash, '.image.json', build)
+        return None if data is None else json.loads(data)
+
+    def get_thumbnail_data_url(self, content_hash: str) -> Optional[str]:
+        """Return a stored image's thumbnail as a base64 data URL."""
+        thumbnail = self.get_thumbnail(content_hash)
+        if thumbnail is None:
+            return None
+        return 'data:image/jpeg;base64,' + base64.b64encode(thumbnail).decode('ascii')
+
+    def prune(self, max_age: Optional[int] = None) -> int:
+        """
+        Remove blobs, and their artifacts, that have not been read for max_age seconds.
+
+        Args:
+            max_age: Seconds since last use; defaults to the store's TTL.
+
+        Returns:
+            int: The number of uploads removed.
+        """
+        cutoff = time.time() - (self.ttl if max_age is None else max_age)
+        removed = 0
+        # Other workers prune the same directory, so files may vanish underneath
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if len(name) != 64 or _mtime(os.path.join(shard_dir, name)) >= cutoff:
+                    continue
+                for artifact in os.listdir(shard_dir):
+                    if artifact.startswith(name):
+                        _unlink(os.path.join(shard_dir, artifact))
+                removed += 1
+        # Temporary files of uploads interrupted mid-stream
+        for name in os.listdir(self._tmp_dir):
+            path = os.path.join(self._tmp_dir, name)
+            if _mtime(path) < time.time() - TMP_TTL:
+                _unlink(path)
+        if removed:
+            logger.info(f"Pruned {removed} unused uploads")
+        return removed
+
+    def _sweep_loop(self):
+        """Background loop that prunes the store periodically."""
+        while not self._stop_event.wait(self.sweep_interval):
+            try:
+                self.prune()
+            except Exception as e:
+                logger.warning(f"Error pruning uploads in {self.root}: {str(e)}")
+
+    def start_sweeper(self):
+        """Start the background sweeper thread if it is not already running."""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stop_event.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True, name='upload-sweeper')
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Stop the background sweeper thread."""
+        self._stop_event.set()
+
+    def clear(self):
+        """Remove every stored upload."""
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the store's counters."""
+        return dict(self._stats, root=self.root, max_bytes=self.max_bytes)
+
+
+def _mtime(path: str) -> float:
+    """A file's modification time, or infinity if it is already gone."""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return float('inf')
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+_upload_store = None
+_upload_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    """Return the process-wide upload store, with its sweeper running."""
+    global _upload_store
+    if _upload_store is None:
+        with _upload_store_lock:
+            if _upload_store is None:
+                _upload_store = UploadStore()
+                _upload_store.start_sweeper()
+    return _upload_store
@@ -0,0 +1,222 @@
+"""
+Vector Stores for the Memory Service
+A small interface over Qdrant Cloud and an in-memory stand-in with the same
+behaviour, so memory features can run and be tested without a Qdrant cluster.
+Points are (id, vector, payload) tuples and filters are dicts of payload fields
+that must match exactly.
+"""
+
+import math
+import threading
+import logging
+
+try:
+    from qdrant_client.http import models
+    QDRANT_AVAILABLE = True
+except ImportError:
+    QDRANT_AVAILABLE = False
+    models = None
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHit:
+    """One search result: the stored payload and its cosine similarity to the query."""
+
+    def __init__(self, point_id, payload, score):
+        self.id = point_id
+        self.payload = payload
+        self.score = score
+
+
+class QdrantVectorStore:
+    """Vector store backed by a Qdrant client."""
+
+    name = 'qdrant'
+
+    def __init__(self, client):
+        """
+        Initialize the store.
+
+        Args:
+            client (QdrantClient): A connected Qdrant client
+        """
+        self.client = client
+
+    @staticmethod
+    def _filter(must):
+        return models.Filter(must=[
+            models.FieldCondition(key=key, match=models.MatchValue(value=value))
+            for key, value in must.items()
+        ])
+
+    def ensure_collections(self, names, size):
+        """
+        Create any missing collections.
+
+        Args:
+            names (list): Collection names
+            size (int): Vector dimension
+        """
+        existing = [col.name for col in self.client.get_collections().collections]
+        for name in names:
+            if name not in existing:
+                self.client.create_collection(
+                    collection_name=name,
+                    vectors_config=models.VectorParams(size=size, distance=models.Distance.COSINE)
+                )
+                logger.info(f"Created collection: {name}")
+
+    def upsert(self, collection, points):
+        """
+        Insert or replace points in one request.
+
+        Args:
+            collection (str): Collection name
+            points (list): (id, vector, payload) tuples
+        """
+        self.client.upsert(
+            collection_name=collection,
+            points=[models.PointStruct(id=point_id, vector=vector, payload=payload)
+                    for point_id, vector, payload in points]
+        )
+
+    def search(self, collection, vector, must, limit):
+        """
+        Find the points most similar to a vector.
+
+        Args:
+            collection (str): Collection name
+            vector (list): Query vector
+            must (dict): Payload fields that must match
+            limit (int): Maximum number of results
+
+        Returns:
+            list: SearchHit objects, most similar first
+        """
+        results = self.client.search(
+            collection_name=collection,
+            query_vector=vector,
+            query_filter=self._filter(must),
+            limit=limit
+        )
+        return [SearchHit(result.id, result.payload, result.score) for result in results]
+
+    def scroll(self, collection, must, limit):
+        """
+        List the payloads of points matching a filter.
+
+        Args:
+            collection (str): Collection name
+            must (dict): Payload fields that must match
+            limit (int): Maximum number of points
+
+        Returns:
+            list: Payload dicts
+        """
+        points, _ = self.client.scroll(collection_name=collection, scroll_filter=self._filter(must), limit=limit)
+        return [point.payload for point in points]
+
+
+class InMemoryVectorStore:
+    """Process-local vector store with exact cosine search, standing in for Qdrant."""
+
+    name = 'local'
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def ensure_collections(self, names, size):
+        """
+        Create any missing collections.
+
+        Args:
+            names (list): Collection names
+            size (int): Vector dimension (unused; vectors are stored as given)
+        """
+        with self._lock:
+            for name in names:
+                self._collections.setdefault(name, {})
+
+    def upsert(self, collection, points):
+        """
+        Insert or replace points.
+
+        Args:
+            collection (str): Collection name
+            points (list): (id, vector, payload) tuples
+        """
+        with self._lock:
+            store = self._collections.setdefault(collection, {})
+            for point_id, vector, payload in points:
+                norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+                store[point_id] = ([x / norm for x in vector], dict(payload))
+
+    def _matching(self, collection, must):
+        with self._lock:
+            items = list(self._collections.get(collection, {}).items())
+        return [(point_id, vector, payload) for point_id, (vector, payload) in items
+                if all(payload.get(key) == value for key, value in must.items())]
+
+    def search(self, collection, vector, must, limit):
+        """
+        Find the points most similar to a vector.
+
+        Args:
+            collection (str): Collection name
+            vector (list): Query vector
+            must (dict): Payload fields that must match
+            limit (int): Maximum number of results
+
+        Returns:
+            list: SearchHit objects, most similar first
+        """
+        candidates = self._matching(collection, must)
+        if not candidates:
+            return []
+
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        if NUMPY_AVAILABLE:
+            matrix = np.array([point_vector for _, point_vector, _ in candidates], dtype=np.float32)
+            scores = (matrix @ np.array(vector, dtype=np.float32) / norm).tolist()
+        else:
+            scores = [sum(a * b for a, b in zip(point_vector, vector)) / norm
+                      for _, point_vector, _ in candidates]
+
+        ranked = sorted(zip(scores, candidates), key=lambda item: item[0], reverse=True)[:limit]
+        return [SearchHit(point_id, dict(payload), score) for score, (point_id, _, payload) in ranked]
+
+    def scroll(self, collection, must, limit):
+        """
+        List the payloads of points matching a filter.
+
+        Args:
+            collection (str): Collection name
+            must (dict): Payload fields that must match
+            limit (int): Maximum number of points
+
+        Returns:
+            list: Payload dicts
+        """
+        return [dict(payload) for _, _, payload in self._matching(collection, must)[:limit]]
+
+    def count(self, collection):
+        """
+        Get the number of points in a collection.
+
+        Args:
+            collection (str): Collection name
+
+        Returns:
+            int: Stored points
+        """
+        with self._lock:
+            return len(self._collections.get(collection, {}))
@@ -132,6 +132,7 @@ class PrimeAgentTools {
             }
 
             this.currentTaskId = data.task_id;
+            this.streamUrl = data.stream_url || `/api/context7-tools/stream-task?task_id=${data.task_id}`;
 
             // Start streaming progress
             this.startProgressStream();
@@ -149,7 +150,7 @@ class PrimeAgentTools {
             this.eventSource.close();
         }
 
-        this.eventSource = new EventSource(`/api/context7-tools/stream-task?task_id=${this.currentTaskId}`);
+        this.eventSource = new EventSource(this.streamUrl || `/api/context7-tools/stream-task?task_id=${this.currentTaskId}`);
 
         this.eventSource.onmessage = (event) => {
             try {
@@ -161,9 +162,12 @@ class PrimeAgentTools {
         };
 
         this.eventSource.onerror = (error) => {
-            console.error('EventSource error:', error);
-            this.eventSource.close();
-            this.checkTaskStatus();
+            // The browser reconnects on its own and resumes from the last event ID;
+            // only fall back to polling once it has given up
+            if (this.eventSource.readyState === EventSource.CLOSED) {
+                console.error('EventSource error:', error);
+                this.checkTaskStatus();
+            }
         };
     }
 
@@ -86,23 +86,26 @@ function executePythonCode() {
 
 // Function to poll for execution status
 function pollExecutionStatus(projectId) {
-    let lastOutputLength = 0;
+    let output = '';
+    let offset = 0;
     const maxPolls = 30; // Maximum number of polls (30 seconds)
     let pollCount = 0;
     
     const pollInterval = setInterval(() => {
         pollCount++;
         
-        fetch(`/api/code-executor/status/${projectId}`)
+        // Only output written since the last poll comes back
+        fetch(`/api/code-executor/status/${projectId}?since=${offset}`)
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
                     const status = data.status;
                     
                     // Update the output in the preview if there's new content
-                    if (status.output && status.output.length > lastOutputLength) {
-                        lastOutputLength = status.output.length;
-                        previewFrame.contentWindow.updateOutput(status.output);
+                    offset = status.offset;
+                    if (status.output) {
+                        output += status.output;
+                        previewFrame.contentWindow.updateOutput(output);
                     }
                     
                     // If execution is complete, stop polling
@@ -114,7 +117,7 @@ function pollExecutionStatus(projectId) {
                     // If we've reached the maximum number of polls, stop polling
                     if (pollCount >= maxPolls) {
                         clearInterval(pollInterval);
-                        previewFrame.contentWindow.updateOutput(status.output + '\n\nExecution timed out after 30 seconds.');
+                        previewFrame.contentWindow.updateOutput(output + '\n\nExecution timed out after 30 seconds.');
                         previewFrame.contentWindow.hideLoading();
                         
                         // Stop the execution on the server
@@ -113,11 +113,15 @@ class UniversalFileUpload {
                 type: file.type,
                 size: file.size,
                 id: Date.now() + Math.random(),
-                content: null
+                content: null,
+                upload: null
             };
 
             contextFiles.push(fileData);
 
+            // Store the file on the server so prompts can reference it by token
+            this.uploadFile(fileData);
+
             // Read file content for text files and images
             if (this.isReadableFile(file)) {
                 this.readFileContent(fileData);
@@ -139,6 +143,24 @@ class UniversalFileUpload {
                file.name.endsWith('.txt');
     }
 
+    uploadFile(fileData) {
+        const formData = new FormData();
+        formData.append('file', fileData.file, fileData.name);
+
+        fetch('/api/uploads', { method: 'POST', body: formData })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success && data.files && data.files.length) {
+                    fileData.upload = data.files[0];
+                } else {
+                    console.warn(`Upload of ${fileData.name} failed, its content will be sent inline:`, data.error);
+                }
+            })
+            .catch(error => {
+                console.warn(`Upload of ${fileData.name} failed, its content will be sent inline:`, error);
+            });
+    }
+
     readFileContent(fileData) {
         const reader = new FileReader();
         
@@ -287,7 +309,13 @@ class UniversalFileUpload {
         let content = '';
 
         files.forEach(fileData => {
-            if (fileData.isText && fileData.content) {
+            if (fileData.upload) {
+                // Stored files are referenced by token instead of being sent again
+                const header = fileData.type.startsWith('image/')
+                    ? `--- Image: ${fileData.name} (${fileData.type}) ---`
+                    : `--- File: ${fileData.name} ---`;
+                content += `\n\n${header}\n${fileData.upload.token}\n`;
+            } else if (fileData.isText && fileData.content) {
                 content += `\n\n--- File: ${fileData.name} ---\n${fileData.content}\n`;
             } else if (fileData.isImage && fileData.content) {
                 content += `\n\n--- Image: ${fileData.name} (${fileData.type}) ---\n${fileData.content}\n`;
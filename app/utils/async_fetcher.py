@@ -0,0 +1,310 @@
+"""
+Async HTTP fetch engine for the web browser.
+This module fetches many URLs concurrently from one persistent event loop with a
+global connection pool, per-host concurrency caps and politeness delays, capped
+streaming body reads and conditional GETs (ETag / Last-Modified).
+"""
+
+import asyncio
+import threading
+import time
+import logging
+import concurrent.futures
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import requests
+
+# Optional httpx import (async HTTP/1.1 keep-alive, HTTP/2 when h2 is installed)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = HTTPX_AVAILABLE
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+
+
+class _LoopThread:
+    """A daemon thread running one event loop that outlives individual calls."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="async-fetch-loop")
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout=None):
+        """
+        Run a coroutine on the loop and wait for its result.
+
+        Args:
+            coro: The coroutine to run
+            timeout (float, optional): Maximum time to wait in seconds. Defaults to None.
+
+        Returns:
+            The coroutine's result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+class AsyncFetchEngine:
+    """Concurrent HTTP fetcher with per-host politeness and a shared connection pool."""
+
+    def __init__(self, max_connections=50, per_host_limit=4, per_host_delay=0.0,
+                 max_body_bytes=5 * 1024 * 1024, timeout=30, user_agent=DEFAULT_USER_AGENT):
+        """
+        Initialize the fetch engine.
+
+        Args:
+            max_connections (int, optional): Size of the global connection pool. Defaults to 50.
+            per_host_limit (int, optional): Maximum concurrent requests per host. Defaults to 4.
+            per_host_delay (float, optional): Minimum seconds between request starts to one host. Defaults to 0.
+            max_body_bytes (int, optional): Response bodies are truncated at this size. Defaults to 5 MB.
+            timeout (int, optional): Per-request timeout in seconds. Defaults to 30.
+            user_agent (str, optional): User-Agent header. Defaults to a desktop Chrome UA.
+        """
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.per_host_delay = per_host_delay
+        self.max_body_bytes = max_body_bytes
+        self.timeout = timeout
+        self.headers = {'User-Agent': user_agent}
+
+        self._client = None
+        self._host_semaphores = {}
+        self._host_last_start = defaultdict(float)
+        self._host_locks = {}
+
+        # Without httpx, requests run on a thread pool that shares one pooled session
+        self._session = None
+        self._executor = None
+
+        self.requests_sent = 0
+        self.not_modified = 0
+        self.truncated = 0
+        self.errors = 0
+
+    def _get_client(self):
+        """Get the pooled async client, creating it on the running loop."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                follow_redirects=True,
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    def _get_session(self):
+        """Get the pooled requests session used when httpx is not installed."""
+        if self._session is None:
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_connections,
+                                                    pool_maxsize=self.per_host_limit)
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+            self._session.headers.update(self.headers)
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_connections)
+        return self._session
+
+    async def _wait_for_host(self, host):
+        """Acquire a per-host slot, honouring the politeness delay."""
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+            self._host_locks[host] = asyncio.Lock()
+        await semaphore.acquire()
+
+        if self.per_host_delay:
+            async with self._host_locks[host]:
+                wait = self._host_last_start[host] + self.per_host_delay - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._host_last_start[host] = time.monotonic()
+        return semaphore
+
+    async def fetch(self, url, headers=None, validators=None):
+        """
+        Fetch one URL.
+
+        Args:
+            url (str): The URL to fetch
+            headers (dict, optional): Extra request headers. Defaults to None.
+            validators (dict, optional): Stored 'etag' / 'last_modified' for a conditional GET. Defaults to None.
+
+        Returns:
+            dict: url, status, text, etag, last_modified, not_modified, truncated, elapsed and error
+        """
+        request_headers = dict(headers or {})
+        if validators:
+            if validators.get('etag'):
+                request_headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                request_headers['If-Modified-Since'] = validators['last_modified']
+
+        host = urlparse(url).netloc
+        start = time.perf_counter()
+        semaphore = await self._wait_for_host(host)
+        try:
+            self.requests_sent += 1
+            if HTTPX_AVAILABLE:
+                result = await self._fetch_httpx(url, request_headers)
+            else:
+                loop = asyncio.get_running_loop()
+                self._get_session()
+                result = await loop.run_in_executor(self._executor, self._fetch_requests, url, request_headers)
+        except Exception as e:
+            self.errors += 1
+            result = {"url": url, "status": None, "text": "", "error": str(e)}
+        finally:
+            semaphore.release()
+
+        result.setdefault("error", None)
+        result["not_modified"] = result.get("status") == 304
+        if result["not_modified"]:
+            self.not_modified += 1
+        if result.get("truncated"):
+            self.truncated += 1
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    async def _fetch_httpx(self, url, headers):
+        """Fetch with httpx, streaming the body up to the byte cap."""
+        client = self._get_client()
+        async with client.stream('GET', url, headers=headers) as response:
+            chunks = []
+            received = 0
+            truncated = False
+            if response.status_code != 304:
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    if received >= self.max_body_bytes:
+                        truncated = True
+                        break
+            body = b''.join(chunks)[:self.max_body_bytes]
+            encoding = response.encoding or 'utf-8'
+            return {
+                "url": str(response.url),
+                "requested_url": url,
+                "status": response.status_code,
+                "text": body.decode(encoding, errors='replace'),
+                "etag": response.headers.get('etag'),
+                "last_modified": response.headers.get('last-modified'),
+                "truncated": truncated,
+                "http_version": response.http_version
+            }
+
+    def _fetch_requests(self, url, headers):
+        """Fetch with the pooled requests session, streaming the body up to the byte cap."""
+        with self._get_session().get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            chunks = []
+            received = 0
+            truncated = False
+            if response.status_code != 304:
+                for chunk in response.iter_content(chunk_size=65536):
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    if received >= self.max_body_bytes:
+                        truncated = True
+                        break
+            body = b''.join(chunks)[:self.max_body_bytes]
+            encoding = response.encoding or response.apparent_encoding or 'utf-8'
+            return {
+                "url": response.url,
+                "requested_url": url,
+                "status": response.status_code,
+                "text": body.decode(encoding, errors='replace'),
+                "etag": response.headers.get('ETag'),
+                "last_modified": response.headers.get('Last-Modified'),
+                "truncated": truncated,
+                "http_version": "HTTP/1.1"
+            }
+
+    async def fetch_many(self, urls, headers=None, validators=None):
+        """
+        Fetch many URLs concurrently.
+
+        Args:
+            urls (list): URLs to fetch
+            headers (dict, optional): Extra request headers. Defaults to None.
+            validators (dict, optional): Map of url -> stored validators. Defaults to None.
+
+        Returns:
+            list: One result dict per URL, in input order
+        """
+        validators = validators or {}
+        return await asyncio.gather(*[
+            self.fetch(url, headers=headers, validators=validators.get(url)) for url in urls
+        ])
+
+    def get_stats(self):
+        """
+        Get engine statistics.
+
+        Returns:
+            dict: Request, 304, truncation and error counts
+        """
+        return {
+            "backend": "httpx" if HTTPX_AVAILABLE else "requests",
+            "http2": HTTP2_AVAILABLE,
+            "requests_sent": self.requests_sent,
+            "not_modified": self.not_modified,
+            "truncated": self.truncated,
+            "errors": self.errors,
+            "hosts": len(self._host_semaphores)
+        }
+
+
+# The engine and its loop are shared process-wide so connections are reused across calls
+_loop_thread = None
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_fetch_engine():
+    """
+    Get the process-wide fetch engine and its event loop thread.
+
+    Returns:
+        tuple: (AsyncFetchEngine, _LoopThread)
+    """
+    global _loop_thread, _engine
+    with _engine_lock:
+        if _engine is None:
+            _loop_thread = _LoopThread()
+            _engine = AsyncFetchEngine()
+        return _engine, _loop_thread
+
+
+def fetch_many_sync(urls, headers=None, validators=None, timeout=None):
+    """
+    Fetch many URLs concurrently from synchronous code.
+
+    Args:
+        urls (list): URLs to fetch
+        headers (dict, optional): Extra request headers. Defaults to None.
+        validators (dict, optional): Map of url -> stored validators. Defaults to None.
+        timeout (float, optional): Overall timeout in seconds. Defaults to None.
+
+    Returns:
+        list: One result dict per URL, in input order
+    """
+    engine, loop_thread = get_fetch_engine()
+    return loop_thread.run(engine.fetch_many(urls, headers=headers, validators=validators), timeout=timeout)
@@ -1,18 +1,20 @@
 """
 Cache manager for the Super Agent.
-This module provides caching functionality for booking search results.
+This module provides caching functionality for booking search results on top
+of the shared cache service.
 """
 
-import os
-import json
-import time
-import hashlib
 import logging
 
+from app.utils.cache_service import get_cache_service, make_cache_key
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cache namespace for booking search results
+BOOKING_SEARCH_NAMESPACE = 'booking_search'
+
 class CacheManager:
     """A cache manager for booking search results."""
 
@@ -21,16 +23,11 @@ class CacheManager:
         Initialize the cache manager.
         
         Args:
-            cache_dir (str, optional): Directory to store cache files. Defaults to 'cache' in current directory.
+            cache_dir (str, optional): Directory to store cache files. Defaults to the shared cache directory.
             cache_expiry (int, optional): Cache expiry time in seconds. Defaults to 3600 (1 hour).
         """
-        self.cache_dir = cache_dir or os.path.join(os.getcwd(), 'cache')
         self.cache_expiry = cache_expiry
-        
-        # Create cache directory if it doesn't exist
-        if not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
-            logger.info(f"Created cache directory: {self.cache_dir}")
+        self.cache = get_cache_service(cache_dir)
     
     def get_cache_key(self, data):
         """
@@ -42,11 +39,7 @@ class CacheManager:
         Returns:
             str: The cache key
         """
-        # Create a string representation of the data
-        data_str = json.dumps(data, sort_keys=True)
-        
-        # Generate a hash of the data
-        return hashlib.md5(data_str.encode()).hexdigest()
+        return make_cache_key(BOOKING_SEARCH_NAMESPACE, data)
     
     def get_cached_data(self, key):
         """
@@ -56,31 +49,12 @@ class CacheManager:
             key (str): The cache key
             
         Returns:
-            dict: The cached data, or None if not found or expired
+            dict: The cached entry ({'data', 'timestamp'}), or None if not found or expired
         """
-        cache_file = os.path.join(self.cache_dir, f"{key}.json")
-        
-        # Check if cache file exists and is not expired
-        if os.path.exists(cache_file):
-            try:
-                # Get file modification time
-                mod_time = os.path.getmtime(cache_file)
-                current_time = time.time()
-                
-                # Check if cache is expired
-                if current_time - mod_time <= self.cache_expiry:
-                    # Cache is still valid, load it
-                    with open(cache_file, 'r') as f:
-                        cache_data = json.load(f)
-                    
-                    logger.info(f"Using cached data for key: {key}")
-                    return cache_data
-                else:
-                    logger.info(f"Cache expired for key: {key}")
-            except Exception as e:
-                logger.warning(f"Error reading cache: {str(e)}")
-        
-        return None
+        cache_data = self.cache.get_entry(BOOKING_SEARCH_NAMESPACE, key, ttl=self.cache_expiry)
+        if cache_data is not None:
+            logger.info(f"Using cached data for key: {key}")
+        return cache_data
     
     def cache_data(self, key, data):
         """
@@ -90,19 +64,8 @@ class CacheManager:
             key (str): The cache key
             data (dict): The data to cache
         """
-        cache_file = os.path.join(self.cache_dir, f"{key}.json")
-        
         try:
-            # Create cache data with timestamp
-            cache_data = {
-                'data': data,
-                'timestamp': time.time()
-            }
-            
-            # Write cache data to file
-            with open(cache_file, 'w') as f:
-                json.dump(cache_data, f)
-            
+            self.cache.set(BOOKING_SEARCH_NAMESPACE, key, data, ttl=self.cache_expiry)
             logger.info(f"Cached data for key: {key}")
         except Exception as e:
             logger.warning(f"Error writing cache: {str(e)}")
@@ -114,21 +77,21 @@ class CacheManager:
         Args:
             key (str, optional): The cache key to clear. Defaults to None.
         """
-        if key:
-            # Clear specific cache
-            cache_file = os.path.join(self.cache_dir, f"{key}.json")
-            if os.path.exists(cache_file):
-                try:
-                    os.remove(cache_file)
-                    logger.info(f"Cleared cache for key: {key}")
-                except Exception as e:
-                    logger.warning(f"Error clearing cache for key {key}: {str(e)}")
-        else:
-            # Clear all cache
-            try:
-                for filename in os.listdir(self.cache_dir):
-                    if filename.endswith('.json'):
-                        os.remove(os.path.join(self.cache_dir, filename))
+        try:
+            if key:
+                self.cache.delete(BOOKING_SEARCH_NAMESPACE, key)
+                logger.info(f"Cleared cache for key: {key}")
+            else:
+                self.cache.clear(BOOKING_SEARCH_NAMESPACE)
                 logger.info("Cleared all cache")
-            except Exception as e:
-                logger.warning(f"Error clearing all cache: {str(e)}")
+        except Exception as e:
+            logger.warning(f"Error clearing cache: {str(e)}")
+
+    def get_stats(self):
+        """
+        Get cache statistics for booking search results.
+
+        Returns:
+            dict: Cache statistics
+        """
+        return self.cache.get_stats(BOOKING_SEARCH_NAMESPACE)
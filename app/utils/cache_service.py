@@ -0,0 +1,727 @@
+"""
+Shared cache service for AutoWave.
+This module provides one cache with a single key scheme, TTL policy and stats
+surface for every subsystem that caches fetched pages or search results. Each
+process keeps a byte-bounded in-memory tier in front of a shared tier (the
+sharded disk store by default, SQLite in WAL mode or Redis optionally) so a
+value cached by one agent or gunicorn worker is a hit for every other one.
+get_or_compute() adds single-flight coalescing, so concurrent misses on the
+same key in one process share a single computation.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import defaultdict, deque
+
+from app.utils.page_cache import MemoryLRU, get_disk_store
+
+# Optional Redis import
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    redis = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Default cache directory shared by all subsystems
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'cache')
+
+# Default time to live per namespace, in seconds
+DEFAULT_TTLS = {
+    # Pages are kept for a week so expired entries can be revalidated with conditional GETs
+    'page': 7 * 86400,
+    'super_agent_task': 3600,
+    'booking_search': 3600,
+    'booking_results': 86400,
+    # Context 7 tool results; flight prices move fastest
+    'context7_flight_booking': 900,
+    'context7_hotel_search': 1800,
+    'context7_restaurant_booking': 1800,
+    'context7_price_comparison': 3600,
+    # Analyses of uploaded files are keyed by content hash and never go stale
+    'file_analysis': 7 * 86400
+}
+DEFAULT_TTL = 3600
+
+
+def make_cache_key(namespace, key):
+    """
+    Build a cache key from a namespace and a natural key.
+
+    Args:
+        namespace (str): The cache namespace (e.g. 'page')
+        key (str or dict): The natural key; dicts and lists are serialized canonically
+
+    Returns:
+        str: A hex digest that is stable across processes
+    """
+    if not isinstance(key, str):
+        key = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.md5(f"{namespace}:{key}".encode('utf-8')).hexdigest()
+
+
+def _percentile(sorted_values, pct):
+    """
+    Return the given percentile of an already sorted list.
+
+    Args:
+        sorted_values (list): Sorted samples
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value, or 0.0 if there are no samples
+    """
+    if not sorted_values:
+        return 0.0
+    index = int(round((pct / 100.0) * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def _encode(record):
+    """Serialize and compress a cache record."""
+    return zlib.compress(json.dumps(record, default=str).encode('utf-8'))
+
+
+def _decode(payload):
+    """Decompress and deserialize a cache record."""
+    return json.loads(zlib.decompress(payload))
+
+
+class SQLiteStore:
+    """A shared cache tier backed by a SQLite database in WAL mode."""
+
+    def __init__(self, db_path, ttl=86400, max_bytes=512 * 1024 * 1024, sweep_interval=300):
+        """
+        Initialize the SQLite store.
+
+        Args:
+            db_path (str): Path to the database file
+            ttl (int, optional): Maximum retention of any entry in seconds. Defaults to 86400.
+            max_bytes (int, optional): Maximum total payload size. Defaults to 512 MB.
+            sweep_interval (int, optional): Seconds between background sweeps. Defaults to 300.
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.evictions = 0
+        self.expirations = 0
+        self.last_sweep = None
+
+        self._local = threading.local()
+        self._stop_event = threading.Event()
+        self._sweeper = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                value BLOB NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_created ON cache_entries (created_at)")
+        conn.commit()
+
+    def _conn(self):
+        """Get this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """
+        Read a record.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            dict: The stored record ({'timestamp', 'data'}), or None if missing or expired
+        """
+        row = self._conn().execute(
+            "SELECT value, created_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] >= self.ttl:
+            self.delete(key)
+            self.expirations += 1
+            return None
+        return _decode(row[0])
+
+    def set(self, key, record, namespace=''):
+        """
+        Write a record.
+
+        Args:
+            key (str): The cache key
+            record (dict): The record to store; must contain a 'timestamp'
+            namespace (str, optional): Namespace, kept for per-namespace sweeps. Defaults to ''.
+
+        Returns:
+            int: Size of the stored payload in bytes
+        """
+        payload = _encode(record)
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, namespace, created_at, size, value) VALUES (?, ?, ?, ?, ?)",
+            (key, namespace, record["timestamp"], len(payload), sqlite3.Binary(payload))
+        )
+        conn.commit()
+        return len(payload)
+
+    def delete(self, key):
+        """
+        Remove a record.
+
+        Args:
+            key (str): The cache key
+        """
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        conn.commit()
+
+    def clear(self, namespace=None):
+        """
+        Remove every record, or every record in one namespace.
+
+        Args:
+            namespace (str, optional): Namespace to clear. Defaults to None (all).
+        """
+        conn = self._conn()
+        if namespace is None:
+            conn.execute("DELETE FROM cache_entries")
+        else:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+        conn.commit()
+
+    def sweep(self):
+        """
+        Delete expired records and enforce the total size budget.
+
+        Returns:
+            dict: Counts of expired and evicted records
+        """
+        now = time.time()
+        conn = self._conn()
+        expired = conn.execute("DELETE FROM cache_entries WHERE created_at <= ?", (now - self.ttl,)).rowcount
+
+        evicted = 0
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        if total > self.max_bytes:
+            # Sweep down to 90% so we don't immediately trigger again
+            target = int(self.max_bytes * 0.9)
+            for key, size in conn.execute("SELECT key, size FROM cache_entries ORDER BY created_at").fetchall():
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        conn.commit()
+
+        self.expirations += expired
+        self.evictions += evicted
+        self.last_sweep = now
+        return {"expired": expired, "evicted": evicted}
+
+    def stats(self):
+        """
+        Get store statistics.
+
+        Returns:
+            dict: Entry count, byte usage and eviction counts
+        """
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.db_path,
+            "entries": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "last_sweep": self.last_sweep
+        }
+
+    def _sweep_loop(self):
+        """Background loop that sweeps the store periodically."""
+        while not self._stop_event.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"Error sweeping cache database {self.db_path}: {str(e)}")
+
+    def start_sweeper(self):
+        """Start the background sweeper thread if it is not already running."""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stop_event.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True, name="cache-sweeper-sqlite")
+        self._sweeper.start()
+
+
+class RedisStore:
+    """A shared cache tier backed by Redis; expiry is left to Redis TTLs."""
+
+    def __init__(self, client, ttl=86400, prefix='autowave:cache:'):
+        """
+        Initialize the Redis store.
+
+        Args:
+            client: A connected redis.Redis client (binary responses)
+            ttl (int, optional): Maximum retention of any entry in seconds. Defaults to 86400.
+            prefix (str, optional): Key prefix. Defaults to 'autowave:cache:'.
+        """
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        """Read a record, or None if missing."""
+        payload = self.client.get(self.prefix + key)
+        return _decode(payload) if payload else None
+
+    def set(self, key, record, namespace=''):
+        """Write a record with a Redis expiry."""
+        payload = _encode(record)
+        self.client.set(self.prefix + key, payload, ex=int(self.ttl))
+        return len(payload)
+
+    def delete(self, key):
+        """Remove a record."""
+        self.client.delete(self.prefix + key)
+
+    def clear(self, namespace=None):
+        """Remove every record under the prefix."""
+        for redis_key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(redis_key)
+
+    def stats(self):
+        """Get store statistics."""
+        return {"backend": "redis", "prefix": self.prefix}
+
+
+class DiskStore:
+    """Adapter exposing the sharded disk store through the shared tier interface."""
+
+    def __init__(self, cache_dir, ttl=86400, max_bytes=512 * 1024 * 1024):
+        """
+        Initialize the disk store adapter.
+
+        Args:
+            cache_dir (str): Root directory of the sharded store
+            ttl (int, optional): Maximum retention of any entry in seconds. Defaults to 86400.
+            max_bytes (int, optional): Maximum total size on disk. Defaults to 512 MB.
+        """
+        self.store = get_disk_store(cache_dir, ttl=ttl, max_bytes=max_bytes)
+
+    def get(self, key):
+        """Read a record, or None if missing or expired; hits are touched so size sweeps keep them."""
+        record = self.store.get(key)
+        if record is not None:
+            self.store.touch(key)
+        return record
+
+    def set(self, key, record, namespace=''):
+        """Write a record atomically."""
+        return self.store.set(key, record)
+
+    def delete(self, key):
+        """Remove a record."""
+        self.store.delete(key)
+
+    def clear(self, namespace=None):
+        """Remove every record."""
+        self.store.clear()
+
+    def stats(self):
+        """Get store statistics."""
+        return {
+            "backend": "disk",
+            "path": self.store.cache_dir,
+            "entries": self.store.entry_count,
+            "bytes": self.store.current_bytes,
+            "max_bytes": self.store.max_bytes,
+            "evictions": self.store.evictions,
+            "expirations": self.store.expirations,
+            "last_sweep": self.store.last_sweep
+        }
+
+
+def _create_shared_store(cache_dir, backend, max_ttl, max_bytes):
+    """
+    Create the shared tier for a cache directory.
+
+    Args:
+        cache_dir (str): The cache directory
+        backend (str): 'disk', 'sqlite' or 'redis'
+        max_ttl (int): Maximum retention of any entry in seconds
+        max_bytes (int): Maximum total size of the shared tier
+
+    Returns:
+        The shared store
+    """
+    if backend == 'redis':
+        if REDIS_AVAILABLE:
+            try:
+                client = redis.Redis(
+                    host=os.getenv('REDIS_HOST', 'localhost'),
+                    port=int(os.getenv('REDIS_PORT', 6379)),
+                    db=int(os.getenv('REDIS_DB', 0))
+                )
+                client.ping()
+                logger.info("Connected to Redis for the shared cache")
+                return RedisStore(client, ttl=max_ttl)
+            except Exception:
+                logger.warning("Redis not available, using the disk store for the shared cache")
+        else:
+            logger.info("Redis module not installed, using the disk store for the shared cache")
+        backend = 'disk'
+
+    if backend == 'sqlite':
+        store = SQLiteStore(os.path.join(cache_dir, 'shared_cache.db'), ttl=max_ttl, max_bytes=max_bytes)
+        store.start_sweeper()
+        return store
+
+    return DiskStore(cache_dir, ttl=max_ttl, max_bytes=max_bytes)
+
+
+class _Flight:
+    """A computation in progress that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class CacheService:
+    """A two-tier cache: per-process memory LRU in front of a cross-process shared store."""
+
+    def __init__(self, shared_store, max_memory_bytes=64 * 1024 * 1024, max_memory_items=None,
+                 ttls=None, latency_samples=1024):
+        """
+        Initialize the cache service.
+
+        Args:
+            shared_store: The shared tier (DiskStore, SQLiteStore or RedisStore)
+            max_memory_bytes (int, optional): In-process tier byte budget. Defaults to 64 MB.
+            max_memory_items (int, optional): Optional in-process tier item cap. Defaults to None.
+            ttls (dict, optional): Default TTL per namespace. Defaults to DEFAULT_TTLS.
+            latency_samples (int, optional): Recent hit latencies kept per namespace. Defaults to 1024.
+        """
+        self.shared = shared_store
+        self.memory = MemoryLRU(max_bytes=max_memory_bytes, max_items=max_memory_items)
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+
+        self._stats = defaultdict(lambda: {"memory_hits": 0, "shared_hits": 0, "misses": 0, "sets": 0, "coalesced": 0})
+        self._latencies = defaultdict(lambda: deque(maxlen=latency_samples))
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    def limit_memory(self, max_bytes=None, max_items=None):
+        """
+        Tighten the in-process tier limits.
+
+        The service is shared by every caller using the same directory, so a
+        caller can only lower the limits, never raise them for the others.
+
+        Args:
+            max_bytes (int, optional): Byte budget to apply. Defaults to None (unchanged).
+            max_items (int, optional): Item cap to apply. Defaults to None (unchanged).
+        """
+        if max_bytes is not None:
+            self.memory.max_bytes = min(self.memory.max_bytes, max_bytes)
+        if max_items is not None:
+            self.memory.max_items = min(self.memory.max_items or max_items, max_items)
+
+    def get_ttl(self, namespace, ttl=None):
+        """
+        Resolve the TTL for a namespace.
+
+        Args:
+            namespace (str): The cache namespace
+            ttl (int, optional): Explicit TTL that overrides the namespace default. Defaults to None.
+
+        Returns:
+            int: The TTL in seconds
+        """
+        return ttl if ttl is not None else self.ttls.get(namespace, DEFAULT_TTL)
+
+    def get_entry(self, namespace, key, ttl=None):
+        """
+        Get the full cached record for a key.
+
+        Args:
+            namespace (str): The cache namespace
+            key (str or dict): The natural key
+            ttl (int, optional): Maximum age in seconds. Defaults to the namespace TTL.
+
+        Returns:
+            dict: The record ({'timestamp', 'data'}), or None if not found or expired
+        """
+        start = time.perf_counter()
+        ttl = self.get_ttl(namespace, ttl)
+        cache_key = make_cache_key(namespace, key)
+        stats = self._stats[namespace]
+
+        record = self.memory.get(cache_key)
+        if record is not None and time.time() - record["timestamp"] < ttl:
+            stats["memory_hits"] += 1
+            self._latencies[namespace].append(time.perf_counter() - start)
+            return record
+
+        try:
+            record = self.shared.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Error reading shared cache: {str(e)}")
+            record = None
+
+        if record is not None and time.time() - record["timestamp"] < ttl:
+            remaining = ttl - (time.time() - record["timestamp"])
+            self.memory.set(cache_key, record, len(json.dumps(record, default=str)), ttl=remaining)
+            stats["shared_hits"] += 1
+            self._latencies[namespace].append(time.perf_counter() - start)
+            return record
+
+        stats["misses"] += 1
+        return None
+
+    def get(self, namespace, key, ttl=None):
+        """
+        Get cached data for a key.
+
+        Args:
+            namespace (str): The cache namespace
+            key (str or dict): The natural key
+            ttl (int, optional): Maximum age in seconds. Defaults to the namespace TTL.
+
+        Returns:
+            The cached data, or None if not found or expired
+        """
+        record = self.get_entry(namespace, key, ttl)
+        return record["data"] if record is not None else None
+
+    def set(self, namespace, key, data, ttl=None):
+        """
+        Store data in both tiers.
+
+        Args:
+            namespace (str): The cache namespace
+            key (str or dict): The natural key
+            data: JSON-serializable data to cache
+            ttl (int, optional): TTL for the in-process tier. Defaults to the namespace TTL.
+        """
+        cache_key = make_cache_key(namespace, key)
+        record = {"timestamp": time.time(), "data": data}
+        size = len(json.dumps(record, default=str))
+
+        self.memory.set(cache_key, record, size, ttl=self.get_ttl(namespace, ttl))
+        self._stats[namespace]["sets"] += 1
+        try:
+            self.shared.set(cache_key, record, namespace=namespace)
+        except Exception as e:
+            logger.warning(f"Error writing shared cache: {str(e)}")
+
+    def get_or_compute(self, namespace, key, compute, ttl=None, cacheable=None, wait_timeout=None):
+        """
+        Get cached data for a key, computing and storing it on a miss.
+
+        Concurrent misses on the same key in this process are coalesced: the first
+        caller runs compute() and the others wait for its result instead of
+        repeating the work. An exception from compute() is raised in every caller.
+        A caller that waits longer than wait_timeout stops waiting and runs
+        compute() itself, so a hung computation cannot hold every caller.
+
+        Args:
+            namespace (str): The cache namespace
+            key (str or dict): The natural key
+            compute (callable): Produces the data on a miss
+            ttl (int, optional): Maximum age in seconds. Defaults to the namespace TTL.
+            cacheable (callable, optional): Returns False for results that must not be stored. Defaults to None (store all).
+            wait_timeout (float, optional): Seconds to wait for another caller's computation. Defaults to None (no limit).
+
+        Returns:
+            tuple: (data, source) where source is 'hit', 'coalesced' or 'miss'
+        """
+        record = self.get_entry(namespace, key, ttl)
+        if record is not None:
+            return record["data"], 'hit'
+
+        cache_key = make_cache_key(namespace, key)
+        with self._flights_lock:
+            flight = self._flights.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[cache_key] = _Flight()
+            else:
+                flight.waiters += 1
+                self._stats[namespace]["coalesced"] += 1
+
+        if not leader:
+            if flight.done.wait(wait_timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result, 'coalesced'
+            logger.warning(f"Gave up waiting {wait_timeout}s for {namespace} computation, computing it again")
+            with self._flights_lock:
+                flight.waiters -= 1
+                self._stats[namespace]["coalesced"] -= 1
+            data = compute()
+            if cacheable is None or cacheable(data):
+                self.set(namespace, key, data, ttl)
+            return data, 'miss'
+
+        try:
+            flight.result = compute()
+            if cacheable is None or cacheable(flight.result):
+                self.set(namespace, key, flight.result, ttl)
+            return flight.result, 'miss'
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(cache_key, None)
+            flight.done.set()
+
+    def delete(self, namespace, key):
+        """
+        Remove a key from both tiers.
+
+        Args:
+            namespace (str): The cache namespace
+            key (str or dict): The natural key
+        """
+        cache_key = make_cache_key(namespace, key)
+        self.memory.delete(cache_key)
+        try:
+            self.shared.delete(cache_key)
+        except Exception as e:
+            logger.warning(f"Error deleting from shared cache: {str(e)}")
+
+    def clear(self, namespace=None):
+        """
+        Clear the cache.
+
+        Args:
+            namespace (str, optional): Namespace to clear in the shared tier. Defaults to None (all).
+        """
+        self.memory.clear()
+        self.shared.clear(namespace)
+
+    def get_stats(self, namespace=None):
+        """
+        Get cache statistics.
+
+        Args:
+            namespace (str, optional): Restrict namespace stats to one namespace. Defaults to None.
+
+        Returns:
+            dict: Per-namespace hit/miss counts and hit latency percentiles, plus tier usage
+        """
+        namespaces = {}
+        for name, counts in list(self._stats.items()):
+            if namespace is not None and name != namespace:
+                continue
+            hits = counts["memory_hits"] + counts["shared_hits"]
+            total_requests = hits + counts["misses"]
+            # Coalesced callers missed the cache but did not repeat the work
+            computed = counts["misses"] - counts["coalesced"]
+            latencies = sorted(self._latencies[name])
+            namespaces[name] = dict(
+                counts,
+                cache_hits=hits,
+                cache_misses=counts["misses"],
+                hit_rate=f"{(hits / total_requests) * 100 if total_requests else 0:.2f}%",
+                computations=computed,
+                saved_rate=f"{((total_requests - computed) / total_requests) * 100 if total_requests else 0:.2f}%",
+                ttl=self.get_ttl(name),
+                hit_latency_ms={
+                    "p50": round(_percentile(latencies, 50) * 1000, 3),
+                    "p95": round(_percentile(latencies, 95) * 1000, 3),
+                    "p99": round(_percentile(latencies, 99) * 1000, 3),
+                    "samples": len(latencies)
+                }
+            )
+
+        try:
+            shared_stats = self.shared.stats()
+        except Exception as e:
+            shared_stats = {"error": str(e)}
+
+        return {
+            "namespaces": namespaces,
+            "memory": {
+                "entries": len(self.memory),
+                "bytes": self.memory.current_bytes,
+                "max_bytes": self.memory.max_bytes,
+                "evictions": self.memory.evictions
+            },
+            "shared": shared_stats
+        }
+
+
+# One service per cache directory per process
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_cache_service(cache_dir=None, max_memory_bytes=None, max_memory_items=None, max_shared_bytes=None):
+    """
+    Get the shared cache service for a directory, creating it on first use.
+
+    The shared tier is chosen by the CACHE_BACKEND environment variable
+    ('disk' by default, 'sqlite' or 'redis').
+
+    Args:
+        cache_dir (str, optional): Cache directory. Defaults to the project's cache/ directory.
+        max_memory_bytes (int, optional): In-process tier byte budget. Defaults to CACHE_MEMORY_BYTES or 64 MB.
+        max_memory_items (int, optional): In-process tier item cap. Defaults to None.
+        max_shared_bytes (int, optional): Shared tier byte budget, used when the service is
+            created. Defaults to CACHE_MAX_BYTES or 512 MB.
+
+    Returns:
+        CacheService: The cache service
+    """
+    cache_dir = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+    with _services_lock:
+        service = _services.get(cache_dir)
+        if service is None:
+            backend = os.getenv('CACHE_BACKEND', 'disk').lower()
+            max_ttl = int(os.getenv('CACHE_MAX_TTL', max(DEFAULT_TTLS.values())))
+            if max_shared_bytes is None:
+                max_shared_bytes = int(os.getenv('CACHE_MAX_BYTES', 512 * 1024 * 1024))
+            if max_memory_bytes is None:
+                max_memory_bytes = int(os.getenv('CACHE_MEMORY_BYTES', 64 * 1024 * 1024))
+            shared_store = _create_shared_store(cache_dir, backend, max_ttl, max_shared_bytes)
+            service = CacheService(
+                shared_store,
+                max_memory_bytes=max_memory_bytes,
+                max_memory_items=max_memory_items
+            )
+            _services[cache_dir] = service
+            logger.info(f"Initialized {backend} cache service at {cache_dir}")
+        else:
+            service.limit_memory(max_memory_bytes, max_memory_items)
+        return service
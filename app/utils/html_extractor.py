@@ -0,0 +1,292 @@
+"""
+Single-pass HTML extraction for the web browser.
+This module extracts the title, readable text, links, headings, forms and images
+of a page in one traversal, without building a BeautifulSoup tree. selectolax's
+lexbor HTML5 parser is used when installed; otherwise the standard library HTML
+parser streams the document.
+"""
+
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# Optional selectolax import (lexbor backend)
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+# Elements whose text is not part of the readable content
+SKIP_TEXT_TAGS = {'script', 'style', 'template'}
+
+# Elements that never have a closing tag
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+             'meta', 'param', 'source', 'track', 'wbr'}
+
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3}
+FORM_FIELD_TAGS = {'input', 'textarea', 'select'}
+
+BACKGROUND_IMAGE_PATTERN = re.compile(r"background-image:\s*url\(['\"]?([^'\"\)]+)['\"]?\)")
+
+MAX_IMAGES = 15
+
+
+def _is_content_image(src, width, height):
+    """
+    Decide whether an image is substantial enough to report.
+
+    Args:
+        src (str): Absolute image URL
+        width: The width attribute, if any
+        height: The height attribute, if any
+
+    Returns:
+        bool: True for images larger than 100x100, or undimensioned JPEG/PNG files
+    """
+    if width and height:
+        try:
+            return int(width) > 100 and int(height) > 100
+        except (ValueError, TypeError):
+            return False
+    if not width and not height:
+        lower = src.lower()
+        return 'jpg' in lower or 'jpeg' in lower or 'png' in lower
+    return False
+
+
+class PageExtraction:
+    """The result of extracting one page."""
+
+    def __init__(self, url):
+        self.url = url
+        self.title = None
+        self.text_parts = []
+        self.links = []
+        self.headings = []
+        self.forms = []
+        self.images = []
+        self.background_images = []
+
+    @property
+    def text(self):
+        """Readable text, equivalent to get_text(separator=' ', strip=True) without scripts and styles."""
+        return ' '.join(self.text_parts)
+
+    def to_dict(self):
+        """
+        Get the extraction as a plain dictionary.
+
+        Returns:
+            dict: title, text, links, headings, forms and images
+        """
+        return {
+            "title": self.title or "No title",
+            "text": self.text,
+            "links": self.links,
+            "headings": self.headings,
+            "forms": self.forms,
+            "images": self.images
+        }
+
+
+class _ExtractionState:
+    """Event handler shared by the selectolax and standard library backends."""
+
+    def __init__(self, url):
+        self.page = PageExtraction(url)
+        self.url = url
+        self.skip_depth = 0
+        self.in_title = False
+        self.title_parts = []
+        self.open_links = []      # (link dict, text parts) of each open <a>, innermost last
+        self.heading = None       # (level, text parts) of the open heading
+        self.form = None          # form dict being filled
+        self.select = None        # (field dict, first selected value) of the open <select>
+
+    def _absolute(self, href):
+        if href and not href.startswith(('http://', 'https://', 'data:')):
+            return urljoin(self.url or '', href)
+        return href
+
+    def start(self, tag, attrs):
+        """Handle an opening tag."""
+        if tag in SKIP_TEXT_TAGS:
+            self.skip_depth += 1
+            return
+
+        if tag == 'title' and self.page.title is None:
+            self.in_title = True
+        elif tag == 'a' and attrs.get('href') is not None:
+            href = attrs['href']
+            if not href.startswith(('http://', 'https://')):
+                href = urljoin(self.url or '', href)
+            # Links are recorded in start-tag order; text is filled in when they close
+            link = {"text": "", "href": href}
+            self.page.links.append(link)
+            self.open_links.append((link, []))
+        elif tag in HEADING_TAGS:
+            self.heading = (HEADING_TAGS[tag], [])
+        elif tag == 'form':
+            action = attrs.get('action')
+            if action:
+                if not action.startswith(('http://', 'https://')):
+                    action = urljoin(self.url or '', action)
+            else:
+                action = self.url
+            self.form = {"action": action, "method": (attrs.get('method') or 'get').lower(), "inputs": []}
+            self.form["id"] = len(self.page.forms)
+            self.page.forms.append(self.form)
+        elif tag in FORM_FIELD_TAGS and self.form is not None:
+            field = {
+                "type": tag,
+                "input_type": attrs.get('type') or 'text',
+                "name": attrs.get('name'),
+                "value": attrs.get('value') or ''
+            }
+            self.form["inputs"].append(field)
+            if tag == 'select':
+                self.select = field
+        elif tag == 'option' and self.select is not None and 'selected' in attrs:
+            if not self.select.get('_selected'):
+                self.select["value"] = attrs.get('value') or ''
+                self.select['_selected'] = True
+        elif tag == 'img' and attrs.get('src'):
+            self._add_image(attrs['src'], attrs.get('alt') or '', attrs.get('width') or 0, attrs.get('height') or 0)
+
+        style = attrs.get('style')
+        if style and 'background-image' in style:
+            match = BACKGROUND_IMAGE_PATTERN.search(style)
+            if match:
+                self.page.background_images.append(self._absolute(match.group(1)))
+
+    def _add_image(self, src, alt, width, height):
+        if len(self.page.images) >= MAX_IMAGES:
+            return
+        src = self._absolute(src)
+        if src and not src.startswith('data:') and _is_content_image(src, width, height):
+            self.page.images.append({"src": src, "alt": alt, "width": width, "height": height})
+
+    def end(self, tag):
+        """Handle a closing tag."""
+        if tag in SKIP_TEXT_TAGS:
+            if self.skip_depth:
+                self.skip_depth -= 1
+            return
+
+        if tag == 'title' and self.in_title:
+            self.in_title = False
+            self.page.title = ''.join(self.title_parts)
+        elif tag == 'a' and self.open_links:
+            link, parts = self.open_links.pop()
+            link["text"] = ''.join(parts)
+        elif tag in HEADING_TAGS and self.heading is not None:
+            level, parts = self.heading
+            self.page.headings.append({"level": level, "text": ''.join(parts)})
+            self.heading = None
+        elif tag == 'form':
+            self.form = None
+        elif tag == 'select' and self.select is not None:
+            self.select.pop('_selected', None)
+            self.select = None
+
+    def data(self, text):
+        """Handle a run of character data."""
+        if not text or self.skip_depth:
+            return
+        if self.in_title:
+            self.title_parts.append(text)
+        stripped = text.strip()
+        if not stripped:
+            return
+        self.page.text_parts.append(stripped)
+        for _, parts in self.open_links:
+            parts.append(stripped)
+        if self.heading is not None:
+            self.heading[1].append(stripped)
+
+    def finish(self):
+        """Close any elements left open and return the extraction."""
+        if self.in_title:
+            self.page.title = ''.join(self.title_parts)
+        while self.open_links:
+            self.end('a')
+        if self.select is not None:
+            self.select.pop('_selected', None)
+        return self.page
+
+
+class _StreamingParser(HTMLParser):
+    """Standard library backend: feeds parser events straight into the extraction state."""
+
+    def __init__(self, state):
+        super().__init__(convert_charrefs=True)
+        self.state = state
+
+    def handle_starttag(self, tag, attrs):
+        self.state.start(tag, dict(attrs))
+        if tag in VOID_TAGS:
+            self.state.end(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.state.start(tag, dict(attrs))
+        self.state.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_TAGS:
+            self.state.end(tag)
+
+    def handle_data(self, data):
+        self.state.data(data)
+
+
+def _extract_with_selectolax(html, state):
+    """selectolax backend: one iterative depth-first walk over the lexbor tree."""
+    root = LexborHTMLParser(html).root
+    if root is None:
+        return
+    stack = [(root, False)]
+    while stack:
+        node, closing = stack.pop()
+        tag = node.tag
+        if closing:
+            state.end(tag)
+            continue
+        if tag == '-text':
+            state.data(node.text_content)
+            continue
+        if tag.startswith(('-', '!')):
+            # Comments and doctypes
+            continue
+        state.start(tag, node.attributes)
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(list(node.iter(include_text=True))))
+
+
+def extract_page(html, url=None, backend=None):
+    """
+    Extract title, text, links, headings, forms and images from HTML in one pass.
+
+    Args:
+        html (str): The raw HTML
+        url (str, optional): The page URL, used to absolutize links. Defaults to None.
+        backend (str, optional): 'selectolax' or 'stdlib'. Defaults to selectolax when installed.
+
+    Returns:
+        PageExtraction: The extracted page
+    """
+    state = _ExtractionState(url)
+    if not html:
+        return state.finish()
+
+    if backend is None:
+        backend = 'selectolax' if SELECTOLAX_AVAILABLE else 'stdlib'
+
+    if backend == 'selectolax' and SELECTOLAX_AVAILABLE:
+        _extract_with_selectolax(html, state)
+        return state.finish()
+
+    parser = _StreamingParser(state)
+    parser.feed(html)
+    parser.close()
+    return state.finish()
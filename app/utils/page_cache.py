@@ -0,0 +1,463 @@
+"""
+Cache storage primitives.
+This module provides a byte-bounded in-memory LRU and a sharded, compressed
+on-disk store with a background sweeper that enforces TTL and total size.
+Both are used as tiers by app.utils.cache_service.
+
+Flat ``<md5>.json`` files left by the pre-sharding cache were keyed by
+md5(url), which no current key matches, so they are not migrated: the
+sweeper deletes them.
+"""
+
+import os
+import json
+import time
+import zlib
+import threading
+import tempfile
+import logging
+from collections import OrderedDict
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Extension used for compressed cache entries on disk
+CACHE_FILE_SUFFIX = '.json.z'
+
+HEX_DIGITS = '0123456789abcdef'
+
+
+def _is_shard_name(name):
+    """Check whether a directory name is one level of the two-character hex fan-out."""
+    return len(name) == 2 and all(c in HEX_DIGITS for c in name)
+
+
+def _is_legacy_name(name):
+    """Check whether a file name looks like an old flat ``<md5>.json`` cache entry."""
+    stem, ext = os.path.splitext(name)
+    return ext == '.json' and len(stem) == 32 and all(c in HEX_DIGITS for c in stem)
+
+
+class MemoryLRU:
+    """An LRU cache bounded by the total byte size of its entries."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_items=None):
+        """
+        Initialize the memory cache.
+
+        Args:
+            max_bytes (int, optional): Maximum total size of cached entries. Defaults to 64 MB.
+            max_items (int, optional): Optional cap on the number of entries. Defaults to None.
+        """
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Get a value and mark it as most recently used.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                self.current_bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size, ttl=None):
+        """
+        Store a value, evicting least recently used entries as needed.
+
+        Args:
+            key (str): The cache key
+            value: The value to store
+            size (int): Size of the value in bytes, used for the byte budget
+            ttl (float, optional): Time to live in seconds. Defaults to None (no expiry).
+        """
+        if size > self.max_bytes:
+            # Never let a single oversized entry flush the whole cache
+            self.delete(key)
+            return
+
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (expires_at, size, value)
+            self.current_bytes += size
+
+            while self._entries and (
+                self.current_bytes > self.max_bytes
+                or (self.max_items and len(self._entries) > self.max_items)
+            ):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key):
+        """
+        Remove a key from the cache.
+
+        Args:
+            key (str): The cache key
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry[1]
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+class ShardedDiskStore:
+    """
+    A compressed on-disk key/value store with two-level hex fan-out.
+
+    Entries live at ``<cache_dir>/<k[0:2]>/<k[2:4]>/<key>.json.z`` and are written
+    atomically via a temporary file and ``os.replace``. The file modification time
+    is the write time, so the sweeper can expire entries without reading them.
+    """
+
+    def __init__(self, cache_dir, ttl=86400, max_bytes=512 * 1024 * 1024,
+                 sweep_interval=300, compress_level=6):
+        """
+        Initialize the disk store.
+
+        Args:
+            cache_dir (str): Root directory of the store
+            ttl (int, optional): Entry time to live in seconds. Defaults to 86400.
+            max_bytes (int, optional): Maximum total size on disk. Defaults to 512 MB.
+            sweep_interval (int, optional): Seconds between background sweeps. Defaults to 300.
+            compress_level (int, optional): zlib compression level. Defaults to 6.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.compress_level = compress_level
+
+        self.current_bytes = 0
+        self.entry_count = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.last_sweep = None
+
+        self._lock = threading.Lock()
+        # Held by whichever sweep is running, so sweeps never overlap
+        self._sweep_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sweeper = None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.sweep()
+
+    def _path(self, key):
+        """
+        Get the sharded file path for a key.
+
+        Args:
+            key (str): The cache key (a hex digest)
+
+        Returns:
+            str: The file path
+        """
+        return os.path.join(self.cache_dir, key[0:2], key[2:4], f"{key}{CACHE_FILE_SUFFIX}")
+
+    def get(self, key):
+        """
+        Read an entry from disk.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            dict: The stored record ({'timestamp', 'data'}), or None if missing or expired
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Error reading cache entry {key}: {str(e)}")
+            return None
+
+        try:
+            record = json.loads(zlib.decompress(payload))
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"Corrupt cache entry {key}, removing: {str(e)}")
+            self.delete(key)
+            return None
+
+        if time.time() - record.get("timestamp", 0) >= self.ttl:
+            self.delete(key)
+            self.expirations += 1
+            return None
+
+        return record
+
+    def set(self, key, record):
+        """
+        Write an entry to disk atomically.
+
+        Args:
+            key (str): The cache key
+            record (dict): The record to store; must contain a 'timestamp'
+
+        Returns:
+            int: Size of the serialized (uncompressed) record in bytes
+        """
+        raw = json.dumps(record).encode('utf-8')
+        payload = zlib.compress(raw, self.compress_level)
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        try:
+            old_size = os.path.getsize(path)
+            is_new = False
+        except OSError:
+            old_size = 0
+            is_new = True
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self.current_bytes += len(payload) - old_size
+            if is_new:
+                self.entry_count += 1
+
+        if self.current_bytes > self.max_bytes:
+            self._start_sweep_now()
+
+        return len(raw)
+
+    def delete(self, key):
+        """
+        Remove an entry from disk.
+
+        Args:
+            key (str): The cache key
+        """
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self.current_bytes -= size
+            self.entry_count -= 1
+
+    def touch(self, key):
+        """Refresh the access time of an entry so size-based sweeps keep hot entries."""
+        try:
+            os.utime(self._path(key), None)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove every entry in the store."""
+        for path, _, _ in self._iter_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self.current_bytes = 0
+            self.entry_count = 0
+
+    @staticmethod
+    def _list_dir(path):
+        try:
+            return os.listdir(path)
+        except OSError:
+            return []
+
+    def _iter_entries(self):
+        """
+        Walk the shard directories only; the cache directory may hold other stores.
+
+        Yields:
+            tuple: (path, size, mtime) for each entry on disk
+        """
+        for first in self._list_dir(self.cache_dir):
+            if not _is_shard_name(first):
+                continue
+            first_dir = os.path.join(self.cache_dir, first)
+            for second in self._list_dir(first_dir):
+                if not _is_shard_name(second):
+                    continue
+                shard_dir = os.path.join(first_dir, second)
+                for name in self._list_dir(shard_dir):
+                    if not name.endswith(CACHE_FILE_SUFFIX):
+                        continue
+                    path = os.path.join(shard_dir, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _remove_legacy_files(self):
+        """Delete flat files left by the pre-sharding cache; no current key reads them."""
+        removed = 0
+        for name in self._list_dir(self.cache_dir):
+            if _is_legacy_name(name):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def sweep(self):
+        """
+        Delete expired entries and enforce the total size budget.
+
+        Entries older than the TTL are removed first; if the store is still over
+        budget, the least recently touched entries are removed until it fits.
+
+        Returns:
+            dict: Counts of expired and evicted entries
+        """
+        now = time.time()
+        live = []
+        total = 0
+        expired = self._remove_legacy_files()
+
+        for path, size, mtime in self._iter_entries():
+            if now - mtime >= self.ttl:
+                try:
+                    os.remove(path)
+                    expired += 1
+                except OSError:
+                    pass
+                continue
+            live.append((mtime, size, path))
+            total += size
+
+        evicted = 0
+        if total > self.max_bytes:
+            live.sort()
+            # Sweep down to 90% so we don't immediately trigger again
+            target = int(self.max_bytes * 0.9)
+            while live and total > target:
+                _, size, path = live.pop(0)
+                try:
+                    os.remove(path)
+                    total -= size
+                    evicted += 1
+                except OSError:
+                    pass
+
+        with self._lock:
+            self.current_bytes = total
+            self.entry_count = len(live)
+            self.expirations += expired
+            self.evictions += evicted
+            self.last_sweep = now
+
+        if expired or evicted:
+            logger.info(f"Cache sweep of {self.cache_dir}: {expired} expired, {evicted} evicted")
+
+        return {"expired": expired, "evicted": evicted}
+
+    def _sweep_loop(self):
+        """Background loop that sweeps the store periodically."""
+        while not self._stop_event.wait(self.sweep_interval):
+            if self._sweep_lock.acquire(blocking=False):
+                self._locked_sweep()
+
+    def _locked_sweep(self):
+        """Sweep, then release the sweep lock the caller acquired."""
+        try:
+            self.sweep()
+        except Exception as e:
+            logger.warning(f"Error sweeping cache {self.cache_dir}: {str(e)}")
+        finally:
+            self._sweep_lock.release()
+
+    def _start_sweep_now(self):
+        """Run an out-of-band sweep in the background when the store goes over budget."""
+        # Writes keep arriving while a sweep runs; one sweep at a time is enough
+        if self._sweep_lock.acquire(blocking=False):
+            threading.Thread(target=self._locked_sweep, daemon=True).start()
+
+    def start_sweeper(self):
+        """Start the background sweeper thread if it is not already running."""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stop_event.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True,
+                                         name=f"cache-sweeper-{os.path.basename(self.cache_dir)}")
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Stop the background sweeper thread."""
+        self._stop_event.set()
+
+
+# Disk stores are shared per directory so every WebBrowser instance pointing at
+# the same cache_dir uses one sweeper and one byte count.
+_disk_stores = {}
+_disk_stores_lock = threading.Lock()
+
+
+def get_disk_store(cache_dir, ttl=86400, max_bytes=512 * 1024 * 1024, sweep_interval=300):
+    """
+    Get the shared disk store for a directory, creating it on first use.
+
+    Args:
+        cache_dir (str): Root directory of the store
+        ttl (int, optional): Entry time to live in seconds. Defaults to 86400.
+        max_bytes (int, optional): Maximum total size on disk. Defaults to 512 MB.
+        sweep_interval (int, optional): Seconds between background sweeps. Defaults to 300.
+
+    Returns:
+        ShardedDiskStore: The shared store
+    """
+    key = os.path.abspath(cache_dir)
+    with _disk_stores_lock:
+        store = _disk_stores.get(key)
+        if store is None:
+            store = ShardedDiskStore(key, ttl=ttl, max_bytes=max_bytes, sweep_interval=sweep_interval)
+            store.start_sweeper()
+            _disk_stores[key] = store
+        return store
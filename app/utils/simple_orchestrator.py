@@ -12,13 +12,13 @@ import requests
 import traceback
 import hashlib
 import os
-import pickle
 from datetime import datetime, timedelta
 from bs4 import BeautifulSoup
 from app.utils.web_browser import WebBrowser
 from app.utils.mcp_client import MCPClient
 from app.mcp.tools.search_tools import SearchTools
 from app.utils.cache_manager import CacheManager
+from app.utils.cache_service import get_cache_service
 from app.mcp.tools.image_tools import ImageTools
 from app.utils.image_extractor import ImageExtractor
 
@@ -40,10 +40,8 @@ class SimpleOrchestrator:
         self.cache_manager = CacheManager()
         logger.info('Initialized cache manager for booking search results')
 
-        # Create a booking cache directory if it doesn't exist
-        self.booking_cache_dir = os.path.join('cache', 'booking_cache')
-        os.makedirs(self.booking_cache_dir, exist_ok=True)
-        logger.info(f'Created booking cache directory at {self.booking_cache_dir}')
+        # Booking results are stored in the shared cache service
+        self.booking_cache = get_cache_service()
 
         # Cache expiration time (24 hours in seconds)
         self.cache_expiration = 24 * 60 * 60
@@ -161,17 +159,9 @@ class SimpleOrchestrator:
             booking_details (dict): Details of the booking
 
         Returns:
-            str: A unique cache key
+            dict: The natural cache key, hashed by the cache service
         """
-        # Create a string representation of the booking details
-        details_str = json.dumps(booking_details, sort_keys=True)
-
-        # Create a hash of the details string
-        hash_obj = hashlib.md5(details_str.encode())
-        hash_str = hash_obj.hexdigest()
-
-        # Return a key that includes the booking type and hash
-        return f"{booking_type}_{hash_str}"
+        return {'type': booking_type, 'details': booking_details}
 
     def _cache_booking_results(self, booking_type, booking_details, results, booking_links):
         """
@@ -190,20 +180,15 @@ class SimpleOrchestrator:
         # Generate a cache key
         cache_key = self._get_cache_key(booking_type, booking_details)
 
-        # Create a cache entry with timestamp
         cache_entry = {
-            'timestamp': time.time(),
             'results': results,
             'booking_links': booking_links,
             'booking_details': booking_details
         }
 
-        # Save to cache file
-        cache_file = os.path.join(self.booking_cache_dir, f"{cache_key}.pkl")
         try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(cache_entry, f)
-            logger.info(f"Cached {len(results)} {booking_type} results with key {cache_key}")
+            self.booking_cache.set('booking_results', cache_key, cache_entry, ttl=self.cache_expiration)
+            logger.info(f"Cached {len(results)} {booking_type} results")
         except Exception as e:
             logger.error(f"Error caching booking results: {str(e)}")
 
@@ -221,23 +206,13 @@ class SimpleOrchestrator:
         # Generate a cache key
         cache_key = self._get_cache_key(booking_type, booking_details)
 
-        # Check if cache file exists
-        cache_file = os.path.join(self.booking_cache_dir, f"{cache_key}.pkl")
-        if not os.path.exists(cache_file):
-            logger.info(f"No cache found for {booking_type} with key {cache_key}")
-            return None, None
-
         try:
-            # Load cache entry
-            with open(cache_file, 'rb') as f:
-                cache_entry = pickle.load(f)
-
-            # Check if cache is expired
-            if time.time() - cache_entry['timestamp'] > self.cache_expiration:
-                logger.info(f"Cache expired for {booking_type} with key {cache_key}")
+            cache_entry = self.booking_cache.get('booking_results', cache_key, ttl=self.cache_expiration)
+            if cache_entry is None:
+                logger.info(f"No cache found for {booking_type}")
                 return None, None
 
-            logger.info(f"Using cached {booking_type} results with key {cache_key}")
+            logger.info(f"Using cached {booking_type} results")
             return cache_entry['results'], cache_entry['booking_links']
         except Exception as e:
             logger.error(f"Error loading cached booking results: {str(e)}")
@@ -468,55 +443,57 @@ class SimpleOrchestrator:
         logger.info("Step 2: Browsing top search results")
         browsed_pages = []
 
-        # Browse only up to 5 top results for faster processing
-        for i, result in enumerate(search_results[:5]):
-            url = result.get('link')
-            if not url:
-                continue
-
-            logger.info(f"Browsing result {i+1}: {url}")
-
+        # Browse up to 5 top results concurrently with the async fetch engine
+        top_urls = [result.get('link') for result in search_results[:5] if result.get('link')]
+        for url in top_urls:
             # Record the browsing action
             task_record['steps'].append({
                 'action': 'browse_web',
                 'url': url
             })
 
-            # Actually browse the page
-            try:
-                page_result = self.web_browser.browse(url, use_cache=True)
-                if page_result and page_result.get('success'):
-                    # Extract content
-                    title = page_result.get('title', 'No title')
-                    content = page_result.get('content', '')
-
-                    # Store the browsed page content
-                    browsed_pages.append({
-                        'url': url,
-                        'title': title,
-                        'content': content[:5000]  # Limit content length
-                    })
+        try:
+            page_results = self.web_browser.browse_many(top_urls, use_cache=True, timeout=60)
+        except Exception as e:
+            logger.error(f"Error browsing search results: {str(e)}")
+            page_results = [{'url': url, 'error': str(e), 'success': False} for url in top_urls]
 
-                    logger.info(f"Successfully browsed: {title}")
+        for i, (url, page_result) in enumerate(zip(top_urls, page_results)):
+            logger.info(f"Browsed result {i+1}: {url}")
 
-                    # Add a step summary for each successful page browse
-                    task_record['step_summaries'].append({
-                        'description': f"Browsing: {title}",
-                        'summary': f"Successfully extracted {len(content)} characters of content from {url}",
-                        'success': True
-                    })
-                else:
-                    logger.warning(f"Failed to browse: {url}")
-                    task_record['step_summaries'].append({
-                        'description': f"Browsing: {url}",
-                        'summary': f"Failed to browse page",
-                        'success': False
-                    })
-            except Exception as e:
-                logger.error(f"Error browsing {url}: {str(e)}")
+            # Pages that need JavaScript rendering fall back to the advanced browser
+            if not page_result.get('success') and self.web_browser.use_advanced_browser:
+                try:
+                    page_result = self.web_browser.browse(url, use_cache=True)
+                except Exception as e:
+                    logger.error(f"Error browsing {url}: {str(e)}")
+                    page_result = {'error': str(e), 'success': False}
+
+            if page_result and page_result.get('success'):
+                # Extract content
+                title = page_result.get('title', 'No title')
+                content = page_result.get('content', '')
+
+                # Store the browsed page content
+                browsed_pages.append({
+                    'url': url,
+                    'title': title,
+                    'content': content[:5000]  # Limit content length
+                })
+
+                logger.info(f"Successfully browsed: {title}")
+
+                # Add a step summary for each successful page browse
+                task_record['step_summaries'].append({
+                    'description': f"Browsing: {title}",
+                    'summary': f"Successfully extracted {len(content)} characters of content from {url}",
+                    'success': True
+                })
+            else:
+                logger.warning(f"Failed to browse: {url}")
                 task_record['step_summaries'].append({
                     'description': f"Browsing: {url}",
-                    'summary': f"Error browsing page: {str(e)}",
+                    'summary': f"Error browsing page: {page_result.get('error', 'Failed to browse page')}",
                     'success': False
                 })
 
@@ -5,6 +5,7 @@ This module provides a simple web browser that can fetch and parse web pages.
 
 import os
 import time
+import asyncio
 import hashlib
 import json
 import requests
@@ -16,6 +17,13 @@ from typing import Dict, Any, Optional, List, Tuple
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, quote_plus
 
+from app.utils.cache_service import DEFAULT_CACHE_DIR, get_cache_service
+from app.utils.async_fetcher import get_fetch_engine
+from app.utils.html_extractor import extract_page
+
+# Cache namespace for fetched pages, shared with every other agent
+PAGE_CACHE_NAMESPACE = 'page'
+
 # Try to import selenium for advanced browsing
 try:
     from selenium import webdriver
@@ -40,16 +48,19 @@ class WebBrowser:
     A lightweight web browser that can fetch and parse web pages.
     """
 
-    def __init__(self, cache_dir='./cache', cache_expiry=86400, use_advanced_browser=False, max_cache_size=500, browser_type='auto'):
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, cache_expiry=86400, use_advanced_browser=False, max_cache_size=500, browser_type='auto',
+                 max_cache_bytes=64 * 1024 * 1024, max_disk_cache_bytes=512 * 1024 * 1024):
         """
         Initialize the web browser.
 
         Args:
-            cache_dir (str, optional): Directory to store cache files. Defaults to None.
+            cache_dir (str, optional): Directory to store cache files; None disables caching. Defaults to the shared cache directory.
             cache_expiry (int, optional): Cache expiry time in seconds. Defaults to 3600 (1 hour).
             use_advanced_browser (bool, optional): Whether to use advanced browser capabilities. Defaults to False.
             max_cache_size (int, optional): Maximum number of items to keep in memory cache. Defaults to 100.
             browser_type (str, optional): Type of browser to use. Can be 'auto', 'playwright', or 'selenium'. Defaults to 'auto'.
+            max_cache_bytes (int, optional): Maximum total size of the memory cache in bytes. Defaults to 64 MB.
+            max_disk_cache_bytes (int, optional): Maximum total size of the disk cache in bytes. Defaults to 512 MB.
         """
         # Initialize session
         self.session = requests.Session()
@@ -61,7 +72,9 @@ class WebBrowser:
         # State tracking
         self.current_url = None
         self.current_page_content = None
-        self.current_soup = None
+        self._current_html = None  # Raw HTML of the current page; parsed into a soup on demand
+        self._current_soup = None
+        self._current_extraction = None
 
         # Advanced browser settings
         self.use_advanced_browser = use_advanced_browser
@@ -82,19 +95,19 @@ class WebBrowser:
         if self.use_advanced_browser:
             self._init_advanced_browser()
 
-        # Initialize cache with LRU tracking
-        self.cache = {}
+        # Use the shared cache service (in-process LRU + cross-process shared tier)
         self.cache_dir = cache_dir
         self.cache_enabled = cache_dir is not None
         self.cache_expiry = cache_expiry
         self.max_cache_size = max_cache_size
-        self.cache_access_times = {}  # Track when each cache item was last accessed
-        self.cache_hits = 0
-        self.cache_misses = 0
-
-        # Create cache directory if it doesn't exist
-        if self.cache_enabled and not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
+        self.page_cache = None
+        if self.cache_enabled:
+            self.page_cache = get_cache_service(
+                cache_dir,
+                max_memory_bytes=max_cache_bytes,
+                max_memory_items=max_cache_size,
+                max_shared_bytes=max_disk_cache_bytes
+            )
 
     def _init_advanced_browser(self):
         """
@@ -229,6 +242,26 @@ class WebBrowser:
         """
         self._cleanup_advanced_browser()
 
+    def _normalize_url(self, url):
+        """
+        Ensure a URL has a single http(s) scheme.
+
+        Args:
+            url (str): The URL to normalize.
+
+        Returns:
+            str: The normalized URL.
+        """
+        if not url.startswith('http://') and not url.startswith('https://'):
+            url = 'https://' + url
+            print(f"DEBUG: Added https:// prefix to URL: {url}")
+        # Fix double https:// issue
+        elif url.startswith('https://https://') or url.startswith('http://http://'):
+            url = url.replace('https://https://', 'https://')
+            url = url.replace('http://http://', 'http://')
+            print(f"DEBUG: Fixed double protocol in URL: {url}")
+        return url
+
     def browse(self, url, timeout=10, headers=None, cookies=None, use_cache=True):
         """
         Browse to a URL and return the page content.
@@ -247,14 +280,7 @@ class WebBrowser:
             print(f"DEBUG: WebBrowser.browse() called with URL: {url}")
 
             # Ensure URL has proper format (this is a backup check in case SuperAgent didn't fix it)
-            if not url.startswith('http://') and not url.startswith('https://'):
-                url = 'https://' + url
-                print(f"DEBUG: Added https:// prefix to URL: {url}")
-            # Fix double https:// issue
-            elif url.startswith('https://https://') or url.startswith('http://http://'):
-                url = url.replace('https://https://', 'https://')
-                url = url.replace('http://http://', 'http://')
-                print(f"DEBUG: Fixed double protocol in URL: {url}")
+            url = self._normalize_url(url)
 
             # Check cache first if enabled
             cache_key = self._get_cache_key(url)
@@ -266,7 +292,7 @@ class WebBrowser:
                 # Update current state from cache
                 self.current_url = url
                 self.current_page_content = cached_data.get("content", "")
-                self.current_soup = BeautifulSoup(cached_data.get("html", ""), 'html.parser')
+                self._set_current_html(cached_data.get("html", ""))
                 self.screenshot_data = cached_data.get("screenshot")
 
                 print(f"DEBUG: Using cached data for {url}")
@@ -294,77 +320,16 @@ class WebBrowser:
                 print(f"DEBUG: HTTP request failed: {str(request_error)}")
                 raise request_error
 
-            # Parse with BeautifulSoup
-            try:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                print(f"DEBUG: BeautifulSoup parsing successful")
-            except Exception as soup_error:
-                print(f"DEBUG: BeautifulSoup parsing failed: {str(soup_error)}")
-                raise soup_error
-
-            # Extract title
-            title = soup.title.string if soup.title else "No title"
-            print(f"DEBUG: Page title: {title}")
-
-            # Remove script and style elements for text content
-            for script in soup(["script", "style"]):
-                script.extract()
-
-            # Get text content
-            text_content = soup.get_text(separator=' ', strip=True)
-            print(f"DEBUG: Extracted text content length: {len(text_content)}")
+            result, extraction, text_content = self._build_page_result(url, response.text)
 
-            # Store current state
+            # Store current state; the soup is only built if a caller needs DOM access
             self.current_url = url
             self.current_page_content = text_content
-            self.current_soup = soup
-
-            # Extract images
-            images = []
-            try:
-                # Find all img tags with src attribute
-                img_tags = soup.find_all('img', src=True)
-
-                # Filter out small icons, spacers, etc.
-                for img in img_tags:
-                    src = img.get('src')
-                    # Convert relative URLs to absolute
-                    if src and not src.startswith(('http://', 'https://', 'data:')):
-                        src = urljoin(url, src)
-
-                    # Skip data URLs and very small images
-                    if src and not src.startswith('data:'):
-                        # Get alt text and dimensions if available
-                        alt = img.get('alt', '')
-                        width = img.get('width', 0)
-                        height = img.get('height', 0)
-
-                        # Try to determine if this is a substantial image
-                        # Skip very small images that are likely icons
-                        if (width and height and int(width) > 100 and int(height) > 100) or \
-                           (not width and not height and ('jpg' in src.lower() or 'jpeg' in src.lower() or 'png' in src.lower())):
-                            images.append({
-                                "src": src,
-                                "alt": alt,
-                                "width": width,
-                                "height": height
-                            })
-
-                            # Limit to 15 images to avoid overloading
-                            if len(images) >= 15:
-                                break
-            except Exception as img_error:
-                print(f"DEBUG: Error extracting images: {str(img_error)}")
+            self._set_current_html(response.text, extraction)
 
-            # Prepare result
-            result = {
-                "title": title,
-                "content": text_content[:5000] + ("..." if len(text_content) > 5000 else ""),
-                "url": url,
-                "html": response.text,
-                "images": images,
-                "success": True
-            }
+            # Keep validators so an expired entry can be revalidated with a conditional GET
+            result["etag"] = response.headers.get('ETag')
+            result["last_modified"] = response.headers.get('Last-Modified')
 
             # Save to cache
             self._save_to_cache(cache_key, result)
@@ -382,6 +347,78 @@ class WebBrowser:
                 "success": False
             }
 
+    def _build_page_result(self, url, html):
+        """
+        Parse fetched HTML into a page result in a single pass.
+
+        Args:
+            url (str): The URL the HTML was fetched from.
+            html (str): The raw HTML.
+
+        Returns:
+            tuple: (result dict, PageExtraction, full text content)
+        """
+        extraction = extract_page(html, url)
+        text_content = extraction.text
+        print(f"DEBUG: Page title: {extraction.title}")
+        print(f"DEBUG: Extracted text content length: {len(text_content)}")
+
+        result = {
+            "title": extraction.title or "No title",
+            "content": text_content[:5000] + ("..." if len(text_content) > 5000 else ""),
+            "url": url,
+            "html": html,
+            "images": extraction.images,
+            "success": True
+        }
+
+        return result, extraction, text_content
+
+    @property
+    def current_soup(self):
+        """
+        BeautifulSoup tree of the current page, built on first access.
+
+        Returns:
+            BeautifulSoup or None: The parsed page, or None if no page is loaded.
+        """
+        if self._current_soup is None and self._current_html is not None:
+            self._current_soup = BeautifulSoup(self._current_html, 'html.parser')
+        return self._current_soup
+
+    @current_soup.setter
+    def current_soup(self, soup):
+        self._current_soup = soup
+        self._current_html = None
+        self._current_extraction = None
+
+    def _set_current_html(self, html, extraction=None):
+        """
+        Set the current page from raw HTML without parsing it into a soup.
+
+        Args:
+            html (str): The raw HTML.
+            extraction (PageExtraction, optional): An extraction already made from this HTML. Defaults to None.
+        """
+        self._current_html = html or ""
+        self._current_soup = None
+        self._current_extraction = extraction
+
+    def _has_current_page(self):
+        """Check whether a page is loaded, without forcing a soup to be built."""
+        return self._current_soup is not None or self._current_html is not None
+
+    def _get_current_extraction(self):
+        """
+        Get the single-pass extraction of the current page, if it was loaded from raw HTML.
+
+        Returns:
+            PageExtraction or None: The extraction, or None if the page only exists as a soup.
+        """
+        if self._current_extraction is None and self._current_html is not None:
+            self._current_extraction = extract_page(self._current_html, self.current_url)
+        return self._current_extraction
+
     def navigate_to_url(self, url, timeout=30):
         """
         Navigate to a URL using the advanced browser.
@@ -477,9 +514,20 @@ class WebBrowser:
         Returns:
             dict: A dictionary containing the analysis results.
         """
-        if not self.current_soup or not self.current_url:
+        if not self._has_current_page() or not self.current_url:
             return {"error": "No page currently loaded", "success": False}
 
+        extraction = self._get_current_extraction()
+        if extraction is not None:
+            return {
+                "url": self.current_url,
+                "title": extraction.title or "No title",
+                "forms": extraction.forms,
+                "links": extraction.links[:50],  # Limit to 50 links
+                "headings": extraction.headings,
+                "success": True
+            }
+
         try:
             soup = self.current_soup
 
@@ -534,7 +582,7 @@ class WebBrowser:
         Returns:
             dict: A dictionary containing the response.
         """
-        if not self.current_soup or not self.current_url:
+        if not self._has_current_page() or not self.current_url:
             return {"error": "No page currently loaded", "success": False}
 
         try:
@@ -844,7 +892,7 @@ class WebBrowser:
         Returns:
             dict: A dictionary containing the response.
         """
-        if not self.current_soup or not self.current_url:
+        if not self._has_current_page() or not self.current_url:
             return {"error": "No page currently loaded", "success": False}
 
         try:
@@ -1053,7 +1101,7 @@ class WebBrowser:
         if not self.use_advanced_browser or (not self.playwright_page and not self.selenium_driver):
             return {"error": "Advanced browser is required for clicking elements", "success": False}
 
-        if not self.current_soup or not self.current_url:
+        if not self._has_current_page() or not self.current_url:
             return {"error": "No page currently loaded", "success": False}
 
         try:
@@ -1637,25 +1685,16 @@ class WebBrowser:
         """
         Generate a cache key for a URL.
 
+        The cache service hashes keys together with their namespace, so the
+        URL itself is the natural key.
+
         Args:
             url (str): The URL to generate a cache key for.
 
         Returns:
             str: The cache key.
         """
-        return hashlib.md5(url.encode()).hexdigest()
-
-    def _get_cache_path(self, cache_key):
-        """
-        Get the file path for a cache key.
-
-        Args:
-            cache_key (str): The cache key.
-
-        Returns:
-            str: The file path.
-        """
-        return os.path.join(self.cache_dir, f"{cache_key}.json")
+        return url
 
     def _save_to_cache(self, cache_key, data):
         """
@@ -1669,34 +1708,7 @@ class WebBrowser:
             return
 
         try:
-            # Add timestamp for expiry checking
-            current_time = time.time()
-            cache_data = {
-                "timestamp": current_time,
-                "data": data
-            }
-
-            # Update access time for LRU tracking
-            self.cache_access_times[cache_key] = current_time
-
-            # Check if we need to evict items from memory cache (LRU policy)
-            if len(self.cache) >= self.max_cache_size:
-                # Find the least recently used item
-                oldest_key = min(self.cache_access_times.items(), key=lambda x: x[1])[0]
-                # Remove it from memory cache
-                if oldest_key in self.cache:
-                    del self.cache[oldest_key]
-                    del self.cache_access_times[oldest_key]
-                    print(f"Evicted least recently used item from cache: {oldest_key}")
-
-            # Save to memory cache
-            self.cache[cache_key] = cache_data
-
-            # Save to disk cache
-            cache_path = self._get_cache_path(cache_key)
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f)
-
+            self.page_cache.set(PAGE_CACHE_NAMESPACE, cache_key, data, ttl=self.cache_expiry)
             print(f"Saved data to cache: {cache_key}")
         except Exception as e:
             print(f"Error saving to cache: {str(e)}")
@@ -1714,82 +1726,58 @@ class WebBrowser:
         if not self.cache_enabled:
             return None
 
-        current_time = time.time()
-
-        # Check memory cache first
-        if cache_key in self.cache:
-            cache_data = self.cache[cache_key]
-            # Check if cache is expired
-            if current_time - cache_data["timestamp"] < self.cache_expiry:
-                # Update access time for LRU tracking
-                self.cache_access_times[cache_key] = current_time
-                self.cache_hits += 1
-                print(f"Cache hit (memory): {cache_key} (hits: {self.cache_hits}, misses: {self.cache_misses})")
-                return cache_data["data"]
-
-        # Check disk cache
-        cache_path = self._get_cache_path(cache_key)
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r') as f:
-                    cache_data = json.load(f)
-
-                # Check if cache is expired
-                if current_time - cache_data["timestamp"] < self.cache_expiry:
-                    # Update memory cache
-                    self.cache[cache_key] = cache_data
-                    # Update access time for LRU tracking
-                    self.cache_access_times[cache_key] = current_time
-
-                    # Check if we need to evict items from memory cache (LRU policy)
-                    if len(self.cache) > self.max_cache_size:
-                        # Find the least recently used item
-                        oldest_key = min(self.cache_access_times.items(), key=lambda x: x[1])[0]
-                        # Remove it from memory cache
-                        if oldest_key in self.cache:
-                            del self.cache[oldest_key]
-                            del self.cache_access_times[oldest_key]
-                            print(f"Evicted least recently used item from cache: {oldest_key}")
-
-                    self.cache_hits += 1
-                    print(f"Cache hit (disk): {cache_key} (hits: {self.cache_hits}, misses: {self.cache_misses})")
-                    return cache_data["data"]
-                else:
-                    # Cache is expired, remove the file
-                    try:
-                        os.remove(cache_path)
-                        print(f"Removed expired cache file: {cache_path}")
-                    except Exception as remove_error:
-                        print(f"Error removing expired cache file: {str(remove_error)}")
-            except Exception as e:
-                print(f"Error reading from cache: {str(e)}")
+        try:
+            data = self.page_cache.get(PAGE_CACHE_NAMESPACE, cache_key, ttl=self.cache_expiry)
+        except Exception as e:
+            print(f"Error reading from cache: {str(e)}")
+            data = None
 
-        self.cache_misses += 1
-        print(f"Cache miss: {cache_key} (hits: {self.cache_hits}, misses: {self.cache_misses})")
-        return None
+        if data is None:
+            print(f"Cache miss: {cache_key}")
+        else:
+            print(f"Cache hit: {cache_key}")
+        return data
 
     def get_cache_stats(self):
         """
         Get cache statistics.
 
         Returns:
-            dict: A dictionary containing cache statistics.
+            dict: A dictionary containing cache statistics, byte usage, eviction
+                counts and hit latency percentiles.
         """
-        total_requests = self.cache_hits + self.cache_misses
-        hit_rate = (self.cache_hits / total_requests) * 100 if total_requests > 0 else 0
+        if not self.cache_enabled:
+            return {
+                "memory_cache_size": 0,
+                "disk_cache_size": 0,
+                "max_cache_size": self.max_cache_size,
+                "cache_hits": 0,
+                "cache_misses": 0,
+                "hit_rate": "0.00%",
+                "cache_enabled": False,
+                "cache_expiry": self.cache_expiry
+            }
 
-        # Count disk cache files
-        disk_cache_count = 0
-        if self.cache_enabled and os.path.exists(self.cache_dir):
-            disk_cache_count = len([f for f in os.listdir(self.cache_dir) if f.endswith('.json')])
+        service_stats = self.page_cache.get_stats(PAGE_CACHE_NAMESPACE)
+        page_stats = service_stats["namespaces"].get(PAGE_CACHE_NAMESPACE, {})
+        memory_stats = service_stats["memory"]
+        shared_stats = service_stats["shared"]
 
         return {
-            "memory_cache_size": len(self.cache),
-            "disk_cache_size": disk_cache_count,
+            "memory_cache_size": memory_stats["entries"],
+            "memory_bytes": memory_stats["bytes"],
+            "max_memory_bytes": memory_stats["max_bytes"],
+            "memory_evictions": memory_stats["evictions"],
+            "disk_cache_size": shared_stats.get("entries", 0),
+            "disk_bytes": shared_stats.get("bytes", 0),
+            "disk_evictions": shared_stats.get("evictions", 0),
+            "disk_expirations": shared_stats.get("expirations", 0),
+            "shared_backend": shared_stats.get("backend"),
             "max_cache_size": self.max_cache_size,
-            "cache_hits": self.cache_hits,
-            "cache_misses": self.cache_misses,
-            "hit_rate": f"{hit_rate:.2f}%",
+            "cache_hits": page_stats.get("cache_hits", 0),
+            "cache_misses": page_stats.get("cache_misses", 0),
+            "hit_rate": page_stats.get("hit_rate", "0.00%"),
+            "hit_latency_ms": page_stats.get("hit_latency_ms", {}),
             "cache_enabled": self.cache_enabled,
             "cache_expiry": self.cache_expiry
         }
@@ -1809,6 +1797,10 @@ class WebBrowser:
         Returns:
             list: A list of dictionaries containing the results for each URL.
         """
+        # Plain HTTP fetches go through the shared async engine instead of a thread per URL
+        if not self.use_advanced_browser and not cookies:
+            return self.browse_many(urls, headers=headers, use_cache=use_cache, timeout=timeout * max(1, len(urls)))
+
         results = []
 
         # Define a worker function to browse a single URL
@@ -1849,6 +1841,94 @@ class WebBrowser:
 
         return results
 
+    async def browse_many_async(self, urls, headers=None, use_cache=True):
+        """
+        Fetch and parse multiple URLs concurrently with the async fetch engine.
+
+        Fresh cache entries are returned directly. Expired entries that carry an
+        ETag or Last-Modified validator are revalidated with a conditional GET and
+        reused on 304 Not Modified.
+
+        Args:
+            urls (list): List of URLs to browse.
+            headers (dict, optional): Additional headers to send. Defaults to None.
+            use_cache (bool, optional): Whether to use the cache. Defaults to True.
+
+        Returns:
+            list: A list of dictionaries containing the results for each URL, in input order.
+        """
+        urls = [self._normalize_url(url) for url in urls]
+        results = {}
+        stale = {}
+        validators = {}
+
+        if use_cache and self.cache_enabled:
+            for url in urls:
+                entry = self.page_cache.get_entry(PAGE_CACHE_NAMESPACE, self._get_cache_key(url))
+                if entry is None:
+                    continue
+                if time.time() - entry["timestamp"] < self.cache_expiry:
+                    results[url] = entry["data"]
+                elif entry["data"].get("etag") or entry["data"].get("last_modified"):
+                    stale[url] = entry["data"]
+                    validators[url] = {
+                        "etag": entry["data"].get("etag"),
+                        "last_modified": entry["data"].get("last_modified")
+                    }
+
+        to_fetch = [url for url in dict.fromkeys(urls) if url not in results]
+        if to_fetch:
+            engine, loop_thread = get_fetch_engine()
+            fetched = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+                engine.fetch_many(to_fetch, headers=headers, validators=validators), loop_thread.loop))
+
+            loop = asyncio.get_running_loop()
+            for url, response in zip(to_fetch, fetched):
+                if response["not_modified"] and url in stale:
+                    results[url] = stale[url]
+                    self._save_to_cache(self._get_cache_key(url), stale[url])
+                    continue
+
+                if response["error"] or not response["status"] or response["status"] >= 400:
+                    error = response["error"] or f"HTTP {response['status']}"
+                    results[url] = {"url": url, "error": f"Error browsing {url}: {error}", "success": False}
+                    continue
+
+                try:
+                    # Parse off the event loop so other fetches keep streaming
+                    result, _, _ = await loop.run_in_executor(None, self._build_page_result, url, response["text"])
+                except Exception as e:
+                    results[url] = {"url": url, "error": f"Error parsing {url}: {str(e)}", "success": False}
+                    continue
+
+                result["etag"] = response.get("etag")
+                result["last_modified"] = response.get("last_modified")
+                result["truncated"] = response.get("truncated", False)
+                results[url] = result
+                self._save_to_cache(self._get_cache_key(url), result)
+
+        return [results[url] for url in urls]
+
+    def browse_many(self, urls, headers=None, use_cache=True, timeout=None):
+        """
+        Synchronous wrapper around browse_many_async.
+
+        Args:
+            urls (list): List of URLs to browse.
+            headers (dict, optional): Additional headers to send. Defaults to None.
+            use_cache (bool, optional): Whether to use the cache. Defaults to True.
+            timeout (float, optional): Overall timeout in seconds. Defaults to None.
+
+        Returns:
+            list: A list of dictionaries containing the results for each URL, in input order.
+        """
+        _, loop_thread = get_fetch_engine()
+        try:
+            return loop_thread.run(self.browse_many_async(urls, headers=headers, use_cache=use_cache), timeout=timeout)
+        except Exception as e:
+            print(f"Error browsing multiple URLs: {str(e)}")
+            return [{"url": url, "error": f"Error browsing {url}: {str(e)}", "success": False} for url in urls]
+
     def search(self, query, num_results=5, use_cache=True):
         """
         Search for a query using a search engine and return the results.
@@ -9,6 +9,7 @@ import os
 import time
 import logging
 import threading
+import functools
 import base64
 from typing import Dict, Any, Optional
 from selenium.webdriver.common.by import By
@@ -16,12 +17,25 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 from app.visual_browser.selenium_visual_browser import SeleniumVisualBrowser
+from app.visual_browser.browser_pool import get_visual_browser_pool, browser_memory_mb, BrowserLease, PSUTIL_AVAILABLE
+from app.visual_browser.session_governor import SessionGovernor, IDLE, MEMORY, TOTAL_MEMORY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _tracked(method):
+    """Mark the session busy while a command runs so the governor does not evict it."""
+    @functools.wraps(method)
+    def wrapper(self, session_id, *args, **kwargs):
+        self.governor.begin(session_id)
+        try:
+            return method(self, session_id, *args, **kwargs)
+        finally:
+            self.governor.end(session_id)
+    return wrapper
+
 class BrowserManager:
     """
     A service for managing browser instances for the Visual Browser.
@@ -48,9 +62,18 @@ class BrowserManager:
         
         self._initialized = True
         self.browsers: Dict[str, SeleniumVisualBrowser] = {}
-        self.last_activity: Dict[str, float] = {}
-        self.cleanup_thread = threading.Thread(target=self._cleanup_inactive_browsers, daemon=True)
-        self.cleanup_thread.start()
+        self.leases: Dict[str, BrowserLease] = {}
+        # Sessions whose browser is being leased, so the global lock is not held during startup
+        self.pending: Dict[str, threading.Event] = {}
+        # Pages to reopen for sessions whose browser was evicted while they were still in use
+        self.restore_urls: Dict[str, str] = {}
+        self.pool = get_visual_browser_pool()
+        if not PSUTIL_AVAILABLE:
+            logger.warning("psutil is not installed: browser memory is not sampled, so the per-session "
+                           "and total memory limits are disabled")
+        self.governor = SessionGovernor(self._evict,
+                                        memory_probe=self._session_memory_mb if PSUTIL_AVAILABLE else None)
+        self.governor.start()
         
         logger.info("Browser Manager initialized")
 
@@ -64,72 +87,121 @@ class BrowserManager:
         Returns:
             SeleniumVisualBrowser: The browser instance.
         """
-        with self._lock:
-            # Create a new browser if one doesn't exist for this session
-            if session_id not in self.browsers:
-                logger.info(f"Creating new browser for session {session_id}")
-                browser = SeleniumVisualBrowser(headless=False, timeout=30)
-                browser.start()
-                self.browsers[session_id] = browser
-            
-            # Update last activity time
-            self.last_activity[session_id] = time.time()
-            
-            return self.browsers[session_id]
+        while True:
+            with self._lock:
+                if session_id in self.browsers:
+                    self.governor.touch(session_id)
+                    return self.browsers[session_id]
+                
+                pending = self.pending.get(session_id)
+                if pending is None:
+                    pending = threading.Event()
+                    self.pending[session_id] = pending
+                    break
+            
+            # Another request is already leasing this session's browser
+            pending.wait()
+            with self._lock:
+                if session_id not in self.browsers and session_id not in self.pending:
+                    raise RuntimeError(f"Failed to start browser for session {session_id}")
+        
+        # Lease outside the global lock so other sessions are not blocked by a browser start
+        try:
+            # Evicts least recently used idle sessions when at the browser cap
+            self.governor.admit(session_id)
+            logger.info(f"Leasing browser for session {session_id}")
+            try:
+                lease = self.pool.acquire()
+            except Exception:
+                self.governor.remove(session_id)
+                raise
+            with self._lock:
+                self.leases[session_id] = lease
+                self.browsers[session_id] = lease.browser
+                restore_url = self.restore_urls.pop(session_id, None)
+            if restore_url:
+                logger.info(f"Reopening {restore_url} for session {session_id}")
+                lease.browser.navigate(restore_url)
+            return lease.browser
+        finally:
+            with self._lock:
+                self.pending.pop(session_id, None)
+            pending.set()
 
-    def close_browser(self, session_id: str) -> Dict[str, Any]:
+    def close_browser(self, session_id: str, discard: bool = False) -> Dict[str, Any]:
         """
         Close a browser instance.
         
         Args:
             session_id (str): The session ID.
+            discard (bool, optional): Stop the browser instead of returning it to the pool. Defaults to False.
             
         Returns:
             Dict[str, Any]: A dictionary containing the result of the operation.
         """
         with self._lock:
-            if session_id in self.browsers:
-                logger.info(f"Closing browser for session {session_id}")
-                browser = self.browsers[session_id]
-                result = browser.stop()
-                del self.browsers[session_id]
-                if session_id in self.last_activity:
-                    del self.last_activity[session_id]
-                return result
-            else:
-                return {
-                    'success': False,
-                    'error': f"No browser found for session {session_id}"
-                }
+            browser = self.browsers.pop(session_id, None)
+            lease = self.leases.pop(session_id, None)
+        self.governor.remove(session_id)
+        
+        if browser is None:
+            return {
+                'success': False,
+                'error': f"No browser found for session {session_id}"
+            }
+        
+        logger.info(f"Closing browser for session {session_id}")
+        if lease is None:
+            return browser.stop()
+        
+        # Cookies and storage are cleared before the browser serves another session
+        lease.release(discard=discard)
+        return {
+            'success': True,
+            'message': 'Browser stopped successfully'
+        }
 
-    def _cleanup_inactive_browsers(self):
+    def _evict(self, session_id: str, reason: str):
         """
-        Periodically clean up inactive browser instances.
+        Close a session's browser for the governor.
+
+        Args:
+            session_id (str): The session ID.
+            reason (str): Why the browser is evicted.
+        """
+        if reason != IDLE:
+            # The session is still live: reopen its page when it is next used
+            with self._lock:
+                browser = self.browsers.get(session_id)
+            current_url = getattr(browser, 'current_url', None)
+            if current_url:
+                self.restore_urls[session_id] = current_url
+        # Bloated browsers are stopped rather than reset and reused
+        self.close_browser(session_id, discard=reason in (MEMORY, TOTAL_MEMORY))
+
+    def _session_memory_mb(self, session_id: str) -> Optional[float]:
+        with self._lock:
+            browser = self.browsers.get(session_id)
+        return browser_memory_mb(browser) if browser is not None else None
+
+    def get_session_stats(self, session_id: str = None) -> Dict[str, Any]:
         """
-        # Timeout in seconds (30 minutes)
-        timeout = 30 * 60
+        Get live sessions, browser memory and eviction history.
         
-        while True:
-            try:
-                # Sleep for a while before checking
-                time.sleep(60)
-                
-                current_time = time.time()
-                sessions_to_close = []
-                
-                # Find inactive sessions
-                with self._lock:
-                    for session_id, last_time in self.last_activity.items():
-                        if current_time - last_time > timeout:
-                            sessions_to_close.append(session_id)
-                
-                # Close inactive sessions
-                for session_id in sessions_to_close:
-                    logger.info(f"Closing inactive browser for session {session_id}")
-                    self.close_browser(session_id)
-            except Exception as e:
-                logger.error(f"Error in cleanup thread: {str(e)}")
+        Args:
+            session_id (str, optional): Only report this session. Defaults to all sessions.
+            
+        Returns:
+            Dict[str, Any]: Governor statistics and the browser pool's metrics.
+        """
+        stats = self.governor.get_stats()
+        if session_id is not None:
+            stats['session_details'] = [s for s in stats['session_details'] if s['session_id'] == session_id]
+        stats['pid'] = os.getpid()
+        stats['pool'] = self.pool.get_stats()
+        return stats
 
+    @_tracked
     def navigate(self, session_id: str, url: str) -> Dict[str, Any]:
         """
         Navigate to a URL.
@@ -144,6 +216,7 @@ class BrowserManager:
         browser = self.get_browser(session_id)
         return browser.navigate(url)
 
+    @_tracked
     def click(self, session_id: str, selector: str = None, x: int = None, y: int = None) -> Dict[str, Any]:
         """
         Click on an element or at specific coordinates.
@@ -160,6 +233,7 @@ class BrowserManager:
         browser = self.get_browser(session_id)
         return browser.click(selector, x, y)
 
+    @_tracked
     def type(self, session_id: str, text: str, selector: str = None) -> Dict[str, Any]:
         """
         Type text into an input field.
@@ -175,6 +249,7 @@ class BrowserManager:
         browser = self.get_browser(session_id)
         return browser.type(text, selector)
 
+    @_tracked
     def scroll(self, session_id: str, direction: str = 'down', distance: int = 300) -> Dict[str, Any]:
         """
         Scroll the page.
@@ -190,6 +265,7 @@ class BrowserManager:
         browser = self.get_browser(session_id)
         return browser.scroll(direction, distance)
 
+    @_tracked
     def get_page_info(self, session_id: str) -> Dict[str, Any]:
         """
         Get information about the current page.
@@ -203,6 +279,7 @@ class BrowserManager:
         browser = self.get_browser(session_id)
         return browser.get_page_info()
 
+    @_tracked
     def take_screenshot(self, session_id: str, full_page: bool = False) -> str:
         """
         Take a screenshot of the current page.
@@ -217,6 +294,7 @@ class BrowserManager:
         browser = self.get_browser(session_id)
         return browser.take_screenshot(full_page)
 
+    @_tracked
     def go_back(self, session_id: str) -> Dict[str, Any]:
         """
         Go back in the browser history.
@@ -259,6 +337,7 @@ class BrowserManager:
                 'error': str(e)
             }
 
+    @_tracked
     def go_forward(self, session_id: str) -> Dict[str, Any]:
         """
         Go forward in the browser history.
@@ -301,6 +380,7 @@ class BrowserManager:
                 'error': str(e)
             }
 
+    @_tracked
     def refresh(self, session_id: str) -> Dict[str, Any]:
         """
         Refresh the current page.
@@ -343,6 +423,7 @@ class BrowserManager:
                 'error': str(e)
             }
 
+    @_tracked
     def fill_form(self, session_id: str, form_data: Dict[str, str]) -> Dict[str, Any]:
         """
         Fill a form with the provided data.
@@ -443,6 +524,7 @@ class BrowserManager:
                 'error': str(e)
             }
 
+    @_tracked
     def press_key(self, session_id: str, key: str, selector: str = None) -> Dict[str, Any]:
         """
         Press a key on the keyboard.
@@ -0,0 +1,509 @@
+"""
+Browser Pool for Context 7 tools and the Visual Browser.
+
+This module keeps pre-started Chrome instances ready so a task's first navigation
+does not pay browser startup. Browsers are checked out as leases and checked back
+in with cookies and storage cleared. They are recycled after a number of
+navigations, above a memory threshold or when a health check fails. Callers wait
+for a free browser up to a timeout when the pool is exhausted.
+"""
+
+import os
+import time
+import itertools
+import threading
+import logging
+from typing import Callable, Dict, Any, Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+MAX_NAVIGATIONS = int(os.getenv('BROWSER_POOL_MAX_NAVIGATIONS', 50))
+MAX_MEMORY_MB = int(os.getenv('BROWSER_POOL_MAX_MEMORY_MB', 1024))
+ACQUIRE_TIMEOUT = float(os.getenv('BROWSER_POOL_ACQUIRE_TIMEOUT', 30))
+HEALTH_INTERVAL = float(os.getenv('BROWSER_POOL_HEALTH_INTERVAL', 30))
+
+# Longest wait between attempts to start a browser after a failure
+MAX_RETRY_DELAY = 300
+
+
+class BrowserPoolExhausted(Exception):
+    """Raised when no browser becomes free before the acquire timeout."""
+
+
+class PooledBrowser:
+    """A browser owned by the pool, with its usage counters."""
+
+    def __init__(self, browser, browser_id: int):
+        self.browser = browser
+        self.id = browser_id
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+        self.navigations = 0
+        self.leases = 0
+
+
+class BrowserLease:
+    """A checked-out browser. Release it, or use it as a context manager."""
+
+    def __init__(self, pool: 'BrowserPool', entry: PooledBrowser, wait_time: float):
+        self.pool = pool
+        self.entry = entry
+        self.wait_time = wait_time
+        self.released = False
+
+    @property
+    def browser(self):
+        """The leased browser."""
+        return self.entry.browser
+
+    def release(self, discard: bool = False):
+        """
+        Return the browser to the pool.
+
+        Args:
+            discard (bool, optional): Stop the browser instead of reusing it. Defaults to False.
+        """
+        if not self.released:
+            self.released = True
+            self.pool.release(self.entry, discard=discard)
+
+    def __enter__(self):
+        return self.browser
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+
+def _get_driver(browser):
+    return getattr(browser, 'driver', None)
+
+
+def browser_memory_mb(browser) -> Optional[float]:
+    """Resident memory of a browser's driver and Chrome processes, if measurable."""
+    if not PSUTIL_AVAILABLE:
+        return None
+    try:
+        process = psutil.Process(_get_driver(browser).service.process.pid)
+        processes = [process] + process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class BrowserPool:
+    """A bounded pool of pre-started browsers."""
+
+    def __init__(self, factory: Callable[[], Any], name: str = 'browser', size: int = 2, max_size: int = 4,
+                 max_navigations: int = None, max_memory_mb: int = None, acquire_timeout: float = None,
+                 health_interval: float = None):
+        """
+        Initialize the pool. No browser is started until start() or the first acquire().
+
+        Args:
+            factory (callable): Returns a started browser, raising if it cannot start
+            name (str, optional): Pool name used in logs and metrics. Defaults to 'browser'.
+            size (int, optional): Idle browsers kept warm. Defaults to 2.
+            max_size (int, optional): Most browsers alive at once, idle or leased. Defaults to 4.
+            max_navigations (int, optional): Navigations before a browser is recycled. Defaults to BROWSER_POOL_MAX_NAVIGATIONS or 50.
+            max_memory_mb (int, optional): Chrome RSS above which a browser is recycled. Defaults to BROWSER_POOL_MAX_MEMORY_MB or 1024.
+            acquire_timeout (float, optional): Seconds to wait for a free browser. Defaults to BROWSER_POOL_ACQUIRE_TIMEOUT or 30.
+            health_interval (float, optional): Seconds between health checks of idle browsers. Defaults to BROWSER_POOL_HEALTH_INTERVAL or 30.
+        """
+        self.factory = factory
+        self.name = name
+        self.size = size
+        self.max_size = max(max_size, size, 1)
+        self.max_navigations = max_navigations if max_navigations is not None else MAX_NAVIGATIONS
+        self.max_memory_mb = max_memory_mb if max_memory_mb is not None else MAX_MEMORY_MB
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else ACQUIRE_TIMEOUT
+        self.health_interval = health_interval if health_interval is not None else HEALTH_INTERVAL
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._in_use: Dict[int, PooledBrowser] = {}
+        self._starting = 0
+        self._ids = itertools.count(1)
+        self._closed = False
+        self._wake = threading.Event()
+        self._maintainer = None
+        self._retry_delay = 0
+        self._retry_at = 0.0
+
+        self.stats = {
+            'created': 0,
+            'start_failures': 0,
+            'recycled': 0,
+            'health_failures': 0,
+            'reset_failures': 0,
+            'leases': 0,
+            'warm_leases': 0,
+            'cold_leases': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'total_wait_time': 0.0
+        }
+
+    def start(self):
+        """Start the maintenance thread that keeps idle browsers warm and healthy."""
+        with self._cond:
+            if self._maintainer is None:
+                self._maintainer = threading.Thread(target=self._maintain, name=f"{self.name}-pool", daemon=True)
+                self._maintainer.start()
+
+    def _total(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._starting
+
+    def _create(self) -> PooledBrowser:
+        browser = self.factory()
+        entry = PooledBrowser(browser, next(self._ids))
+        self._track_navigations(entry)
+        with self._cond:
+            self.stats['created'] += 1
+        logger.info(f"Started browser {entry.id} for the {self.name} pool")
+        return entry
+
+    @staticmethod
+    def _track_navigations(entry: PooledBrowser):
+        # Count navigations by wrapping the instance's navigate; the class is unchanged,
+        # so isinstance checks on the leased browser still hold.
+        navigate = getattr(entry.browser, 'navigate', None)
+        if navigate is None:
+            return
+
+        def counting_navigate(*args, **kwargs):
+            entry.navigations += 1
+            return navigate(*args, **kwargs)
+
+        entry.browser.navigate = counting_navigate
+
+    def _destroy(self, entry: PooledBrowser):
+        try:
+            entry.browser.stop()
+        except Exception as e:
+            logger.warning(f"Error stopping browser {entry.id} of the {self.name} pool: {e}")
+
+    def acquire(self, timeout: float = None) -> BrowserLease:
+        """
+        Check out a browser, starting one if the pool has room and none is idle.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a free browser. Defaults to the pool's acquire timeout.
+
+        Returns:
+            BrowserLease: The lease on a started browser
+
+        Raises:
+            BrowserPoolExhausted: If no browser became free in time
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        # Warm lazily so importing a module that owns a pool starts no browsers
+        self.start()
+        start = time.monotonic()
+        deadline = start + timeout
+        entry = None
+        create = False
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise BrowserPoolExhausted(f"{self.name} pool is closed")
+                if self._idle:
+                    # Most recently used first: its caches are warmest
+                    entry = self._idle.pop()
+                    break
+                if self._total() < self.max_size:
+                    self._starting += 1
+                    create = True
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise BrowserPoolExhausted(
+                        f"No browser free in the {self.name} pool after {timeout:.1f}s ({self.max_size} in use)"
+                    )
+                if not waited:
+                    waited = True
+                    self.stats['waits'] += 1
+                self._cond.wait(remaining)
+
+        if create:
+            try:
+                entry = self._create()
+            except Exception:
+                with self._cond:
+                    self.stats['start_failures'] += 1
+                raise
+            finally:
+                with self._cond:
+                    self._starting -= 1
+                    self._cond.notify_all()
+
+        wait_time = time.monotonic() - start
+        with self._cond:
+            self._in_use[entry.id] = entry
+            entry.leases += 1
+            self.stats['leases'] += 1
+            self.stats['cold_leases' if create else 'warm_leases'] += 1
+            self.stats['total_wait_time'] += wait_time
+
+        # Replace the browser just taken from the warm set
+        self._wake.set()
+        return BrowserLease(self, entry, wait_time)
+
+    def release(self, entry: PooledBrowser, discard: bool = False):
+        """
+        Check a browser back in, resetting it or recycling it if it is worn out.
+
+        Args:
+            entry (PooledBrowser): The browser being returned
+            discard (bool, optional): Stop the browser instead of reusing it. Defaults to False.
+        """
+        with self._cond:
+            self._in_use.pop(entry.id, None)
+            closed = self._closed
+            # Count the browser until it is reset or stopped so acquire() cannot overshoot max_size
+            self._starting += 1
+
+        recycle = discard or closed or self._should_recycle(entry) or not self._reset(entry)
+        if recycle:
+            self._destroy(entry)
+
+        with self._cond:
+            self._starting -= 1
+            if recycle:
+                self.stats['recycled'] += 1
+            else:
+                entry.last_used = time.time()
+                self._idle.append(entry)
+            self._cond.notify_all()
+
+        if recycle:
+            self._wake.set()
+
+    def _should_recycle(self, entry: PooledBrowser) -> bool:
+        if entry.navigations >= self.max_navigations:
+            logger.info(f"Recycling browser {entry.id} of the {self.name} pool after {entry.navigations} navigations")
+            return True
+        memory = self._memory_mb(entry)
+        if memory is not None and memory > self.max_memory_mb:
+            logger.info(f"Recycling browser {entry.id} of the {self.name} pool using {memory:.0f} MB")
+            return True
+        return False
+
+    @staticmethod
+    def _memory_mb(entry: PooledBrowser) -> Optional[float]:
+        return browser_memory_mb(entry.browser)
+
+    def _reset(self, entry: PooledBrowser) -> bool:
+        """Clear cookies and storage and leave the browser on a blank page."""
+        driver = _get_driver(entry.browser)
+        if driver is None:
+            return False
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+            try:
+                driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            except Exception:
+                driver.delete_all_cookies()
+            driver.get('about:blank')
+            # StealthBrowserSync keeps its state on the SeleniumVisualBrowser it wraps
+            inner = getattr(entry.browser, 'browser', entry.browser)
+            if hasattr(inner, 'current_url'):
+                inner.current_url = None
+            entry.last_checked = time.time()
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reset browser {entry.id} of the {self.name} pool: {e}")
+            with self._cond:
+                self.stats['reset_failures'] += 1
+            return False
+
+    @staticmethod
+    def _is_healthy(entry: PooledBrowser) -> bool:
+        driver = _get_driver(entry.browser)
+        if driver is None:
+            return False
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _maintain(self):
+        while True:
+            self._wake.wait(timeout=min(self.health_interval, 5))
+            self._wake.clear()
+            with self._cond:
+                if self._closed:
+                    return
+            try:
+                self._replenish()
+                self._check_health()
+            except Exception as e:
+                logger.error(f"Error maintaining the {self.name} browser pool: {e}")
+
+    def _replenish(self):
+        while True:
+            with self._cond:
+                if (self._closed or time.time() < self._retry_at or
+                        len(self._idle) + self._starting >= self.size or self._total() >= self.max_size):
+                    return
+                self._starting += 1
+            try:
+                entry = self._create()
+            except Exception as e:
+                with self._cond:
+                    self._starting -= 1
+                    self.stats['start_failures'] += 1
+                    self._retry_delay = min(max(self._retry_delay * 2, 5), MAX_RETRY_DELAY)
+                    self._retry_at = time.time() + self._retry_delay
+                    self._cond.notify_all()
+                logger.error(f"Failed to start a browser for the {self.name} pool, retrying in {self._retry_delay}s: {e}")
+                return
+            with self._cond:
+                self._starting -= 1
+                self._retry_delay = 0
+                self._idle.append(entry)
+                self._cond.notify_all()
+
+    def _check_health(self):
+        now = time.time()
+        with self._cond:
+            due = [entry for entry in self._idle if now - entry.last_checked >= self.health_interval]
+            # Taken out of the idle set so they cannot be leased mid-check
+            self._idle = [entry for entry in self._idle if entry not in due]
+            self._starting += len(due)
+
+        for entry in due:
+            healthy = self._is_healthy(entry)
+            if not healthy:
+                logger.warning(f"Browser {entry.id} of the {self.name} pool failed its health check")
+                self._destroy(entry)
+            with self._cond:
+                self._starting -= 1
+                if healthy:
+                    entry.last_checked = now
+                    self._idle.append(entry)
+                else:
+                    self.stats['health_failures'] += 1
+                    self.stats['recycled'] += 1
+                self._cond.notify_all()
+
+        if due:
+            self._replenish()
+
+    def close(self):
+        """Stop every idle browser; leased browsers are stopped when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        self._wake.set()
+        for entry in idle:
+            self._destroy(entry)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool metrics.
+
+        Returns:
+            Dict[str, Any]: Pool occupancy, lease counts, waits and recycling
+        """
+        with self._cond:
+            stats = dict(self.stats)
+            stats.update({
+                'name': self.name,
+                'size': self.size,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'starting': self._starting,
+                'average_wait': round(stats['total_wait_time'] / stats['leases'], 4) if stats['leases'] else 0,
+                'navigations_in_use': sum(entry.navigations for entry in self._in_use.values())
+            })
+            stats['total_wait_time'] = round(stats['total_wait_time'], 4)
+        return stats
+
+
+def _start_browser(browser):
+    result = browser.start()
+    if not result or not result.get('success'):
+        raise RuntimeError((result or {}).get('error', 'browser failed to start'))
+    return browser
+
+
+def create_headless_browser():
+    """Start a headless stealth browser for Context 7 tools."""
+    from app.visual_browser.stealth_browser import StealthBrowserSync
+    return _start_browser(StealthBrowserSync(headless=True, remote_debugging_port=None))
+
+
+def create_visual_browser():
+    """Start a visible Selenium browser for Visual Browser sessions."""
+    from app.visual_browser.selenium_visual_browser import SeleniumVisualBrowser
+    return _start_browser(SeleniumVisualBrowser(headless=False, timeout=30, remote_debugging_port=None))
+
+
+_pools: Dict[str, BrowserPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(name: str, factory: Callable[[], Any], size: int, max_size: int) -> BrowserPool:
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = BrowserPool(factory, name=name, size=size, max_size=max_size)
+        return _pools[name]
+
+
+def get_context7_browser_pool() -> BrowserPool:
+    """
+    Get the process-wide pool of headless browsers for Context 7 tools.
+
+    Sized by CONTEXT7_BROWSER_POOL_SIZE (default 2) and CONTEXT7_BROWSER_POOL_MAX (default 4).
+
+    Returns:
+        BrowserPool: The Context 7 browser pool
+    """
+    return _get_pool('context7', create_headless_browser,
+                     int(os.getenv('CONTEXT7_BROWSER_POOL_SIZE', 2)),
+                     int(os.getenv('CONTEXT7_BROWSER_POOL_MAX', 4)))
+
+
+def get_visual_browser_pool() -> BrowserPool:
+    """
+    Get the process-wide pool of browsers for Visual Browser sessions.
+
+    Sized by VISUAL_BROWSER_POOL_SIZE (default 1) and VISUAL_BROWSER_POOL_MAX (default 8).
+
+    Returns:
+        BrowserPool: The Visual Browser pool
+    """
+    return _get_pool('visual', create_visual_browser,
+                     int(os.getenv('VISUAL_BROWSER_POOL_SIZE', 1)),
+                     int(os.getenv('VISUAL_BROWSER_POOL_MAX', 8)))
+
+
+def get_browser_pool_stats() -> Dict[str, Any]:
+    """
+    Get metrics of every pool created in this process.
+
+    Returns:
+        Dict[str, Any]: Pool name to its metrics
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.get_stats() for pool in pools}
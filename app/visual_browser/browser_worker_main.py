@@ -0,0 +1,108 @@
+"""
+Browser Worker process entry point.
+
+Worker processes are spawned, and a spawned process imports the module of the
+function it runs. Anything under app/ would import the app package and, through
+app/__init__, every blueprint and service: the screen recorder server, the
+Context 7 tools and a BrowserManager of the parent's kind per worker. This
+module imports nothing from the app, and the supervisor runs it by path, so a
+worker starts with the standard library only.
+
+The default command handler is the worker's own BrowserManager. The
+visual_browser package needs only selenium, so it is imported under a bare
+app package whose __init__ is not run.
+"""
+
+import os
+import sys
+import logging
+import threading
+import importlib.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger('app.visual_browser.browser_worker_main')
+
+# The name this module runs under in a worker; see BrowserWorkerSupervisor._spawn
+RUN_NAME = '__browser_worker__'
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_handler():
+    """Create the object running commands in a worker: the worker's own BrowserManager."""
+    if 'app' not in sys.modules:
+        spec = importlib.util.spec_from_loader('app', None, is_package=True)
+        spec.submodule_search_locations = [APP_DIR]
+        sys.modules['app'] = importlib.util.module_from_spec(spec)
+    from app.visual_browser.browser_manager import BrowserManager
+    return BrowserManager()
+
+
+def worker_main(worker_id: int, conn, handler_factory: Optional[Callable[[], Any]], threads: int):
+    """
+    Serve commands until the supervisor closes the pipe.
+
+    Receives (request_id, session_id, command, args, kwargs) tuples and answers
+    each with (request_id, ok, result_or_error).
+
+    Args:
+        worker_id (int): The worker's ID, used in logs and thread names
+        conn: The worker's end of the supervisor's pipe
+        handler_factory (callable, optional): Creates the command handler. None uses default_handler.
+        threads (int): Sessions running commands at the same time
+    """
+    handler = (handler_factory or default_handler)()
+    send_lock = threading.Lock()
+    queues_lock = threading.Lock()
+    # Commands waiting per session; only the head of each queue is on the executor
+    session_queues: Dict[str, deque] = {}
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"browser-worker-{worker_id}")
+
+    def run(request_id, session_id, command, args, kwargs):
+        try:
+            method = getattr(handler, command, None) if not command.startswith('_') else None
+            if not callable(method):
+                raise AttributeError(f"Unknown browser command: {command}")
+            reply = (request_id, True, method(session_id, *args, **kwargs))
+        except Exception as e:
+            logger.error(f"Worker {worker_id}: {command} failed for session {session_id}: {str(e)}")
+            reply = (request_id, False, f"{type(e).__name__}: {str(e)}")
+        try:
+            with send_lock:
+                conn.send(reply)
+        except (OSError, ValueError):
+            pass
+
+        # Chain the session's next command, so a burst for one slow session holds one thread
+        with queues_lock:
+            queue = session_queues[session_id]
+            queue.popleft()
+            if queue:
+                executor.submit(run, *queue[0])
+            else:
+                del session_queues[session_id]
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        session_id = message[1]
+        with queues_lock:
+            queue = session_queues.get(session_id)
+            if queue is not None:
+                queue.append(message)
+                continue
+            session_queues[session_id] = deque([message])
+            executor.submit(run, *message)
+    executor.shutdown(wait=False)
+
+
+if __name__ == RUN_NAME:
+    # A spawned worker has no logging configured; a forked one keeps the parent's
+    logging.basicConfig(level=logging.INFO)
+    worker_main(*WORKER_ARGS)  # noqa: F821 - passed in by the supervisor
@@ -0,0 +1,449 @@
+"""
+Browser Workers for the Visual Browser.
+
+This module runs visual browser sessions in separate worker processes so a slow
+Chrome call for one user does not hold up the others and sessions spread over
+cores. A supervisor consistent-hashes each session ID onto a worker and sends
+commands (navigate, click, type, screenshot, ...) over a pipe. Inside a worker,
+commands for different sessions run concurrently and commands for the same
+session wait in a per-session FIFO queue, so only one of them occupies a thread. When a worker dies its pending
+commands fail, its sessions are reassigned to the surviving workers (reopening
+the page they were on) and a replacement worker is started. The worker side
+lives in browser_worker_main, which imports nothing from the app.
+
+Enable it by setting BROWSER_WORKERS to the number of worker processes; with
+the default of 0 sessions stay in the in-process BrowserManager.
+"""
+
+import os
+import time
+import runpy
+import bisect
+import hashlib
+import itertools
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_COUNT = int(os.getenv('BROWSER_WORKERS', 0))
+# Sessions running commands at the same time inside one worker
+WORKER_THREADS = int(os.getenv('BROWSER_WORKER_THREADS', 4))
+COMMAND_TIMEOUT = float(os.getenv('BROWSER_COMMAND_TIMEOUT', 120))
+START_METHOD = os.getenv('BROWSER_WORKER_START_METHOD', 'spawn')
+
+# Points per worker on the hash ring
+VIRTUAL_NODES = 64
+
+# Run by path in each worker, so workers do not import the app package
+WORKER_MODULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'browser_worker_main.py')
+WORKER_RUN_NAME = '__browser_worker__'
+
+# Commands safe to run again on a new worker when the one running them died
+RETRYABLE_COMMANDS = {'navigate', 'get_page_info', 'take_screenshot', 'refresh'}
+
+
+class WorkerCrashedError(Exception):
+    """Raised for commands that were running on a worker process that died."""
+
+
+class HashRing:
+    """Consistent hash ring mapping session IDs to worker IDs."""
+
+    def __init__(self, virtual_nodes: int = VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self._points: List[int] = []
+        self._owners: List[int] = []
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, worker_id: int):
+        for i in range(self.virtual_nodes):
+            point = self._hash(f"worker-{worker_id}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, worker_id)
+
+    def remove(self, worker_id: int):
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != worker_id]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def lookup(self, key: str) -> Optional[int]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def __len__(self):
+        return len(set(self._owners))
+
+
+class BrowserWorker:
+    """The supervisor's handle on one worker process."""
+
+    def __init__(self, worker_id: int, process, conn):
+        self.id = worker_id
+        self.process = process
+        self.conn = conn
+        self.send_lock = threading.Lock()
+        self.pending: Dict[int, Future] = {}
+        self.pending_lock = threading.Lock()
+        self.alive = True
+        self.started_at = time.time()
+        self.commands = 0
+
+    def send(self, request_id: int, session_id: str, command: str, args: tuple, kwargs: dict) -> Future:
+        future = Future()
+        with self.pending_lock:
+            if not self.alive:
+                raise WorkerCrashedError(f"Browser worker {self.id} is not running")
+            self.pending[request_id] = future
+        try:
+            with self.send_lock:
+                self.conn.send((request_id, session_id, command, args, kwargs))
+        except (OSError, ValueError) as e:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+            raise WorkerCrashedError(f"Browser worker {self.id} is not running: {str(e)}")
+        self.commands += 1
+        return future
+
+    def fail_pending(self, error: Exception):
+        with self.pending_lock:
+            self.alive = False
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class BrowserWorkerSupervisor:
+    """
+    Routes visual browser sessions to worker processes.
+
+    Exposes the same session methods as BrowserManager.
+    """
+
+    def __init__(self, workers: int = None, handler_factory: Callable[[], Any] = None,
+                 threads: int = None, command_timeout: float = None, start_method: str = None):
+        """
+        Configure the supervisor. Workers start on first use or on start().
+
+        Args:
+            workers (int, optional): Worker processes. Defaults to BROWSER_WORKERS, at least 1.
+            handler_factory (Callable, optional): Picklable function creating the object that runs
+                commands inside a worker. Defaults to the worker's own BrowserManager, created
+                without importing the app package.
+            threads (int, optional): Concurrent sessions per worker. Defaults to BROWSER_WORKER_THREADS or 4.
+            command_timeout (float, optional): Seconds to wait for a command. Defaults to BROWSER_COMMAND_TIMEOUT or 120.
+            start_method (str, optional): multiprocessing start method. Defaults to BROWSER_WORKER_START_METHOD or spawn.
+        """
+        self.worker_count = max(1, workers or WORKER_COUNT)
+        self.handler_factory = handler_factory
+        self.threads = threads or WORKER_THREADS
+        self.command_timeout = command_timeout or COMMAND_TIMEOUT
+        self.context = multiprocessing.get_context(start_method or START_METHOD)
+
+        self.workers: Dict[int, BrowserWorker] = {}
+        self.ring = HashRing()
+        # Sessions stay on the worker holding their browser even as workers come and go
+        self.assignments: Dict[str, int] = {}
+        self.last_urls: Dict[str, str] = {}
+        self.restore: set = set()
+        self._lock = threading.Lock()
+        self._worker_ids = itertools.count(1)
+        self._request_ids = itertools.count(1)
+        self._started = False
+        self._stopping = False
+        self.crashes = 0
+        self.reassigned = 0
+
+    def start(self):
+        """Start the worker processes."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._stopping = False
+            for _ in range(self.worker_count):
+                self._spawn()
+        logger.info(f"Started {self.worker_count} browser worker processes")
+
+    def stop(self):
+        """Stop the worker processes, closing their browsers."""
+        with self._lock:
+            self._stopping = True
+            self._started = False
+            workers = list(self.workers.values())
+            self.workers.clear()
+            self.ring = HashRing()
+            self.assignments.clear()
+        for worker in workers:
+            worker.fail_pending(WorkerCrashedError("Browser workers stopped"))
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+
+    def _spawn(self) -> BrowserWorker:
+        # Caller holds self._lock
+        worker_id = next(self._worker_ids)
+        parent_conn, child_conn = self.context.Pipe()
+        worker_args = (worker_id, child_conn, self.handler_factory, self.threads)
+        process = self.context.Process(target=runpy.run_path, name=f"browser-worker-{worker_id}",
+                                       args=(WORKER_MODULE_PATH,),
+                                       kwargs={'init_globals': {'WORKER_ARGS': worker_args},
+                                               'run_name': WORKER_RUN_NAME},
+                                       daemon=True)
+        process.start()
+        # Only the child keeps its end open, so the parent sees EOF when it dies
+        child_conn.close()
+        worker = BrowserWorker(worker_id, process, parent_conn)
+        self.workers[worker_id] = worker
+        self.ring.add(worker_id)
+        threading.Thread(target=self._read_replies, args=(worker,), name=f"browser-worker-reader-{worker_id}",
+                         daemon=True).start()
+        logger.info(f"Browser worker {worker_id} started (pid {process.pid})")
+        return worker
+
+    def _read_replies(self, worker: BrowserWorker):
+        while True:
+            try:
+                request_id, ok, result = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            with worker.pending_lock:
+                future = worker.pending.pop(request_id, None)
+            if future is not None and not future.done():
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(result))
+        self._handle_exit(worker)
+
+    def _handle_exit(self, worker: BrowserWorker):
+        worker.process.join(timeout=1)
+        worker.fail_pending(WorkerCrashedError(
+            f"Browser worker {worker.id} exited with code {worker.process.exitcode}"))
+        with self._lock:
+            if self._stopping or self.workers.get(worker.id) is not worker:
+                return
+            self.crashes += 1
+            del self.workers[worker.id]
+            self.ring.remove(worker.id)
+            orphaned = [s for s, w in self.assignments.items() if w == worker.id]
+            for session_id in orphaned:
+                del self.assignments[session_id]
+                if session_id in self.last_urls:
+                    self.restore.add(session_id)
+            self.reassigned += len(orphaned)
+            logger.error(f"Browser worker {worker.id} died (exit code {worker.process.exitcode}); "
+                         f"reassigning {len(orphaned)} sessions")
+            self._spawn()
+
+    def _route(self, session_id: str) -> BrowserWorker:
+        with self._lock:
+            worker_id = self.assignments.get(session_id)
+            if worker_id not in self.workers:
+                worker_id = self.ring.lookup(session_id)
+                if worker_id is None:
+                    raise WorkerCrashedError("No browser workers running")
+                self.assignments[session_id] = worker_id
+            return self.workers[worker_id]
+
+    def _call(self, worker: BrowserWorker, session_id: str, command: str, args: tuple, kwargs: dict):
+        future = worker.send(next(self._request_ids), session_id, command, args, kwargs)
+        return future.result(timeout=self.command_timeout)
+
+    def execute(self, session_id: str, command: str, *args, **kwargs) -> Any:
+        """
+        Run a browser command for a session on its worker.
+
+        Args:
+            session_id (str): The session ID.
+            command (str): The BrowserManager method to run.
+            *args: Arguments after the session ID.
+            **kwargs: Keyword arguments.
+
+        Returns:
+            Any: The command's result. Failures are returned as {'success': False, 'error': ...}.
+        """
+        if not self._started:
+            self.start()
+        for attempt in range(2):
+            try:
+                worker = self._route(session_id)
+                with self._lock:
+                    restore = session_id in self.restore and command not in ('navigate', 'close_browser')
+                    self.restore.discard(session_id)
+                if restore:
+                    logger.info(f"Reopening {self.last_urls[session_id]} for reassigned session {session_id}")
+                    self._call(worker, session_id, 'navigate', (self.last_urls[session_id],), {})
+                result = self._call(worker, session_id, command, args, kwargs)
+            except WorkerCrashedError as e:
+                if attempt == 0 and command in RETRYABLE_COMMANDS:
+                    logger.warning(f"Retrying {command} for session {session_id}: {str(e)}")
+                    continue
+                return {'success': False, 'error': str(e)}
+            except FutureTimeoutError:
+                return {'success': False, 'error': f"Browser command {command} timed out after {self.command_timeout:.0f}s"}
+            except Exception as e:
+                return {'success': False, 'error': str(e)}
+
+            if command == 'close_browser':
+                with self._lock:
+                    self.assignments.pop(session_id, None)
+                    self.last_urls.pop(session_id, None)
+                    self.restore.discard(session_id)
+            elif isinstance(result, dict) and result.get('success') and result.get('url'):
+                self.last_urls[session_id] = result['url']
+            return result
+
+    def navigate(self, session_id: str, url: str) -> Dict[str, Any]:
+        """Navigate a session's browser to a URL."""
+        return self.execute(session_id, 'navigate', url)
+
+    def click(self, session_id: str, selector: str = None, x: int = None, y: int = None) -> Dict[str, Any]:
+        """Click on an element or at coordinates."""
+        return self.execute(session_id, 'click', selector, x, y)
+
+    def type(self, session_id: str, text: str, selector: str = None) -> Dict[str, Any]:
+        """Type text into an input field."""
+        return self.execute(session_id, 'type', text, selector)
+
+    def scroll(self, session_id: str, direction: str = 'down', distance: int = 300) -> Dict[str, Any]:
+        """Scroll the page."""
+        return self.execute(session_id, 'scroll', direction, distance)
+
+    def get_page_info(self, session_id: str) -> Dict[str, Any]:
+        """Get information about the current page."""
+        return self.execute(session_id, 'get_page_info')
+
+    def take_screenshot(self, session_id: str, full_page: bool = False) -> str:
+        """Take a screenshot of the current page."""
+        return self.execute(session_id, 'take_screenshot', full_page)
+
+    def go_back(self, session_id: str) -> Dict[str, Any]:
+        """Go back in the browser history."""
+        return self.execute(session_id, 'go_back')
+
+    def go_forward(self, session_id: str) -> Dict[str, Any]:
+        """Go forward in the browser history."""
+        return self.execute(session_id, 'go_forward')
+
+    def refresh(self, session_id: str) -> Dict[str, Any]:
+        """Refresh the current page."""
+        return self.execute(session_id, 'refresh')
+
+    def fill_form(self, session_id: str, form_data: Dict[str, str]) -> Dict[str, Any]:
+        """Fill a form with the provided data."""
+        return self.execute(session_id, 'fill_form', form_data)
+
+    def press_key(self, session_id: str, key: str, selector: str = None) -> Dict[str, Any]:
+        """Press a key on the keyboard."""
+        return self.execute(session_id, 'press_key', key, selector)
+
+    def hover(self, session_id: str, selector: str = None, x: int = None, y: int = None) -> Dict[str, Any]:
+        """Hover over an element or coordinates."""
+        return self.execute(session_id, 'hover', selector, x, y)
+
+    def drag_and_drop(self, session_id: str, source_selector: str, target_selector: str) -> Dict[str, Any]:
+        """Drag an element onto another."""
+        return self.execute(session_id, 'drag_and_drop', source_selector, target_selector)
+
+    def close_browser(self, session_id: str) -> Dict[str, Any]:
+        """Close a session's browser."""
+        return self.execute(session_id, 'close_browser')
+
+    def get_session_stats(self) -> Dict[str, Any]:
+        """
+        Get every worker's live sessions, browser memory and eviction history.
+
+        Returns:
+            Dict[str, Any]: Totals across workers and each worker's BrowserManager.get_session_stats()
+        """
+        if not self._started:
+            self.start()
+        with self._lock:
+            workers = list(self.workers.values())
+        futures = []
+        for worker in workers:
+            try:
+                futures.append(worker.send(next(self._request_ids), None, 'get_session_stats', (), {}))
+            except WorkerCrashedError:
+                pass
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=self.command_timeout))
+            except Exception as e:
+                logger.warning(f"Could not get session stats from a browser worker: {str(e)}")
+        return {
+            'sessions': sum(r.get('sessions', 0) for r in results),
+            'memory_mb': round(sum(r.get('memory_mb', 0) for r in results), 1),
+            'workers': results
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get worker statistics.
+
+        Returns:
+            Dict[str, Any]: Per-worker sessions and in-flight commands, crash and reassignment counts.
+        """
+        with self._lock:
+            sessions: Dict[int, int] = {}
+            for worker_id in self.assignments.values():
+                sessions[worker_id] = sessions.get(worker_id, 0) + 1
+            workers = [{
+                'id': worker.id,
+                'pid': worker.process.pid,
+                'alive': worker.process.is_alive(),
+                'sessions': sessions.get(worker.id, 0),
+                'in_flight': len(worker.pending),
+                'commands': worker.commands,
+                'uptime': round(time.time() - worker.started_at, 1)
+            } for worker in self.workers.values()]
+            return {
+                'workers': workers,
+                'sessions': len(self.assignments),
+                'crashes': self.crashes,
+                'reassigned_sessions': self.reassigned
+            }
+
+
+_supervisor: Optional[BrowserWorkerSupervisor] = None
+_supervisor_lock = threading.Lock()
+
+
+def get_browser_workers() -> BrowserWorkerSupervisor:
+    """Get the shared browser worker supervisor."""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = BrowserWorkerSupervisor()
+        return _supervisor
+
+
+def get_browser_backend():
+    """
+    Get the object visual browser sessions are routed through.
+
+    Returns:
+        The worker supervisor if BROWSER_WORKERS is set, otherwise the in-process BrowserManager.
+    """
+    if WORKER_COUNT > 0:
+        return get_browser_workers()
+    from app.visual_browser.browser_manager import browser_manager
+    return browser_manager
@@ -0,0 +1,465 @@
+"""
+Frame Stream for the Screen Recorder.
+
+This module turns the recorder's screenshots into a delta-encoded live stream.
+Frames whose perceptual fingerprint has not changed are skipped, changed regions
+are cut into tiles and encoded as WebP or JPEG, and only the dirty tiles are sent
+as binary websocket messages. Every client has a bounded send queue served from
+the websocket server's own event loop, so clients are written to concurrently and
+a slow client drops deltas and resynchronises with a keyframe instead of holding
+up the others. Capture rate and encoder quality adapt to page activity and to
+client backlog.
+
+Wire format of binary messages (big-endian):
+
+    header: magic b'AWF1' (4s), kind (B: 0 keyframe, 1 delta),
+            codec (B: 1 jpeg, 2 webp, 3 png), sequence (I),
+            width (H), height (H), tile count (H)
+    tile:   x (H), y (H), width (H), height (H), length (I), then the encoded image
+
+A keyframe carries one tile covering the whole frame. A delta is drawn on top of
+the last frame the client received. Text messages stay JSON (e.g. URL changes).
+"""
+
+import io
+import os
+import json
+import time
+import struct
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, List
+
+try:
+    from PIL import Image, ImageChops
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    Image = None
+    ImageChops = None
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = int(os.getenv('STREAM_TILE_SIZE', 128))
+STREAM_FORMAT = os.getenv('STREAM_FORMAT', 'webp').lower()
+QUALITY_MAX = int(os.getenv('STREAM_QUALITY_MAX', 80))
+QUALITY_MIN = int(os.getenv('STREAM_QUALITY_MIN', 35))
+# Longest wait between captures of a page that is not changing
+MAX_INTERVAL = float(os.getenv('STREAM_MAX_INTERVAL_MS', 2000)) / 1000
+# Messages a client may have queued before it starts dropping deltas
+MAX_BACKLOG = int(os.getenv('STREAM_MAX_BACKLOG', 2))
+
+# Above this share of dirty tiles a full keyframe is cheaper than a delta
+KEYFRAME_THRESHOLD = 0.5
+# Fingerprints are compared at 1/FINGERPRINT_SCALE resolution; smaller grey-level
+# changes than FINGERPRINT_THRESHOLD (anti-aliasing, encoder noise) are ignored
+FINGERPRINT_SCALE = 4
+FINGERPRINT_THRESHOLD = 12
+
+MAGIC = b'AWF1'
+KEYFRAME = 0
+DELTA = 1
+CODECS = {'jpeg': 1, 'webp': 2, 'png': 3}
+CODEC_NAMES = {value: name for name, value in CODECS.items()}
+HEADER = struct.Struct('>4sBBIHHH')
+TILE_HEADER = struct.Struct('>HHHHI')
+
+
+class EncodedFrame:
+    """A keyframe or delta ready to send."""
+
+    def __init__(self, kind: int, sequence: int, payload: bytes, tiles: int, dirty_fraction: float = 1.0):
+        self.kind = kind
+        self.sequence = sequence
+        self.payload = payload
+        self.tiles = tiles
+        self.dirty_fraction = dirty_fraction
+
+
+class FrameDeltaEncoder:
+    """Detects changed tiles between consecutive screenshots and encodes them."""
+
+    def __init__(self, tile_size: int = None, image_format: str = None, quality: int = None):
+        """
+        Initialize the encoder.
+
+        Args:
+            tile_size (int, optional): Tile edge in pixels. Defaults to STREAM_TILE_SIZE or 128.
+            image_format (str, optional): 'webp' or 'jpeg'. Defaults to STREAM_FORMAT or webp.
+            quality (int, optional): Initial encoder quality. Defaults to STREAM_QUALITY_MAX or 80.
+        """
+        self.tile_size = tile_size or TILE_SIZE
+        self.image_format = image_format or STREAM_FORMAT
+        if self.image_format not in ('webp', 'jpeg'):
+            self.image_format = 'webp'
+        self.quality = quality if quality is not None else QUALITY_MAX
+
+        self.sequence = 0
+        self._digest = None
+        self._image = None
+        self._fingerprint = None
+        self._keyframe = None
+        self._lock = threading.Lock()
+        self._threshold_table = [255 if value > FINGERPRINT_THRESHOLD else 0 for value in range(256)]
+
+    @property
+    def codec(self) -> str:
+        return self.image_format if PIL_AVAILABLE else 'png'
+
+    def reset(self):
+        """Forget the reference frame so the next screenshot is sent as a keyframe."""
+        with self._lock:
+            self._digest = None
+            self._image = None
+            self._fingerprint = None
+            self._keyframe = None
+
+    def _encode_image(self, image) -> bytes:
+        output = io.BytesIO()
+        if self.image_format == 'webp':
+            image.save(output, 'WEBP', quality=self.quality, method=0)
+        else:
+            image.save(output, 'JPEG', quality=self.quality)
+        return output.getvalue()
+
+    def _pack(self, kind: int, width: int, height: int, tiles: List[tuple]) -> bytes:
+        parts = [HEADER.pack(MAGIC, kind, CODECS[self.codec], self.sequence, width, height, len(tiles))]
+        for x, y, w, h, data in tiles:
+            parts.append(TILE_HEADER.pack(x, y, w, h, len(data)))
+            parts.append(data)
+        return b''.join(parts)
+
+    def _fingerprint_of(self, image):
+        return image.convert('L').reduce(FINGERPRINT_SCALE)
+
+    def _dirty_tiles(self, fingerprint) -> Optional[List[tuple]]:
+        """Boxes of the tiles whose fingerprint changed, or None if the frame size changed."""
+        if self._fingerprint is None or self._fingerprint.size != fingerprint.size:
+            return None
+        diff = ImageChops.difference(fingerprint, self._fingerprint).point(self._threshold_table)
+        if diff.getbbox() is None:
+            return []
+
+        width, height = self._image.size
+        step = self.tile_size // FINGERPRINT_SCALE
+        dirty = []
+        for y in range(0, height, self.tile_size):
+            for x in range(0, width, self.tile_size):
+                fx, fy = x // FINGERPRINT_SCALE, y // FINGERPRINT_SCALE
+                if diff.crop((fx, fy, fx + step, fy + step)).getbbox() is not None:
+                    dirty.append((x, y, min(x + self.tile_size, width), min(y + self.tile_size, height)))
+        return dirty
+
+    def process(self, png: bytes, keyframe: bool = False) -> Optional[EncodedFrame]:
+        """
+        Compare a screenshot with the previous one and encode what changed.
+
+        Args:
+            png (bytes): The screenshot as PNG data
+            keyframe (bool, optional): Encode a changed frame in full rather than as a delta. Defaults to False.
+
+        Returns:
+            Optional[EncodedFrame]: A delta or keyframe, or None if the frame is unchanged
+        """
+        digest = hashlib.blake2b(png, digest_size=16).digest()
+        with self._lock:
+            if digest == self._digest:
+                return None
+
+            if not PIL_AVAILABLE:
+                # Without Pillow every changed frame is sent whole as PNG
+                self._digest = digest
+                self.sequence += 1
+                self._keyframe = EncodedFrame(KEYFRAME, self.sequence,
+                                              self._pack(KEYFRAME, 0, 0, [(0, 0, 0, 0, png)]), 1)
+                return self._keyframe
+
+            image = Image.open(io.BytesIO(png)).convert('RGB')
+            fingerprint = self._fingerprint_of(image)
+            previous = self._image
+            self._image = image
+            dirty = self._dirty_tiles(fingerprint) if previous is not None and previous.size == image.size else None
+            self._digest = digest
+            if dirty == []:
+                # Perceptually unchanged; the stored fingerprint stays the reference
+                return None
+            self._fingerprint = fingerprint
+            self.sequence += 1
+            self._keyframe = None
+
+            width, height = image.size
+            total = -(-width // self.tile_size) * -(-height // self.tile_size)
+            if dirty is None or keyframe or len(dirty) / total > KEYFRAME_THRESHOLD:
+                return self._encode_keyframe(dirty_fraction=1.0 if dirty is None else len(dirty) / total)
+
+            tiles = [(box[0], box[1], box[2] - box[0], box[3] - box[1], self._encode_image(image.crop(box)))
+                     for box in dirty]
+            return EncodedFrame(DELTA, self.sequence, self._pack(DELTA, width, height, tiles),
+                                len(tiles), len(dirty) / total)
+
+    def _encode_keyframe(self, dirty_fraction: float = 1.0) -> EncodedFrame:
+        width, height = self._image.size
+        data = self._encode_image(self._image)
+        self._keyframe = EncodedFrame(KEYFRAME, self.sequence,
+                                      self._pack(KEYFRAME, width, height, [(0, 0, width, height, data)]),
+                                      1, dirty_fraction)
+        return self._keyframe
+
+    def keyframe(self) -> Optional[EncodedFrame]:
+        """
+        Get the current frame in full, encoding it at most once per sequence.
+
+        Returns:
+            Optional[EncodedFrame]: The keyframe, or None before the first screenshot
+        """
+        with self._lock:
+            if self._keyframe is not None:
+                return self._keyframe
+            if self._image is None:
+                return None
+            return self._encode_keyframe()
+
+
+def decode_frame(payload: bytes) -> Dict[str, Any]:
+    """
+    Parse a binary frame message.
+
+    Args:
+        payload (bytes): A keyframe or delta as produced by FrameDeltaEncoder
+
+    Returns:
+        Dict[str, Any]: kind, codec, sequence, width, height and tiles as (x, y, width, height, data)
+    """
+    magic, kind, codec, sequence, width, height, count = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Not a frame message")
+    offset = HEADER.size
+    tiles = []
+    for _ in range(count):
+        x, y, w, h, length = TILE_HEADER.unpack_from(payload, offset)
+        offset += TILE_HEADER.size
+        tiles.append((x, y, w, h, payload[offset:offset + length]))
+        offset += length
+    return {
+        'kind': kind,
+        'codec': CODEC_NAMES.get(codec),
+        'sequence': sequence,
+        'width': width,
+        'height': height,
+        'tiles': tiles
+    }
+
+
+class ClientStream:
+    """One websocket client's send queue and statistics."""
+
+    def __init__(self, websocket, max_backlog: int):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=max_backlog)
+        self.needs_keyframe = True
+        self.task = None
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+        self.connected_at = time.time()
+
+
+class FrameStreamer:
+    """Fans encoded frames out to websocket clients from the websocket server's event loop."""
+
+    def __init__(self, encoder: FrameDeltaEncoder = None, max_backlog: int = None, max_interval: float = None):
+        """
+        Initialize the streamer.
+
+        Args:
+            encoder (FrameDeltaEncoder, optional): Frame encoder. Defaults to a new encoder.
+            max_backlog (int, optional): Queued messages per client. Defaults to STREAM_MAX_BACKLOG or 2.
+            max_interval (float, optional): Longest capture interval in seconds. Defaults to STREAM_MAX_INTERVAL_MS or 2s.
+        """
+        self.encoder = encoder or FrameDeltaEncoder()
+        self.max_backlog = max_backlog or MAX_BACKLOG
+        self.max_interval = max_interval or MAX_INTERVAL
+
+        self.loop = None
+        self.clients: Dict[Any, ClientStream] = {}
+        self._lock = threading.Lock()
+        self._url = None
+        self._idle_digest = None
+        self._unchanged = 0
+        self._dropped_since_adapt = 0
+
+        self.published = 0
+        self.skipped = 0
+
+    def has_clients(self) -> bool:
+        return bool(self.clients)
+
+    def _streams(self) -> List[ClientStream]:
+        with self._lock:
+            return list(self.clients.values())
+
+    def add_client(self, websocket) -> ClientStream:
+        """
+        Register a websocket client. Must be called on the websocket server's event loop.
+
+        Args:
+            websocket: The websocket connection
+
+        Returns:
+            ClientStream: The client's stream
+        """
+        self.loop = asyncio.get_running_loop()
+        stream = ClientStream(websocket, self.max_backlog)
+        stream.task = self.loop.create_task(self._sender(stream))
+        with self._lock:
+            self.clients[websocket] = stream
+        return stream
+
+    def remove_client(self, websocket):
+        """
+        Unregister a websocket client and stop its sender.
+
+        Args:
+            websocket: The websocket connection
+        """
+        with self._lock:
+            stream = self.clients.pop(websocket, None)
+        if stream and stream.task:
+            stream.task.cancel()
+
+    def request_keyframe(self, websocket):
+        """Resend the full frame to a client, e.g. after it lost its canvas."""
+        stream = self.clients.get(websocket)
+        if stream:
+            stream.needs_keyframe = True
+
+    async def _sender(self, stream: ClientStream):
+        while True:
+            message = await stream.queue.get()
+            try:
+                await stream.websocket.send(message)
+                stream.sent_frames += 1
+                stream.sent_bytes += len(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.info(f"Dropping stream client: {e}")
+                with self._lock:
+                    self.clients.pop(stream.websocket, None)
+                return
+
+    def publish(self, png: bytes, url: str = None) -> bool:
+        """
+        Encode a screenshot and queue it for every client. Called from the capture thread.
+
+        Args:
+            png (bytes): The screenshot as PNG data
+            url (str, optional): The page URL, sent to clients when it changes
+
+        Returns:
+            bool: True if the page changed since the previous screenshot
+        """
+        if not self.clients or self.loop is None or self.loop.is_closed():
+            # Nobody is watching: skip decoding and start the next client from a fresh keyframe
+            if self._idle_digest is None:
+                self.encoder.reset()
+                self._url = None
+            digest = hashlib.blake2b(png, digest_size=16).digest()
+            changed = digest != self._idle_digest
+            self._idle_digest = digest
+            self._unchanged = 0 if changed else self._unchanged + 1
+            return changed
+        self._idle_digest = None
+
+        frame = self.encoder.process(png)
+        if frame is None:
+            self.skipped += 1
+            self._unchanged += 1
+        else:
+            self.published += 1
+            self._unchanged = 0
+
+        keyframe = self.encoder.keyframe() if any(stream.needs_keyframe for stream in self._streams()) else None
+        url_message = None
+        if url and url != self._url:
+            self._url = url
+            url_message = json.dumps({'type': 'url', 'url': url, 'timestamp': time.time()})
+
+        if frame is not None or keyframe is not None or url_message is not None:
+            self.loop.call_soon_threadsafe(self._fan_out, frame, keyframe, url_message)
+        return frame is not None
+
+    def _enqueue(self, stream: ClientStream, message) -> bool:
+        try:
+            stream.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _fan_out(self, frame: Optional[EncodedFrame], keyframe: Optional[EncodedFrame], url_message: Optional[str]):
+        """Queue a frame for each client. Runs on the event loop."""
+        for stream in self._streams():
+            if url_message is not None:
+                self._enqueue(stream, url_message)
+
+            if stream.needs_keyframe:
+                full = keyframe if keyframe is not None else (frame if frame and frame.kind == KEYFRAME else None)
+                # Drop anything older than the keyframe; it supersedes the queue
+                if full is not None and stream.queue.empty() and self._enqueue(stream, full.payload):
+                    stream.needs_keyframe = False
+                continue
+
+            if frame is not None and not self._enqueue(stream, frame.payload):
+                # The client is behind; skip deltas until its queue drains, then resync
+                stream.dropped += 1
+                stream.needs_keyframe = True
+                self._dropped_since_adapt += 1
+
+    def next_interval(self, base_interval: float) -> float:
+        """
+        Adapt encoder quality and pick the wait before the next capture.
+
+        Idle pages are captured less often, backing off to max_interval. Dropped
+        frames lower the quality and the rate; drained queues raise them again.
+
+        Args:
+            base_interval (float): The recorder's configured interval in seconds
+
+        Returns:
+            float: Seconds to wait before the next capture
+        """
+        interval = min(self.max_interval, base_interval * (2 ** min(self._unchanged, 4)))
+
+        if self._dropped_since_adapt:
+            self.encoder.quality = max(QUALITY_MIN, self.encoder.quality - 10)
+            interval = min(self.max_interval, interval * 2)
+        elif self.clients and all(stream.queue.empty() for stream in self._streams()):
+            self.encoder.quality = min(QUALITY_MAX, self.encoder.quality + 5)
+        self._dropped_since_adapt = 0
+        return interval
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get stream statistics.
+
+        Returns:
+            Dict[str, Any]: Published and skipped frames, quality and per-client totals
+        """
+        now = time.time()
+        streams = self._streams()
+        return {
+            'codec': self.encoder.codec,
+            'quality': self.encoder.quality,
+            'sequence': self.encoder.sequence,
+            'published': self.published,
+            'skipped': self.skipped,
+            'clients': [{
+                'sent_frames': stream.sent_frames,
+                'sent_bytes': stream.sent_bytes,
+                'dropped': stream.dropped,
+                'queued': stream.queue.qsize(),
+                'bytes_per_second': round(stream.sent_bytes / max(now - stream.connected_at, 1e-6))
+            } for stream in streams]
+        }
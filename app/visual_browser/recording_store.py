@@ -0,0 +1,295 @@
+"""
+Recording Store for the Screen Recorder.
+
+This module stores a recording as one append-only frame container instead of a
+PNG file per frame. Frames are written with the live stream's tile encoder: a
+keyframe every RECORDING_KEYFRAME_INTERVAL stored frames and, in between, deltas
+holding only the tiles that changed, while unchanged captures are not stored at
+all. A fixed-size seek index maps capture times to container offsets, so a
+frame is fetched by timestamp by decoding one keyframe and the deltas after it.
+
+Files in a recording directory:
+
+    frames.awr   concatenated frame messages (see app.visual_browser.frame_stream)
+    frames.idx   one INDEX_ENTRY per stored frame: capture time in seconds from
+                 the start of the recording (d), offset (Q), length (I), kind (B)
+"""
+
+import io
+import os
+import re
+import json
+import bisect
+import struct
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.visual_browser.frame_stream import FrameDeltaEncoder, decode_frame, KEYFRAME, PIL_AVAILABLE
+
+if PIL_AVAILABLE:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_FILE = 'frames.awr'
+INDEX_FILE = 'frames.idx'
+CONTAINER_FORMAT = 'awr1'
+INDEX_ENTRY = struct.Struct('>dQIB')
+
+# Stored frames between keyframes; bounds the deltas decoded per seek
+KEYFRAME_INTERVAL = int(os.getenv('RECORDING_KEYFRAME_INTERVAL', 30))
+RECORDING_QUALITY = int(os.getenv('RECORDING_QUALITY', 80))
+
+LEGACY_FRAME_PATTERN = re.compile(r'^frame_(\d+)\.png$')
+
+
+def has_container(recording_path: str) -> bool:
+    """Whether a recording directory uses the frame container."""
+    return os.path.exists(os.path.join(recording_path, INDEX_FILE))
+
+
+def legacy_frame_files(recording_path: str) -> List[str]:
+    """The frame_N.png files of a recording written before the container, in frame order."""
+    names = [name for name in os.listdir(recording_path) if LEGACY_FRAME_PATTERN.match(name)]
+    return sorted(names, key=lambda name: int(LEGACY_FRAME_PATTERN.match(name).group(1)))
+
+
+class RecordingWriter:
+    """Appends screenshots to a recording's frame container and seek index."""
+
+    def __init__(self, recording_path: str, keyframe_interval: int = None, quality: int = None):
+        """
+        Open the container for appending.
+
+        Args:
+            recording_path (str): The recording directory
+            keyframe_interval (int, optional): Stored frames per keyframe. Defaults to RECORDING_KEYFRAME_INTERVAL or 30.
+            quality (int, optional): Encoder quality. Defaults to RECORDING_QUALITY or 80.
+        """
+        self.path = recording_path
+        self.keyframe_interval = keyframe_interval or KEYFRAME_INTERVAL
+        self.encoder = FrameDeltaEncoder(quality=quality if quality is not None else RECORDING_QUALITY)
+        self._frames = open(os.path.join(recording_path, CONTAINER_FILE), 'ab')
+        self._index = open(os.path.join(recording_path, INDEX_FILE), 'ab')
+        self._offset = self._frames.tell()
+        self._lock = threading.Lock()
+        self._since_keyframe = self.keyframe_interval
+        self.captured = 0
+        self.stored = 0
+        self.bytes_written = 0
+
+    def add(self, png: bytes, timestamp: float) -> bool:
+        """
+        Append a screenshot if it differs from the previous one.
+
+        Args:
+            png (bytes): The screenshot as PNG data
+            timestamp (float): Seconds since the start of the recording
+
+        Returns:
+            bool: True if a frame was stored
+        """
+        with self._lock:
+            if self._frames.closed:
+                return False
+            self.captured += 1
+            frame = self.encoder.process(png, keyframe=self._since_keyframe >= self.keyframe_interval)
+            if frame is None:
+                return False
+
+            self._frames.write(frame.payload)
+            self._frames.flush()
+            self._index.write(INDEX_ENTRY.pack(timestamp, self._offset, len(frame.payload), frame.kind))
+            self._index.flush()
+            self._offset += len(frame.payload)
+            self._since_keyframe = 0 if frame.kind == KEYFRAME else self._since_keyframe + 1
+            self.stored += 1
+            self.bytes_written += len(frame.payload)
+            return True
+
+    def close(self):
+        """Flush and close the container."""
+        with self._lock:
+            for handle in (self._frames, self._index):
+                if not handle.closed:
+                    handle.close()
+
+
+class RecordingReader:
+    """Random access to the frames of a container recording."""
+
+    def __init__(self, recording_path: str):
+        """
+        Load a recording's seek index.
+
+        Args:
+            recording_path (str): The recording directory
+        """
+        self.path = recording_path
+        self.container_path = os.path.join(recording_path, CONTAINER_FILE)
+        size = os.path.getsize(self.container_path) if os.path.exists(self.container_path) else 0
+
+        with open(os.path.join(recording_path, INDEX_FILE), 'rb') as f:
+            data = f.read()
+        self.entries: List[Tuple[float, int, int, int]] = []
+        for offset in range(0, len(data) - INDEX_ENTRY.size + 1, INDEX_ENTRY.size):
+            entry = INDEX_ENTRY.unpack_from(data, offset)
+            # Ignore a frame whose write was cut short
+            if entry[1] + entry[2] > size:
+                break
+            self.entries.append(entry)
+        self.timestamps = [entry[0] for entry in self.entries]
+        self.keyframes = [i for i, entry in enumerate(self.entries) if entry[3] == KEYFRAME]
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def duration(self) -> float:
+        return self.timestamps[-1] if self.timestamps else 0.0
+
+    def index_at(self, timestamp: float) -> int:
+        """
+        Find the frame shown at a time.
+
+        Args:
+            timestamp (float): Seconds since the start of the recording
+
+        Returns:
+            int: Index of the last frame stored at or before the time (0 before the first)
+        """
+        return max(0, bisect.bisect_right(self.timestamps, timestamp) - 1)
+
+    def _read(self, f, index: int) -> bytes:
+        _, offset, length, _ = self.entries[index]
+        f.seek(offset)
+        return f.read(length)
+
+    def _compose(self, canvas, payload: bytes):
+        message = decode_frame(payload)
+        if not message['width']:
+            # Written without Pillow: a PNG keyframe of unknown size holding the whole frame
+            data = message['tiles'][0][4]
+            return Image.open(io.BytesIO(data)).convert('RGB') if PIL_AVAILABLE else data
+        if message['kind'] == KEYFRAME or canvas is None:
+            canvas = Image.new('RGB', (message['width'], message['height']))
+        for x, y, _, _, data in message['tiles']:
+            with Image.open(io.BytesIO(data)) as tile:
+                canvas.paste(tile.convert('RGB'), (x, y))
+        return canvas
+
+    def _encode(self, canvas, image_format: str) -> bytes:
+        if isinstance(canvas, bytes):
+            return canvas
+        output = io.BytesIO()
+        canvas.save(output, image_format.upper())
+        return output.getvalue()
+
+    def iter_frames(self, start: int = 0, end: int = None, image_format: str = 'png'):
+        """
+        Decode a range of frames, starting from the keyframe before the first.
+
+        Args:
+            start (int, optional): First frame index. Defaults to 0.
+            end (int, optional): Frame index to stop before. Defaults to the last frame.
+            image_format (str, optional): Output image format. Defaults to png.
+
+        Yields:
+            Tuple[int, float, bytes]: Frame index, timestamp and the encoded image
+        """
+        end = len(self.entries) if end is None else min(end, len(self.entries))
+        if start >= end:
+            return
+        position = bisect.bisect_right(self.keyframes, start) - 1
+        first = self.keyframes[position] if position >= 0 else 0
+
+        canvas = None
+        with open(self.container_path, 'rb') as f:
+            for index in range(first, end):
+                canvas = self._compose(canvas, self._read(f, index))
+                if index >= start:
+                    yield index, self.entries[index][0], self._encode(canvas, image_format)
+
+    def frame_at(self, timestamp: float, image_format: str = 'png') -> Optional[Tuple[int, float, bytes]]:
+        """
+        Get the frame shown at a time.
+
+        Args:
+            timestamp (float): Seconds since the start of the recording
+            image_format (str, optional): Output image format. Defaults to png.
+
+        Returns:
+            Optional[Tuple[int, float, bytes]]: Frame index, its timestamp and the image, or None if empty
+        """
+        if not self.entries:
+            return None
+        index = self.index_at(timestamp)
+        return next(self.iter_frames(index, index + 1, image_format), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'format': CONTAINER_FORMAT,
+            'frames': len(self.entries),
+            'keyframes': len(self.keyframes),
+            'duration': round(self.duration, 3),
+            'size_bytes': os.path.getsize(self.container_path) if os.path.exists(self.container_path) else 0
+        }
+
+
+def migrate_recording(recording_path: str, interval: float = 0.3, keep_frames: bool = False) -> Dict[str, Any]:
+    """
+    Convert a recording of frame_N.png files to the frame container.
+
+    Legacy recordings carry no capture times, so frame N is placed at N * interval
+    seconds, the recorder's capture interval when they were written.
+
+    Args:
+        recording_path (str): The recording directory
+        interval (float, optional): Seconds between legacy frames. Defaults to 0.3.
+        keep_frames (bool, optional): Keep the PNG files after converting. Defaults to False.
+
+    Returns:
+        Dict[str, Any]: Frame counts and sizes before and after
+    """
+    if has_container(recording_path):
+        return {'success': False, 'error': 'Recording already uses the frame container'}
+
+    names = legacy_frame_files(recording_path)
+    before = sum(os.path.getsize(os.path.join(recording_path, name)) for name in names)
+    writer = RecordingWriter(recording_path)
+    try:
+        for name in names:
+            frame_number = int(LEGACY_FRAME_PATTERN.match(name).group(1))
+            with open(os.path.join(recording_path, name), 'rb') as f:
+                writer.add(f.read(), frame_number * interval)
+    except Exception:
+        writer.close()
+        for filename in (CONTAINER_FILE, INDEX_FILE):
+            path = os.path.join(recording_path, filename)
+            if os.path.exists(path):
+                os.unlink(path)
+        raise
+    writer.close()
+
+    if not keep_frames:
+        for name in names:
+            os.unlink(os.path.join(recording_path, name))
+
+    metadata_path = os.path.join(recording_path, 'metadata.json')
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+    metadata['format'] = CONTAINER_FORMAT
+    metadata['stored_frames'] = writer.stored
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    return {
+        'success': True,
+        'frames': len(names),
+        'stored_frames': writer.stored,
+        'size_before': before,
+        'size_after': writer.bytes_written + writer.stored * INDEX_ENTRY.size
+    }
@@ -2,6 +2,8 @@
 Screen Recorder Module
 
 This module provides functionality to record the browser screen and stream it to clients.
+Live frames are delta-encoded and fanned out by app.visual_browser.frame_stream,
+and recordings are written to a frame container by app.visual_browser.recording_store.
 """
 
 import os
@@ -10,18 +12,22 @@ import json
 import base64
 import logging
 import threading
-import asyncio
 from io import BytesIO
 from typing import Dict, Any, Optional, Set, List
 from datetime import datetime
 
+from app.visual_browser.frame_stream import FrameStreamer
+from app.visual_browser.recording_store import (
+    RecordingWriter, RecordingReader, has_container, legacy_frame_files, CONTAINER_FORMAT
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Global variables
-websocket_clients = set()
+frame_streamer = FrameStreamer()
 recording_service = None
 
 class ScreenRecorder:
@@ -41,9 +47,11 @@ class ScreenRecorder:
         self.is_recording = False
         self.capture_thread = None
         self.recording_thread = None
-        self.screenshot_interval = 300  # milliseconds (3-4 FPS)
+        self.screenshot_interval = 300  # milliseconds (3-4 FPS); the stream backs off on idle pages
+        self.streamer = frame_streamer
         self.last_screenshot = None
         self.last_screenshot_time = 0
+        self.recording_writer = None
         
         # Create recordings directory if it doesn't exist
         self.recordings_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
@@ -143,9 +151,11 @@ class ScreenRecorder:
                 'start_url': self.live_browser.current_url,
                 'start_time': datetime.now().isoformat(),
                 'browser': 'Chrome',
+                'format': CONTAINER_FORMAT,
                 'status': 'recording'
             }
         }
+        self.recording_writer = RecordingWriter(recording_path)
         
         # Save metadata
         self._save_recording_metadata()
@@ -184,12 +194,14 @@ class ScreenRecorder:
         self.current_recording['metadata']['end_url'] = self.live_browser.current_url
         self.current_recording['metadata']['status'] = 'completed'
         
-        # Save metadata
-        self._save_recording_metadata()
-        
         # Stop recording
         recording_id = self.current_recording['id']
         self.is_recording = False
+        if self.recording_writer:
+            self.recording_writer.close()
+        
+        # Save metadata
+        self._save_recording_metadata()
         
         # Reload recordings list
         self.recordings = self._load_recordings()
@@ -291,33 +303,42 @@ class ScreenRecorder:
             else:
                 metadata = {}
             
-            # Get frame files
-            frame_files = [f for f in os.listdir(recording_path) if f.startswith('frame_') and f.endswith('.png')]
-            frame_files.sort(key=lambda f: int(f.split('_')[1].split('.')[0]))
-            
-            # Apply start and end frame limits
-            if end_frame is None:
-                end_frame = len(frame_files)
-            
-            frame_files = frame_files[start_frame:end_frame]
-            
-            # Load frames
-            frames = []
-            for frame_file in frame_files:
-                frame_path = os.path.join(recording_path, frame_file)
-                with open(frame_path, 'rb') as f:
-                    frame_data = f.read()
-                    frames.append({
-                        'data': base64.b64encode(frame_data).decode('utf-8'),
-                        'timestamp': int(frame_file.split('_')[1].split('.')[0])
-                    })
+            if has_container(recording_path):
+                reader = RecordingReader(recording_path)
+                total_frames = len(reader)
+                frames = [{
+                    'data': base64.b64encode(image).decode('utf-8'),
+                    'index': index,
+                    'timestamp': timestamp
+                } for index, timestamp, image in reader.iter_frames(start_frame, end_frame)]
+            else:
+                # Recording written before the frame container (see migrate_recordings.py)
+                frame_files = legacy_frame_files(recording_path)
+                total_frames = len(frame_files)
+                
+                # Apply start and end frame limits
+                if end_frame is None:
+                    end_frame = len(frame_files)
+                
+                frame_files = frame_files[start_frame:end_frame]
+                
+                # Load frames
+                frames = []
+                for frame_file in frame_files:
+                    frame_path = os.path.join(recording_path, frame_file)
+                    with open(frame_path, 'rb') as f:
+                        frame_data = f.read()
+                        frames.append({
+                            'data': base64.b64encode(frame_data).decode('utf-8'),
+                            'timestamp': int(frame_file.split('_')[1].split('.')[0])
+                        })
             
             return {
                 'success': True,
                 'recording_id': recording_id,
                 'metadata': metadata,
                 'frames': frames,
-                'total_frames': len(frame_files),
+                'total_frames': total_frames,
                 'start_frame': start_frame,
                 'end_frame': start_frame + len(frames)
             }
@@ -328,6 +349,47 @@ class ScreenRecorder:
                 'error': f'Error getting recording frames: {str(e)}'
             }
     
+    def get_frame_at(self, recording_id, timestamp, image_format='png'):
+        """
+        Get the frame shown at a time in a recording without decoding the whole recording.
+        
+        Args:
+            recording_id: The ID of the recording.
+            timestamp: Seconds since the start of the recording.
+            image_format: Output image format, png, jpeg or webp.
+            
+        Returns:
+            dict: The frame index, its timestamp and the image bytes.
+        """
+        recording_path = os.path.join(self.recordings_dir, f"recording_{recording_id}")
+        
+        if not has_container(recording_path):
+            return {
+                'success': False,
+                'error': f'Recording {recording_id} not found or not migrated to the frame container'
+            }
+        
+        try:
+            frame = RecordingReader(recording_path).frame_at(timestamp, image_format)
+            if frame is None:
+                return {
+                    'success': False,
+                    'error': f'Recording {recording_id} has no frames'
+                }
+            index, frame_timestamp, image = frame
+            return {
+                'success': True,
+                'index': index,
+                'timestamp': frame_timestamp,
+                'image': image
+            }
+        except Exception as e:
+            logger.error(f"Error getting recording frame: {str(e)}")
+            return {
+                'success': False,
+                'error': f'Error getting recording frame: {str(e)}'
+            }
+    
     def _capture_loop(self):
         """
         Main loop for capturing screenshots.
@@ -347,11 +409,11 @@ class ScreenRecorder:
                     if self.is_recording:
                         self._save_screenshot(screenshot)
                     
-                    # Broadcast screenshot to clients
-                    self._broadcast_screenshot(screenshot)
+                    # Stream what changed to clients
+                    self.streamer.publish(screenshot, url=self.live_browser.current_url)
                 
-                # Sleep for the specified interval
-                time.sleep(self.screenshot_interval / 1000)
+                # Sleep for the interval adapted to page activity and client backlog
+                time.sleep(self.streamer.next_interval(self.screenshot_interval / 1000))
             except Exception as e:
                 logger.error(f"Error in capture loop: {str(e)}")
                 time.sleep(0.5)
@@ -384,16 +446,11 @@ class ScreenRecorder:
             screenshot: The screenshot data.
         """
         try:
-            if not self.is_recording or not self.current_recording['path']:
+            if not self.is_recording or not self.current_recording['path'] or not self.recording_writer:
                 return
             
-            # Generate frame filename
-            frame_number = self.current_recording['frames']
-            frame_path = os.path.join(self.current_recording['path'], f"frame_{frame_number}.png")
-            
-            # Save frame
-            with open(frame_path, 'wb') as f:
-                f.write(screenshot)
+            # Append the frame to the recording; unchanged frames are not stored
+            self.recording_writer.add(screenshot, time.time() - self.current_recording['start_time'])
             
             # Update frame count
             self.current_recording['frames'] += 1
@@ -414,6 +471,8 @@ class ScreenRecorder:
             
             # Update metadata
             self.current_recording['metadata']['frames'] = self.current_recording['frames']
+            if self.recording_writer:
+                self.current_recording['metadata']['stored_frames'] = self.recording_writer.stored
             self.current_recording['metadata']['last_updated'] = datetime.now().isoformat()
             
             # Save metadata
@@ -423,55 +482,6 @@ class ScreenRecorder:
         except Exception as e:
             logger.error(f"Error saving recording metadata: {str(e)}")
     
-    def _broadcast_screenshot(self, screenshot):
-        """
-        Broadcast a screenshot to all connected clients.
-        
-        Args:
-            screenshot: The screenshot data.
-        """
-        try:
-            if not websocket_clients:
-                return
-            
-            # Convert screenshot to base64
-            screenshot_base64 = base64.b64encode(screenshot).decode('utf-8')
-            
-            # Create message
-            message = {
-                'type': 'screenshot',
-                'data': screenshot_base64,
-                'timestamp': self.last_screenshot_time,
-                'url': self.live_browser.current_url
-            }
-            
-            # Broadcast to all clients
-            asyncio.run(self._broadcast_message(message))
-        except Exception as e:
-            logger.error(f"Error broadcasting screenshot: {str(e)}")
-    
-    async def _broadcast_message(self, message):
-        """
-        Broadcast a message to all connected clients.
-        
-        Args:
-            message: The message to broadcast.
-        """
-        if not websocket_clients:
-            return
-        
-        # Convert message to JSON
-        message_json = json.dumps(message)
-        
-        # Send to all clients
-        for client in list(websocket_clients):
-            try:
-                await client.send(message_json)
-            except Exception as e:
-                logger.error(f"Error sending message to client: {str(e)}")
-                # Remove client if there was an error
-                websocket_clients.discard(client)
-    
     def _load_recordings(self):
         """
         Load the list of available recordings.
@@ -499,8 +509,10 @@ class ScreenRecorder:
                             metadata = {}
                         
                         # Count frames
-                        frame_count = len([f for f in os.listdir(recording_path) 
-                                          if f.startswith('frame_') and f.endswith('.png')])
+                        if has_container(recording_path):
+                            frame_count = len(RecordingReader(recording_path))
+                        else:
+                            frame_count = len(legacy_frame_files(recording_path))
                         
                         # Calculate size
                         size_bytes = sum(os.path.getsize(os.path.join(recording_path, f)) 
@@ -562,14 +574,19 @@ async def websocket_handler(websocket, path):
         path: The connection path.
     """
     # Register client
-    websocket_clients.add(websocket)
-    logger.info(f"WebSocket client connected, total clients: {len(websocket_clients)}")
+    frame_streamer.add_client(websocket)
+    logger.info(f"WebSocket client connected, total clients: {len(frame_streamer.clients)}")
     
     try:
-        # Send initial message
+        # Send initial message; frames follow as binary messages, starting with a keyframe
         await websocket.send(json.dumps({
             'type': 'connected',
-            'message': 'Connected to screen recorder'
+            'message': 'Connected to screen recorder',
+            'stream': {
+                'protocol': 'AWF1',
+                'codec': frame_streamer.encoder.codec,
+                'tile_size': frame_streamer.encoder.tile_size
+            }
         }))
         
         # Handle messages
@@ -577,8 +594,12 @@ async def websocket_handler(websocket, path):
             try:
                 data = json.loads(message)
                 
+                # Client lost its canvas and needs the full frame again
+                if data.get('type') == 'keyframe':
+                    frame_streamer.request_keyframe(websocket)
+                
                 # Handle commands
-                if data.get('type') == 'command':
+                elif data.get('type') == 'command':
                     command = data.get('command')
                     
                     if command == 'start_recording':
@@ -659,8 +680,8 @@ async def websocket_handler(websocket, path):
         logger.error(f"WebSocket error: {str(e)}")
     finally:
         # Unregister client
-        websocket_clients.discard(websocket)
-        logger.info(f"WebSocket client disconnected, total clients: {len(websocket_clients)}")
+        frame_streamer.remove_client(websocket)
+        logger.info(f"WebSocket client disconnected, total clients: {len(frame_streamer.clients)}")
 
 # TODO: When implementing database integration, recordings should be stored in the database
 # with metadata and references to the frame files. This will allow for better organization,
@@ -2,14 +2,21 @@
 Screenshot Service for Visual Browser.
 
 This module provides a service for taking screenshots of the browser and serving them to the frontend.
+Screenshots go through a capture -> encode -> publish pipeline: the capture thread only grabs
+PNG bytes and hands them to a bounded queue that drops the oldest frame when the encoders fall
+behind, a small worker pool resizes and encodes straight from memory, and encoded frames are
+kept in a ring buffer served from memory. Persisting frames to disk is optional and bounded by
+a retention policy.
 """
 
 import os
 import time
+import uuid
 import threading
 import logging
-import base64
 from io import BytesIO
+from collections import deque
+from typing import Dict, Any, Optional
 from PIL import Image
 
 # Configure logging
@@ -17,30 +24,127 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# URL the live browser API serves ring buffer frames from
+FRAMES_URL = '/api/live-browser/frames'
+
+MIMETYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp', 'png': 'image/png'}
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp', 'png': 'png'}
+
+
+class Frame:
+    """An encoded screenshot in the ring buffer."""
+
+    def __init__(self, sequence: int, timestamp: float, data: bytes, image_format: str, width: int, height: int,
+                 epoch: str = ''):
+        self.sequence = sequence
+        self.epoch = epoch
+        self.timestamp = timestamp
+        self.data = data
+        self.image_format = image_format
+        self.width = width
+        self.height = height
+
+    @property
+    def mimetype(self) -> str:
+        return MIMETYPES[self.image_format]
+
+    @property
+    def url(self) -> str:
+        # Sequences restart in every service instance, so the epoch keeps URLs unique
+        return f"{FRAMES_URL}/{self.epoch}/{self.sequence}"
+
+
+class LatencyStats:
+    """Rolling latency samples in milliseconds."""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds * 1000)
+        self.count += 1
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {'count': self.count, 'avg_ms': 0, 'p50_ms': 0, 'p95_ms': 0}
+        ordered = sorted(self.samples)
+        return {
+            'count': self.count,
+            'avg_ms': round(sum(ordered) / len(ordered), 2),
+            'p50_ms': round(ordered[len(ordered) // 2], 2),
+            'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2)
+        }
+
+
 class ScreenshotService:
     """
     A service for taking screenshots of the browser and serving them to the frontend.
     """
-    
-    def __init__(self, live_browser):
+
+    def __init__(self, live_browser, encode_workers=None, queue_size=None, ring_size=None,
+                 image_format=None, persist=None, retention_count=None, retention_seconds=None):
         """
         Initialize the Screenshot Service.
-        
+
         Args:
             live_browser: The Live Browser instance.
+            encode_workers (int, optional): Encoder threads. Defaults to SCREENSHOT_ENCODE_WORKERS or 2.
+            queue_size (int, optional): Captured frames waiting for an encoder before the oldest is dropped.
+                Defaults to SCREENSHOT_QUEUE_SIZE or 2.
+            ring_size (int, optional): Encoded frames kept in memory. Defaults to SCREENSHOT_RING_SIZE or 10.
+            image_format (str, optional): jpeg, webp or png. Defaults to SCREENSHOT_SERVICE_FORMAT or jpeg.
+            persist (bool, optional): Also write frames to static/screenshots. Defaults to SCREENSHOT_PERSIST or False.
+            retention_count (int, optional): Persisted files kept. Defaults to SCREENSHOT_RETENTION_COUNT or 100.
+            retention_seconds (float, optional): Longest a persisted file is kept.
+                Defaults to SCREENSHOT_RETENTION_SECONDS or 1 hour.
         """
         self.live_browser = live_browser
         self.screenshot_interval = 1.0  # seconds
+        self.max_width = 1280
+        self.quality = 85
         self.is_running = False
         self.screenshot_thread = None
         self.latest_screenshot = None
         self.latest_screenshot_time = 0
         self.screenshots_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'screenshots')
-        
+
+        self.encode_workers = encode_workers or int(os.getenv('SCREENSHOT_ENCODE_WORKERS', 2))
+        self.image_format = (image_format or os.getenv('SCREENSHOT_SERVICE_FORMAT', 'jpeg')).lower()
+        if self.image_format not in MIMETYPES:
+            self.image_format = 'jpeg'
+        self.persist = persist if persist is not None else os.getenv('SCREENSHOT_PERSIST', 'false').lower() == 'true'
+        self.retention_count = retention_count if retention_count is not None else int(
+            os.getenv('SCREENSHOT_RETENTION_COUNT', 100))
+        self.retention_seconds = retention_seconds if retention_seconds is not None else float(
+            os.getenv('SCREENSHOT_RETENTION_SECONDS', 3600))
+
+        # Captured PNGs waiting for an encoder; a full queue drops its oldest frame
+        self._queue = deque(maxlen=queue_size or int(os.getenv('SCREENSHOT_QUEUE_SIZE', 2)))
+        self._queue_ready = threading.Condition()
+        self._workers = []
+        # Encoded frames served from memory, newest last
+        self._ring = deque(maxlen=ring_size or int(os.getenv('SCREENSHOT_RING_SIZE', 10)))
+        self._ring_lock = threading.Lock()
+        self._sequence = 0
+        self._published_sequence = 0
+        # Identifies this instance's frames; sequence numbers alone repeat after a restart
+        self.epoch = uuid.uuid4().hex[:12]
+        self._persisted = deque()
+
+        self.captured = 0
+        self.dropped = 0
+        self.encoded = 0
+        self.stale = 0
+        self.failed = 0
+        self.capture_latency = LatencyStats()
+        self.queue_latency = LatencyStats()
+        self.encode_latency = LatencyStats()
+
         # Create screenshots directory if it doesn't exist
-        if not os.path.exists(self.screenshots_dir):
+        if self.persist and not os.path.exists(self.screenshots_dir):
             os.makedirs(self.screenshots_dir)
-    
+
     def start(self):
         """
         Start the Screenshot Service.
@@ -48,14 +152,18 @@ class ScreenshotService:
         if self.is_running:
             logger.info("Screenshot Service is already running")
             return
-        
+
         logger.info("Starting Screenshot Service...")
         self.is_running = True
+        self._workers = [threading.Thread(target=self._encode_loop, name=f"screenshot-encoder-{i}", daemon=True)
+                         for i in range(self.encode_workers)]
+        for worker in self._workers:
+            worker.start()
         self.screenshot_thread = threading.Thread(target=self._screenshot_loop)
         self.screenshot_thread.daemon = True
         self.screenshot_thread.start()
         logger.info("Screenshot Service started")
-    
+
     def stop(self):
         """
         Stop the Screenshot Service.
@@ -63,13 +171,18 @@ class ScreenshotService:
         if not self.is_running:
             logger.info("Screenshot Service is not running")
             return
-        
+
         logger.info("Stopping Screenshot Service...")
         self.is_running = False
+        with self._queue_ready:
+            self._queue_ready.notify_all()
         if self.screenshot_thread:
             self.screenshot_thread.join(timeout=2.0)
+        for worker in self._workers:
+            worker.join(timeout=2.0)
+        self._workers = []
         logger.info("Screenshot Service stopped")
-    
+
     def _screenshot_loop(self):
         """
         Main loop for taking screenshots.
@@ -81,79 +194,177 @@ class ScreenshotService:
                     logger.warning("Browser is not running, skipping screenshot")
                     time.sleep(self.screenshot_interval)
                     continue
-                
-                # Take screenshot
-                self._take_screenshot()
-                
+
+                # Capture only; encoding happens on the worker pool
+                self._capture()
+
                 # Sleep for interval
                 time.sleep(self.screenshot_interval)
             except Exception as e:
                 logger.error(f"Error in screenshot loop: {str(e)}")
                 time.sleep(self.screenshot_interval)
-    
-    def _take_screenshot(self):
+
+    def _capture(self) -> Optional[tuple]:
         """
-        Take a screenshot of the browser.
+        Grab a PNG from the browser and queue it for encoding.
+
+        Returns:
+            tuple: The queued (sequence, timestamp, png) item, or None if the capture failed.
         """
         try:
-            # Take screenshot
+            start = time.perf_counter()
             screenshot_data = self.live_browser.driver.get_screenshot_as_png()
-            
-            # Generate filename with timestamp
-            timestamp = int(time.time())
-            filename = f"screenshot_{timestamp}.png"
-            filepath = os.path.join(self.screenshots_dir, filename)
-            
-            # Save screenshot to file
-            with open(filepath, 'wb') as f:
-                f.write(screenshot_data)
-            
-            # Update latest screenshot
-            self.latest_screenshot = f"/static/screenshots/{filename}"
-            self.latest_screenshot_time = timestamp
-            
-            # Update browser's current screenshot
-            self.live_browser.current_screenshot = self.latest_screenshot
-            
-            logger.debug(f"Screenshot taken and saved to {filepath}")
-            
-            # Optimize the image for web
-            self._optimize_image(filepath)
-            
-            return self.latest_screenshot
+            self.capture_latency.add(time.perf_counter() - start)
         except Exception as e:
             logger.error(f"Error taking screenshot: {str(e)}")
             return None
-    
-    def _optimize_image(self, filepath):
+
+        with self._queue_ready:
+            self._sequence += 1
+            self.captured += 1
+            item = (self._sequence, time.time(), time.perf_counter(), screenshot_data)
+            if len(self._queue) == self._queue.maxlen:
+                # The deque discards the oldest frame on append
+                self.dropped += 1
+            self._queue.append(item)
+            self._queue_ready.notify()
+        return item
+
+    def _encode_loop(self):
+        """
+        Worker loop encoding queued screenshots.
+        """
+        while True:
+            with self._queue_ready:
+                while self.is_running and not self._queue:
+                    self._queue_ready.wait()
+                if not self.is_running:
+                    return
+                item = self._queue.popleft()
+            self._process(item)
+
+    def _encode(self, screenshot_data):
         """
-        Optimize the image for web.
-        
+        Resize and encode a PNG screenshot in memory.
+
         Args:
-            filepath: Path to the image file.
+            screenshot_data: The PNG bytes.
+
+        Returns:
+            tuple: The encoded bytes, width and height.
         """
-        try:
-            # Open the image
-            img = Image.open(filepath)
-            
+        with Image.open(BytesIO(screenshot_data)) as img:
             # Resize if too large
-            max_width = 1280
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((max_width, new_height), Image.LANCZOS)
-            
-            # Save with optimization
-            img.save(filepath, optimize=True, quality=85)
-            
-            logger.debug(f"Image optimized: {filepath}")
+            if img.width > self.max_width:
+                ratio = self.max_width / img.width
+                img = img.resize((self.max_width, int(img.height * ratio)), Image.LANCZOS)
+            if self.image_format != 'png':
+                img = img.convert('RGB')
+
+            output = BytesIO()
+            if self.image_format == 'png':
+                img.save(output, 'PNG', optimize=True)
+            else:
+                img.save(output, self.image_format.upper(), quality=self.quality)
+            return output.getvalue(), img.width, img.height
+
+    def _process(self, item) -> Optional[Frame]:
+        """
+        Encode a captured screenshot and publish it if nothing newer has been published.
+
+        Args:
+            item: A (sequence, timestamp, queued_at, png) tuple from the capture queue.
+
+        Returns:
+            Frame: The published frame, or None if it failed or was superseded.
+        """
+        sequence, timestamp, queued_at, screenshot_data = item
+        self.queue_latency.add(time.perf_counter() - queued_at)
+        try:
+            start = time.perf_counter()
+            data, width, height = self._encode(screenshot_data)
+            self.encode_latency.add(time.perf_counter() - start)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error encoding screenshot: {str(e)}")
+            return None
+
+        frame = Frame(sequence, timestamp, data, self.image_format, width, height, epoch=self.epoch)
+        with self._ring_lock:
+            self.encoded += 1
+            if sequence < self._published_sequence:
+                # Another worker already published a newer frame
+                self.stale += 1
+                return None
+            self._published_sequence = sequence
+            self._ring.append(frame)
+
+        self.latest_screenshot = frame.url
+        self.latest_screenshot_time = int(timestamp)
+
+        # Update browser's current screenshot
+        self.live_browser.current_screenshot = self.latest_screenshot
+
+        if self.persist:
+            self._persist(frame)
+        return frame
+
+    def _persist(self, frame: Frame):
+        """
+        Write an encoded frame to static/screenshots and apply the retention policy.
+
+        Args:
+            frame: The frame to write.
+        """
+        try:
+            filename = f"screenshot_{int(frame.timestamp * 1000)}_{frame.sequence}.{EXTENSIONS[frame.image_format]}"
+            filepath = os.path.join(self.screenshots_dir, filename)
+            with open(filepath, 'wb') as f:
+                f.write(frame.data)
+
+            cutoff = time.time() - self.retention_seconds
+            with self._ring_lock:
+                self._persisted.append((frame.timestamp, filepath))
+                expired = []
+                while self._persisted and (len(self._persisted) > self.retention_count
+                                           or self._persisted[0][0] < cutoff):
+                    expired.append(self._persisted.popleft()[1])
+            for path in expired:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
         except Exception as e:
-            logger.error(f"Error optimizing image: {str(e)}")
-    
+            logger.error(f"Error persisting screenshot: {str(e)}")
+
+    def get_frame(self, sequence: int = None, epoch: str = None) -> Optional[Frame]:
+        """
+        Get a frame from the ring buffer.
+
+        Args:
+            sequence (int, optional): The frame's sequence number. Defaults to the latest frame.
+            epoch (str, optional): The epoch from the frame's URL; frames of another instance are not found.
+                Defaults to None (this instance).
+
+        Returns:
+            Frame: The frame, or None if it is not (or no longer) in the buffer.
+        """
+        if epoch is not None and epoch != self.epoch:
+            return None
+        with self._ring_lock:
+            if not self._ring:
+                return None
+            if sequence is None:
+                return self._ring[-1]
+            for frame in reversed(self._ring):
+                if frame.sequence == sequence:
+                    return frame
+        return None
+
     def get_latest_screenshot(self):
         """
         Get the latest screenshot.
-        
+
         Returns:
             dict: A dictionary containing the latest screenshot information.
         """
@@ -161,15 +372,53 @@ class ScreenshotService:
             'screenshot': self.latest_screenshot,
             'timestamp': self.latest_screenshot_time
         }
-    
+
     def take_screenshot_now(self):
         """
         Take a screenshot immediately.
-        
+
         Returns:
-            str: The path to the screenshot.
+            str: The URL of the screenshot.
         """
-        return self._take_screenshot()
+        item = self._capture()
+        if item is None:
+            return None
+        with self._queue_ready:
+            # Encode it here rather than waiting for a worker
+            try:
+                self._queue.remove(item)
+            except ValueError:
+                pass
+        frame = self._process(item)
+        return frame.url if frame else self.latest_screenshot
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pipeline statistics.
+
+        Returns:
+            dict: Frame counts and capture, queue and encode latencies.
+        """
+        with self._ring_lock:
+            buffered = len(self._ring)
+            persisted = len(self._persisted)
+        return {
+            'is_running': self.is_running,
+            'format': self.image_format,
+            'captured': self.captured,
+            'dropped': self.dropped,
+            'encoded': self.encoded,
+            'stale': self.stale,
+            'failed': self.failed,
+            'queued': len(self._queue),
+            'buffered': buffered,
+            'persisted': persisted,
+            'epoch': self.epoch,
+            'latest_sequence': self._published_sequence,
+            'capture_latency': self.capture_latency.summary(),
+            'queue_latency': self.queue_latency.summary(),
+            'encode_latency': self.encode_latency.summary()
+        }
 
 # Create a global instance
 screenshot_service = None
@@ -177,7 +426,7 @@ screenshot_service = None
 def init_screenshot_service(live_browser):
     """
     Initialize the Screenshot Service.
-    
+
     Args:
         live_browser: The Live Browser instance.
     """
@@ -189,7 +438,7 @@ def init_screenshot_service(live_browser):
 def get_screenshot_service():
     """
     Get the Screenshot Service instance.
-    
+
     Returns:
         ScreenshotService: The Screenshot Service instance.
     """
@@ -30,16 +30,19 @@ class SeleniumVisualBrowser:
     A visual browser that uses Selenium to provide visual browsing capabilities.
     """
 
-    def __init__(self, headless: bool = True, timeout: int = 30):
+    def __init__(self, headless: bool = True, timeout: int = 30, remote_debugging_port: Optional[int] = 9222):
         """
         Initialize the visual browser.
 
         Args:
             headless (bool, optional): Whether to run the browser in headless mode. Defaults to True.
             timeout (int, optional): Default timeout in seconds. Defaults to 30.
+            remote_debugging_port (int, optional): Chrome DevTools port. None lets ChromeDriver pick one,
+                which is required to run several browsers at once. Defaults to 9222.
         """
         self.headless = headless
         self.timeout = timeout
+        self.remote_debugging_port = remote_debugging_port
 
         # Browser instance
         self.driver = None
@@ -162,7 +165,8 @@ class SeleniumVisualBrowser:
             chrome_options.add_argument("--window-size=1280,800")
 
             # HEROKU-SPECIFIC ARGUMENTS for containerized environment
-            chrome_options.add_argument("--remote-debugging-port=9222")
+            if self.remote_debugging_port is not None:
+                chrome_options.add_argument(f"--remote-debugging-port={self.remote_debugging_port}")
             chrome_options.add_argument("--disable-background-timer-throttling")
             chrome_options.add_argument("--disable-backgrounding-occluded-windows")
             chrome_options.add_argument("--disable-renderer-backgrounding")
@@ -0,0 +1,307 @@
+"""
+Session Governor for the Visual Browser.
+
+This module bounds the browsers kept open for Visual Browser sessions. Idle
+deadlines live in a heap, so the reaper sleeps until exactly the next deadline
+and each touch costs O(log n) instead of a periodic scan of every session. A
+cap on concurrent browsers evicts the least recently used idle session to make
+room for a new one, and a sampler measures each browser's resident memory to
+recycle bloated instances and keep the total under a budget. Evictions are kept
+in a short history for the admin endpoint.
+"""
+
+import os
+import time
+import heapq
+import logging
+import threading
+from collections import OrderedDict, deque, Counter
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = float(os.getenv('BROWSER_IDLE_TIMEOUT', 30 * 60))
+MAX_BROWSERS = int(os.getenv('BROWSER_MAX_SESSIONS', 8))
+MAX_SESSION_MEMORY_MB = float(os.getenv('BROWSER_SESSION_MAX_MEMORY_MB', 1024))
+# Memory budget across all session browsers; 0 disables it
+MAX_TOTAL_MEMORY_MB = float(os.getenv('BROWSER_TOTAL_MAX_MEMORY_MB', 0))
+MEMORY_SAMPLE_INTERVAL = float(os.getenv('BROWSER_MEMORY_SAMPLE_INTERVAL', 30))
+HISTORY_SIZE = 100
+
+# Eviction reasons
+IDLE = 'idle'
+LRU = 'lru'
+MEMORY = 'memory'
+TOTAL_MEMORY = 'total_memory'
+
+
+class SessionLimitExceeded(Exception):
+    """Raised when a new session needs a browser and every open browser is busy."""
+
+
+class SessionState:
+    """Activity and memory of one session's browser."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.last_activity = time.monotonic()
+        self.deadline = 0.0
+        self.busy = 0
+        # Set once the session holds one of the max_browsers slots
+        self.admitted = False
+        self.generation = 0
+        self.memory_mb: Optional[float] = None
+
+
+class SessionGovernor:
+    """Reaps idle session browsers and enforces browser count and memory caps."""
+
+    def __init__(self, evict: Callable[[str, str], Any], memory_probe: Callable[[str], Optional[float]] = None,
+                 idle_timeout: float = None, max_browsers: int = None, max_session_memory_mb: float = None,
+                 max_total_memory_mb: float = None, sample_interval: float = None):
+        """
+        Initialize the governor. Call start() to run the reaper.
+
+        Args:
+            evict (Callable): Called with (session_id, reason) to close a session's browser
+            memory_probe (Callable, optional): Returns a session browser's RSS in MB, or None if unknown.
+                Without one the memory limits are not enforced.
+            idle_timeout (float, optional): Seconds of inactivity before a browser is closed. Defaults to BROWSER_IDLE_TIMEOUT or 30 minutes.
+            max_browsers (int, optional): Most session browsers open at once. Defaults to BROWSER_MAX_SESSIONS or 8.
+            max_session_memory_mb (float, optional): RSS above which an idle browser is recycled. Defaults to BROWSER_SESSION_MAX_MEMORY_MB or 1024.
+            max_total_memory_mb (float, optional): RSS budget across all browsers, 0 for none. Defaults to BROWSER_TOTAL_MAX_MEMORY_MB or 0.
+            sample_interval (float, optional): Seconds between memory samples. Defaults to BROWSER_MEMORY_SAMPLE_INTERVAL or 30.
+        """
+        self.evict = evict
+        self.memory_probe = memory_probe
+        self.idle_timeout = idle_timeout if idle_timeout is not None else IDLE_TIMEOUT
+        self.max_browsers = max_browsers if max_browsers is not None else MAX_BROWSERS
+        self.max_session_memory_mb = max_session_memory_mb if max_session_memory_mb is not None else MAX_SESSION_MEMORY_MB
+        self.max_total_memory_mb = max_total_memory_mb if max_total_memory_mb is not None else MAX_TOTAL_MEMORY_MB
+        self.sample_interval = sample_interval if sample_interval is not None else MEMORY_SAMPLE_INTERVAL
+
+        self._cond = threading.Condition()
+        # Least recently used first
+        self._sessions: 'OrderedDict[str, SessionState]' = OrderedDict()
+        # (deadline, generation, session_id); entries left behind by a touch are skipped when popped
+        self._deadlines = []
+        self._next_sample = time.monotonic() + self.sample_interval
+        self._thread = None
+        self._closed = False
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.evictions = Counter()
+
+    def start(self):
+        """Start the reaper thread."""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='browser-session-governor', daemon=True)
+                self._thread.start()
+
+    def close(self):
+        """Stop the reaper thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _schedule(self, state: SessionState):
+        # Caller holds self._cond
+        state.generation += 1
+        state.deadline = state.last_activity + self.idle_timeout
+        earliest = self._deadlines[0][0] if self._deadlines else None
+        heapq.heappush(self._deadlines, (state.deadline, state.generation, state.session_id))
+        # Rebuild once stale entries outnumber live ones so the heap stays O(sessions)
+        if len(self._deadlines) > 2 * len(self._sessions) + 16:
+            self._deadlines = [(s.deadline, s.generation, s.session_id) for s in self._sessions.values()]
+            heapq.heapify(self._deadlines)
+        if earliest is None or state.deadline < earliest:
+            self._cond.notify_all()
+
+    def admit(self, session_id: str):
+        """
+        Make room for a new session's browser, evicting the least recently used idle sessions.
+
+        Args:
+            session_id (str): The session about to open a browser
+
+        Raises:
+            SessionLimitExceeded: If the cap is reached and every open browser is busy
+        """
+        with self._cond:
+            state = self._sessions.get(session_id)
+            if state is not None and state.admitted:
+                return
+            admitted = [s for s in self._sessions.values() if s.admitted]
+            excess = len(admitted) + 1 - self.max_browsers
+            victims = [s for s in admitted if s.busy == 0][:max(0, excess)]
+            if len(victims) < excess:
+                raise SessionLimitExceeded(
+                    f"All {self.max_browsers} browsers are busy; try again when a session finishes")
+            # Taken out now so concurrent admits cannot pick the same sessions
+            for victim in victims:
+                del self._sessions[victim.session_id]
+            if state is None:
+                state = self._sessions[session_id] = SessionState(session_id)
+                self._schedule(state)
+            state.admitted = True
+            self._sessions.move_to_end(session_id)
+        for victim in victims:
+            self._evict(victim.session_id, LRU, state=victim)
+
+    def touch(self, session_id: str):
+        """Record activity on a session, pushing back its idle deadline."""
+        with self._cond:
+            state = self._sessions.get(session_id)
+            if state is None:
+                state = self._sessions[session_id] = SessionState(session_id)
+            state.last_activity = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            self._schedule(state)
+
+    def begin(self, session_id: str):
+        """Mark a session busy so it is not reaped or evicted mid-command."""
+        with self._cond:
+            self.touch(session_id)
+            self._sessions[session_id].busy += 1
+
+    def end(self, session_id: str):
+        """Mark a command on a session finished."""
+        with self._cond:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                state.busy = max(0, state.busy - 1)
+                self.touch(session_id)
+
+    def remove(self, session_id: str):
+        """Forget a session whose browser was closed."""
+        with self._cond:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self, session_id: str, reason: str, memory_mb: float = None, state: SessionState = None):
+        if state is None:
+            with self._cond:
+                state = self._sessions.pop(session_id, None)
+        if state is None or not state.admitted:
+            # Never opened a browser: nothing to close
+            return
+        idle = time.monotonic() - state.last_activity
+        logger.info(f"Evicting browser for session {session_id} ({reason}, idle {idle:.0f}s"
+                    + (f", {memory_mb:.0f} MB)" if memory_mb is not None else ")"))
+        try:
+            self.evict(session_id, reason)
+        except Exception as e:
+            logger.error(f"Error evicting browser for session {session_id}: {str(e)}")
+        with self._cond:
+            self.evictions[reason] += 1
+            self.history.append({
+                'session_id': session_id,
+                'reason': reason,
+                'time': time.time(),
+                'idle_seconds': round(idle, 1),
+                'memory_mb': round(memory_mb, 1) if memory_mb is not None else state.memory_mb
+            })
+
+    def _due_sessions(self):
+        # Caller holds self._cond
+        now = time.monotonic()
+        due = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, generation, session_id = heapq.heappop(self._deadlines)
+            state = self._sessions.get(session_id)
+            if state is None or state.generation != generation:
+                continue
+            if state.busy:
+                # Check again once the running command could have timed out
+                state.last_activity = now
+                self._schedule(state)
+                continue
+            due.append(session_id)
+        return due
+
+    def _sample_memory(self):
+        if self.memory_probe is None:
+            return
+        with self._cond:
+            session_ids = list(self._sessions)
+        samples = {}
+        for session_id in session_ids:
+            try:
+                samples[session_id] = self.memory_probe(session_id)
+            except Exception:
+                samples[session_id] = None
+
+        bloated = {}
+        over_budget = []
+        with self._cond:
+            for session_id, memory in samples.items():
+                state = self._sessions.get(session_id)
+                if state is None:
+                    continue
+                state.memory_mb = round(memory, 1) if memory is not None else None
+                if memory is not None and memory > self.max_session_memory_mb and not state.busy:
+                    bloated[session_id] = memory
+            if self.max_total_memory_mb:
+                total = sum(s.memory_mb or 0 for s in self._sessions.values() if s.session_id not in bloated)
+                # Least recently used first
+                for state in self._sessions.values():
+                    if total <= self.max_total_memory_mb:
+                        break
+                    if not state.busy and state.memory_mb and state.session_id not in bloated:
+                        over_budget.append((state.session_id, state.memory_mb))
+                        total -= state.memory_mb
+
+        for session_id, memory in bloated.items():
+            self._evict(session_id, MEMORY, memory)
+        for session_id, memory in over_budget:
+            self._evict(session_id, TOTAL_MEMORY, memory)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                due = self._due_sessions()
+                if not due:
+                    wake_at = self._next_sample
+                    if self._deadlines:
+                        wake_at = min(wake_at, self._deadlines[0][0])
+                    self._cond.wait(max(0.0, wake_at - time.monotonic()))
+            try:
+                for session_id in due:
+                    self._evict(session_id, IDLE)
+                if time.monotonic() >= self._next_sample:
+                    self._next_sample = time.monotonic() + self.sample_interval
+                    self._sample_memory()
+            except Exception as e:
+                logger.error(f"Error in browser session governor: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get live sessions, memory and eviction history.
+
+        Returns:
+            Dict[str, Any]: Session count, per-session activity and memory, eviction counts and recent evictions
+        """
+        now = time.monotonic()
+        with self._cond:
+            sessions = [{
+                'session_id': state.session_id,
+                'busy': state.busy > 0,
+                'idle_seconds': round(now - state.last_activity, 1),
+                'expires_in': round(state.deadline - now, 1),
+                'memory_mb': state.memory_mb,
+                'created_at': state.created_at
+            } for state in self._sessions.values() if state.admitted]
+            return {
+                'sessions': len(sessions),
+                'max_browsers': self.max_browsers,
+                'idle_timeout': self.idle_timeout,
+                'memory_mb': round(sum(s['memory_mb'] or 0 for s in sessions), 1),
+                'max_session_memory_mb': self.max_session_memory_mb,
+                'max_total_memory_mb': self.max_total_memory_mb,
+                'memory_sampling': self.memory_probe is not None,
+                'evictions': dict(self.evictions),
+                'session_details': sessions,
+                'history': list(self.history)
+            }
@@ -16,15 +16,17 @@ class StealthBrowserSync:
     This class is specifically designed for Context 7 tools that need to bypass CAPTCHA and detection.
     """
 
-    def __init__(self, headless: bool = True, timeout: int = 30):
+    def __init__(self, headless: bool = True, timeout: int = 30, remote_debugging_port: Optional[int] = 9222):
         """
         Initialize the stealth browser.
 
         Args:
             headless (bool, optional): Whether to run the browser in headless mode. Defaults to True.
             timeout (int, optional): Default timeout in seconds. Defaults to 30.
+            remote_debugging_port (int, optional): Chrome DevTools port, None to let ChromeDriver pick. Defaults to 9222.
         """
-        self.browser = SeleniumVisualBrowser(headless=headless, timeout=timeout)
+        self.browser = SeleniumVisualBrowser(headless=headless, timeout=timeout,
+                                             remote_debugging_port=remote_debugging_port)
         self.session_id = self.browser.session_id
         logger.info(f"StealthBrowserSync initialized with session ID: {self.session_id}")
 
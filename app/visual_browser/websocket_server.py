@@ -13,7 +13,7 @@ from typing import Dict, Any, List, Set
 from flask import Flask
 from flask_socketio import SocketIO, emit
 
-from app.visual_browser.browser_manager import browser_manager
+from app.visual_browser.browser_workers import get_browser_backend
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -24,6 +24,9 @@ logger = logging.getLogger(__name__)
 socketio_app = Flask(__name__)
 socketio = SocketIO(socketio_app, cors_allowed_origins="*")
 
+# Sessions run in browser worker processes when BROWSER_WORKERS is set
+browser_manager = get_browser_backend()
+
 # Connected clients
 connected_clients: Dict[str, str] = {}  # Maps client_id to session_id
 
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Migrate screen recordings to the frame container
+Converts recordings stored as one frame_N.png file per frame into a single
+frames.awr container with a seek index, as written by the screen recorder now.
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.append('.')
+
+from app.visual_browser.recording_store import migrate_recording, has_container, legacy_frame_files
+
+DEFAULT_RECORDINGS_DIR = os.path.join('app', 'static', 'recordings')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate PNG frame recordings to the frame container")
+    parser.add_argument('--dir', default=DEFAULT_RECORDINGS_DIR, help="Recordings directory")
+    parser.add_argument('--interval', type=float, default=0.3,
+                        help="Seconds between legacy frames (the recorder captured every 300 ms)")
+    parser.add_argument('--keep-frames', action='store_true', help="Keep the PNG files after converting")
+    parser.add_argument('--dry-run', action='store_true', help="List recordings that would be migrated")
+    args = parser.parse_args()
+
+    print("🎞️ Migrating screen recordings to the frame container")
+    print("=" * 50)
+
+    if not os.path.isdir(args.dir):
+        print(f"❌ Recordings directory not found: {args.dir}")
+        sys.exit(1)
+
+    total_before = total_after = migrated = 0
+    for name in sorted(os.listdir(args.dir)):
+        path = os.path.join(args.dir, name)
+        if not name.startswith('recording_') or not os.path.isdir(path):
+            continue
+        if has_container(path):
+            print(f"⏭️ {name}: already migrated")
+            continue
+        frames = legacy_frame_files(path)
+        if not frames:
+            print(f"⏭️ {name}: no frames")
+            continue
+        if args.dry_run:
+            print(f"📋 {name}: {len(frames)} frames")
+            continue
+
+        try:
+            result = migrate_recording(path, interval=args.interval, keep_frames=args.keep_frames)
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            continue
+        migrated += 1
+        total_before += result['size_before']
+        total_after += result['size_after']
+        print(f"✅ {name}: {result['frames']} frames -> {result['stored_frames']} stored, "
+              f"{result['size_before'] / 1024 / 1024:.1f} MB -> {result['size_after'] / 1024 / 1024:.1f} MB")
+
+    print("=" * 50)
+    if migrated:
+        print(f"🎉 Migrated {migrated} recordings: {total_before / 1024 / 1024:.1f} MB -> "
+              f"{total_after / 1024 / 1024:.1f} MB")
+    else:
+        print("Nothing to migrate")
+
+
+if __name__ == "__main__":
+    main()
@@ -71,6 +71,10 @@ def test_browser():
             f.write(f"Cache hits: {cache_stats.get('cache_hits', 0)}\n")
             f.write(f"Cache misses: {cache_stats.get('cache_misses', 0)}\n")
             f.write(f"Hit rate: {cache_stats.get('hit_rate', '0%')}\n")
+            f.write(f"Memory bytes: {cache_stats.get('memory_bytes', 0)}\n")
+            f.write(f"Disk bytes: {cache_stats.get('disk_bytes', 0)}\n")
+            f.write(f"Evictions (memory/disk): {cache_stats.get('memory_evictions', 0)}/{cache_stats.get('disk_evictions', 0)}\n")
+            f.write(f"Hit latency (ms): {cache_stats.get('hit_latency_ms', {})}\n")
 
             # Clean up
             browser._cleanup_advanced_browser()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Load test for the visual browser worker processes.
+
+Drives 50 concurrent sessions (navigate, clicks, typing, screenshots) against a
+local test page through the worker supervisor, using a fake browser that fetches
+the page over HTTP and spends a Chrome-like amount of time per command. Compares
+it with routing every session through one process and one lock held across each
+call, checks that a session stuck on a slow page does not delay the others, that
+commands for one session never overlap, and that killing a worker reassigns its
+sessions to the page they were on. Also checks that a burst of commands for one
+slow session does not take every thread of its worker from the sessions sharing it,
+and that a spawned worker does not import Flask or the app package.
+"""
+
+import os
+import sys
+import time
+import signal
+import threading
+import importlib.util
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('.')
+
+# Imported in run_tests: spawned workers re-import this script, and must not import the app
+WORKER_MODULE = os.path.join('app', 'visual_browser', 'browser_worker_main.py')
+
+SESSIONS = 50
+COMMAND_TIME = 0.02  # what a WebDriver round trip costs
+SLOW_PAGE_TIME = 3.0
+BURST_PAGE_TIME = 0.5
+BURST_COMMANDS = 12
+
+
+class TestPage(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if 'slow' in self.path:
+            time.sleep(SLOW_PAGE_TIME)
+        elif 'burst' in self.path:
+            time.sleep(BURST_PAGE_TIME)
+        body = b"<html><head><title>Test page</title></head><body><input id='q'><button>Go</button></body></html>"
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeBrowserManager:
+    """Stands in for BrowserManager inside a worker."""
+
+    def __init__(self):
+        self.urls = {}
+        self.active = {}
+        self.overlaps = 0
+        self.lock = threading.Lock()
+
+    def _enter(self, session_id):
+        with self.lock:
+            self.active[session_id] = self.active.get(session_id, 0) + 1
+            if self.active[session_id] > 1:
+                self.overlaps += 1
+
+    def _exit(self, session_id):
+        with self.lock:
+            self.active[session_id] -= 1
+
+    def navigate(self, session_id, url):
+        self._enter(session_id)
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+            self.urls[session_id] = url
+            return {'success': True, 'url': url, 'title': 'Test page', 'pid': os.getpid()}
+        finally:
+            self._exit(session_id)
+
+    def _command(self, session_id):
+        self._enter(session_id)
+        try:
+            time.sleep(COMMAND_TIME)
+            return {'success': True, 'url': self.urls.get(session_id), 'pid': os.getpid()}
+        finally:
+            self._exit(session_id)
+
+    def click(self, session_id, selector=None, x=None, y=None):
+        return self._command(session_id)
+
+    def type(self, session_id, text, selector=None):
+        return self._command(session_id)
+
+    def take_screenshot(self, session_id, full_page=False):
+        return self._command(session_id)
+
+    def get_page_info(self, session_id):
+        return {'success': True, 'url': self.urls.get(session_id), 'pid': os.getpid()}
+
+    def overlap_count(self, session_id):
+        return self.overlaps
+
+    def close_browser(self, session_id):
+        self.urls.pop(session_id, None)
+        return {'success': True}
+
+
+class ModuleProbe:
+    """Reports which modules a worker has imported."""
+
+    def imported(self, session_id, name):
+        return name in sys.modules
+
+    def load_default_handler(self, session_id):
+        spec = importlib.util.spec_from_file_location('browser_worker_main', WORKER_MODULE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return type(module.default_handler()).__name__
+
+
+class GlobalLockBackend:
+    """Every session in one process behind one lock held across each call."""
+
+    def __init__(self):
+        self.manager = FakeBrowserManager()
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        method = getattr(self.manager, name)
+
+        def call(*args):
+            with self.lock:
+                return method(*args)
+        return call
+
+
+def session_script(backend, session_id, page):
+    latencies = []
+    for command, args in [('navigate', (page,)), ('click', ('#q',)), ('type', ('flights', '#q')),
+                          ('click', ('button',)), ('take_screenshot', ()), ('get_page_info', ())]:
+        start = time.perf_counter()
+        result = getattr(backend, command)(session_id, *args)
+        latencies.append(time.perf_counter() - start)
+        assert result['success'], result
+    return latencies
+
+
+def run_load(backend, page, prefix):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=SESSIONS) as pool:
+        results = list(pool.map(lambda i: session_script(backend, f"{prefix}-{i}", page), range(SESSIONS)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(l for session in results for l in session)
+    return elapsed, len(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def test_worker_imports():
+    from app.visual_browser.browser_workers import BrowserWorkerSupervisor
+    supervisor = BrowserWorkerSupervisor(workers=1, handler_factory=ModuleProbe, command_timeout=60,
+                                         start_method='spawn')
+    try:
+        assert not supervisor.execute('probe', 'imported', 'flask')
+        assert not supervisor.execute('probe', 'imported', 'app')
+        assert supervisor.execute('probe', 'load_default_handler') == 'BrowserManager'
+        assert not supervisor.execute('probe', 'imported', 'flask')
+        assert not supervisor.execute('probe', 'imported', 'app.api')
+    finally:
+        supervisor.stop()
+    print("✅ A spawned worker and its BrowserManager import neither Flask nor the app package")
+
+
+def run_tests():
+    from app.visual_browser.browser_workers import BrowserWorkerSupervisor
+    print("=== Browser worker load test ===")
+    test_worker_imports()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TestPage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    page = f"http://127.0.0.1:{server.server_port}/"
+    print(f"Test page at {page}, {SESSIONS} sessions, {os.cpu_count()} CPUs")
+
+    elapsed, commands, p95 = run_load(GlobalLockBackend(), page, 'legacy')
+    print(f"One process, global lock: {elapsed:6.2f}s, {commands / elapsed:6.1f} commands/s, p95 {p95 * 1000:6.1f} ms")
+    legacy_elapsed = elapsed
+
+    supervisor = BrowserWorkerSupervisor(workers=4, handler_factory=FakeBrowserManager, threads=8,
+                                         command_timeout=30, start_method='fork')
+    supervisor.start()
+    try:
+        elapsed, commands, p95 = run_load(supervisor, page, 'load')
+        stats = supervisor.get_stats()
+        spread = sorted(w['sessions'] for w in stats['workers'])
+        print(f"4 worker processes:       {elapsed:6.2f}s, {commands / elapsed:6.1f} commands/s, p95 {p95 * 1000:6.1f} ms "
+              f"(sessions per worker {spread})")
+        assert elapsed * 2 < legacy_elapsed
+        assert min(spread) > 0
+        print(f"✅ {legacy_elapsed / elapsed:.1f}x faster; sessions spread over all workers")
+
+        overlaps = sum(supervisor.execute(f"load-{i}", 'overlap_count') for i in range(0, SESSIONS, 7))
+        assert overlaps == 0
+        print("✅ Commands for a session never overlapped")
+
+        # A session stuck on a slow page must not delay the others
+        slow = threading.Thread(target=supervisor.navigate, args=('slow-session', page + '?slow=1'))
+        slow.start()
+        time.sleep(0.2)
+        elapsed, commands, p95 = run_load(supervisor, page, 'during-slow')
+        slow.join()
+        # Measured against the slow page itself: queued behind it, p95 would be at least SLOW_PAGE_TIME
+        assert p95 < SLOW_PAGE_TIME / 2, p95
+        print(f"✅ While one session waited {SLOW_PAGE_TIME:.0f}s on a slow page, the others ran at "
+              f"p95 {p95 * 1000:.1f} ms")
+
+        # A burst for one slow session must not fill its worker's threads
+        burst_worker = supervisor.ring.lookup('burst-session')
+        neighbours = [f"neighbour-{i}" for i in range(200)
+                      if supervisor.ring.lookup(f"neighbour-{i}") == burst_worker][:5]
+        burst = [threading.Thread(target=supervisor.navigate, args=('burst-session', page + '?burst=1'))
+                 for _ in range(BURST_COMMANDS)]
+        for thread in burst:
+            thread.start()
+        time.sleep(0.2)
+        start = time.perf_counter()
+        for session_id in neighbours:
+            assert supervisor.navigate(session_id, page)['success']
+        neighbour_time = time.perf_counter() - start
+        for thread in burst:
+            thread.join()
+        # Queued behind the burst, each navigation would wait at least one BURST_PAGE_TIME
+        assert neighbour_time / len(neighbours) < BURST_PAGE_TIME / 2, neighbour_time
+        print(f"✅ During a burst of {BURST_COMMANDS} slow commands for one session, {len(neighbours)} sessions "
+              f"on the same worker navigated in {neighbour_time * 1000:.0f} ms")
+
+        # Kill the worker holding some sessions
+        victim = supervisor._route('load-0')
+        moved = [f"load-{i}" for i in range(SESSIONS) if supervisor.assignments.get(f"load-{i}") == victim.id]
+        os.kill(victim.process.pid, signal.SIGKILL)
+        deadline = time.time() + 10
+        while supervisor.get_stats()['crashes'] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        stats = supervisor.get_stats()
+        assert stats['crashes'] == 1 and len(stats['workers']) == 4
+        for session_id in moved:
+            result = supervisor.get_page_info(session_id)
+            assert result['success'] and result['url'] == page and result['pid'] != victim.process.pid, result
+        result = supervisor.click('load-0', '#q')
+        assert result['success'], result
+        print(f"✅ Killed worker {victim.id}: {stats['reassigned_sessions']} sessions reassigned and reopened "
+              f"{page}, replacement started")
+
+        for i in range(SESSIONS):
+            assert supervisor.close_browser(f"load-{i}")['success']
+        assert not any(session_id.startswith('load-') for session_id in supervisor.assignments)
+    finally:
+        supervisor.stop()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    run_tests()
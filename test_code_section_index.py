@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark the code section index used by the Code Wave targeted editor.
+
+Generates a ~200 KB landing page like the code generator produces and compares
+the previous regex section extraction with the parsed index: building it,
+reusing it for the same version, looking sections up, and updating it after an
+edit. Checks that incrementally updated indexes match a fresh parse of the
+edited page and that nested elements and multi-block functions are found.
+"""
+
+import re
+import sys
+import time
+import random
+
+sys.path.append('.')
+
+from app.services.code_section_index import (SectionIndex, get_section_index, update_section_index,
+                                             get_index_stats)
+
+TARGET_BYTES = 200 * 1024
+EDITS = 200
+
+
+def generate_page(target_bytes=TARGET_BYTES, seed=7):
+    """A generated landing page: a large <style>, nested sections of cards, and a <script>."""
+    rng = random.Random(seed)
+    colors = ['#1e3a8a', '#7c3aed', '#db2777', '#059669', '#f59e0b', '#0ea5e9']
+    css, body, js = [], [], []
+    i = 0
+    while sum(map(len, css)) + sum(map(len, body)) + sum(map(len, js)) < target_bytes:
+        color = rng.choice(colors)
+        css.append(f".section-{i} {{ padding: {rng.randint(8, 64)}px; background: linear-gradient(135deg, {color}, #fff); }}\n"
+                   f".section-{i} .card:hover {{ transform: translateY(-4px); box-shadow: 0 10px 30px rgba(0,0,0,.2); }}\n")
+        if i % 10 == 0:
+            css.append(f"@media (max-width: {rng.choice([480, 768, 1024])}px) {{\n"
+                       f"  .section-{i} h2 {{ font-size: 1.5rem; }}\n  .section-{i} .grid {{ display: block; }}\n}}\n")
+        cards = ''.join(
+            f'      <div class="card" id="card-{i}-{j}" style="border-color: {rng.choice(colors)}">\n'
+            f'        <div class="card-body"><h3>Feature {i}.{j}</h3>\n'
+            f'          <p>Build faster with <strong>feature {j}</strong> &amp; ship with confidence.\n'
+            f'          <ul><li>Fast<li>Secure<li>Simple</ul>\n'
+            f'          <button class="btn" onclick="handleClick({i}, {j})">Learn more</button>\n'
+            f'        </div>\n      </div>\n'
+            for j in range(3))
+        body.append(f'  <section class="section-{i}" id="section-{i}">\n    <h2>Section {i} heading</h2>\n'
+                    f'    <div class="grid">\n{cards}    </div>\n  </section>\n')
+        js.append(f"function handleSection{i}(event) {{\n  const items = document.querySelectorAll('.section-{i} .card');\n"
+                  f"  items.forEach((item) => {{ if (item.dataset.open === 'true') {{ item.classList.toggle('open'); }} }});\n"
+                  f"  return `section ${{{i}}} {{done}}`;\n}}\n")
+        i += 1
+    return ('<!DOCTYPE html>\n<html lang="en">\n<head>\n  <meta charset="UTF-8">\n  <title>Generated page</title>\n'
+            '  <style>\n' + ''.join(css) + '  </style>\n</head>\n<body>\n' + ''.join(body) +
+            '  <script>\n' + ''.join(js) + '  </script>\n</body>\n</html>\n')
+
+
+def legacy_identify_sections(code):
+    """The regex extraction CodeSectionParser used before the index."""
+    elements = [m for m in re.finditer(r'<(\w+)([^>]*?)>(.*?)</\1>', code, re.DOTALL | re.IGNORECASE)
+                if m.group(1).lower() not in ['script', 'style']]
+    rules = []
+    for style in re.finditer(r'<style[^>]*>(.*?)</style>', code, re.DOTALL | re.IGNORECASE):
+        rules.extend(re.finditer(r'([^{]+)\s*\{([^}]+)\}', style.group(1)))
+    functions = []
+    for script in re.finditer(r'<script[^>]*>(.*?)</script>', code, re.DOTALL | re.IGNORECASE):
+        functions.extend(re.finditer(r'function\s+(\w+)\s*\([^)]*\)\s*\{[^}]*\}', script.group(1)))
+    styles = list(re.finditer(r'style\s*=\s*["\']([^"\']+)["\']', code, re.IGNORECASE))
+    texts = [m for m in re.finditer(r'>([^<]+)<', code) if m.group(1).strip()]
+    return {'html_elements': elements, 'css_rules': rules, 'js_functions': functions,
+            'inline_styles': styles, 'text_content': texts}
+
+
+def timed(fn, repeat=5):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def test_build_and_lookup(page):
+    legacy, legacy_time = timed(lambda: legacy_identify_sections(page), repeat=3)
+    index, build_time = timed(lambda: SectionIndex(page), repeat=3)
+    print(f"Page: {len(page) / 1024:.0f} KB")
+    print(f"  regex extraction on every request: {legacy_time * 1000:.0f} ms, "
+          f"{len(legacy['html_elements'])} elements, {len(legacy['js_functions'])} functions")
+    print(f"  parsed index, first build:         {build_time * 1000:.0f} ms, "
+          f"{len(index.sections['html_elements'])} elements, {len(index.sections['js_functions'])} functions")
+
+    get_section_index(page)
+    _, cached_time = timed(lambda: get_section_index(page), repeat=20)
+    print(f"  parsed index, same version again:  {cached_time * 1000:.2f} ms")
+    assert cached_time < legacy_time / 10
+
+    # The regex stopped at the first '}' inside a function and never matched a <div> inside a <div>
+    divs = index.select('div')
+    assert len(divs) > 2 * sum(1 for m in legacy['html_elements'] if m.group(1) == 'div')
+    body = index.functions_named('handleSection3')[0].to_dict(page)['full_match']
+    assert body.startswith('function handleSection3') and body.endswith('}') and body.count('{') == body.count('}')
+    print(f"✅ Found {len(divs)} nested <div>s (regex: "
+          f"{sum(1 for m in legacy['html_elements'] if m.group(1) == 'div')}) and whole function bodies")
+
+    lookups = [
+        ('select #card-5-1', lambda: index.select('#card-5-1')),
+        ('select .section-40 .card h3', lambda: index.select('.section-40 .card h3')),
+        ('select section > h2', lambda: index.select('section > h2')),
+        ('CSS rules for .section-12 .card:hover', lambda: index.css_rules_for('.section-12 .card:hover')),
+        ('function handleSection30', lambda: index.functions_named('handleSection30')),
+        ('text "Section 25 heading"', lambda: index.find_text('Section 25 heading')),
+    ]
+    index.select('div')
+    for label, lookup in lookups:
+        found, seconds = timed(lookup, repeat=20)
+        assert found, label
+        print(f"  {label}: {len(found)} found in {seconds * 1000:.3f} ms")
+    assert len(index.select('.section-40 .card h3')) == 3
+    assert index.select('section > h2')[0].to_dict(page)['content'] == 'Section 0 heading'
+    print("✅ Selector, CSS rule, function and text lookups answered from the index")
+    return index
+
+
+def same_sections(a, b):
+    return all(a.sections[kind] == b.sections[kind] for kind in SectionIndex.KINDS)
+
+
+def random_edit(index, rng):
+    """Pick a section and an edit of it like the targeted editor makes."""
+    page = index.code
+    kind = rng.choice([kind for kind in SectionIndex.KINDS if index.sections[kind]])
+    section = rng.choice(index.sections[kind])
+    original = page[section.start_pos:section.end_pos]
+    if kind == 'css_rules':
+        new = f"{section.name} {{ color: #{rng.randrange(16 ** 6):06x}; content: '}}'; transition: all .3s; }}"
+    elif kind == 'js_functions':
+        new = original.replace('{', '{\n  console.log("edited");', 1)
+    elif kind == 'inline_styles':
+        new = 'style="border-color: red; box-shadow: 0 2px 4px {rgba(0,0,0,.1)}"'
+    elif kind == 'text_content':
+        new = rng.choice(['Brand new text', 'Text with <em>emphasis</em> inside', 'Tom &amp; Jerry',
+                          'Text with a stray </div> end tag'])
+    else:
+        new = rng.choice([
+            original.replace('>', ' data-edited="true">', 1),
+            f"<{section.name} class=\"edited\">Replaced content</{section.name}>",
+            'plain text instead of an element',
+            original + '<p>an extra paragraph',
+            '<div class="open">left unclosed',
+        ])
+    return section.start_pos, section.end_pos, new
+
+
+def test_incremental_updates(page):
+    rng = random.Random(11)
+    index = SectionIndex(page)
+    incremental, full = [], []
+    reindexed = 0
+    for _ in range(EDITS):
+        start, end, new = random_edit(index, rng)
+        t0 = time.perf_counter()
+        updated = index.apply_edit(start, end, new)
+        incremental.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        fresh = SectionIndex(updated.code)
+        full.append(time.perf_counter() - t0)
+        assert same_sections(updated, fresh), (start, end, new)
+        reindexed += updated.reparsed_chars == len(updated.code)
+        index = updated
+
+    incremental.sort()
+    full.sort()
+    print(f"✅ {EDITS} random edits: every incrementally updated index matched a fresh parse")
+    print(f"  median update {incremental[EDITS // 2] * 1000:.1f} ms vs {full[EDITS // 2] * 1000:.1f} ms to reparse; "
+          f"{reindexed} edits that changed the structure around them were reindexed in full")
+    assert incremental[EDITS // 2] < full[EDITS // 2] / 3
+
+
+def test_edit_flow(page):
+    """The /api/code/edit-section flow: find the target, apply the edit, edit the result again."""
+    from app.services import code_section_index as module
+    module._index_cache.clear()
+    before = get_index_stats()
+    index = get_section_index(page)
+    rule = index.css_rules_for('.section-3')[0]
+    edited = update_section_index(page, rule.start_pos, rule.end_pos, '.section-3 { padding: 0; }')
+    again = get_section_index(edited.code)
+    assert again is edited
+    heading = again.find_text('Section 4 heading')[0]
+    edited_twice = update_section_index(edited.code, heading.start_pos, heading.end_pos, 'Our pricing')
+    stats = get_index_stats()
+    assert stats['builds'] - before['builds'] == 1 and stats['incremental_updates'] - before['incremental_updates'] == 2
+    assert same_sections(edited_twice, SectionIndex(edited_twice.code))
+    print("✅ Consecutive edits to a page parsed it once; later versions came from incremental updates")
+
+
+def run_tests():
+    print("=== Code section index benchmark ===")
+    page = generate_page()
+    test_build_and_lookup(page)
+    test_incremental_updates(page)
+    test_edit_flow(page)
+
+
+if __name__ == "__main__":
+    run_tests()
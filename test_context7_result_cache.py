@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test the Context 7 tool result cache.
+
+Simulates identical hotel searches arriving from many users at once and checks
+that they share one execution, that repeats within the TTL are served from the
+cache, that fallback and failed results are never cached, that a request stops
+waiting on a hung search after its timeout, and that per-tool hit rates are
+reported.
+"""
+
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+sys.path.append('.')
+
+from app.utils.cache_service import get_cache_service
+
+NAMESPACE = 'context7_hotel_search'
+PARAMS = {'location': 'lagos', 'check_in': '2026-10-23', 'check_out': '2026-10-25', 'guests': 2}
+SEARCH_SECONDS = 0.5
+
+# Requests each concurrent_requests call coalesced, for checking the reported stats
+coalesced_requests = []
+
+
+class FakeHotelSearch:
+    """Stands in for the browser navigation, screenshots and vision calls."""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result or {'success': True, 'analysis': 'Three hotels near Victoria Island', 'task_summary': '...'}
+        self.error = error
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(SEARCH_SECONDS)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def cacheable(result):
+    return bool(result.get('success')) and 'analysis' in result
+
+
+def coalesced_count(cache):
+    return cache.get_stats(NAMESPACE)['namespaces'].get(NAMESPACE, {}).get('coalesced', 0)
+
+
+def concurrent_requests(cache, params, search, users):
+    sources = []
+    errors = []
+    joined = coalesced_count(cache) + users - 1
+
+    def gated_search():
+        # Finish only once every other user is waiting on this search, however slowly
+        # their threads start, so none of them arrives after it and misses or hits instead
+        deadline = time.time() + 10
+        while coalesced_count(cache) < joined and time.time() < deadline:
+            time.sleep(0.01)
+        return search()
+
+    def user():
+        try:
+            sources.append(cache.get_or_compute(NAMESPACE, params, gated_search, cacheable=cacheable)[1])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=user) for _ in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    coalesced_requests.append(users - 1)
+    return sources, errors, time.perf_counter() - start
+
+
+def test_coalescing_and_hits(cache):
+    search = FakeHotelSearch()
+    sources, errors, elapsed = concurrent_requests(cache, PARAMS, search, 20)
+    assert not errors and search.calls == 1, search.calls
+    assert sources.count('miss') == 1 and sources.count('coalesced') == 19
+    print(f"✅ 20 identical concurrent searches ran once and all finished in {elapsed:.2f}s "
+          f"(sequentially {20 * SEARCH_SECONDS:.0f}s)")
+
+    start = time.perf_counter()
+    for _ in range(50):
+        data, source = cache.get_or_compute(NAMESPACE, PARAMS, search, cacheable=cacheable)
+        assert source == 'hit' and data['analysis'] == search.result['analysis']
+    per_hit = (time.perf_counter() - start) / 50
+    assert search.calls == 1
+    print(f"✅ 50 repeat searches served from the cache in {per_hit * 1000:.2f} ms each")
+
+
+def test_ttl(cache):
+    search = FakeHotelSearch()
+    params = dict(PARAMS, location='abuja')
+    cache.get_or_compute(NAMESPACE, params, search, ttl=1, cacheable=cacheable)
+    assert cache.get_or_compute(NAMESPACE, params, search, ttl=1, cacheable=cacheable)[1] == 'hit'
+    time.sleep(1.1)
+    assert cache.get_or_compute(NAMESPACE, params, search, ttl=1, cacheable=cacheable)[1] == 'miss'
+    assert search.calls == 2
+    print("✅ Results expire after the tool's TTL")
+
+
+def test_fallbacks_and_errors_not_cached(cache):
+    fallback = FakeHotelSearch(result={'success': True, 'task_summary': 'Hotel Search Results (Fallback)'})
+    params = dict(PARAMS, location='accra')
+    for _ in range(2):
+        assert cache.get_or_compute(NAMESPACE, params, fallback, cacheable=cacheable)[1] == 'miss'
+    assert fallback.calls == 2
+
+    failing = FakeHotelSearch(error=RuntimeError('browser crashed'))
+    params = dict(PARAMS, location='nairobi')
+    sources, errors, _ = concurrent_requests(cache, params, failing, 5)
+    assert len(errors) == 5 and not sources and failing.calls == 1
+    assert all(str(e) == 'browser crashed' for e in errors)
+    print("✅ Fallback results were not cached; a failed search failed every coalesced request once")
+
+
+def test_hung_leader(cache):
+    release = threading.Event()
+    params = dict(PARAMS, location='kigali')
+    result = {'success': True, 'analysis': 'Two hotels in Kigali'}
+    leader = threading.Thread(target=cache.get_or_compute,
+                              args=(NAMESPACE, params, lambda: release.wait(10) and result),
+                              kwargs={'cacheable': cacheable})
+    leader.start()
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    data, source = cache.get_or_compute(NAMESPACE, params, lambda: result, cacheable=cacheable, wait_timeout=0.2)
+    waited = time.perf_counter() - start
+    release.set()
+    leader.join()
+    assert source == 'miss' and data == result and waited < 1
+    print(f"✅ A request coalesced onto a hung search gave up after {waited:.2f}s and searched itself")
+
+
+def test_stats(cache):
+    stats = cache.get_stats(NAMESPACE)['namespaces'][NAMESPACE]
+    requests = stats['cache_hits'] + stats['cache_misses']
+    print(f"✅ hotel_search: {requests} requests, {stats['cache_hits']} hits, {stats['coalesced']} coalesced, "
+          f"{stats['computations']} executions, hit rate {stats['hit_rate']}, saved {stats['saved_rate']}, "
+          f"TTL {stats['ttl']}s")
+    assert stats['coalesced'] == sum(coalesced_requests) and stats['ttl'] == 1800
+
+
+def run_tests():
+    print("=== Context 7 result cache tests ===")
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = get_cache_service(cache_dir)
+        test_coalescing_and_hits(cache)
+        test_ttl(cache)
+        test_fallbacks_and_errors_not_cached(cache)
+        test_hung_leader(cache)
+        test_stats(cache)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
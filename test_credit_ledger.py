@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test the credit ledger.
+
+Checks that concurrent consumers can never spend past the daily allowance,
+that journal rows are flushed to Supabase in batches and retried after a
+failed insert, that a row is counted once whether its insert commits before or
+after the Supabase baseline is read, that rows inserted before a crash are not
+inserted twice on restart, and that the legacy fallback totals are imported once.
+"""
+
+import os
+import sys
+import json
+import uuid
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.append('.')
+
+import app.services.credit_ledger as credit_ledger_module
+from app.services.credit_ledger import CreditLedger
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, table, rows=None):
+        self.table = table
+        self.rows = rows
+        self.filters = {}
+
+    def select(self, _columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        if self.rows is not None:
+            if self.table.fail_next:
+                self.table.fail_next = False
+                raise RuntimeError("network down")
+            self.table.inserts.append(len(self.rows))
+            self.table.records.extend(self.rows)
+            return FakeResult(self.rows)
+        return FakeResult([r for r in self.table.records
+                           if all(r.get(k) == v for k, v in self.filters.items())])
+
+
+class FakeSupabase:
+    """Enough of the Supabase client for the credit_usage table."""
+
+    def __init__(self):
+        self.records = []
+        self.inserts = []
+        self.fail_next = False
+
+    def table(self, _name):
+        return FakeQuery(self)
+
+
+def test_allowance_under_concurrency(root=None):
+    root = root or tempfile.mkdtemp()
+    ledger = CreditLedger(os.path.join(root, 'concurrent.db'), balance_ttl=0)
+    user_id = str(uuid.uuid4())
+    results = []
+
+    def consume():
+        for _ in range(10):
+            results.append(ledger.consume(user_id, 'chat', 1, limit=25)['success'])
+
+    threads = [threading.Thread(target=consume) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 25
+    assert ledger.get_daily_usage(user_id) == 25
+    print("✅ 8 threads making 80 consumptions against an allowance of 25 spent exactly 25")
+
+
+def test_batched_flush_and_retry(root=None):
+    root = root or tempfile.mkdtemp()
+    supabase = FakeSupabase()
+    ledger = CreditLedger(os.path.join(root, 'flush.db'), supabase=supabase, batch_size=4, baseline_ttl=0)
+    user_id = str(uuid.uuid4())
+    for _ in range(10):
+        assert ledger.consume(user_id, 'chat', 1)['success']
+    ledger.consume('guest-user', 'chat', 1)
+
+    supabase.fail_next = True
+    assert ledger.flush() == 0 and ledger.get_stats()['pending_rows'] == 10
+    assert ledger.flush() == 10
+    assert supabase.inserts == [4, 4, 2] and ledger.get_stats()['pending_rows'] == 0
+    # Flushed rows now come from the Supabase baseline and are not counted twice
+    assert ledger.get_daily_usage(user_id) == 10
+    print("✅ Journal rows are flushed in batches of 4, retried after a failure and counted once")
+
+
+def test_baseline_read_during_flush(root=None):
+    root = root or tempfile.mkdtemp()
+    supabase = FakeSupabase()
+    ledger = CreditLedger(os.path.join(root, 'baseline.db'), supabase=supabase, balance_ttl=0)
+    user_id = str(uuid.uuid4())
+
+    def insert(rows):
+        supabase.table('credit_usage').insert([{
+            'user_id': r[1], 'task_type': r[2], 'credits_consumed': r[3], 'date': r[4], 'timestamp': r[5]
+        } for r in rows]).execute()
+
+    # Inserted before the baseline is read, marked flushed after it
+    ledger.consume(user_id, 'chat', 3)
+    rows = ledger._claim_batch()
+    insert(rows)
+    ledger.invalidate(user_id, refetch=True)
+    ledger.get_daily_usage(user_id)
+    ledger._mark_flushed([r[0] for r in rows])
+    assert ledger.get_daily_usage(user_id) == 3
+
+    # Claimed before the baseline is read, inserted after it
+    ledger.consume(user_id, 'chat', 2)
+    rows = ledger._claim_batch()
+    ledger.invalidate(user_id, refetch=True)
+    ledger.get_daily_usage(user_id)
+    insert(rows)
+    ledger._mark_flushed([r[0] for r in rows])
+    assert ledger.get_daily_usage(user_id) == 5
+    print("✅ A flushed row is counted once whether its insert committed before or after the baseline read")
+
+
+def test_reconcile_after_crash(root=None):
+    root = root or tempfile.mkdtemp()
+    supabase = FakeSupabase()
+    db_path = os.path.join(root, 'crash.db')
+    ledger = CreditLedger(db_path, supabase=supabase)
+    user_id = str(uuid.uuid4())
+    for _ in range(3):
+        ledger.consume(user_id, 'chat', 2)
+
+    # Simulate a crash between the Supabase insert and marking the rows flushed
+    rows = ledger._claim_batch()
+    supabase.table('credit_usage').insert([{
+        'user_id': r[1], 'task_type': r[2], 'credits_consumed': r[3], 'date': r[4], 'timestamp': r[5]
+    } for r in rows[:2]]).execute()
+
+    restarted = CreditLedger(db_path, supabase=supabase)
+    assert restarted.reconcile()['matched'] == 2
+    assert restarted.flush() == 1 and len(supabase.records) == 3
+    print("✅ Rows inserted before a crash are matched on restart and not inserted twice")
+
+
+def test_fallback_import(root=None):
+    root = root or tempfile.mkdtemp()
+    fallback = os.path.join(root, 'credit_usage.json')
+    today = datetime.now().date().isoformat()
+    with open(fallback, 'w') as f:
+        json.dump({f"guest_{today}": 7}, f)
+
+    original = credit_ledger_module.FALLBACK_USAGE_FILE
+    credit_ledger_module.FALLBACK_USAGE_FILE = fallback
+    try:
+        ledger = CreditLedger(os.path.join(root, 'fallback.db'))
+        assert ledger.reconcile()['imported'] == 1
+        assert ledger.reconcile()['imported'] == 0
+        assert ledger.get_daily_usage('guest') == 7
+    finally:
+        credit_ledger_module.FALLBACK_USAGE_FILE = original
+    print("✅ Legacy fallback totals are imported into the journal exactly once")
+
+
+def run_tests():
+    print("=== Credit ledger tests ===")
+    root = tempfile.mkdtemp()
+    try:
+        test_allowance_under_concurrency(root)
+        test_batched_flush_and_retry(root)
+        test_baseline_read_during_flush(root)
+        test_reconcile_after_crash(root)
+        test_fallback_import(root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
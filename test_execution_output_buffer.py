@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test the bounded output buffers of the simple code executor.
+
+Runs a program that prints a million lines while a client polls for new output
+with since=offset, and compares that with appending every line to one string.
+Also checks the output stream, resume from Last-Event-ID, the same stream
+served by the async task stream server, stopping a run and eviction of
+finished runs.
+"""
+
+import os
+import sys
+import time
+import json
+import asyncio
+
+sys.path.append('.')
+
+import app.services.simple_code_executor as executor_module
+from app.services.simple_code_executor import SimpleCodeExecutor
+from app.services.output_buffer import MAX_OUTPUT_BYTES
+from app.services.task_stream_server import TaskStreamServer
+
+LINES = 1000000
+MILLION_LINES = f"for i in range({LINES}):\n    print(f'line {{i}} of the output')\n"
+EXPECTED_CHARS = sum(len(f'line {i} of the output\n') for i in range(LINES))
+
+
+def wait_until_finished(executor, project_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = executor.get_execution_status(project_id, since=10 ** 12)['status']['status']
+        if status in ('completed', 'error', 'stopped'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"{project_id} did not finish")
+
+
+def test_string_append_baseline():
+    timings = []
+    for lines in (10000, 20000, 40000):
+        entry = {'output': ''}
+        start = time.perf_counter()
+        for i in range(lines):
+            entry['output'] += f'line {i} of the output\n'
+        timings.append((lines, time.perf_counter() - start))
+    print("Appending to one string (previous approach): " +
+          ", ".join(f"{lines} lines {seconds:.2f}s" for lines, seconds in timings))
+    # Doubling the lines more than doubles the time
+    assert timings[-1][1] > 3 * timings[-2][1]
+
+
+def test_million_lines(executor):
+    result = executor.execute_project([{'name': 'main.py', 'content': MILLION_LINES}])
+    project_id = result['project_id']
+
+    start = time.perf_counter()
+    offset, polls, received, largest, truncated = 0, 0, 0, 0, 0
+    while True:
+        status = executor.get_execution_status(project_id, since=offset)['status']
+        polls += 1
+        received += len(status['output'])
+        largest = max(largest, len(status['output']))
+        truncated += status['truncated']
+        offset = status['offset']
+        if status['status'] in ('completed', 'error') and not status['output']:
+            break
+        time.sleep(0.2)
+    elapsed = time.perf_counter() - start
+
+    entry = executor.output_cache[project_id]
+    stats = entry['output'].get_stats()
+    assert entry['status'] == 'completed', executor.get_execution_status(project_id)['status']['output'][-500:]
+    assert stats['bytes_kept'] <= MAX_OUTPUT_BYTES
+    assert stats['characters'] > EXPECTED_CHARS
+    full = executor.get_execution_status(project_id)['status']['output']
+    assert full.startswith('[... ') and full.endswith("Execution completed successfully.\n")
+    assert f"line {LINES - 1} of the output\n" in full
+
+    print(f"✅ {LINES} lines ({stats['characters'] / 1e6:.1f} MB) ran and were polled in {elapsed:.1f}s; "
+          f"{polls} polls received {received / 1e6:.1f} MB in total, at most {largest / 1e6:.2f} MB each")
+    print(f"✅ The run kept {stats['bytes_kept'] / 1e6:.2f} MB of its output (cap {MAX_OUTPUT_BYTES / 1e6:.2f} MB); "
+          f"the poller missed {truncated} characters to truncation")
+
+
+def test_stream_and_resume(executor):
+    source = "import time\nfor i in range(5):\n    print('tick', i)\n    time.sleep(0.2)\n"
+    project_id = executor.execute_project([{'name': 'main.py', 'content': source}])['project_id']
+
+    events = []
+    event_id = None
+    for text in executor.iter_output_events(project_id, timeout=0.5):
+        if text.startswith('id: '):
+            event_id = text.split('\n', 1)[0][4:]
+            events.append((event_id, text))
+    output = ''.join(text for _, text in events)
+    assert all(f"tick {i}" in output for i in range(5)) and '"done": true' in events[-1][1]
+    assert len(events) < 12, len(events)
+
+    # A client reconnecting from the middle only gets what came after
+    middle = events[len(events) // 2][0]
+    resumed = ''.join(executor.iter_output_events(project_id, last_event_id=middle))
+    expected = executor.output_cache[project_id]['output'].read(int(middle))[0]
+    assert expected and expected.replace('\n', '\\n') in resumed
+    print(f"✅ Output streamed as {len(events)} events and a stream resumed from offset {middle}")
+
+
+async def read_async_stream(port, project_id, last_event_id=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    request = f"GET /api/agentic-code/status/{project_id} HTTP/1.1\r\nHost: localhost\r\n"
+    if last_event_id:
+        request += f"Last-Event-ID: {last_event_id}\r\n"
+    writer.write((request + "\r\n").encode())
+    body = (await asyncio.wait_for(reader.read(), 10)).decode()
+    writer.close()
+    events = []
+    for block in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if line.startswith(('id: ', 'data: ')))
+        if 'data' in fields:
+            events.append((fields.get('id'), json.loads(fields['data'])))
+    return events
+
+
+def test_async_stream(executor):
+    server = TaskStreamServer(host='127.0.0.1', port=0, heartbeat=0.3, executor=executor)
+    server.start_thread()
+    source = "import time\nfor i in range(5):\n    print('tick', i)\n    time.sleep(0.2)\n"
+    project_id = executor.execute_project([{'name': 'main.py', 'content': source}])['project_id']
+    threads = executor_module.threading.active_count()
+
+    events = asyncio.run(read_async_stream(server.port, project_id))
+    output = ''.join(data.get('output', '') for _, data in events)
+    assert all(f"tick {i}" in output for i in range(5)) and events[-1][1]['done'], events
+    assert executor_module.threading.active_count() <= threads
+
+    middle = events[len(events) // 2][0]
+    resumed = asyncio.run(read_async_stream(server.port, project_id, middle))
+    expected = executor.output_cache[project_id]['output'].read(int(middle))[0]
+    assert ''.join(data.get('output', '') for _, data in resumed) == expected
+    print(f"✅ The async stream server sent the output as {len(events)} events and resumed from offset {middle}")
+
+
+def test_stop(executor):
+    source = "import time\nprint('running')\nwhile True:\n    time.sleep(0.1)\n"
+    project_id = executor.execute_project([{'name': 'main.py', 'content': source}])['project_id']
+    while 'running' not in executor.get_execution_status(project_id)['status']['output']:
+        time.sleep(0.05)
+    assert executor.stop_execution(project_id)['success']
+    time.sleep(0.3)
+    status = executor.get_execution_status(project_id)['status']
+    assert status['status'] == 'stopped' and status['output'].endswith("Execution stopped by user.\n"), status
+    print("✅ A stopped run stays 'stopped' and its output is closed")
+
+
+def test_eviction(executor):
+    project_id = executor.execute_project([{'name': 'main.py', 'content': "print('hi')\n"}])['project_id']
+    assert wait_until_finished(executor, project_id) == 'completed'
+    project_dir = executor.project_dirs[project_id]
+
+    executor_module.OUTPUT_TTL = 0
+    executor_module.EVICTION_INTERVAL = 0
+    time.sleep(0.01)
+    assert executor.get_execution_status(project_id) == {'success': False, 'error': 'Project not found'}
+    assert project_id not in executor.project_dirs and not os.path.exists(project_dir)
+    print("✅ Finished runs past their TTL were evicted with their project directories")
+
+
+def run_tests():
+    print("=== Execution output buffer tests ===")
+    executor = SimpleCodeExecutor()
+    try:
+        test_string_append_baseline()
+        test_million_lines(executor)
+        test_stream_and_resume(executor)
+        test_async_stream(executor)
+        test_stop(executor)
+        test_eviction(executor)
+    finally:
+        executor.clean_up()
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-pass HTML extraction against the BeautifulSoup path.
+
+Loads every cached page from the cache/ directory (old flat <md5>.json files,
+sharded .json.z entries and the shared SQLite cache) and, for each page, times
+and measures peak memory of:
+  1. the previous path: BeautifulSoup(html, 'html.parser'), script/style removal,
+     get_text, image filtering, then analyze_page's forms/links/headings walks
+  2. extract_page() with each available backend
+"""
+
+import os
+import sys
+import json
+import zlib
+import glob
+import time
+import sqlite3
+import tracemalloc
+from urllib.parse import urljoin
+
+sys.path.append('.')
+
+from bs4 import BeautifulSoup
+from app.utils.html_extractor import extract_page, SELECTOLAX_AVAILABLE
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+
+def load_corpus():
+    """Collect (url, html) pairs from every cache layout."""
+    records = []
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.json')):
+        with open(path) as f:
+            records.append(json.load(f))
+    for path in glob.glob(os.path.join(CACHE_DIR, '*', '*', '*.json.z')):
+        with open(path, 'rb') as f:
+            records.append(json.loads(zlib.decompress(f.read())))
+    db_path = os.path.join(CACHE_DIR, 'shared_cache.db')
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        for (value,) in conn.execute("SELECT value FROM cache_entries WHERE namespace = 'page'"):
+            records.append(json.loads(zlib.decompress(value)))
+        conn.close()
+
+    pages = []
+    for record in records:
+        data = record.get('data') if isinstance(record, dict) else None
+        if isinstance(data, dict) and data.get('html'):
+            pages.append((data.get('url'), data['html']))
+    return pages
+
+
+def soup_path(url, html):
+    """The previous browse() + analyze_page() work for one page."""
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.string if soup.title else "No title"
+    for script in soup(["script", "style"]):
+        script.extract()
+    text = soup.get_text(separator=' ', strip=True)
+    images = [img.get('src') for img in soup.find_all('img', src=True)]
+    forms = [form.find_all(["input", "textarea", "select"]) for form in soup.find_all('form')]
+    links = [(link.get_text(strip=True), urljoin(url or '', link['href'])) for link in soup.find_all('a', href=True)]
+    headings = [heading.get_text(strip=True) for heading in soup.find_all(['h1', 'h2', 'h3'])]
+    return title, text, images, forms, links, headings
+
+
+def measure(name, func, pages):
+    """Time and measure peak traced memory of func over every page."""
+    total_time = 0.0
+    peak = 0
+    for url, html in pages:
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(url, html)
+        total_time += time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    print(f"{name:28s} total {total_time:7.2f}s  per page {total_time / len(pages) * 1000:7.1f} ms  "
+          f"max peak {peak / (1024 * 1024):7.1f} MB")
+    return total_time
+
+
+def run_benchmark():
+    pages = load_corpus()
+    if not pages:
+        print("No cached pages with HTML found in cache/")
+        return
+    total_bytes = sum(len(html) for _, html in pages)
+    print(f"=== {len(pages)} cached pages, {total_bytes / (1024 * 1024):.1f} MB of HTML ===")
+
+    baseline = measure("BeautifulSoup html.parser", soup_path, pages)
+    stdlib = measure("extract_page (stdlib)", lambda url, html: extract_page(html, url, backend='stdlib'), pages)
+    print(f"  speedup: {baseline / stdlib:.1f}x")
+    if SELECTOLAX_AVAILABLE:
+        fast = measure("extract_page (selectolax)", lambda url, html: extract_page(html, url, backend='selectolax'), pages)
+        print(f"  speedup: {baseline / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test the memory embedding pipeline against the local in-memory vector store.
+
+Runs without Qdrant Cloud. Uses the real all-MiniLM-L6-v2 model when
+sentence-transformers is installed, otherwise a deterministic hashing encoder.
+Checks store/flush/retrieve round trips, the embedding cache and that
+concurrent retrievals are coalesced into batched forward passes.
+"""
+
+import sys
+import time
+import hashlib
+import threading
+
+sys.path.append('.')
+
+from app.services.memory_service import MemoryService
+from app.services.embedding_pipeline import SENTENCE_TRANSFORMERS_AVAILABLE
+
+
+class HashingEncoder:
+    """Bag-of-words hashing encoder with the same output size as the real model."""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32):
+        self.calls += 1
+        time.sleep(self.delay)
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 384
+            for word in text.lower().split():
+                vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 384] += 1.0
+            vectors.append(vector)
+        return vectors
+
+
+def run_tests():
+    encoder = None if SENTENCE_TRANSFORMERS_AVAILABLE else HashingEncoder()
+    service = MemoryService(backend='local', encoder=encoder)
+    print(f"=== Memory pipeline test ({'all-MiniLM-L6-v2' if encoder is None else 'hashing encoder'}) ===")
+    assert service.is_available(), "memory service should be available with the local store"
+
+    memories = [
+        'User prefers window seats on morning flights',
+        'User writes Python with type hints and pytest',
+        'User likes minimalist blue and white designs',
+        'User books hotels near the city centre',
+    ]
+    start = time.perf_counter()
+    for content in memories:
+        assert service.store_memory('prime_agent', 'user_1', content, {'type': 'note'})
+    queued = time.perf_counter() - start
+    assert service.flush(timeout=120), "write-behind queue did not drain"
+    print(f"✅ Queued {len(memories)} memories in {queued * 1000:.1f} ms, "
+          f"written in {service.writer.upserts} upsert(s)")
+
+    results = service.retrieve_memories('prime_agent', 'user_1', 'window seats on morning flights', limit=2)
+    assert results and 'flights' in results[0]['content'], results
+    print(f"✅ Top match: {results[0]['content']} ({results[0]['score']:.3f})")
+    assert not service.retrieve_memories('prime_agent', 'user_2', 'window seats on morning flights')
+    print("✅ Results are filtered by user")
+
+    service.store_memory('global_user', 'user_1', 'Preferred currency', {'type': 'preference', 'preference_key': 'currency',
+                                                                    'preference_value': 'NGN'})
+    service.flush(timeout=60)
+    assert service.get_user_preferences('user_1') == {'currency': 'NGN'}
+    print("✅ Preferences read back from the local store")
+
+    # Concurrent retrievals of distinct queries share forward passes
+    batches_before = service.pipeline.batches
+    threads = [threading.Thread(target=service.retrieve_memories, args=('prime_agent', 'user_1', f'query number {i}'))
+               for i in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batches = service.pipeline.batches - batches_before
+    assert batches < 32, f"expected coalesced batches, got {batches}"
+    print(f"✅ 32 concurrent queries encoded in {batches} batch(es)")
+
+    hits_before = service.pipeline.cache_hits
+    service.retrieve_memories('prime_agent', 'user_1', 'window seats on morning flights')
+    assert service.pipeline.cache_hits == hits_before + 1
+    print("✅ Repeated query served from the embedding cache")
+
+    print(f"Stats: {service.get_stats()}")
+
+
+if __name__ == "__main__":
+    run_tests()
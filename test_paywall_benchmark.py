@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark paywall decorator overhead per request.
+
+Compares the previous per-request path of require_subscription and trial_limit
+(new SubscriptionService and Supabase client per call, then sequential
+user_subscriptions and subscription_plans queries) with the shared service,
+joined subscription+plan query and entitlement cache. Supabase is replaced by
+an in-process client that sleeps a configurable round trip per query so the
+numbers do not depend on network access.
+
+Environment:
+    PAYWALL_BENCH_REQUESTS  requests per scenario (default 200)
+    PAYWALL_BENCH_USERS     distinct users (default 20)
+    PAYWALL_BENCH_RTT_MS    simulated Supabase round trip (default 15)
+    PAYWALL_BENCH_CLIENT_MS simulated client construction cost (default 5)
+"""
+
+import os
+import sys
+import time
+
+sys.path.append('.')
+
+from flask import Flask, jsonify, session
+from app.decorators.paywall import require_subscription, trial_limit
+from app.services.subscription_service import get_subscription_service
+
+REQUESTS = int(os.getenv('PAYWALL_BENCH_REQUESTS', 200))
+USERS = int(os.getenv('PAYWALL_BENCH_USERS', 20))
+RTT = float(os.getenv('PAYWALL_BENCH_RTT_MS', 15)) / 1000
+CLIENT_SETUP = float(os.getenv('PAYWALL_BENCH_CLIENT_MS', 5)) / 1000
+
+PLAN = {
+    'id': 'plan-plus', 'plan_name': 'plus', 'display_name': 'Plus',
+    'monthly_price_usd': 19, 'annual_price_usd': 190, 'monthly_credits': 8000,
+    'features': {'prime_agent': True}, 'is_active': True
+}
+
+
+def subscription_row(user_id):
+    return {
+        'id': f'sub-{user_id}', 'user_id': user_id, 'plan_id': PLAN['id'], 'status': 'active',
+        'payment_gateway': 'paystack', 'gateway_subscription_id': None,
+        'current_period_start': '2026-01-01T00:00:00+00:00',
+        'current_period_end': '2027-01-01T00:00:00+00:00', 'cancel_at_period_end': False
+    }
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Enough of the postgrest query builder for the paywall queries."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.columns = '*'
+        self.filters = {}
+        self.single_row = False
+
+    def select(self, columns):
+        self.columns = columns
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def limit(self, count):
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def execute(self):
+        self.client.queries += 1
+        time.sleep(RTT)
+        if self.table == 'user_subscriptions':
+            row = subscription_row(self.filters['user_id'])
+            if 'subscription_plans' in self.columns:
+                row['subscription_plans'] = dict(PLAN)
+            rows = [row]
+        else:
+            rows = [dict(PLAN)]
+        return FakeResponse(rows[0] if self.single_row else rows)
+
+
+class FakeSupabase:
+    queries = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def create_fake_client(counter):
+    time.sleep(CLIENT_SETUP)
+    counter['clients'] += 1
+    return counter['client']
+
+
+def legacy_check(counter, user_id):
+    """The previous require_subscription/trial_limit work: new client, then two queries."""
+    client = create_fake_client(counter)
+    subscription = client.table('user_subscriptions').select('*').eq('user_id', user_id).eq('status', 'active').single().execute()
+    plan = client.table('subscription_plans').select('plan_name').eq('id', subscription.data['plan_id']).single().execute()
+    return plan.data['plan_name']
+
+
+def run(name, app, handler, counter):
+    client = counter['client']
+    start_queries = client.queries
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        with app.test_request_context('/'):
+            session['user_id'] = f'user-{i % USERS}'
+            handler()
+    elapsed = time.perf_counter() - start
+    print(f"{name:34s} {elapsed / REQUESTS * 1000:8.2f} ms/request  "
+          f"{(client.queries - start_queries) / REQUESTS:5.2f} queries/request")
+    return elapsed
+
+
+def run_benchmark():
+    app = Flask(__name__)
+    app.secret_key = 'benchmark'
+    counter = {'clients': 0, 'client': FakeSupabase()}
+
+    service = get_subscription_service()
+    service.supabase = counter['client']
+    service.use_supabase = True
+    service.invalidate_all()
+
+    def endpoint():
+        return jsonify({'ok': True})
+
+    def legacy_require_subscription():
+        legacy_check(counter, session['user_id'])
+        return endpoint()
+
+    print(f"=== {REQUESTS} requests, {USERS} users, {RTT * 1000:.0f} ms simulated round trip ===")
+    before = run("before: per-request client", app, legacy_require_subscription, counter)
+    after = run("after: require_subscription", app, require_subscription('plus')(endpoint), counter)
+    print(f"  speedup: {before / after:.1f}x")
+    trial = run("after: trial_limit (paid plan)", app, trial_limit('prime_agent', 5)(endpoint), counter)
+    print(f"  speedup: {before / trial:.1f}x")
+    print(f"entitlement cache: {service.get_cache_stats()}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark per-request rate limiting overhead.
+
+Replays the same request stream (many clients, a few endpoints, four tiers)
+through:
+  1. the previous fixed-window counters (formatted string keys in a nested
+     defaultdict, swept by splitting every key once it passes 10,000 entries)
+  2. the previous firewall check (rebuilding a deque of the last hour per request)
+  3. the GCRA engine's in-memory path
+and, when USE_REDIS_RATE_LIMIT=true and a server is reachable, the Lua path.
+"""
+
+import os
+import sys
+import time
+import random
+from collections import defaultdict, deque
+
+sys.path.append('.')
+
+from app.security.rate_limit_engine import GCRARateLimiter, get_rate_limit_engine
+
+NUM_REQUESTS = 100000
+# The fixed-window sweep rescans every key on each request once past 10,000 keys,
+# so it only replays a prefix of the stream
+LEGACY_REQUESTS = 20000
+NUM_CLIENTS = 5000
+ENDPOINTS = ['/api/prime-agent/execute-task', '/api/context7-tools/execute-task', '/api/memory/test', '/api/chat']
+LIMITS = {'per_second': 10, 'per_minute': 60, 'per_hour': 1000, 'per_day': 10000}
+
+
+class FixedWindowLimiter:
+    """The previous RateLimiter._check_memory_limit bookkeeping."""
+
+    def __init__(self):
+        # The original nested defaultdict(lambda: defaultdict(int)) raised TypeError on +=
+        self.request_counts = defaultdict(int)
+
+    def check(self, client_id, endpoint, limits):
+        now = time.time()
+        windows = {'second': int(now), 'minute': int(now // 60), 'hour': int(now // 3600), 'day': int(now // 86400)}
+        for period, limit in limits.items():
+            name = period.replace('per_', '')
+            window_key = f"{client_id}:{endpoint}:{name}:{windows[name]}"
+            self.request_counts[window_key] += 1
+            if self.request_counts[window_key] > limit:
+                return False
+        if len(self.request_counts) > 10000:
+            for key in list(self.request_counts):
+                parts = key.split(':')
+                if len(parts) >= 4 and parts[2] == 'second' and int(parts[3]) < windows['second'] - 60:
+                    del self.request_counts[key]
+        return True
+
+
+class DequeFirewall:
+    """The previous SecurityFirewall.check_rate_limits bookkeeping."""
+
+    def __init__(self):
+        self.request_history = defaultdict(lambda: deque(maxlen=100))
+
+    def check(self, ip_address):
+        current_time = time.time()
+        self.request_history[ip_address] = deque(
+            [t for t in self.request_history[ip_address] if current_time - t < 3600], maxlen=100)
+        self.request_history[ip_address].append(current_time)
+        recent = [t for t in self.request_history[ip_address] if current_time - t < 60]
+        return len(recent) <= 60 and len(self.request_history[ip_address]) <= 1000
+
+
+def run(name, func, stream, entries=None):
+    start = time.perf_counter()
+    for client_id, endpoint in stream:
+        func(client_id, endpoint)
+    elapsed = time.perf_counter() - start
+    extra = f"  live entries {entries():,}" if entries else ""
+    print(f"{name:32s} {elapsed / len(stream) * 1e6:7.2f} us/request{extra}")
+
+
+def run_benchmark():
+    random.seed(0)
+    stream = [(f"ip:10.0.{random.randrange(NUM_CLIENTS) // 256}.{random.randrange(256)}", random.choice(ENDPOINTS))
+              for _ in range(NUM_REQUESTS)]
+    print(f"=== {NUM_REQUESTS:,} requests, {NUM_CLIENTS:,} clients, {len(LIMITS)} tiers ===")
+
+    fixed = FixedWindowLimiter()
+    run("fixed window (previous)", lambda c, e: fixed.check(c, e, LIMITS), stream[:LEGACY_REQUESTS],
+        lambda: len(fixed.request_counts))
+
+    firewall = DequeFirewall()
+    run("firewall deque (previous)", lambda c, e: firewall.check(c), stream,
+        lambda: sum(len(d) for d in firewall.request_history.values()))
+
+    gcra = GCRARateLimiter()
+    run("GCRA in-memory", lambda c, e: gcra.check(c, e, LIMITS), stream, lambda: gcra.get_stats()['buckets'])
+    run("GCRA firewall tiers", lambda c, e: gcra.check(c, 'firewall', {'per_minute': 60, 'per_hour': 1000}), stream)
+
+    if os.getenv('USE_REDIS_RATE_LIMIT', 'false').lower() == 'true':
+        engine = get_rate_limit_engine()
+        if engine.redis_client is not None:
+            run("GCRA Redis Lua", lambda c, e: engine.check(c, e, LIMITS), stream[:20000])
+
+
+if __name__ == "__main__":
+    run_benchmark()
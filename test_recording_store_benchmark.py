@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark recording storage: PNG file per frame vs. the frame container.
+
+Writes a synthetic browsing session (idle page with a blinking caret, typing,
+scrolling) as a legacy recording of frame_N.png files, migrates it with the
+same code as migrate_recordings.py, and compares disk footprint and the latency
+of fetching the frame shown at a random time. Also checks that migrated frames
+match the originals and that the recorder's writer produces the same container.
+Requires Pillow. Runs against a temporary directory.
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.append('.')
+
+from PIL import Image, ImageDraw, ImageChops, ImageFont
+
+from app.visual_browser.recording_store import (
+    RecordingReader, RecordingWriter, migrate_recording, legacy_frame_files, has_container
+)
+
+WIDTH, HEIGHT = 1280, 800
+INTERVAL = 0.3
+SEEKS = 50
+
+
+def make_document(height=5000):
+    """A long page of anti-aliased text and photos, which PNG compresses poorly."""
+    rng = random.Random(3)
+    try:
+        font = ImageFont.load_default(size=15)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        font = ImageFont.load_default()
+    page = Image.new('RGB', (WIDTH, height), 'white')
+    draw = ImageDraw.Draw(page)
+    words = ['flight', 'hotel', 'booking', 'price', 'review', 'search', 'results', 'departure',
+             'arrival', 'available', 'rooms', 'per', 'night', 'from', 'the', 'best', 'deals']
+    y = 20
+    while y < height - 200:
+        if rng.random() < 0.15:
+            photo = Image.effect_noise((rng.randrange(300, 1100), 160), rng.randrange(20, 80))
+            tint = Image.new('RGB', photo.size, tuple(rng.randrange(60, 220) for _ in range(3)))
+            page.paste(Image.blend(photo.convert('RGB'), tint, 0.5), (40, y))
+            y += 180
+        else:
+            draw.text((40, y), ' '.join(rng.choice(words) for _ in range(18)), fill=(40, 40, 40), font=font)
+            y += 22
+    return page
+
+
+def session_frames():
+    """About 90 seconds of browsing: reading, typing into a form, scrolling."""
+    document = make_document()
+    offset = 0
+    typed = 0
+    for i in range(300):
+        phase = (i // 50) % 3
+        if phase == 1:
+            typed += 1
+        elif phase == 2:
+            offset = min(offset + 40, 4000)
+        frame = document.crop((0, offset, WIDTH, offset + HEIGHT))
+        draw = ImageDraw.Draw(frame)
+        draw.rectangle([300, 60, 300 + 9 * min(typed, 80), 74], fill=(20, 20, 120))
+        if i % 4 < 2:
+            draw.rectangle([300 + 9 * min(typed, 80), 58, 302 + 9 * min(typed, 80), 76], fill='black')
+        output = io.BytesIO()
+        frame.save(output, 'PNG')
+        yield output.getvalue()
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def legacy_frame_at(path, timestamp):
+    """The previous get_recording_frames path: list, sort, read one PNG."""
+    names = [f for f in os.listdir(path) if f.startswith('frame_') and f.endswith('.png')]
+    names.sort(key=lambda f: int(f.split('_')[1].split('.')[0]))
+    index = min(int(timestamp / INTERVAL), len(names) - 1)
+    with open(os.path.join(path, names[index]), 'rb') as f:
+        return f.read()
+
+
+def mean_difference(png_a, png_b):
+    a = Image.open(io.BytesIO(png_a)).convert('L')
+    b = Image.open(io.BytesIO(png_b)).convert('L')
+    histogram = ImageChops.difference(a, b).histogram()
+    return sum(value * count for value, count in enumerate(histogram)) / (a.width * a.height)
+
+
+def run_tests():
+    print("=== Recording storage benchmark ===")
+    frames = list(session_frames())
+    duration = len(frames) * INTERVAL
+    rng = random.Random(11)
+    seeks = [rng.uniform(0, duration) for _ in range(SEEKS)]
+
+    with tempfile.TemporaryDirectory() as root:
+        legacy = os.path.join(root, 'recording_1')
+        os.makedirs(legacy)
+        for i, png in enumerate(frames):
+            with open(os.path.join(legacy, f"frame_{i}.png"), 'wb') as f:
+                f.write(png)
+        legacy_size = directory_size(legacy)
+
+        start = time.perf_counter()
+        originals = [legacy_frame_at(legacy, t) for t in seeks]
+        legacy_seek = (time.perf_counter() - start) / SEEKS
+        print(f"PNG files:  {len(frames)} files, {legacy_size / 1024 / 1024:.2f} MB, "
+              f"{legacy_seek * 1000:.2f} ms per seek (raw PNG, no decode)")
+
+        start = time.perf_counter()
+        result = migrate_recording(legacy, interval=INTERVAL)
+        migrate_time = time.perf_counter() - start
+        assert result['success'] and has_container(legacy) and not legacy_frame_files(legacy)
+        container_size = directory_size(legacy)
+        print(f"Container:  {result['stored_frames']} stored frames, {container_size / 1024 / 1024:.2f} MB "
+              f"(migrated in {migrate_time:.1f}s)")
+
+        start = time.perf_counter()
+        fetched = [RecordingReader(legacy).frame_at(t) for t in seeks]
+        container_seek = (time.perf_counter() - start) / SEEKS
+        print(f"            {container_seek * 1000:.2f} ms per seek (index load, keyframe + deltas, PNG output)")
+
+        start = time.perf_counter()
+        for t in seeks:
+            RecordingReader(legacy).frame_at(t, image_format='jpeg')
+        jpeg_seek = (time.perf_counter() - start) / SEEKS
+        print(f"            {jpeg_seek * 1000:.2f} ms per seek with JPEG output")
+
+        reader = RecordingReader(legacy)
+        stats = reader.get_stats()
+        print(f"            {stats['keyframes']} keyframes, {len(reader) - stats['keyframes']} deltas")
+
+        assert container_size * 3 < legacy_size, "container should be much smaller"
+        print(f"✅ Disk footprint {legacy_size / container_size:.1f}x smaller")
+
+        # Frames fetched by time must show what the original frame showed
+        worst = max(mean_difference(original, image) for original, (_, _, image) in zip(originals, fetched))
+        assert worst < 3, worst
+        print(f"✅ Seeked frames match the originals (worst mean grey-level difference {worst:.2f})")
+
+        # The recorder's writer produces the same result as the migration
+        live = os.path.join(root, 'recording_2')
+        os.makedirs(live)
+        writer = RecordingWriter(live)
+        for i, png in enumerate(frames):
+            writer.add(png, i * INTERVAL)
+        writer.close()
+        assert len(RecordingReader(live)) == result['stored_frames']
+        print(f"✅ Live writer stored {writer.stored} of {writer.captured} captured frames")
+
+        _, timestamp, _ = RecordingReader(live).frame_at(duration / 2)
+        assert timestamp <= duration / 2
+        print(f"✅ Frame at {duration / 2:.1f}s is the one captured at {timestamp:.1f}s")
+
+
+if __name__ == "__main__":
+    run_tests()
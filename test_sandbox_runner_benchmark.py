@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark the sandbox runner against a fresh interpreter per run.
+
+Measures p50/p95 time to first output for hello-world, numpy, flask and Pillow
+projects, run the old way (a new sys.executable plus two reader threads per run)
+and forked from the pre-imported zygote. Projects whose library is not installed
+are skipped. Also checks the sandbox's limits, network policy, environment and
+timeout, and that concurrent runs share one output thread.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+import importlib.util
+
+sys.path.append('.')
+
+from app.services.sandbox_runner import SandboxRunner
+
+RUNS = 15
+
+PROJECTS = {
+    'hello': (None, "print('Hello, world!')\n"),
+    'numpy': ('numpy', "import numpy as np\nprint(np.arange(10).sum())\n"),
+    'flask': ('flask', "from flask import Flask\napp = Flask(__name__)\nprint('app ready', app.name)\n"),
+    'pillow': ('PIL', "from PIL import Image, ImageDraw\n"
+                      "image = Image.new('RGB', (64, 64))\nprint('image', image.size)\n"),
+}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[int(round((pct / 100.0) * (len(values) - 1)))]
+
+
+def write_project(root, name, source):
+    project_dir = os.path.join(root, name)
+    os.makedirs(project_dir, exist_ok=True)
+    main_file = os.path.join(project_dir, 'main.py')
+    with open(main_file, 'w') as f:
+        f.write(source)
+    return project_dir, main_file
+
+
+def fresh_interpreter_run(main_file, project_dir):
+    """The executors' previous approach: new interpreter, two reader threads."""
+    start = time.perf_counter()
+    first = []
+    process = subprocess.Popen([sys.executable, main_file], cwd=project_dir, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, bufsize=1,
+                               env=dict(os.environ, PYTHONUNBUFFERED='1'))
+
+    def read(pipe):
+        for _ in pipe:
+            if not first:
+                first.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=read, args=(pipe,)) for pipe in (process.stdout, process.stderr)]
+    for thread in threads:
+        thread.start()
+    process.wait()
+    for thread in threads:
+        thread.join()
+    return first[0]
+
+
+def sandbox_run(runner, main_file, project_dir):
+    start = time.perf_counter()
+    first = []
+    process = runner.start(main_file, project_dir,
+                           on_output=lambda stream, line: first or first.append(time.perf_counter() - start))
+    assert process.wait(30) == 0
+    return first[0]
+
+
+def test_time_to_first_output(runner, root):
+    print(f"{'project':<8} {'fresh p50':>10} {'fresh p95':>10} {'sandbox p50':>12} {'sandbox p95':>12}")
+    for name, (module, source) in PROJECTS.items():
+        if module and importlib.util.find_spec(module) is None:
+            print(f"{name:<8} skipped: {module} is not installed")
+            continue
+        project_dir, main_file = write_project(root, name, source)
+        fresh = [fresh_interpreter_run(main_file, project_dir) for _ in range(RUNS)]
+        sandbox = [sandbox_run(runner, main_file, project_dir) for _ in range(RUNS)]
+        print(f"{name:<8} {percentile(fresh, 50) * 1000:>8.1f}ms {percentile(fresh, 95) * 1000:>8.1f}ms "
+              f"{percentile(sandbox, 50) * 1000:>10.1f}ms {percentile(sandbox, 95) * 1000:>10.1f}ms")
+        assert percentile(sandbox, 50) < percentile(fresh, 50)
+    assert runner.get_stats()['spawned_runs'] == 0
+    print("✅ Runs forked from the zygote reached first output sooner for every project")
+
+
+def run_script(runner, root, name, source, timeout=None):
+    project_dir, main_file = write_project(root, name, source)
+    lines = []
+    process = runner.start(main_file, project_dir, on_output=lambda stream, line: lines.append(line), timeout=timeout)
+    process.wait(30)
+    return process, ''.join(lines)
+
+
+def test_sandboxing(runner, root):
+    os.environ['GEMINI_API_KEY'] = 'secret-key'
+    _, output = run_script(runner, root, 'env', "import os\nprint(os.environ.get('GEMINI_API_KEY'), os.getcwd())\n")
+    assert output.startswith('None ') and os.path.join(root, 'env') in output
+
+    _, output = run_script(runner, root, 'network', "import urllib.request\n"
+                           "try:\n    urllib.request.urlopen('http://example.com', timeout=2)\n"
+                           "except Exception as e:\n    print(type(e).__name__, e)\n")
+    assert 'disabled in the sandbox' in output, output
+
+    _, output = run_script(runner, root, 'loopback', "import socket\n"
+                           "try:\n    socket.create_connection(('127.0.0.1', 5000), timeout=2)\n"
+                           "except Exception as e:\n    print(type(e).__name__, e)\n")
+    assert 'disabled in the sandbox' in output, output
+
+    # Programs and native libraries would run outside the audit hook
+    for name, call in (('popen', "import subprocess\nsubprocess.run(['curl', 'http://example.com'])"),
+                       ('system', "import os\nos.system('curl http://example.com')"),
+                       ('execv', "import os\nos.execv('/bin/sh', ['sh'])"),
+                       ('ctypes', "import ctypes\nctypes.CDLL(None)")):
+        _, output = run_script(runner, root, name, "try:\n    " + call.replace('\n', '\n    ') +
+                               "\nexcept PermissionError as e:\n    print(e)\n")
+        assert 'disabled in the sandbox' in output, (name, output)
+
+    _, output = run_script(runner, root, 'memory', "try:\n    block = bytearray(4 * 1024 ** 3)\n"
+                           "except MemoryError:\n    print('MemoryError')\n")
+    assert 'MemoryError' in output, output
+
+    process, output = run_script(runner, root, 'filesize', "with open('big.bin', 'wb') as f:\n"
+                                 "    f.write(b'0' * 128 * 1024 * 1024)\n")
+    assert process.returncode != 0
+
+    process, output = run_script(runner, root, 'forever', "import time\nprint('started')\nwhile True:\n"
+                                 "    time.sleep(0.1)\n", timeout=1)
+    assert process.timed_out and process.returncode < 0 and output == 'started\n'
+    print("✅ Runs had no app secrets, no network, no subprocesses or ctypes, capped memory and file size, "
+          "and were killed at their timeout")
+
+
+def test_shared_output_thread(runner, root):
+    project_dir, main_file = write_project(root, 'sleepy', "import time\nprint('up')\ntime.sleep(1)\nprint('done')\n")
+    before = threading.active_count()
+    processes = [runner.start(main_file, project_dir) for _ in range(20)]
+    time.sleep(0.5)
+    during = threading.active_count()
+    for process in processes:
+        assert process.wait(10) == 0
+    assert during == before, (before, during)
+    print(f"✅ 20 concurrent runs added {during - before} threads (two reader threads each would add 40)")
+
+
+def run_tests():
+    print("=== Sandbox runner benchmark ===")
+    root = tempfile.mkdtemp()
+    runner = SandboxRunner(memory_mb=1024, file_size_mb=16)
+    try:
+        assert runner.start_zygote()
+        print(f"Zygote preloaded: {', '.join(runner.preloaded) or 'nothing'}")
+        test_time_to_first_output(runner, root)
+        test_sandboxing(runner, root)
+        test_shared_output_thread(runner, root)
+    finally:
+        runner.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Benchmark the delta-encoded screen stream against full-frame broadcasts.
+
+Renders a synthetic 1280x800 page and streams it to in-process websocket
+clients on a dedicated event loop, as the screen recorder's websocket server
+does. Compares bytes per second and CPU per client with the previous protocol
+(a base64 PNG in a JSON message for every capture) for an idle page with a
+blinking caret and for a page scrolling continuously, and checks that a slow
+client drops deltas and resyncs with keyframes without slowing a fast one.
+Requires Pillow.
+"""
+
+import io
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import threading
+
+sys.path.append('.')
+
+from PIL import Image, ImageDraw
+
+from app.visual_browser.frame_stream import FrameStreamer, FrameDeltaEncoder, HEADER, KEYFRAME, MAGIC
+
+WIDTH, HEIGHT = 1280, 800
+FRAMES = 40
+CAPTURE_INTERVAL = 0.3  # the recorder's default 300 ms
+
+
+def make_document(height=6000):
+    """A long page of text-like lines, cards and images."""
+    rng = random.Random(7)
+    page = Image.new('RGB', (WIDTH, height), 'white')
+    draw = ImageDraw.Draw(page)
+    y = 20
+    while y < height - 200:
+        if rng.random() < 0.15:
+            colour = tuple(rng.randrange(60, 220) for _ in range(3))
+            draw.rectangle([40, y, 40 + rng.randrange(300, 1100), y + 160], fill=colour)
+            y += 180
+        else:
+            x = 40
+            while x < WIDTH - 120:
+                word = rng.randrange(20, 90)
+                draw.rectangle([x, y, x + word, y + 10], fill=(40, 40, 40))
+                x += word + 10
+            y += 22
+    return page
+
+
+def render(document, offset, caret_on):
+    frame = document.crop((0, offset, WIDTH, offset + HEIGHT))
+    if caret_on:
+        ImageDraw.Draw(frame).rectangle([600, 400, 602, 420], fill='black')
+    output = io.BytesIO()
+    frame.save(output, 'PNG', compress_level=1)
+    return output.getvalue()
+
+
+class FakeWebSocket:
+    """Counts what the streamer sends; a closed gate holds sends like a stalled connection."""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.bytes = 0
+        self.messages = 0
+        self.keyframes = 0
+
+    async def send(self, message):
+        while self.gate is not None and not self.gate.is_set():
+            await asyncio.sleep(0.01)
+        self.messages += 1
+        self.bytes += len(message)
+        if isinstance(message, bytes) and message[:4] == MAGIC and HEADER.unpack_from(message)[1] == KEYFRAME:
+            self.keyframes += 1
+
+
+class ServerLoop:
+    """An event loop on its own thread, standing in for the websocket server."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def call(self, func):
+        async def run():
+            return func()
+        return asyncio.run_coroutine_threadsafe(run(), self.loop).result()
+
+    def drain(self):
+        for _ in range(3):
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0), self.loop).result()
+
+
+def legacy_cost(frames, clients):
+    """Bytes per client and CPU of the previous JSON/base64 broadcast of every capture."""
+    start = time.process_time()
+    sent = 0
+    for png in frames:
+        for _ in range(clients):
+            message = json.dumps({'type': 'screenshot', 'data': base64.b64encode(png).decode('utf-8'),
+                                  'timestamp': time.time(), 'url': 'https://example.com'})
+            sent += len(message)
+    return sent / clients, time.process_time() - start
+
+
+def stream_cost(server, frames, clients):
+    """Bytes per client, CPU and simulated duration of the delta stream."""
+    streamer = FrameStreamer(FrameDeltaEncoder())
+    sockets = [FakeWebSocket() for _ in range(clients)]
+    for socket in sockets:
+        server.call(lambda socket=socket: streamer.add_client(socket))
+
+    elapsed = 0.0
+    start = time.process_time()
+    for png in frames:
+        streamer.publish(png, url='https://example.com')
+        server.drain()
+        elapsed += streamer.next_interval(CAPTURE_INTERVAL)
+    cpu = time.process_time() - start
+    for socket in sockets:
+        server.call(lambda socket=socket: streamer.remove_client(socket))
+    server.drain()
+    return sum(s.bytes for s in sockets) / clients, cpu, elapsed, streamer
+
+
+def run_scenario(server, name, frames, clients=4):
+    legacy_bytes, legacy_cpu = legacy_cost(frames, clients)
+    legacy_seconds = len(frames) * CAPTURE_INTERVAL
+    stream_bytes, stream_cpu, stream_seconds, streamer = stream_cost(server, frames, clients)
+    print(f"--- {name}: {len(frames)} captures, {clients} clients ---")
+    print(f"  full frames: {legacy_bytes / legacy_seconds / 1024:8.1f} KiB/s per client, "
+          f"{legacy_cpu / len(frames) / clients * 1000:6.2f} ms CPU per frame per client")
+    print(f"  delta stream: {stream_bytes / stream_seconds / 1024:7.1f} KiB/s per client, "
+          f"{stream_cpu / len(frames) / clients * 1000:6.2f} ms CPU per frame per client "
+          f"({streamer.published} sent, {streamer.skipped} skipped, quality {streamer.encoder.quality}, "
+          f"{stream_seconds:.1f}s simulated)")
+    return legacy_bytes / legacy_seconds, stream_bytes / stream_seconds
+
+
+def run_tests():
+    print("=== Screen stream benchmark ===")
+    document = make_document()
+    server = ServerLoop()
+
+    idle = [render(document, 0, i % 4 < 2) for i in range(FRAMES)]
+    legacy_rate, stream_rate = run_scenario(server, "Idle page with blinking caret", idle)
+    assert stream_rate * 20 < legacy_rate
+    print(f"✅ Idle page uses {legacy_rate / stream_rate:.0f}x less bandwidth")
+
+    scrolling = [render(document, min(i * 60, 5000), False) for i in range(FRAMES)]
+    legacy_rate, stream_rate = run_scenario(server, "Scrolling page", scrolling)
+    assert stream_rate < legacy_rate
+    print(f"✅ Scrolling page uses {legacy_rate / stream_rate:.1f}x less bandwidth")
+
+    # A slow client must not hold back a fast one. The slow client is stalled until every
+    # frame is published rather than given a fixed delay, so the outcome does not depend on load
+    streamer = FrameStreamer(FrameDeltaEncoder(), max_backlog=2)
+    stalled = threading.Event()
+    fast, slow = FakeWebSocket(), FakeWebSocket(gate=stalled)
+    server.call(lambda: streamer.add_client(fast))
+    server.call(lambda: streamer.add_client(slow))
+    for png in scrolling[:20]:
+        streamer.publish(png)
+        server.drain()
+    stalled.set()
+    time.sleep(0.5)
+    server.drain()
+    streamer.next_interval(CAPTURE_INTERVAL)
+    stats = streamer.get_stats()
+    assert fast.messages > slow.messages and stats['clients'][1]['dropped'] > 0 and slow.keyframes > 1
+    print(f"✅ Fast client received {fast.messages} messages; slow client {slow.messages} "
+          f"({slow.keyframes} keyframes, {stats['clients'][1]['dropped']} deltas dropped), "
+          f"quality lowered to {stats['quality']}")
+
+    # A client connecting to an idle page gets a keyframe without waiting for a change
+    late = FakeWebSocket()
+    server.call(lambda: streamer.add_client(late))
+    streamer.publish(scrolling[19])
+    server.drain()
+    deadline = time.time() + 5
+    while not late.keyframes and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.2)
+    assert late.keyframes == 1, late.keyframes
+    print("✅ Late client started from a keyframe of the unchanged page")
+
+    for socket in (fast, slow, late):
+        server.call(lambda socket=socket: streamer.remove_client(socket))
+    server.drain()
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark the screenshot service pipeline against the previous inline capture.
+
+A fake browser returns 1920x1080 PNG screenshots of a changing page after a
+simulated WebDriver round trip. The previous service wrote each PNG to
+static/screenshots, reopened it, resized it and rewrote it on the capture thread; this measures how long that held the capture loop, then
+runs the service with its capture thread, encoder pool and ring buffer at a capture
+interval the encoders cannot keep up with, and checks that it drops old frames
+instead of falling behind. Requires Pillow. Runs against a temporary directory.
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.append('.')
+
+from PIL import Image, ImageDraw
+
+from app.visual_browser.screenshot_service import ScreenshotService
+
+WIDTH, HEIGHT = 1920, 1080
+FRAMES = 30
+DRIVER_DELAY = 0.03  # WebDriver round trip for a screenshot
+
+
+def make_screenshots(count):
+    rng = random.Random(5)
+    base = Image.effect_noise((WIDTH, HEIGHT), 40).convert('RGB')
+    shots = []
+    for i in range(count):
+        frame = base.copy()
+        draw = ImageDraw.Draw(frame)
+        for _ in range(20):
+            x, y = rng.randrange(WIDTH - 200), rng.randrange(HEIGHT - 40)
+            draw.rectangle([x, y, x + 200, y + 40], fill=tuple(rng.randrange(256) for _ in range(3)))
+        output = io.BytesIO()
+        frame.save(output, 'PNG', compress_level=1)
+        shots.append(output.getvalue())
+    return shots
+
+
+class FakeDriver:
+    def __init__(self, shots):
+        self.shots = shots
+        self.calls = 0
+
+    def get_screenshot_as_png(self):
+        time.sleep(DRIVER_DELAY)
+        png = self.shots[self.calls % len(self.shots)]
+        self.calls += 1
+        return png
+
+
+class FakeBrowser:
+    def __init__(self, shots):
+        self.is_running = True
+        self.driver = FakeDriver(shots)
+        self.current_screenshot = None
+
+
+def legacy_capture(browser, directory, max_width=1280):
+    """The previous _take_screenshot and _optimize_image."""
+    filepath = os.path.join(directory, f"screenshot_{time.time_ns()}.png")
+    with open(filepath, 'wb') as f:
+        f.write(browser.driver.get_screenshot_as_png())
+    img = Image.open(filepath)
+    if img.width > max_width:
+        ratio = max_width / img.width
+        img = img.resize((max_width, int(img.height * ratio)), Image.LANCZOS)
+    img.save(filepath, optimize=True, quality=85)
+
+
+def run_tests():
+    print("=== Screenshot pipeline benchmark ===")
+    shots = make_screenshots(6)
+    png_size = sum(len(s) for s in shots) / len(shots)
+
+    with tempfile.TemporaryDirectory() as directory:
+        browser = FakeBrowser(shots)
+        start = time.perf_counter()
+        for _ in range(FRAMES):
+            legacy_capture(browser, directory)
+        legacy = (time.perf_counter() - start) / FRAMES
+        print(f"Inline capture:   {legacy * 1000:7.1f} ms on the capture thread per frame "
+              f"(max {1 / legacy:.1f} captures/s)")
+
+    browser = FakeBrowser(shots)
+    service = ScreenshotService(browser, encode_workers=2, queue_size=2, ring_size=10, persist=False)
+    # Capture faster than two encoders can keep up with
+    service.screenshot_interval = 0.01
+    service.start()
+    time.sleep(legacy * FRAMES / 2)
+    service.stop()
+
+    stats = service.get_stats()
+    capture = stats['capture_latency']
+    encode = stats['encode_latency']
+    print(f"Pipeline capture: {capture['avg_ms']:7.1f} ms avg on the capture thread, "
+          f"{stats['captured']} captured in {legacy * FRAMES / 2:.1f}s")
+    print(f"         encode:  {encode['avg_ms']:7.1f} ms avg, {encode['p95_ms']:.1f} ms p95 on "
+          f"{service.encode_workers} workers; queue wait {stats['queue_latency']['p95_ms']:.1f} ms p95")
+    print(f"         frames:  {stats['encoded']} encoded, {stats['dropped']} dropped, "
+          f"{stats['stale']} stale, {stats['buffered']} buffered")
+
+    assert capture['avg_ms'] * 3 < legacy * 1000, "capture thread should not encode"
+    print(f"✅ Capture thread {legacy * 1000 / capture['avg_ms']:.0f}x less busy per frame")
+
+    assert stats['dropped'] > 0 and stats['queued'] <= 2
+    assert stats['queue_latency']['p95_ms'] < encode['p95_ms'] * 3, "queue should stay short"
+    print("✅ Encoders fell behind and old frames were dropped instead of queued")
+
+    frame = service.get_frame()
+    assert frame.sequence == stats['latest_sequence'] and browser.current_screenshot == frame.url
+    assert frame.width == 1280 and frame.mimetype == 'image/jpeg'
+    assert service.get_frame(frame.sequence) is frame
+    print(f"✅ Latest frame #{frame.sequence} served from memory: {len(frame.data) / 1024:.0f} KiB JPEG "
+          f"vs {png_size / 1024:.0f} KiB PNG captured")
+
+    # Persisted files are bounded by the retention policy
+    with tempfile.TemporaryDirectory() as directory:
+        service = ScreenshotService(FakeBrowser(shots), encode_workers=1, persist=True, retention_count=3)
+        service.screenshots_dir = directory
+        for _ in range(6):
+            assert service.take_screenshot_now()
+        files = os.listdir(directory)
+        assert len(files) == 3, files
+        print(f"✅ Retention kept {len(files)} of 6 persisted screenshots")
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark the screenshot store against inlined base64 screenshots.
+
+Builds the visual gallery of a Context 7 task both ways (legacy
+<img src="data:image/png;base64,..."> and store URLs) and compares the size of
+the SSE event carrying the task summary and the memory held by retained task
+summaries. Also checks deduplication of identical frames, the served file names
+and TTL cleanup. Runs against a temporary directory.
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import base64
+import random
+import struct
+import tempfile
+import tracemalloc
+
+sys.path.append('.')
+
+from app.services.screenshot_store import ScreenshotStore, PIL_AVAILABLE
+
+WIDTH, HEIGHT = 1280, 800
+FRAMES = 12
+TASKS = 20
+
+
+def make_png(seed):
+    """A noisy 1280x800 PNG, roughly as incompressible as a real page screenshot."""
+    rng = random.Random(seed)
+    rows = []
+    for y in range(HEIGHT):
+        band = (y // 40 + seed) % 7
+        row = bytearray([0])
+        for x in range(0, WIDTH, 8):
+            shade = 200 + band * 7 if rng.random() < 0.9 else rng.randrange(256)
+            row.extend(bytes([shade, (shade - band) % 256, 255 - shade]) * 8)
+        rows.append(bytes(row))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', WIDTH, HEIGHT, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + chunk(b'IEND', b''))
+
+
+def legacy_gallery(frames):
+    html = "\n\n### 📸 Visual Gallery\n\n"
+    for i, frame in enumerate(frames):
+        html += f"""
+#### 📸 Site - Section {i}
+*Additional content (scroll view {i})*
+
+<img src="data:image/png;base64,{base64.b64encode(frame).decode()}" style="max-width: 100%;" />
+
+"""
+    return html
+
+
+def store_gallery(stored):
+    html = "\n\n### 📸 Visual Gallery\n\n"
+    for i, item in enumerate(stored):
+        html += f"""
+#### 📸 Site - Section {i}
+*Additional content (scroll view {i})*
+
+<a href="{item.url}" target="_blank"><img src="{item.url}" loading="lazy" style="max-width: 100%;" /></a>
+
+"""
+    return html
+
+
+def sse_size(summary):
+    return len(f"data: {json.dumps({'status': 'complete', 'task_summary': summary})}\n\n".encode())
+
+
+def retained_bytes(build_summary):
+    tracemalloc.start()
+    tasks = {f"task_{i}": {'task_summary': build_summary()} for i in range(TASKS)}
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tasks
+    return current
+
+
+def run_tests():
+    print(f"=== Screenshot store benchmark ({'Pillow WebP' if PIL_AVAILABLE else 'PNG passthrough'}) ===")
+    # The last two scroll positions are identical, as at the bottom of a page
+    pngs = [make_png(i) for i in range(FRAMES - 2)]
+    pngs += [pngs[-1], pngs[-1]]
+    data_urls = [f"data:image/png;base64,{base64.b64encode(png).decode()}" for png in pngs]
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ScreenshotStore(root, ttl=3600)
+        start = time.perf_counter()
+        stored = [store.put(url) for url in data_urls]
+        elapsed = time.perf_counter() - start
+        assert all(stored)
+        assert stored[-1].deduplicated and stored[-1].digest == stored[-3].digest
+        assert store.stored == FRAMES - 2 and store.deduplicated == 2
+        print(f"✅ Stored {FRAMES} frames in {elapsed * 1000:.0f} ms; "
+              f"{store.deduplicated} duplicates reused, {len(os.listdir(root))} files on disk")
+
+        assert store.get_path(stored[0].filename) == stored[0].path
+        assert store.get_path(stored[0].thumbnail)
+        assert store.get_path('../../etc/passwd') is None
+        print(f"✅ Served as {stored[0].url} (thumbnail {stored[0].thumbnail_url})")
+
+        legacy = legacy_gallery(pngs)
+        unique = [item for i, item in enumerate(stored) if item.digest not in {s.digest for s in stored[:i]}]
+        current = store_gallery(unique)
+        legacy_sse, current_sse = sse_size(legacy), sse_size(current)
+        print(f"✅ SSE summary event: {legacy_sse / 1024:.0f} KiB inlined -> {current_sse / 1024:.1f} KiB with URLs "
+              f"({legacy_sse / current_sse:.0f}x smaller)")
+
+        legacy_mem = retained_bytes(lambda: legacy_gallery(pngs))
+        current_mem = retained_bytes(lambda: store_gallery(unique))
+        print(f"✅ {TASKS} retained task summaries: {legacy_mem / 1024 / 1024:.1f} MiB inlined -> "
+              f"{current_mem / 1024:.0f} KiB with URLs")
+        assert current_sse * 20 < legacy_sse
+
+        disk = sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root))
+        print(f"✅ Disk: {disk / 1024:.0f} KiB for {sum(len(p) for p in pngs) / 1024:.0f} KiB of PNG frames")
+
+        # Expire everything
+        past = time.time() - 7200
+        for name in os.listdir(root):
+            os.utime(os.path.join(root, name), (past, past))
+        removed = store.cleanup()
+        assert not os.listdir(root) and removed > 0
+        assert store.get_path(stored[0].filename) is None
+        print(f"✅ TTL cleanup removed {removed} files")
+
+        again = store.put(data_urls[0])
+        assert again and not again.deduplicated and os.path.exists(again.path)
+        print("✅ Expired screenshot is rewritten when stored again")
+
+    print(f"Stats: {store.get_stats()}")
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test the visual browser session governor.
+
+Checks that idle browsers are reaped at their deadline rather than on the next
+60-second scan, that the browser cap evicts the least recently used idle
+session and never a busy one, that bloated browsers are recycled and the total
+memory budget is kept, and measures the cost of recording activity and reaping
+with 10,000 sessions.
+"""
+
+import sys
+import time
+import threading
+
+sys.path.append('.')
+
+from app.visual_browser.session_governor import SessionGovernor, SessionLimitExceeded
+
+
+class Recorder:
+    def __init__(self):
+        self.evicted = []
+        self.times = {}
+        self.memory = {}
+
+    def evict(self, session_id, reason):
+        self.evicted.append((session_id, reason))
+        self.times[session_id] = time.monotonic()
+
+    def probe(self, session_id):
+        return self.memory.get(session_id)
+
+
+def test_idle_reaping():
+    recorder = Recorder()
+    governor = SessionGovernor(recorder.evict, idle_timeout=0.3, max_browsers=100, sample_interval=60)
+    governor.start()
+    started = time.monotonic()
+    for i in range(5):
+        governor.admit(f"s{i}")
+    time.sleep(0.15)
+    governor.touch('s0')
+    touched = time.monotonic()
+    time.sleep(0.5)
+    governor.close()
+
+    late = max(recorder.times[f"s{i}"] - started - 0.3 for i in range(1, 5))
+    assert sorted(recorder.evicted)[1:] == [(f"s{i}", 'idle') for i in range(1, 5)]
+    assert recorder.times['s0'] - touched >= 0.3
+    assert late < 0.05, late
+    print(f"✅ Idle browsers reaped at most {late * 1000:.0f} ms after their deadline; activity postponed s0")
+
+
+def test_lru_cap():
+    recorder = Recorder()
+    governor = SessionGovernor(recorder.evict, idle_timeout=60, max_browsers=3, sample_interval=60)
+    for name in ('a', 'b', 'c'):
+        governor.admit(name)
+    governor.touch('a')
+    governor.begin('b')  # b is running a command
+    governor.admit('d')
+    assert recorder.evicted == [('c', 'lru')], recorder.evicted
+    governor.begin('a')
+    governor.begin('d')
+    try:
+        governor.admit('e')
+        assert False, "every browser is busy"
+    except SessionLimitExceeded:
+        pass
+    governor.end('b')
+    governor.admit('e')
+    assert recorder.evicted[-1] == ('b', 'lru')
+    stats = governor.get_stats()
+    assert stats['sessions'] == 3 and stats['evictions'] == {'lru': 2}
+    print(f"✅ Browser cap evicted least recently used idle sessions {[s for s, _ in recorder.evicted]}, "
+          "skipped busy ones and refused when all were busy")
+
+
+def test_memory_caps():
+    recorder = Recorder()
+    governor = SessionGovernor(recorder.evict, memory_probe=recorder.probe, idle_timeout=60, max_browsers=10,
+                               max_session_memory_mb=800, max_total_memory_mb=1700, sample_interval=0.1)
+    recorder.memory = {'old': 400, 'mid': 350, 'new': 300, 'fat': 900, 'busy': 850}
+    for name in ('old', 'fat', 'mid', 'busy', 'new'):
+        governor.admit(name)
+    governor.begin('busy')
+    governor.start()
+    time.sleep(0.3)
+    governor.close()
+    reasons = dict(recorder.evicted)
+    assert reasons.get('fat') == 'memory' and 'busy' not in reasons, reasons
+    assert reasons.get('old') == 'total_memory' and 'new' not in reasons, reasons
+    history = governor.get_stats()['history']
+    assert {h['session_id']: h['memory_mb'] for h in history}['fat'] == 900
+    print(f"✅ Recycled the 900 MB browser and evicted {[s for s, r in recorder.evicted if r == 'total_memory']} "
+          "to fit the total budget; busy browser left alone")
+
+
+def test_scale():
+    sessions = 10000
+    recorder = Recorder()
+    governor = SessionGovernor(recorder.evict, idle_timeout=0.5, max_browsers=sessions, sample_interval=60)
+    for i in range(sessions):
+        governor.admit(f"s{i}")
+
+    start = time.perf_counter()
+    for i in range(sessions * 5):
+        governor.touch(f"s{i % sessions}")
+    touch = (time.perf_counter() - start) / (sessions * 5)
+
+    # The previous cleanup thread scanned every session each pass
+    activity = {f"s{i}": time.time() for i in range(sessions)}
+    start = time.perf_counter()
+    for _ in range(10):
+        [s for s, t in activity.items() if time.time() - t > 1800]
+    scan = (time.perf_counter() - start) / 10
+
+    governor.start()
+    deadline = time.monotonic() + 10
+    while len(recorder.evicted) < sessions and time.monotonic() < deadline:
+        time.sleep(0.05)
+    governor.close()
+    assert len(recorder.evicted) == sessions
+    stats = governor.get_stats()
+    assert stats['sessions'] == 0 and len(governor._deadlines) <= 2 * sessions + 16
+    print(f"✅ {sessions} sessions: {touch * 1e6:.1f} µs per activity update, all reaped by the reaper thread; "
+          f"a full scan took {scan * 1000:.1f} ms per pass")
+
+
+def test_concurrent_admits():
+    recorder = Recorder()
+    governor = SessionGovernor(recorder.evict, idle_timeout=60, max_browsers=4, sample_interval=60)
+    errors = []
+
+    def client(i):
+        try:
+            governor.admit(f"c{i}")
+        except SessionLimitExceeded as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert governor.get_stats()['sessions'] == 4 and not errors
+    assert len(recorder.evicted) == 36 and len(set(recorder.evicted)) == 36
+    print("✅ 40 concurrent sessions never exceeded the cap of 4 browsers")
+
+
+def run_tests():
+    print("=== Session governor tests ===")
+    test_idle_reaping()
+    test_lru_cap()
+    test_memory_caps()
+    test_concurrent_admits()
+    test_scale()
+
+
+if __name__ == "__main__":
+    run_tests()
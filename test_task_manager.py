@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test the Prime Agent task manager.
+
+Checks that finished tasks are evicted by TTL and by the in-memory limit while
+running tasks are only evicted once stale, that evicted tasks stay readable from the SQLite
+store, that a second manager sharing the store sees another worker's tasks,
+and that the store sweep keeps unfinished tasks until they go stale.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.append('.')
+
+from app.prime_agent.task_manager import TaskManager, SQLiteTaskStore
+
+
+def test_running_tasks_survive_size_limit():
+    manager = TaskManager(max_tasks=3, max_workers=1)
+    running = [manager.create_task(f"running {i}") for i in range(5)]
+    assert len(manager.tasks) == 5, "running tasks must not be evicted to meet max_tasks"
+
+    for task_id in running:
+        assert manager.update_task_progress(task_id, "thinking", "Still working")
+    assert manager.complete_task(running[0], {"success": True})
+    assert manager.complete_task(running[1], {"success": True})
+
+    # The next create sweeps: only the two finished tasks can go
+    newest = manager.create_task("newest")
+    assert running[0] not in manager.tasks and running[1] not in manager.tasks
+    assert all(task_id in manager.tasks for task_id in running[2:] + [newest])
+    assert manager.get_task_status(running[0]) is None
+    print("✅ The size limit evicts finished tasks only; running tasks keep receiving updates")
+
+
+def test_running_tasks_survive_ttl():
+    manager = TaskManager(ttl=0.2, max_workers=1, sweep_interval=0)
+    quiet = manager.create_task("long running, no progress")
+    finished = manager.create_task("finished")
+    manager.complete_task(finished, {"success": True})
+    time.sleep(0.3)
+
+    manager.create_task("trigger a sweep")
+    assert finished not in manager.tasks
+    assert quiet in manager.tasks
+    assert manager.update_task_progress(quiet, "thinking", "Finally some progress")
+    assert manager.complete_task(quiet, {"success": True})
+    assert manager.get_task_result(quiet) == {"success": True}
+    print("✅ The TTL evicts finished tasks only; a quiet running task can still complete")
+
+
+def test_stale_tasks_evicted():
+    manager = TaskManager(ttl=0.2, stale_ttl=0.5, max_workers=1, sweep_interval=0)
+    orphaned = manager.create_task("worker crashed")
+    time.sleep(0.3)
+    active = manager.create_task("still reporting")
+    assert orphaned in manager.tasks
+    time.sleep(0.3)
+    manager.update_task_progress(active, "thinking", "Still working")
+
+    manager.create_task("trigger a sweep")
+    assert orphaned not in manager.tasks
+    assert active in manager.tasks
+    print("✅ A running task with no update for stale_ttl is evicted; active ones stay")
+
+
+def test_persistence(root=None):
+    root = root or tempfile.mkdtemp()
+    db_path = os.path.join(root, 'tasks.db')
+    manager = TaskManager(max_tasks=1, max_workers=1, db_path=db_path)
+    first = manager.create_task("persisted")
+    manager.update_task_progress(first, "thinking", "Step 1")
+    manager.complete_task(first, {"success": True, "answer": 42})
+    manager.create_task("pushes the first one out of memory")
+    assert first not in manager.tasks
+
+    assert manager.get_task_status(first) == "complete"
+    assert manager.get_task_result(first) == {"success": True, "answer": 42}
+    assert [item["message"] for item in manager.get_task_progress(first)] == ["Step 1", "Task completed"]
+
+    # Another worker sharing the database sees the task and its progress
+    other = TaskManager(max_workers=1, db_path=db_path, remote_poll_interval=0.05)
+    progress, status = other.wait_for_progress(first, since=1, timeout=1)
+    assert status == "complete" and [item["message"] for item in progress] == ["Task completed"]
+    print("✅ Evicted tasks are read back from SQLite, including from a second manager")
+
+
+def test_store_sweep(root=None):
+    root = root or tempfile.mkdtemp()
+    store = SQLiteTaskStore(os.path.join(root, 'sweep.db'))
+    old = time.time() - 100
+    for task_id, status in (("done", "complete"), ("failed", "error"), ("running", "thinking")):
+        store.insert_task(task_id, {"task": task_id, "use_visual_browser": False, "status": status,
+                                    "created_at": old, "updated_at": old})
+
+    assert store.sweep(ttl=10) == 2
+    assert store.get_summary("running") is not None
+    assert store.sweep(ttl=10, stale_ttl=1000) == 0
+    assert store.sweep(ttl=10, stale_ttl=50) == 1 and store.count() == 0
+    print("✅ The store sweep deletes finished tasks by TTL and unfinished ones only once stale")
+
+
+def run_tests():
+    print("=== Task manager tests ===")
+    root = tempfile.mkdtemp()
+    try:
+        test_running_tasks_survive_size_limit()
+        test_running_tasks_survive_ttl()
+        test_stale_tasks_evicted()
+        test_persistence(root)
+        test_store_sweep(root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()
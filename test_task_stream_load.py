@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Load test for the async task stream server.
+
+Holds thousands of idle progress streams open on one event loop, measures the
+memory each costs and how quickly a progress update reaches every stream, and
+checks Last-Event-ID resume, heartbeats, the final result event, the stream
+cap, that a held task manager lock does not stall the loop, and that a second
+server cannot take a bound port.
+"""
+
+import sys
+import time
+import asyncio
+import threading
+import resource
+
+sys.path.append('.')
+
+from app.prime_agent.task_manager import TaskManager
+from app.services.task_events import TaskEventBroker
+from app.services.task_stream_server import TaskStreamServer
+import app.prime_agent.task_manager as task_manager_module
+
+STREAMS = 4000
+TASKS = 100
+PATH = '/api/context7-tools/stream-task'
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Client:
+    """A minimal EventSource: collects event IDs, data and comments."""
+
+    def __init__(self, port, task_id, last_event_id=None):
+        self.port = port
+        self.task_id = task_id
+        self.last_event_id = last_event_id
+        self.status = None
+        self.events = []
+        self.comments = 0
+        self.received = asyncio.Event()
+        self.closed = asyncio.Event()
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        headers = f"GET {PATH}?task_id={self.task_id} HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n"
+        if self.last_event_id is not None:
+            headers += f"Last-Event-ID: {self.last_event_id}\r\n"
+        self.writer.write((headers + "\r\n").encode())
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        self.status = int(head.split(b' ', 2)[1])
+        self.task = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        event_id = None
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                line = line.decode().rstrip('\n')
+                if line.startswith('id: '):
+                    event_id = line[4:]
+                elif line.startswith('data: '):
+                    self.events.append((event_id, line[6:]))
+                    self.received.set()
+                elif line.startswith(':'):
+                    self.comments += 1
+                elif not line:
+                    event_id = None
+        finally:
+            self.closed.set()
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+
+def make_server(task_manager, **kwargs):
+    broker = TaskEventBroker()
+    # The task manager publishes to the module's broker
+    task_manager_module.task_events = broker
+    server = TaskStreamServer(task_manager, broker=broker, host='127.0.0.1', port=0, **kwargs)
+    server.start_thread()
+    return server
+
+
+async def test_idle_streams(task_manager, server):
+    task_ids = [task_manager.create_task(f"load task {i}") for i in range(TASKS)]
+    await asyncio.sleep(0.2)
+
+    before = rss_mb()
+    clients = [Client(server.port, task_ids[i % TASKS]) for i in range(STREAMS)]
+    start = time.perf_counter()
+    for i in range(0, STREAMS, 500):
+        await asyncio.gather(*(c.connect() for c in clients[i:i + 500]))
+    connect = time.perf_counter() - start
+    await asyncio.gather(*(c.received.wait() for c in clients))
+    for c in clients:
+        c.received.clear()
+    after = rss_mb()
+
+    assert server.active >= STREAMS and all(c.status == 200 for c in clients), server.get_stats()
+    per_stream_kb = (after - before) * 1024 / STREAMS
+    print(f"✅ {STREAMS} concurrent streams on one event loop thread, opened in {connect:.2f}s; "
+          f"{per_stream_kb:.1f} KB per stream including the client end")
+
+    # Fan one progress update out to every stream on each task
+    start = time.perf_counter()
+    for task_id in task_ids:
+        task_manager.update_task_progress(task_id, 'processing', f"step one of {task_id}")
+    await asyncio.wait_for(asyncio.gather(*(c.received.wait() for c in clients)), 30)
+    fan_out = time.perf_counter() - start
+    assert all(c.events[-1][0] == '1' for c in clients)
+    print(f"✅ Progress on {TASKS} tasks reached all {STREAMS} streams in {fan_out * 1000:.0f} ms")
+
+    for c in clients:
+        c.close()
+    deadline = time.monotonic() + 10
+    while server.active and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    assert server.active == 0, server.active
+    assert server.broker.get_stats()['subscribers'] == 0
+    print(f"✅ Closed streams unsubscribed; peak {server.peak} streams")
+
+
+async def test_resume_and_result(task_manager, server):
+    task_id = task_manager.create_task('resume task')
+    for i in range(3):
+        task_manager.update_task_progress(task_id, 'processing', f"step {i}")
+
+    first = Client(server.port, task_id)
+    await first.connect()
+    while len(first.events) < 4:
+        await asyncio.sleep(0.01)
+    first.close()
+    # Items 1-3 arrived with IDs; reconnect as if only the first got through
+    assert [e[0] for e in first.events] == [None, '1', '2', '3']
+
+    resumed = Client(server.port, task_id, last_event_id='1')
+    await resumed.connect()
+    await asyncio.sleep(0.1)
+    task_manager.update_task_progress(task_id, 'processing', 'step 3')
+    task_manager.complete_task(task_id, {'answer': 42})
+    await asyncio.wait_for(resumed.closed.wait(), 5)
+    ids = [e[0] for e in resumed.events]
+    assert ids[:2] == ['2', '3'] and ids[-1] == 'result', ids
+    assert '"answer": 42' in resumed.events[-1][1]
+    assert server.resumed >= 1
+
+    done = Client(server.port, task_id, last_event_id='result')
+    await done.connect()
+    assert done.status == 204
+    print(f"✅ Resumed from Last-Event-ID 1 without replaying it, received {ids[2:]}, "
+          "and a client holding the result got 204")
+
+
+async def test_heartbeat(task_manager, server):
+    task_id = task_manager.create_task('quiet task')
+    client = Client(server.port, task_id)
+    await client.connect()
+    await asyncio.sleep(0.75)
+    client.close()
+    assert client.comments >= 2, client.comments
+    print(f"✅ Idle stream received {client.comments} heartbeats in 0.75s")
+
+
+async def test_held_lock(task_manager, server):
+    task_id = task_manager.create_task('lock task')
+    watcher = Client(server.port, task_id)
+    await watcher.connect()
+    # Its first heartbeat means it has read the task and is waiting for changes
+    while not watcher.comments:
+        await asyncio.sleep(0.01)
+
+    # A sweep or slow store read holds the lock; a new stream must wait off the loop
+    released = threading.Event()
+    holder = threading.Thread(target=lambda: task_manager.lock.acquire() and released.wait(5))
+    holder.start()
+    before = watcher.comments
+    blocked = Client(server.port, task_id)
+    await blocked.connect()
+    await asyncio.sleep(0.9)
+    during = watcher.comments - before
+    released.set()
+    holder.join()
+    task_manager.lock.release()
+    await asyncio.wait_for(blocked.received.wait(), 5)
+    watcher.close()
+    blocked.close()
+    assert during >= 2, during
+    print(f"✅ With the task manager lock held for 0.9s, other streams still got {during} heartbeats")
+
+
+async def test_port_taken(task_manager, server):
+    second = TaskStreamServer(task_manager, host='127.0.0.1', port=server.port)
+    try:
+        second.start_thread()
+    except RuntimeError:
+        print("✅ A second server on a bound port fails to start instead of running silently")
+        return
+    raise AssertionError("second server started on a bound port")
+
+
+async def test_stream_cap(task_manager):
+    server = make_server(task_manager, max_streams=2, heartbeat=5)
+    task_id = task_manager.create_task('capped task')
+    clients = [Client(server.port, task_id) for _ in range(3)]
+    for c in clients:
+        await c.connect()
+    assert [c.status for c in clients] == [200, 200, 503]
+    for c in clients:
+        c.close()
+    print("✅ Streams beyond the cap were refused with 503")
+
+
+async def main():
+    task_manager = TaskManager(max_tasks=1000, max_workers=2)
+    server = make_server(task_manager, heartbeat=0.3)
+    await test_resume_and_result(task_manager, server)
+    await test_heartbeat(task_manager, server)
+    await test_held_lock(task_manager, server)
+    await test_port_taken(task_manager, server)
+    server.heartbeat = 60
+    await test_idle_streams(task_manager, server)
+    await test_stream_cap(task_manager)
+
+
+def run_tests():
+    print("=== Task stream server load test ===")
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test the single-pass threat scanner.
+
+Checks that the literal prefilter returns the same verdicts as running every
+rule's regex, that long matches deep inside a large body are found, that
+bodies past the byte budget are truncated, that verdicts are cached, and that metrics
+hooks receive each report.
+"""
+
+import re
+import sys
+import random
+import string
+
+sys.path.append('.')
+
+from app.security.threat_scanner import (
+    ThreatScanner, FIREWALL_RULES, VALIDATOR_RULES,
+    add_metrics_hook, remove_metrics_hook, report_scan_metrics
+)
+
+FRAGMENTS = ["UNION select", "' or 1=1", "<script>alert(1)</script>", "javascript:void(0)",
+             "onload =", "../../", "/etc/passwd", "/proc/self", "C:\\windows\\system32",
+             "; rm -rf", "a && b", "whoami", "nmap -sV", "<iframe src=x>", "hello", "plain words"]
+
+# Where the scanner used to split large bodies into 64 KB chunks
+CHUNK_SIZE = 64 * 1024
+
+
+def brute_force(rules, text):
+    """The verdict of searching every rule's regex, as the validators did before the scanner."""
+    return tuple(i for i, (_, pattern, flags, _) in enumerate(rules) if re.search(pattern, text, flags))
+
+
+def fuzz_inputs(count, seed=7):
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + " ;&|`$'\"<>=/\\.:-"
+    inputs = []
+    for _ in range(count):
+        parts = [rng.choice(FRAGMENTS) if rng.random() < 0.3 else
+                 ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+                 for _ in range(rng.randint(1, 6))]
+        inputs.append(' '.join(parts))
+    return inputs
+
+
+def test_verdicts_match_regexes():
+    for name, rules in (('firewall', FIREWALL_RULES), ('input_validator', VALIDATOR_RULES)):
+        scanner = ThreatScanner(rules, name=name, cache_size=0)
+        for text in fuzz_inputs(3000):
+            assert scanner.scan(text).rule_ids == brute_force(rules, text), text
+    print("✅ Prefiltered verdicts match every regex run on its own for 3000 fuzzed inputs per rule set")
+
+
+def test_clean_and_categories():
+    scanner = ThreatScanner(VALIDATOR_RULES, name='validator')
+    assert scanner.scan("Book me a hotel in Lisbon for next week").categories == ()
+    assert scanner.scan("").categories == ()
+    verdict = scanner.scan("1' OR 1=1; <script>x</script> ../etc")
+    assert set(verdict.categories) >= {'SQL Injection', 'XSS Attack', 'Path Traversal', 'Command Injection'}
+    print("✅ Clean text has no categories and a mixed payload reports every category once")
+
+
+def test_long_matches_and_truncation():
+    scanner = ThreatScanner(FIREWALL_RULES, name='firewall', max_scan_bytes=4 * CHUNK_SIZE)
+    padding = 'a' * (CHUNK_SIZE - 10)
+    verdict = scanner.scan(padding + '<script>alert(1)</script>' + 'b' * CHUNK_SIZE)
+    assert 'XSS Attack' in verdict.categories and not verdict.truncated
+
+    # A 4000-character script element straddling the 64 KB mark
+    body = 'a' * (CHUNK_SIZE - 2000) + '<script>' + 'x' * 4000 + '</script>' + 'b' * 40000
+    assert scanner.scan(body).rule_ids == brute_force(FIREWALL_RULES, body) != ()
+
+    hidden = 'c' * (4 * CHUNK_SIZE) + 'javascript:alert(1)'
+    verdict = scanner.scan(hidden)
+    assert verdict.truncated and verdict.bytes_scanned == 4 * CHUNK_SIZE
+    assert 'XSS Attack' not in verdict.categories
+    print("✅ Long matches past the 64 KB mark are found and bodies past the budget are truncated")
+
+
+def test_cache_and_metrics():
+    scanner = ThreatScanner(FIREWALL_RULES, name='firewall', cache_size=2)
+    long_text = 'x' * 1000 + ' select '
+    first = scanner.scan(long_text)
+    second = scanner.scan(long_text)
+    assert not first.cached and second.cached and first.rule_ids == second.rule_ids
+    scanner.scan('one')
+    scanner.scan('two')
+    assert not scanner.scan(long_text).cached
+    assert scanner.get_stats()['cached_verdicts'] == 2
+
+    reports = []
+    hook = lambda *args: reports.append(args)
+    add_metrics_hook(hook)
+    try:
+        report_scan_metrics('firewall', 0.001, 100, ['XSS Attack'])
+    finally:
+        remove_metrics_hook(hook)
+    report_scan_metrics('firewall', 0.001, 100, [])
+    assert reports == [('firewall', 0.001, 100, ['XSS Attack'])]
+    print("✅ Verdicts are cached in a bounded LRU and metrics hooks receive each report")
+
+
+def run_tests():
+    print("=== Threat scanner tests ===")
+    test_verdicts_match_regexes()
+    test_clean_and_categories()
+    test_long_matches_and_truncation()
+    test_cache_and_metrics()
+
+
+if __name__ == "__main__":
+    run_tests()
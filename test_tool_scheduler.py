@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test the Prime Agent tool scheduler.
+
+Checks that steps run after their dependencies with the dependency results as
+input, that independent steps run in parallel, that a step timing out or
+failing skips only its dependents, that time spent waiting for a worker does
+not count against a step's timeout, that threads stuck in timed-out steps are
+replaced up to a cap after which steps fail at once, and that bad graphs are
+rejected.
+"""
+
+import sys
+import time
+import threading
+import concurrent.futures
+
+sys.path.append('.')
+
+from app.prime_agent.tool_scheduler import (
+    ToolScheduler, ToolStep, ToolWorkerPool, SUCCESS, FAILED, TIMEOUT, SKIPPED
+)
+
+
+def sleeper(seconds, value=None, log=None, name=None):
+    def run(inputs):
+        if log is not None:
+            log.append(('start', name, time.monotonic()))
+        time.sleep(seconds)
+        if log is not None:
+            log.append(('end', name, time.monotonic()))
+        return value if value is not None else inputs
+    return run
+
+
+def test_dependency_order():
+    log = []
+    steps = [
+        ToolStep('parse', sleeper(0.05, value={'city': 'Paris'}, log=log, name='parse')),
+        ToolStep('flights', sleeper(0.05, log=log, name='flights'), depends_on=['parse']),
+        ToolStep('hotels', sleeper(0.05, log=log, name='hotels'), depends_on=['parse', 'flights']),
+    ]
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    outcomes = ToolScheduler(executor=executor).run(steps)
+    executor.shutdown()
+
+    assert [o.status for o in outcomes.values()] == [SUCCESS] * 3
+    assert outcomes['flights'].result == {'parse': {'city': 'Paris'}}
+    assert set(outcomes['hotels'].result) == {'parse', 'flights'}
+    times = {(kind, name): t for kind, name, t in log}
+    assert times[('end', 'parse')] <= times[('start', 'flights')]
+    assert times[('end', 'flights')] <= times[('start', 'hotels')]
+    print("✅ Steps start only after their dependencies and receive their results")
+
+
+def test_parallelism():
+    steps = [ToolStep('parse', sleeper(0.01))]
+    steps += [ToolStep(f"tool{i}", sleeper(0.3), depends_on=['parse']) for i in range(4)]
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    start = time.monotonic()
+    outcomes = ToolScheduler(executor=executor).run(steps)
+    elapsed = time.monotonic() - start
+    executor.shutdown()
+
+    assert all(o.status == SUCCESS for o in outcomes.values())
+    assert elapsed < 0.6, f"4 independent 0.3s steps took {elapsed:.2f}s"
+    print(f"✅ Four independent 0.3s steps finished in {elapsed:.2f}s instead of 1.2s")
+
+
+def test_timeout_and_failure_skip_dependents():
+    def fail(inputs):
+        raise RuntimeError("site down")
+
+    release = threading.Event()
+    steps = [
+        ToolStep('slow', lambda inputs: release.wait(5), timeout=0.2),
+        ToolStep('after_slow', sleeper(0.01), depends_on=['slow']),
+        ToolStep('broken', fail),
+        ToolStep('after_broken', sleeper(0.01), depends_on=['broken']),
+        ToolStep('chained', sleeper(0.01), depends_on=['after_broken']),
+        ToolStep('fine', sleeper(0.05)),
+    ]
+    finished = []
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    start = time.monotonic()
+    outcomes = ToolScheduler(executor=executor).run(steps, on_finish=lambda o: finished.append(o.name))
+    elapsed = time.monotonic() - start
+    release.set()
+    executor.shutdown()
+
+    assert outcomes['slow'].status == TIMEOUT and elapsed < 1
+    assert outcomes['broken'].status == FAILED and 'site down' in outcomes['broken'].error
+    assert outcomes['after_slow'].status == SKIPPED and outcomes['after_broken'].status == SKIPPED
+    assert outcomes['chained'].status == SKIPPED
+    assert outcomes['fine'].status == SUCCESS
+    assert sorted(finished) == sorted(step.name for step in steps)
+    print("✅ A timeout or failure skips its dependents transitively and the other steps complete")
+
+
+def test_queue_time_not_counted():
+    # One worker: the second step waits 0.3s in the queue but only runs for 0.1s
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    steps = [
+        ToolStep('first', sleeper(0.3), timeout=1),
+        ToolStep('queued', sleeper(0.1), timeout=0.25),
+    ]
+    outcomes = ToolScheduler(executor=executor).run(steps)
+    executor.shutdown()
+
+    assert outcomes['queued'].status == SUCCESS, outcomes['queued'].error
+    assert outcomes['queued'].elapsed < 0.25
+    print("✅ Time spent waiting for a worker does not count against a step's timeout")
+
+
+def test_hung_steps_replaced():
+    pool = ToolWorkerPool(max_workers=2, max_abandoned=2)
+    scheduler = ToolScheduler(executor=pool)
+    release = threading.Event()
+    hung = lambda name: ToolStep(name, lambda inputs: release.wait(10), timeout=0.2)
+
+    outcomes = scheduler.run([hung('hung1'), hung('hung2')])
+    assert all(o.status == TIMEOUT for o in outcomes.values())
+    start = time.monotonic()
+    outcomes = scheduler.run([ToolStep('quick1', sleeper(0.01)), ToolStep('quick2', sleeper(0.01))])
+    assert all(o.status == SUCCESS for o in outcomes.values()) and time.monotonic() - start < 0.5
+    assert pool.get_stats()['replaced'] == 2
+
+    # Past the cap nothing replaces the stuck threads, and new steps fail at once
+    outcomes = scheduler.run([hung('hung3'), hung('hung4'), ToolStep('queued', sleeper(0.01), depends_on=['hung3'])])
+    assert outcomes['hung3'].status == TIMEOUT and outcomes['queued'].status == SKIPPED
+    start = time.monotonic()
+    outcomes = scheduler.run([ToolStep('late', sleeper(0.01))])
+    assert outcomes['late'].status == FAILED and time.monotonic() - start < 0.1, outcomes['late'].error
+
+    # Once the hung tools return, their threads serve again
+    release.set()
+    deadline = time.monotonic() + 5
+    while pool.get_stats()['abandoned'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.get_stats()['live'] == 2
+    assert scheduler.run([ToolStep('recovered', sleeper(0.01))])['recovered'].status == SUCCESS
+    pool.shutdown()
+    print("✅ Threads stuck in timed-out steps are replaced up to the cap; past it steps fail at once")
+
+
+def test_invalid_graphs():
+    scheduler = ToolScheduler()
+    for steps in (
+        [ToolStep('a', sleeper(0)), ToolStep('a', sleeper(0))],
+        [ToolStep('a', sleeper(0), depends_on=['missing'])],
+        [ToolStep('a', sleeper(0), depends_on=['b']), ToolStep('b', sleeper(0), depends_on=['a'])],
+    ):
+        try:
+            scheduler.run(steps)
+        except ValueError:
+            continue
+        raise AssertionError("invalid graph was accepted")
+    print("✅ Duplicate names, unknown dependencies and cycles are rejected")
+
+
+def run_tests():
+    print("=== Tool scheduler tests ===")
+    test_dependency_order()
+    test_parallelism()
+    test_timeout_and_failure_skip_dependents()
+    test_queue_time_not_counted()
+    test_hung_steps_replaced()
+    test_invalid_graphs()
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed upload store and prompt reference tokens.
+
+Compares processing a prompt carrying a 10 MB image inline, as the universal
+file upload used to send it, with the same prompt carrying an upload token.
+Also checks streaming and deduplication of uploads, lazily loaded text files,
+derived artifacts cached by hash, prompts that still send files inline, that
+only raster images are served inline, and that the background sweeper prunes
+unused blobs and interrupted uploads but keeps blobs whose artifacts are used.
+"""
+
+import io
+import os
+import sys
+import time
+import base64
+import shutil
+import tempfile
+
+sys.path.append('.')
+
+from PIL import Image
+from flask import Flask
+
+import app.services.upload_store as upload_store_module
+import app.services.file_analysis as file_analysis_module
+from app.services.upload_store import UploadStore, UploadTooLarge, make_token
+from app.services.file_analysis import FileAnalysisPipeline
+from app.services.file_processor import file_processor
+from app.utils.cache_service import get_cache_service
+from app.api.uploads import uploads_bp
+
+PROMPT = "Describe this picture and review the script"
+SCRIPT = "import os\n\n\ndef main():\n    print(os.getcwd())\n\n\nclass Runner:\n    pass\n"
+
+
+def make_large_image():
+    """A noisy PNG of about 10 MB that does not compress."""
+    image = Image.frombytes('RGB', (1900, 1800), os.urandom(1900 * 1800 * 3))
+    output = io.BytesIO()
+    image.save(output, 'PNG', compress_level=0)
+    return output.getvalue()
+
+
+def inline_prompt(image_bytes):
+    data_url = 'data:image/png;base64,' + base64.b64encode(image_bytes).decode('ascii')
+    return (f"{PROMPT}\n\n--- Image: photo.png (image/png) ---\n{data_url}\n"
+            f"\n\n--- File: tool-runner.py ---\n{SCRIPT}\n")
+
+
+def token_prompt(image_info, script_info):
+    return (f"{PROMPT}\n\n--- Image: photo.png (image/png) ---\n{image_info['token']}\n"
+            f"\n\n--- File: tool-runner.py ---\n{script_info['token']}\n")
+
+
+def enhance(prompt):
+    original, file_content = file_processor.split_file_content(prompt)
+    assert original == PROMPT
+    return file_processor.enhance_prompt_with_files(original, file_content)
+
+
+def test_store_and_dedup(store, image_bytes):
+    start = time.perf_counter()
+    first = store.store_stream(io.BytesIO(image_bytes), 'photo.png', 'image/png')
+    elapsed = time.perf_counter() - start
+    second = store.store_stream(io.BytesIO(image_bytes), 'copy of photo.png', 'image/png')
+    assert first['hash'] == second['hash'] and not first['deduplicated'] and second['deduplicated']
+    assert store.get_stats()['stored'] == 1 and store.get_info(first['hash'])['name'] == 'photo.png'
+    assert store.read_bytes(first['hash']) == image_bytes
+
+    try:
+        UploadStore(root=store.root, max_bytes=1024).store_bytes(image_bytes, 'photo.png', 'image/png')
+        raise AssertionError("An upload over the limit was stored")
+    except UploadTooLarge:
+        pass
+    assert os.listdir(os.path.join(store.root, 'tmp')) == []
+    print(f"✅ A {len(image_bytes) / 1e6:.1f} MB upload streamed into the store in {elapsed * 1000:.0f} ms; "
+          f"uploading it again stored nothing new")
+    return first
+
+
+def test_inline_vs_token(store, image_bytes, image_info):
+    script_info = store.store_bytes(SCRIPT.encode(), 'tool-runner.py', 'text/x-python')
+    inline = inline_prompt(image_bytes)
+    tokens = token_prompt(image_info, script_info)
+
+    start = time.perf_counter()
+    inline_enhanced = enhance(inline)
+    inline_time = time.perf_counter() - start
+    start = time.perf_counter()
+    token_enhanced = enhance(tokens)
+    first_token_time = time.perf_counter() - start
+    start = time.perf_counter()
+    token_enhanced = enhance(tokens)
+    token_time = time.perf_counter() - start
+
+    print(f"Prompt sent with the files inline: {len(inline) / 1e6:.1f} MB, "
+          f"processed in {inline_time * 1000:.0f} ms into {len(inline_enhanced) / 1e3:.0f} KB")
+    print(f"Prompt sent with upload tokens:    {len(tokens)} bytes, processed in {first_token_time * 1000:.0f} ms "
+          f"(first time) and {token_time * 1000:.1f} ms after, into {len(token_enhanced) / 1e3:.0f} KB")
+
+    assert len(tokens) < 300 and len(token_enhanced) < len(image_bytes) / 20
+    assert 'def main' in token_enhanced and 'Functions: 1' in token_enhanced and 'Classes: 1' in token_enhanced
+    assert 'data:image/jpeg;base64,' in token_enhanced and '1900x1800' in token_enhanced
+    assert token_time < inline_time
+    # Inline images are moved into the store, so the enhanced prompt no longer carries them either
+    assert inline_enhanced == token_enhanced
+    print("✅ Processors loaded the referenced files lazily; the image reached the prompt as a preview")
+
+
+def test_derived_artifacts(store, image_info):
+    before = store.get_stats()
+    thumbnail = store.get_thumbnail(image_info['hash'])
+    assert store.get_thumbnail(image_info['hash']) == thumbnail
+    assert max(Image.open(io.BytesIO(thumbnail)).size) <= upload_store_module.THUMBNAIL_SIZE
+    after = store.get_stats()
+    assert after['derived_built'] == before['derived_built'] and after['derived_hits'] > before['derived_hits']
+
+    notes = store.store_bytes('Meeting notes\n• ship it\n'.encode('utf-8'), 'notes.txt', 'text/plain')
+    assert store.get_text(notes['hash']) == 'Meeting notes\n• ship it\n'
+    assert store.get_text(image_info['hash']) is None
+    binary = store.store_bytes(b'\0\1\2' * 100, 'data.bin', '')
+    assert store.get_text(binary['hash']) is None
+
+    enhanced = file_processor.enhance_prompt_with_files(
+        PROMPT, f"\n\n--- File: data.bin ---\n{binary['token']}\n\n\n--- File: gone.txt ---\n{make_token('0' * 64)}\n")
+    assert 'binary file (300 bytes)' in enhanced and 'no longer available' in enhanced
+    print(f"✅ Thumbnails and extracted text were derived once per hash ({len(thumbnail) / 1e3:.0f} KB thumbnail); "
+          f"binary and missing uploads were described instead of failing")
+
+
+def test_legacy_inline_text():
+    content = ("\n\n--- File: data-2024.json ---\n{\"a\": 1, \"b\": [1, 2]}\n"
+               "\n\n--- File: notes.md ---\n# Title\n\n---\n\nText after a rule\n")
+    files = file_processor._parse_file_content_string(content)
+    assert [f['name'] for f in files] == ['data-2024.json', 'notes.md']
+    assert files[1]['content'].endswith('Text after a rule')
+    processed = file_processor.process_file_content(content)
+    assert processed['processed_files'][0]['analysis']['key_count'] == 2
+    print("✅ Files sent inline are still parsed, including names with '-' and Markdown rules")
+
+
+def test_serving(store, image_info):
+    app = Flask(__name__)
+    app.register_blueprint(uploads_bp)
+    client = app.test_client()
+    page = store.store_bytes(b'<script>alert(document.cookie)</script>', 'page.html', 'text/html')
+    svg = store.store_bytes(b'<svg xmlns="http://www.w3.org/2000/svg" onload="alert(1)"/>', 'x.svg', 'image/svg+xml')
+
+    image = client.get(f"/api/uploads/{image_info['hash']}/raw")
+    assert image.status_code == 200 and image.mimetype == 'image/png'
+    assert 'attachment' not in image.headers.get('Content-Disposition', '')
+    for info in (page, svg):
+        response = client.get(f"/api/uploads/{info['hash']}/raw")
+        assert response.headers['Content-Disposition'].startswith('attachment')
+        assert response.mimetype == 'application/octet-stream'
+    for response in (image, client.get(f"/api/uploads/{page['hash']}/raw")):
+        assert response.headers['X-Content-Type-Options'] == 'nosniff'
+        assert response.headers['Content-Security-Policy'] == 'sandbox'
+        response.close()
+    print("✅ Raster images are served inline; HTML and SVG uploads are sent as sandboxed downloads")
+
+
+def test_sweeper(root):
+    store = UploadStore(root=os.path.join(root, 'swept'), ttl=60, sweep_interval=0.1)
+    used = store.store_bytes(b'still being read\n', 'used.txt', 'text/plain')
+    unused = store.store_bytes(b'nobody reads me\n', 'unused.txt', 'text/plain')
+    assert store.get_text(used['hash'])
+    for info in (used, unused):
+        os.utime(os.path.join(store.root, info['hash'][:2], info['hash']), (0, 0))
+    # A text hit marks the blob used again
+    assert store.get_text(used['hash'])
+    interrupted = os.path.join(store._tmp_dir, 'partial-upload')
+    with open(interrupted, 'wb') as f:
+        f.write(b'half a file')
+    os.utime(interrupted, (0, 0))
+
+    store.start_sweeper()
+    time.sleep(0.5)
+    store.stop_sweeper()
+    assert store.exists(used['hash']) and not store.exists(unused['hash'])
+    assert not os.path.exists(interrupted)
+    print("✅ The sweeper pruned an unused blob and an interrupted upload and kept a blob whose text was read")
+
+
+def run_tests():
+    print("=== Upload store tests ===")
+    root = tempfile.mkdtemp()
+    store = UploadStore(root=root)
+    upload_store_module._upload_store = store
+    # Analyze in-process with a cache of its own, so timings are not cache hits from earlier runs
+    file_analysis_module._pipeline = FileAnalysisPipeline(workers=0, store=store,
+                                                          cache=get_cache_service(os.path.join(root, 'cache')))
+    try:
+        image_bytes = make_large_image()
+        image_info = test_store_and_dedup(store, image_bytes)
+        test_inline_vs_token(store, image_bytes, image_info)
+        test_derived_artifacts(store, image_info)
+        test_legacy_inline_text()
+        test_serving(store, image_info)
+        test_sweeper(root)
+        old = os.path.join(root, image_info['hash'][:2], image_info['hash'])
+        os.utime(old, (0, 0))
+        assert store.prune() == 1 and not store.exists(image_info['hash'])
+        print("✅ Uploads unused past the TTL were pruned with their artifacts")
+    finally:
+        upload_store_module._upload_store = None
+        file_analysis_module._pipeline = None
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_tests()